@@ -0,0 +1,496 @@
+import io
+import os
+import time
+import uuid
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from apps.lambda_processor import compression, json_codec
+
+#object formats; NDJSON keeps every event byte for byte, Parquet types the columns of events of
+#one shape and keeps mixed shapes as JSON rows
+FORMAT_NDJSON_ZST = "ndjson.zst"
+FORMAT_PARQUET = "parquet"
+FORMATS = (FORMAT_NDJSON_ZST, FORMAT_PARQUET)
+#S3 rejects multipart parts below 5 MiB except the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+PARQUET_ROW_GROUP_SIZE = 50_000
+#columns of a Parquet object whose events do not share one shape, each event kept as JSON
+FALLBACK_PARQUET_SCHEMA = pa.schema([
+    ("event_id", pa.string()),
+    ("event_type", pa.string()),
+    ("event_json", pa.string())
+])
+
+class S3MultipartSink(io.RawIOBase):
+    """Writable stream that uploads an S3 object in parts as the data is written.
+
+    At most one part is held in memory. Closing completes the upload; `abort` discards it.
+    """
+
+    def __init__(self, client: Any, bucket: str, key: str, part_size: int = DEFAULT_PART_SIZE):
+        """Initialize the sink and start the multipart upload.
+
+        Args:
+            client (Any): A boto3 S3 client.
+            bucket (str): The bucket.
+            key (str): The object key.
+            part_size (int): Bytes per uploaded part, at least MIN_PART_SIZE.
+
+        Raises:
+            ValueError: If the part size is below the S3 minimum.
+        """
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"Multipart part size must be at least {MIN_PART_SIZE} bytes")
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.bytes_written = 0
+        self._buffer = bytearray()
+        self._parts: List[Dict[str, Any]] = []
+        self._upload_id = client.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+
+    def writable(self) -> bool:
+        """The stream is writable."""
+        return True
+
+    def tell(self) -> int:
+        """Get the number of bytes written so far."""
+        return self.bytes_written
+
+    def write(self, data: Any) -> int:
+        """Buffer bytes and upload every full part.
+
+        Args:
+            data (Any): Bytes-like data.
+
+        Returns:
+            int: The number of bytes consumed.
+        """
+        self._buffer += data
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return len(data)
+
+    def close(self) -> None:
+        """Upload the last part and complete the object."""
+        if self.closed:
+            return
+        try:
+            if self._buffer or not self._parts:
+                self._upload_part(bytes(self._buffer))
+                self._buffer = bytearray()
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts}
+            )
+        except Exception:
+            self.abort()
+            raise
+        super().close()
+
+    def abort(self) -> None:
+        """Discard the upload and every part uploaded so far."""
+        if self.closed:
+            return
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+        finally:
+            super().close()
+
+    def _upload_part(self, data: bytes) -> None:
+        """Upload one part.
+
+        Args:
+            data (bytes): The part's bytes.
+        """
+        number = len(self._parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id, PartNumber=number, Body=data
+        )
+        self._parts.append({"PartNumber": number, "ETag": response["ETag"]})
+
+class LocalFileSink(io.RawIOBase):
+    """Writable stream to a local file that only appears under its name once closed."""
+
+    def __init__(self, path: str):
+        """Initialize the sink.
+
+        Args:
+            path (str): The final file path; parent directories are created.
+        """
+        self.path = path
+        self.bytes_written = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        self._file = open(self._tmp_path, "wb")
+
+    def writable(self) -> bool:
+        """The stream is writable."""
+        return True
+
+    def tell(self) -> int:
+        """Get the number of bytes written so far."""
+        return self.bytes_written
+
+    def write(self, data: Any) -> int:
+        """Write bytes to the temporary file.
+
+        Args:
+            data (Any): Bytes-like data.
+
+        Returns:
+            int: The number of bytes consumed.
+        """
+        self._file.write(data)
+        self.bytes_written += len(data)
+        return len(data)
+
+    def close(self) -> None:
+        """Move the finished file into place, removing the temporary file if that fails."""
+        if self.closed:
+            return
+        try:
+            self._file.close()
+            os.replace(self._tmp_path, self.path)
+        except Exception:
+            if os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+            raise
+        finally:
+            super().close()
+
+    def abort(self) -> None:
+        """Discard the temporary file."""
+        if self.closed:
+            return
+        self._file.close()
+        os.remove(self._tmp_path)
+        super().close()
+
+def sink_factory(uri: str, part_size: int = DEFAULT_PART_SIZE, client: Any = None) -> Callable[[str], Any]:
+    """Build the function that opens an archive object for writing.
+
+    Args:
+        uri (str): An s3://bucket URI or a local directory; object keys are used as given, so
+            the key returned for an event is the real key.
+        part_size (int): Multipart part size for S3.
+        client (Any): The boto3 S3 client, created on first use when None.
+
+    Returns:
+        Callable[[str], Any]: Opens a sink for an object key.
+
+    Raises:
+        ValueError: If an S3 URI has a path after the bucket; use the archive prefix instead.
+    """
+    if uri.startswith("s3://"):
+        bucket, _, path = uri[len("s3://"):].partition("/")
+        if path.strip("/"):
+            raise ValueError(f"Archive URI {uri!r} must name only the bucket, set the key prefix on the archive")
+        clients = [client]
+
+        def open_s3(key: str) -> S3MultipartSink:
+            """Start a multipart upload of an object."""
+            if clients[0] is None:
+                import boto3
+                clients[0] = boto3.client("s3")
+            return S3MultipartSink(clients[0], bucket, key, part_size)
+
+        return open_s3
+    return lambda key: LocalFileSink(os.path.join(uri, key))
+
+class _Group:
+    """Events buffered for one archive object."""
+
+    def __init__(self, key: str, created: float):
+        """Initialize an empty group writing to an object key, created at a monotonic time."""
+        self.key = key
+        self.created = created
+        self.events: List[Dict[str, Any]] = []
+        self.bytes = 0
+        self.failures = 0
+
+class RawArchive:
+    """Buffers original events per event type and hour and writes them as large objects.
+
+    Every event is assigned its object key and row index when it is added, so callers can
+    return the location right away; the object is written when its group is flushed. A group
+    whose write fails keeps its events and key for the next flush, so returned locations stay
+    valid, until it has failed `max_attempts` times and is handed to `on_abandon` instead.
+    Events added while the buffered events or bytes are at their limits are dropped and counted.
+    Hours are arrival hours in UTC, like the keys the handler used to report.
+    """
+
+    def __init__(
+        self,
+        open_sink: Callable[[str], Any],
+        prefix: str = "events",
+        fmt: str = FORMAT_NDJSON_ZST,
+        level: Optional[int] = None,
+        max_rows: int = 100_000,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_age_seconds: float = 300.0,
+        max_pending_events: int = 200_000,
+        max_pending_bytes: int = 128 * 1024 * 1024,
+        max_attempts: int = 3,
+        on_abandon: Optional[Callable[[str, List[Dict[str, Any]], Exception], None]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        utcnow: Callable[[], datetime] = datetime.utcnow
+    ):
+        """Initialize the archive.
+
+        Args:
+            open_sink (Callable[[str], Any]): Opens a writable sink for an object key, e.g. from
+                `sink_factory`; the sink must offer `close` to commit and `abort` to discard.
+            prefix (str): Key prefix of every object.
+            fmt (str): One of FORMATS.
+            level (Optional[int]): zstd level for NDJSON, the codec default when None.
+            max_rows (int): Buffered events that make a group due for flushing.
+            max_bytes (int): Approximate buffered JSON bytes that make a group due.
+            max_age_seconds (float): Age of a group that makes it due.
+            max_pending_events (int): Buffered events over every group beyond which new events
+                are dropped, e.g. while the store is unavailable.
+            max_pending_bytes (int): Approximate buffered JSON bytes beyond which new events are
+                dropped.
+            max_attempts (int): Failed writes after which a group is given up on.
+            on_abandon (Optional[Callable[[str, List[Dict[str, Any]], Exception], None]]): Called
+                with the key, events and last error of a group that is given up on.
+            clock (Callable[[], float]): Monotonic clock, in seconds.
+            utcnow (Callable[[], datetime]): Current UTC time, for the hour in the key.
+
+        Raises:
+            ValueError: If the format is unknown.
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown archive format {fmt!r}, expected one of {FORMATS}")
+        self.open_sink = open_sink
+        self.prefix = prefix.strip("/")
+        self.fmt = fmt
+        self.level = level
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.max_pending_events = max_pending_events
+        self.max_pending_bytes = max_pending_bytes
+        self.max_attempts = max_attempts
+        self.on_abandon = on_abandon
+        self.clock = clock
+        self.utcnow = utcnow
+        self.objects_written = 0
+        self.events_written = 0
+        self.bytes_written = 0
+        self.write_failures = 0
+        self.events_dropped = 0
+        self.groups_abandoned = 0
+        self.events_abandoned = 0
+        self.parquet_fallbacks = 0
+        self._pending_events = 0
+        self._pending_bytes = 0
+        self._groups: Dict[Tuple[str, str], _Group] = {}
+
+    def add(self, event: Dict[str, Any], size: Optional[int] = None) -> Dict[str, Any]:
+        """Buffer an original event.
+
+        Args:
+            event (Dict[str, Any]): The event as received, with an event_type.
+            size (Optional[int]): The event's encoded size if already known, for the byte threshold.
+
+        Returns:
+            Dict[str, Any]: The object "key" and zero-based "row" the event will be written at,
+            both None if the event was dropped because the buffer is full.
+        """
+        if self._pending_events >= self.max_pending_events or self._pending_bytes >= self.max_pending_bytes:
+            self.events_dropped += 1
+            return {"key": None, "row": None}
+        hour = self.utcnow().strftime("%Y/%m/%d/%H")
+        group_id = (str(event.get("event_type")), hour)
+        group = self._groups.get(group_id)
+        if group is None:
+            group = self._groups[group_id] = _Group(self._new_key(*group_id), self.clock())
+        size = size if size is not None else len(json_codec.dumps(event))
+        group.events.append(event)
+        group.bytes += size
+        self._pending_events += 1
+        self._pending_bytes += size
+        return {"key": group.key, "row": len(group.events) - 1}
+
+    def pending_events(self) -> int:
+        """Get the number of events not yet written.
+
+        Returns:
+            int: Buffered events over every group.
+        """
+        return self._pending_events
+
+    def is_due(self, group: _Group) -> bool:
+        """Check whether a group has hit any flush threshold.
+
+        Args:
+            group (_Group): The group.
+
+        Returns:
+            bool: True if its events, bytes or age exceed their thresholds.
+        """
+        return (
+            len(group.events) >= self.max_rows
+            or group.bytes >= self.max_bytes
+            or self.clock() - group.created >= self.max_age_seconds
+        )
+
+    def flush_due(self) -> Dict[str, Exception]:
+        """Write the groups that hit a threshold.
+
+        Returns:
+            Dict[str, Exception]: The write error for each object key that failed.
+        """
+        return self._flush([group_id for group_id, group in self._groups.items() if self.is_due(group)])
+
+    def flush(self) -> Dict[str, Exception]:
+        """Write every buffered group.
+
+        Returns:
+            Dict[str, Exception]: The write error for each object key that failed.
+        """
+        return self._flush(list(self._groups))
+
+    def stats(self) -> Dict[str, int]:
+        """Get the archive counters.
+
+        Returns:
+            Dict[str, int]: Objects, events and bytes written, failed writes, events dropped on a
+            full buffer, groups and events given up on, Parquet objects written as JSON rows,
+            and pending events and bytes.
+        """
+        return {
+            "objects_written": self.objects_written,
+            "events_written": self.events_written,
+            "bytes_written": self.bytes_written,
+            "write_failures": self.write_failures,
+            "events_dropped": self.events_dropped,
+            "groups_abandoned": self.groups_abandoned,
+            "events_abandoned": self.events_abandoned,
+            "parquet_fallbacks": self.parquet_fallbacks,
+            "pending_events": self._pending_events,
+            "pending_bytes": self._pending_bytes
+        }
+
+    def _new_key(self, event_type: str, hour: str) -> str:
+        """Name a new object.
+
+        Args:
+            event_type (str): The event type of the group.
+            hour (str): The arrival hour as "yyyy/mm/dd/HH".
+
+        Returns:
+            str: A unique key, e.g. "events/purchase/2024/01/02/03/20240102T031501-<hex>.ndjson.zst".
+        """
+        stamp = self.utcnow().strftime("%Y%m%dT%H%M%S")
+        name = f"{stamp}-{uuid.uuid4().hex}.{self.fmt}"
+        return f"{self.prefix}/{event_type.replace('/', '_')}/{hour}/{name}"
+
+    def _flush(self, group_ids: List[Tuple[str, str]]) -> Dict[str, Exception]:
+        """Write groups, keeping the ones that fail until they run out of attempts.
+
+        Args:
+            group_ids (List[Tuple[str, str]]): The groups to write.
+
+        Returns:
+            Dict[str, Exception]: The write error for each object key that failed, including
+            the groups given up on.
+        """
+        failed = {}
+        abandoned = []
+        for group_id in group_ids:
+            group = self._groups[group_id]
+            try:
+                size = self._write(group)
+            except Exception as e:
+                self.write_failures += 1
+                failed[group.key] = e
+                group.failures += 1
+                if group.failures >= self.max_attempts:
+                    self._remove(group_id)
+                    self.groups_abandoned += 1
+                    self.events_abandoned += len(group.events)
+                    abandoned.append(group)
+                continue
+            self._remove(group_id)
+            self.objects_written += 1
+            self.events_written += len(group.events)
+            self.bytes_written += size
+        #handed off outside the except block, so the error is not the exception being handled
+        for group in abandoned:
+            if self.on_abandon is not None:
+                self.on_abandon(group.key, group.events, failed[group.key])
+        return failed
+
+    def _remove(self, group_id: Tuple[str, str]) -> None:
+        """Drop a group from the buffer.
+
+        Args:
+            group_id (Tuple[str, str]): The group.
+        """
+        group = self._groups.pop(group_id)
+        self._pending_events -= len(group.events)
+        self._pending_bytes -= group.bytes
+
+    def _parquet_table(self, group: _Group) -> pa.Table:
+        """Build the Parquet rows of a group.
+
+        Events of one shape become typed columns. When their fields disagree on a type, every
+        event of the group is kept as a JSON string instead, so one odd event cannot block the
+        whole object.
+
+        Args:
+            group (_Group): The group.
+
+        Returns:
+            pa.Table: The rows, in the order of the events.
+        """
+        try:
+            return pa.Table.from_pylist(group.events)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            self.parquet_fallbacks += 1
+            return pa.Table.from_pylist([
+                {
+                    "event_id": None if event.get("event_id") is None else str(event.get("event_id")),
+                    "event_type": None if event.get("event_type") is None else str(event.get("event_type")),
+                    "event_json": json_codec.dumps(event)
+                }
+                for event in group.events
+            ], schema=FALLBACK_PARQUET_SCHEMA)
+
+    def _write(self, group: _Group) -> int:
+        """Stream a group's events into its object.
+
+        Args:
+            group (_Group): The group.
+
+        Returns:
+            int: The object size in bytes.
+        """
+        sink = self.open_sink(group.key)
+        try:
+            if self.fmt == FORMAT_PARQUET:
+                pq.write_table(
+                    self._parquet_table(group), sink,
+                    row_group_size=PARQUET_ROW_GROUP_SIZE, compression="zstd"
+                )
+            else:
+                writer = compression.CompressingWriter(sink, "zstd", self.level)
+                for event in group.events:
+                    writer.write((json_codec.dumps(event) + "\n").encode("utf-8"))
+                writer.close()
+            size = sink.tell()
+        except Exception:
+            sink.abort()
+            raise
+        sink.close()
+        return size
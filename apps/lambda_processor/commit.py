@@ -0,0 +1,260 @@
+import time
+import random
+import threading
+import pyarrow as pa
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+from pyiceberg.exceptions import CommitFailedException
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    """Get a percentile from already sorted values using the nearest-rank method.
+
+    Args:
+        sorted_values (List[float]): The values, in ascending order.
+        fraction (float): The percentile as a fraction, e.g. 0.99.
+
+    Returns:
+        Optional[float]: The percentile value, or None when there are no values.
+    """
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+class _PendingAppend:
+    """An append waiting to be committed, possibly together with others."""
+
+    __slots__ = ("data", "done", "error")
+
+    def __init__(self, data: pa.Table):
+        self.data = data
+        self.done = False
+        self.error: Optional[BaseException] = None
+
+class _TableState:
+    """Per-table queue of pending appends and the lock held while committing them."""
+
+    def __init__(self):
+        self.queue_lock = threading.Lock()
+        self.commit_lock = threading.Lock()
+        self.pending: List[_PendingAppend] = []
+
+class CommitCoordinator:
+    """Optimistic-concurrency commit layer for Iceberg appends.
+
+    Conflicting commits from other writers are retried with full-jitter exponential backoff
+    after refreshing the table metadata. Appends issued concurrently from this process to the
+    same table are coalesced into one commit: whichever thread gets the table's commit lock
+    commits everything queued so far on behalf of the others.
+    """
+
+    def __init__(
+        self,
+        get_table: Callable[[str], Any],
+        refresh_table: Callable[[str], Any],
+        max_attempts: int = 5,
+        base_backoff_seconds: float = 0.05,
+        max_backoff_seconds: float = 2.0,
+        latency_window: int = 1024,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Callable[[], float] = random.random,
+        prepare: Optional[Callable[[Any, pa.Table], pa.Table]] = None
+    ):
+        """Initialize the coordinator.
+
+        Args:
+            get_table (Callable[[str], Any]): Returns the table handle for a table name.
+            refresh_table (Callable[[str], Any]): Reloads a table's metadata after a conflict.
+            max_attempts (int): Commit attempts per append before the conflict is raised.
+            base_backoff_seconds (float): Backoff ceiling after the first conflict.
+            max_backoff_seconds (float): Upper bound of the backoff ceiling.
+            latency_window (int): Number of recent commit latencies kept for percentiles.
+            sleep (Callable[[float], None]): Sleeps between attempts.
+            clock (Callable[[], float]): Monotonic clock, in seconds.
+            rng (Callable[[], float]): Uniform random number in [0, 1) used for jitter.
+            prepare (Optional[Callable[[Any, pa.Table], pa.Table]]): Transforms the combined rows
+                of a commit given the table handle, e.g. to apply the table's sort order.
+        """
+        self.get_table = get_table
+        self.refresh_table = refresh_table
+        self.max_attempts = max_attempts
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.sleep = sleep
+        self.clock = clock
+        self.rng = rng
+        self.prepare = prepare
+        self.commits = 0
+        self.attempts = 0
+        self.conflicts = 0
+        self.failed_commits = 0
+        self.coalesced_appends = 0
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self._retry_latencies: Deque[float] = deque(maxlen=latency_window)
+        self._states: Dict[str, _TableState] = {}
+        self._states_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def append(self, table_name: str, data: pa.Table) -> None:
+        """Append rows to a table, coalescing with concurrent appends to the same table.
+
+        Args:
+            table_name (str): The table name.
+            data (pa.Table): The rows to append.
+
+        Raises:
+            CommitFailedException: If the commit still conflicts after every attempt.
+        """
+        state = self._state(table_name)
+        entry = _PendingAppend(data)
+        with state.queue_lock:
+            state.pending.append(entry)
+
+        with state.commit_lock:
+            if not entry.done:
+                with state.queue_lock:
+                    batch = state.pending
+                    state.pending = []
+                self._commit_batch(table_name, batch)
+
+        if entry.error is not None:
+            raise entry.error
+
+    def overwrite(self, table_name: str, data: pa.Table, overwrite_filter: Any) -> None:
+        """Replace the rows matching a filter with new rows in one commit.
+
+        Overwrites are not coalesced, but they hold the table's commit lock, so they are
+        serialized with the appends of this process.
+
+        Args:
+            table_name (str): The table name.
+            data (pa.Table): The rows to write.
+            overwrite_filter (Any): The pyiceberg expression selecting the rows to replace.
+
+        Raises:
+            CommitFailedException: If the commit still conflicts after every attempt.
+        """
+        state = self._state(table_name)
+        with state.commit_lock:
+            self._commit_with_retry(table_name, data, overwrite_filter)
+
+    def backoff_seconds(self, attempt: int) -> float:
+        """Get the full-jitter backoff after a conflicting attempt.
+
+        Args:
+            attempt (int): The attempt that conflicted, starting at 1.
+
+        Returns:
+            float: Seconds to wait, uniform between 0 and the exponential ceiling.
+        """
+        ceiling = min(self.max_backoff_seconds, self.base_backoff_seconds * (2 ** (attempt - 1)))
+        return ceiling * self.rng()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get conflict and latency statistics for sizing writer concurrency.
+
+        Returns:
+            Dict[str, Any]: Commit, attempt and conflict counts, the conflict rate per attempt,
+            and p50/p95/p99 latency in seconds of all commits and of commits that retried.
+        """
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            retry_latencies = sorted(self._retry_latencies)
+            return {
+                "commits": self.commits,
+                "attempts": self.attempts,
+                "conflicts": self.conflicts,
+                "failed_commits": self.failed_commits,
+                "coalesced_appends": self.coalesced_appends,
+                "conflict_rate": self.conflicts / self.attempts if self.attempts else 0.0,
+                "latency_p50": percentile(latencies, 0.50),
+                "latency_p95": percentile(latencies, 0.95),
+                "latency_p99": percentile(latencies, 0.99),
+                "retry_latency_p50": percentile(retry_latencies, 0.50),
+                "retry_latency_p95": percentile(retry_latencies, 0.95),
+                "retry_latency_p99": percentile(retry_latencies, 0.99)
+            }
+
+    def _state(self, table_name: str) -> _TableState:
+        """Get or create the coalescing state of a table.
+
+        Args:
+            table_name (str): The table name.
+
+        Returns:
+            _TableState: The table's pending queue and commit lock.
+        """
+        with self._states_lock:
+            state = self._states.get(table_name)
+            if state is None:
+                state = self._states[table_name] = _TableState()
+            return state
+
+    def _commit_batch(self, table_name: str, batch: List[_PendingAppend]) -> None:
+        """Commit a batch of queued appends as one append and settle every entry.
+
+        Args:
+            table_name (str): The table name.
+            batch (List[_PendingAppend]): The queued appends, including the caller's.
+        """
+        error = None
+        try:
+            data = batch[0].data if len(batch) == 1 else pa.concat_tables(
+                [entry.data for entry in batch], promote_options="default"
+            )
+            self._commit_with_retry(table_name, data)
+        except Exception as e:
+            error = e
+
+        with self._stats_lock:
+            self.coalesced_appends += len(batch) - 1
+        for entry in batch:
+            entry.error = error
+            entry.done = True
+
+    def _commit_with_retry(self, table_name: str, data: pa.Table, overwrite_filter: Any = None) -> None:
+        """Append, or overwrite, with retries on commit conflicts.
+
+        Args:
+            table_name (str): The table name.
+            data (pa.Table): The rows to append.
+            overwrite_filter (Any): Rows to replace with the new ones, or None to only append.
+
+        Raises:
+            CommitFailedException: If every attempt conflicted.
+        """
+        started = self.clock()
+        attempt = 1
+        prepared = False
+        while True:
+            with self._stats_lock:
+                self.attempts += 1
+            try:
+                table = self.get_table(table_name)
+                if self.prepare is not None and not prepared:
+                    #prepared once, a retry appends the same rows on top of the refreshed table
+                    data = self.prepare(table, data)
+                    prepared = True
+                if overwrite_filter is None:
+                    table.append(data)
+                else:
+                    table.overwrite(data, overwrite_filter=overwrite_filter)
+                break
+            except CommitFailedException:
+                with self._stats_lock:
+                    self.conflicts += 1
+                    if attempt >= self.max_attempts:
+                        self.failed_commits += 1
+                        raise
+                #another writer committed first, retry on top of its snapshot
+                self.refresh_table(table_name)
+                self.sleep(self.backoff_seconds(attempt))
+                attempt += 1
+
+        latency = self.clock() - started
+        with self._stats_lock:
+            self.commits += 1
+            self._latencies.append(latency)
+            if attempt > 1:
+                self._retry_latencies.append(latency)
@@ -0,0 +1,554 @@
+import io
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+#bytes read from a source per streaming step
+STREAM_CHUNK_SIZE = 1024 * 1024
+#bytes-like payloads accepted without copying
+BYTES_TYPES = (bytes, bytearray, memoryview)
+
+class Codec(ABC):
+    """A compression codec with one-shot and streaming compress/decompress.
+
+    Streaming compressors expose `compress(chunk)` and `flush()`, streaming decompressors
+    `decompress(chunk)` and `flush()`, which raises EOFError if the input ended inside a frame;
+    both work on arbitrary chunk boundaries. Subclasses must implement both factories,
+    otherwise they cannot be instantiated and registered.
+    """
+
+    name = ""
+    extensions: Tuple[str, ...] = ()
+    default_level: Optional[int] = None
+    #valid levels, inclusive; None for codecs without levels
+    level_range: Optional[Tuple[int, int]] = None
+
+    def check_level(self, level: Optional[int]) -> Optional[int]:
+        """Resolve and validate a compression level.
+
+        Args:
+            level (Optional[int]): The requested level, the codec default when None.
+
+        Returns:
+            Optional[int]: The level to use.
+
+        Raises:
+            ValueError: If the codec has no levels or the level is out of range.
+        """
+        if level is None:
+            return self.default_level
+        if self.level_range is None:
+            raise ValueError(f"Codec {self.name} has no compression levels")
+        low, high = self.level_range
+        if not low <= level <= high:
+            raise ValueError(f"Codec {self.name} level must be between {low} and {high}, got {level}")
+        return level
+
+    @abstractmethod
+    def compressor(self, level: Optional[int] = None) -> Any:
+        """Create a streaming compressor."""
+
+    @abstractmethod
+    def decompressor(self) -> Any:
+        """Create a streaming decompressor."""
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        """Compress a whole payload.
+
+        Args:
+            data (bytes): The payload.
+            level (Optional[int]): The compression level, the codec default when None.
+
+        Returns:
+            bytes: The compressed payload, readable by the streaming decompressor.
+        """
+        compressor = self.compressor(level)
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data: bytes) -> bytes:
+        """Decompress a whole payload.
+
+        Args:
+            data (bytes): The compressed payload, possibly several concatenated frames.
+
+        Returns:
+            bytes: The original payload.
+
+        Raises:
+            EOFError: If the payload is truncated.
+        """
+        decompressor = self.decompressor()
+        return decompressor.decompress(data) + decompressor.flush()
+
+class _FrameDecompressor:
+    """Decompresses concatenated frames, e.g. appended gzip members or zstd frames."""
+
+    def __init__(self, factory: Callable[[], Any]):
+        """Initialize with a factory creating the decompressor of one frame."""
+        self.factory = factory
+        self._current = factory()
+        #whether the current frame has received any input
+        self._started = False
+
+    def decompress(self, chunk: bytes) -> bytes:
+        """Decompress a chunk, starting a new frame whenever one ends."""
+        out = []
+        while chunk:
+            self._started = True
+            out.append(self._current.decompress(chunk))
+            if not self._current.eof:
+                break
+            chunk = self._current.unused_data
+            self._current = self.factory()
+            self._started = False
+        return b"".join(out)
+
+    def flush(self) -> bytes:
+        """End the input, raising EOFError if it stopped inside a frame."""
+        if self._started and not self._current.eof:
+            raise EOFError("Compressed input ended before the end of the frame")
+        return b""
+
+class _NoneCompressor:
+    """Passes chunks through unchanged."""
+
+    def compress(self, chunk: bytes) -> bytes:
+        """Return the chunk."""
+        return bytes(chunk)
+
+    def flush(self) -> bytes:
+        """Return nothing, there is no trailer."""
+        return b""
+
+class _NoneDecompressor:
+    """Passes chunks through unchanged."""
+
+    def decompress(self, chunk: bytes) -> bytes:
+        """Return the chunk."""
+        return bytes(chunk)
+
+    def flush(self) -> bytes:
+        """Return nothing, any input is complete."""
+        return b""
+
+class NoneCodec(Codec):
+    """No compression, as a baseline and for already compressed payloads."""
+
+    name = "none"
+
+    def compressor(self, level: Optional[int] = None) -> Any:
+        """Create a streaming compressor."""
+        self.check_level(level)
+        return _NoneCompressor()
+
+    def decompressor(self) -> Any:
+        """Create a streaming decompressor."""
+        return _NoneDecompressor()
+
+class GzipCodec(Codec):
+    """gzip through zlib, readable by any gzip tool."""
+
+    name = "gzip"
+    extensions = (".gz", ".gzip")
+    default_level = 6
+    level_range = (1, 9)
+
+    def compressor(self, level: Optional[int] = None) -> Any:
+        """Create a streaming compressor."""
+        #wbits 31 writes the gzip header and trailer
+        return zlib.compressobj(self.check_level(level), zlib.DEFLATED, 31)
+
+    def decompressor(self) -> Any:
+        """Create a streaming decompressor."""
+        return _FrameDecompressor(lambda: zlib.decompressobj(31))
+
+class ZstdCodec(Codec):
+    """Zstandard, the best ratio per CPU second at mid levels."""
+
+    name = "zstd"
+    extensions = (".zst", ".zstd")
+    default_level = 3
+    level_range = (1, 22)
+
+    def compressor(self, level: Optional[int] = None) -> Any:
+        """Create a streaming compressor."""
+        import zstandard
+        return zstandard.ZstdCompressor(level=self.check_level(level)).compressobj()
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        """Compress a whole payload into one frame that records its content size."""
+        import zstandard
+        return zstandard.ZstdCompressor(level=self.check_level(level)).compress(data)
+
+    def decompressor(self) -> Any:
+        """Create a streaming decompressor."""
+        import zstandard
+        decompressor = zstandard.ZstdDecompressor()
+        return _FrameDecompressor(decompressor.decompressobj)
+
+class Lz4Codec(Codec):
+    """LZ4 frames, the fastest codec; levels 3 and above use the high-compression mode."""
+
+    name = "lz4"
+    extensions = (".lz4",)
+    default_level = 0
+    level_range = (0, 16)
+
+    def compressor(self, level: Optional[int] = None) -> Any:
+        """Create a streaming compressor."""
+        import lz4.frame
+        return _Lz4Compressor(lz4.frame.LZ4FrameCompressor(compression_level=self.check_level(level)))
+
+    def decompressor(self) -> Any:
+        """Create a streaming decompressor."""
+        import lz4.frame
+        return _FrameDecompressor(lz4.frame.LZ4FrameDecompressor)
+
+class _Lz4Compressor:
+    """Adapts the LZ4 frame compressor, which must begin a frame, to compress/flush."""
+
+    def __init__(self, compressor: Any):
+        """Initialize with a fresh LZ4FrameCompressor."""
+        self.compressor = compressor
+        self._header = compressor.begin()
+
+    def compress(self, chunk: bytes) -> bytes:
+        """Compress a chunk, prefixed with the frame header the first time."""
+        header, self._header = self._header, b""
+        return header + self.compressor.compress(chunk)
+
+    def flush(self) -> bytes:
+        """End the frame."""
+        header, self._header = self._header, b""
+        return header + self.compressor.flush()
+
+class SnappyCodec(Codec):
+    """Snappy framing format from python-snappy, fast with a modest ratio and no levels."""
+
+    name = "snappy"
+    extensions = (".sz", ".snappy")
+
+    def compressor(self, level: Optional[int] = None) -> Any:
+        """Create a streaming compressor."""
+        import snappy
+        self.check_level(level)
+        return _SnappyCompressor(snappy.StreamCompressor())
+
+    def decompressor(self) -> Any:
+        """Create a streaming decompressor."""
+        import snappy
+        return _SnappyDecompressor(snappy.StreamDecompressor())
+
+class _SnappyCompressor:
+    """Adapts the snappy stream compressor to compress/flush."""
+
+    def __init__(self, compressor: Any):
+        """Initialize with a fresh snappy.StreamCompressor."""
+        self.compressor = compressor
+
+    def compress(self, chunk: bytes) -> bytes:
+        """Compress a chunk into framed snappy chunks."""
+        return self.compressor.add_chunk(bytes(chunk)) if len(chunk) else b""
+
+    def flush(self) -> bytes:
+        """Return nothing, every chunk is complete once added."""
+        return b""
+
+#stream identifier chunk that starts every snappy framed stream
+_SNAPPY_STREAM_HEADER = b"\xff\x06\x00\x00sNaPpY"
+
+class _SnappyDecompressor:
+    """Adapts the snappy stream decompressor to decompress/flush.
+
+    The framing format has no end marker, so only input that stops inside a chunk is detected
+    as truncated; input cut exactly between chunks decodes to the chunks before the cut.
+    """
+
+    def __init__(self, decompressor: Any):
+        """Initialize with a fresh snappy.StreamDecompressor."""
+        self.decompressor = decompressor
+
+    def decompress(self, chunk: bytes) -> bytes:
+        """Decompress the complete framed chunks received so far."""
+        return self.decompressor.decompress(bytes(chunk))
+
+    def flush(self) -> bytes:
+        """End the input, raising EOFError if it stopped inside a chunk."""
+        remains = self.decompressor.remains or b""
+        if remains.startswith(_SNAPPY_STREAM_HEADER):
+            remains = remains[len(_SNAPPY_STREAM_HEADER):]
+        if remains:
+            raise EOFError("Compressed input ended inside a snappy chunk")
+        return b""
+
+_codecs: Dict[str, Codec] = {}
+
+def register_codec(codec: Codec) -> None:
+    """Register a codec under its name and file extensions.
+
+    Args:
+        codec (Codec): The codec; a codec with the same name is replaced.
+    """
+    _codecs[codec.name] = codec
+
+def get_codec(name: str) -> Codec:
+    """Get a registered codec.
+
+    Args:
+        name (str): The codec name, e.g. "zstd".
+
+    Returns:
+        Codec: The codec.
+
+    Raises:
+        ValueError: If no codec is registered under the name.
+    """
+    try:
+        return _codecs[name]
+    except KeyError:
+        raise ValueError(f"Unknown compression codec {name!r}, expected one of {sorted(_codecs)}") from None
+
+def available_codecs() -> List[str]:
+    """List the registered codecs whose library is installed.
+
+    Returns:
+        List[str]: Codec names, sorted.
+    """
+    available = []
+    for name, codec in sorted(_codecs.items()):
+        try:
+            codec.compressor()
+        except ImportError:
+            continue
+        available.append(name)
+    return available
+
+def codec_for_path(path: str) -> Optional[Codec]:
+    """Get the codec of a file from its extension.
+
+    Args:
+        path (str): The file path, e.g. "events.ndjson.zst".
+
+    Returns:
+        Optional[Codec]: The codec, or None for files without a compression extension.
+    """
+    name = path.lower()
+    for codec in _codecs.values():
+        if codec.extensions and name.endswith(codec.extensions):
+            return codec
+    return None
+
+def _check_bytes(data: Any) -> None:
+    """Reject payloads that are not bytes-like."""
+    if not isinstance(data, BYTES_TYPES):
+        raise TypeError(f"Expected a bytes-like payload, got {type(data).__name__}")
+
+def compress(data: bytes, codec: str = "gzip", level: Optional[int] = None) -> bytes:
+    """Compress a whole payload.
+
+    Args:
+        data (bytes): The payload; bytearray and memoryview are accepted too.
+        codec (str): The codec name.
+        level (Optional[int]): The compression level, the codec default when None.
+
+    Returns:
+        bytes: The compressed payload.
+
+    Raises:
+        TypeError: If the payload is not bytes-like.
+        ValueError: If the codec is unknown or the level is invalid.
+    """
+    _check_bytes(data)
+    return get_codec(codec).compress(data, level)
+
+def decompress(data: bytes, codec: str = "gzip") -> bytes:
+    """Decompress a whole payload.
+
+    Args:
+        data (bytes): The compressed payload.
+        codec (str): The codec name.
+
+    Returns:
+        bytes: The original payload.
+
+    Raises:
+        TypeError: If the payload is not bytes-like.
+        ValueError: If the codec is unknown.
+        EOFError: If the payload is truncated.
+    """
+    _check_bytes(data)
+    return get_codec(codec).decompress(data)
+
+def iter_compress(chunks: Iterable[bytes], codec: str = "gzip", level: Optional[int] = None) -> Iterator[bytes]:
+    """Compress a stream of chunks without joining them first.
+
+    Args:
+        chunks (Iterable[bytes]): The payload in pieces of any size.
+        codec (str): The codec name.
+        level (Optional[int]): The compression level, the codec default when None.
+
+    Returns:
+        Iterator[bytes]: Compressed pieces, empty pieces skipped, that concatenate to one
+        compressed payload.
+    """
+    compressor = get_codec(codec).compressor(level)
+    for chunk in chunks:
+        _check_bytes(chunk)
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    out = compressor.flush()
+    if out:
+        yield out
+
+def iter_decompress(chunks: Iterable[bytes], codec: str = "gzip") -> Iterator[bytes]:
+    """Decompress a stream of compressed chunks.
+
+    Args:
+        chunks (Iterable[bytes]): The compressed payload in pieces of any size.
+        codec (str): The codec name.
+
+    Returns:
+        Iterator[bytes]: Decompressed pieces, empty pieces skipped.
+
+    Raises:
+        EOFError: If the chunks end inside a frame, after the pieces decoded so far.
+    """
+    decompressor = get_codec(codec).decompressor()
+    for chunk in chunks:
+        out = decompressor.decompress(chunk)
+        if out:
+            yield out
+    out = decompressor.flush()
+    if out:
+        yield out
+
+def iter_file(source: BinaryIO, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Read a binary file in chunks.
+
+    Args:
+        source (BinaryIO): The file object.
+        chunk_size (int): Bytes per read.
+
+    Returns:
+        Iterator[bytes]: The chunks, until end of file.
+    """
+    return iter(lambda: source.read(chunk_size), b"")
+
+class _ChunkReader(io.RawIOBase):
+    """A readable raw stream over an iterator of byte chunks."""
+
+    def __init__(self, chunks: Iterator[bytes], source: Optional[BinaryIO] = None):
+        """Initialize with the chunks and the file they are read from, closed with the reader."""
+        self.chunks = chunks
+        self.source = source
+        self._pending = b""
+
+    def readable(self) -> bool:
+        """The stream is readable."""
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        """Fill the buffer from the pending chunk, returning 0 at the end of the stream."""
+        while not self._pending:
+            try:
+                self._pending = next(self.chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self) -> None:
+        """Close the stream and its source file."""
+        if self.source is not None and not self.closed:
+            self.source.close()
+        super().close()
+
+def open_reader(source: BinaryIO, codec: str, chunk_size: int = STREAM_CHUNK_SIZE) -> BinaryIO:
+    """Wrap a compressed binary file in a buffered reader of the decompressed bytes.
+
+    Args:
+        source (BinaryIO): The compressed file; closed with the reader.
+        codec (str): The codec name.
+        chunk_size (int): Compressed bytes read per step.
+
+    Returns:
+        BinaryIO: A buffered reader, e.g. to wrap in `io.TextIOWrapper` for line reading.
+    """
+    return io.BufferedReader(_ChunkReader(iter_decompress(iter_file(source, chunk_size), codec), source))
+
+class CompressingWriter(io.RawIOBase):
+    """A writable stream that compresses into another binary file.
+
+    Closing the writer writes the codec trailer; the target stays open unless `close_target`.
+    """
+
+    def __init__(self, target: BinaryIO, codec: str = "gzip", level: Optional[int] = None, close_target: bool = False):
+        """Initialize the writer.
+
+        Args:
+            target (BinaryIO): Receives the compressed bytes.
+            codec (str): The codec name.
+            level (Optional[int]): The compression level, the codec default when None.
+            close_target (bool): Close the target when the writer is closed.
+        """
+        self.target = target
+        self.close_target = close_target
+        self.compressor = get_codec(codec).compressor(level)
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def writable(self) -> bool:
+        """The stream is writable."""
+        return True
+
+    def write(self, data: Any) -> int:
+        """Compress bytes into the target, returning the number of bytes consumed."""
+        _check_bytes(data)
+        self._emit(self.compressor.compress(data))
+        self.bytes_in += len(data)
+        return len(data)
+
+    def _emit(self, out: bytes) -> None:
+        """Write compressed bytes to the target."""
+        if out:
+            self.target.write(out)
+            self.bytes_out += len(out)
+
+    def close(self) -> None:
+        """Write the codec trailer and close the stream."""
+        if not self.closed:
+            self._emit(self.compressor.flush())
+            if self.close_target:
+                self.target.close()
+        super().close()
+
+def copy_compress(
+    source: BinaryIO,
+    target: BinaryIO,
+    codec: str = "gzip",
+    level: Optional[int] = None,
+    chunk_size: int = STREAM_CHUNK_SIZE
+) -> Tuple[int, int]:
+    """Compress one file into another in bounded memory.
+
+    Args:
+        source (BinaryIO): The uncompressed input.
+        target (BinaryIO): The compressed output.
+        codec (str): The codec name.
+        level (Optional[int]): The compression level, the codec default when None.
+        chunk_size (int): Bytes read per step.
+
+    Returns:
+        Tuple[int, int]: The bytes read and the compressed bytes written.
+    """
+    writer = CompressingWriter(target, codec, level)
+    for chunk in iter_file(source, chunk_size):
+        writer.write(chunk)
+    writer.close()
+    return writer.bytes_in, writer.bytes_out
+
+for _codec in (NoneCodec(), GzipCodec(), ZstdCodec(), Lz4Codec(), SnappyCodec()):
+    register_codec(_codec)
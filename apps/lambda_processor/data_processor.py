@@ -1,23 +1,705 @@
-import json
-import io
-import gzip
+import os
+import sys
 import uuid
+import time
+import base64
+import resource
 import traceback
 import polars as pl
+import pyarrow as pa
 from datetime import datetime
-from typing import Dict, Any, Optional
-from pyiceberg.catalog import load_catalog
-from pyiceberg.table import Table
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Set, Tuple, Union
+from apps.lambda_processor import json_codec
+from apps.lambda_processor.commit import CommitCoordinator
+from apps.lambda_processor.error_sink import ErrorSink, IcebergErrorWriter, NdjsonSpoolWriter, spool_table
+from apps.lambda_processor.metrics import FileLineWriter, MetricsRegistry
+from apps.lambda_processor.partitioning import cluster_for_table
+from apps.lambda_processor.routing import DEFAULT_QUARANTINE_TABLE, EventRouter, parse_routes
+from apps.lambda_processor.schema_writer import SchemaAligner
+from apps.lambda_processor.schemas import (
+    METADATA_FIELDS,
+    CompiledFlattener,
+    create_base_schema,
+    create_error_log_schema
+)
+from apps.lambda_processor.table_cache import TableCache
+from apps.lambda_processor.timestamps import parse_timestamps
+from apps.lambda_processor.write_buffer import WriteBuffer, DURABILITY_BUFFER, DURABILITY_FLUSH
+
+if TYPE_CHECKING:
+    from pyiceberg.table import Table
+    from apps.lambda_processor.archive import RawArchive
+    from apps.lambda_processor.dedup import Deduplicator
+    from apps.lambda_processor.upsert import UpsertWriter
 
 _catalog = None
+_table_cache = None
+_commit_coordinator = None
+_write_buffer = None
+_error_sink = None
+_metrics = None
+_archive = None
+_schema_aligner = None
+_router = None
+_deduplicator = None
+_upsert_writer = None
+#compiled once per container so per-event flattening is plain dictionary lookups
+_flattener = CompiledFlattener(create_base_schema())
+
+REQUIRED_FIELDS = ["event_id", "event_type", "user_id", "timestamp"]
+
+#catalog location, defaults to the Glue catalog and S3 warehouse
+ICEBERG_CATALOG_NAME = os.environ.get("ICEBERG_CATALOG_NAME", "glue")
+ICEBERG_CATALOG_TYPE = os.environ.get("ICEBERG_CATALOG_TYPE")
+ICEBERG_CATALOG_URI = os.environ.get("ICEBERG_CATALOG_URI")
+ICEBERG_WAREHOUSE = os.environ.get("ICEBERG_WAREHOUSE", "s3://iceberg-data/warehouse")
+#namespace table names are qualified with, unqualified when empty
+ICEBERG_NAMESPACE = os.environ.get("ICEBERG_NAMESPACE", "")
+
+#how long a loaded table handle is reused before it is loaded from the catalog again
+TABLE_CACHE_TTL_SECONDS = float(os.environ.get("TABLE_CACHE_TTL_SECONDS", "300"))
+
+#retries of appends that conflict with commits from other writers
+COMMIT_MAX_ATTEMPTS = int(os.environ.get("COMMIT_MAX_ATTEMPTS", "5"))
+COMMIT_BASE_BACKOFF_SECONDS = float(os.environ.get("COMMIT_BASE_BACKOFF_SECONDS", "0.05"))
+COMMIT_MAX_BACKOFF_SECONDS = float(os.environ.get("COMMIT_MAX_BACKOFF_SECONDS", "2"))
+#cluster each commit by partition and the table's sort order so file and row group stats prune well
+WRITE_SORTED = os.environ.get("WRITE_SORTED", "true").lower() == "true"
+#event types with a table of their own, as "type" or "type=table" entries; empty for the defaults
+EVENT_TYPES = os.environ.get("EVENT_TYPES", "")
+#table receiving the events of every other type
+QUARANTINE_TABLE = os.environ.get("QUARANTINE_TABLE", DEFAULT_QUARANTINE_TABLE)
+#drop rows whose event_id was already committed, making at-least-once delivery idempotent
+DEDUP_ENABLED = os.environ.get("DEDUP_ENABLED", "true").lower() == "true"
+#event ids per Bloom filter generation; the hot window holds one to two generations
+DEDUP_CAPACITY = int(os.environ.get("DEDUP_CAPACITY", "1000000"))
+DEDUP_ERROR_RATE = float(os.environ.get("DEDUP_ERROR_RATE", "0.001"))
+#most snapshots read back when seeding the filters with a table's recent event ids
+DEDUP_SEED_SNAPSHOTS = int(os.environ.get("DEDUP_SEED_SNAPSHOTS", "100"))
+#"upsert" replaces committed rows of event_ids that arrive again with different values, see
+#upsert.WRITE_MODES
+WRITE_MODE = os.environ.get("WRITE_MODE", "append")
+#corrections are rewritten right away while a rewrite copies at most this many rows per correction
+UPSERT_MAX_AMPLIFICATION = float(os.environ.get("UPSERT_MAX_AMPLIFICATION", "50"))
+UPSERT_MAX_PENDING_ROWS = int(os.environ.get("UPSERT_MAX_PENDING_ROWS", "10000"))
+UPSERT_MAX_AGE_SECONDS = float(os.environ.get("UPSERT_MAX_AGE_SECONDS", "60"))
+#how far around a correction's timestamp the committed version is looked for
+UPSERT_MATCH_WINDOW_SECONDS = float(os.environ.get("UPSERT_MATCH_WINDOW_SECONDS", "86400"))
+#add columns a table lacks through schema evolution instead of failing the write
+WRITE_EVOLVE_SCHEMA = os.environ.get("WRITE_EVOLVE_SCHEMA", "false").lower() == "true"
+
+#error records are batched to error_logs ("iceberg") or spooled as NDJSON files ("ndjson")
+ERROR_SINK = os.environ.get("ERROR_SINK", "iceberg")
+ERROR_SPOOL_URI = os.environ.get("ERROR_SPOOL_URI", "/tmp/error_spool")
+#rows the write buffer gives up on are kept as one Parquet file per table here
+ABANDONED_ROWS_URI = os.environ.get("ABANDONED_ROWS_URI", f"{ERROR_SPOOL_URI}/abandoned")
+#a flush thread for long-running processes; Lambda freezes threads between invocations, so
+#handlers there write queued records before they return
+ERROR_SINK_BACKGROUND = os.environ.get(
+    "ERROR_SINK_BACKGROUND", "false" if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") else "true"
+).lower() == "true"
+ERROR_SINK_MAX_BATCH = int(os.environ.get("ERROR_SINK_MAX_BATCH", "500"))
+ERROR_SINK_FLUSH_INTERVAL_SECONDS = float(os.environ.get("ERROR_SINK_FLUSH_INTERVAL_SECONDS", "5"))
+#longest a handler waits on an error write already in flight before returning
+ERROR_SINK_FLUSH_TIMEOUT_SECONDS = float(os.environ.get("ERROR_SINK_FLUSH_TIMEOUT_SECONDS", "2"))
+
+#micro-batching of Iceberg appends across warm invocations
+WRITE_DURABILITY = os.environ.get("WRITE_DURABILITY", DURABILITY_FLUSH)
+WRITE_BUFFER_MAX_ROWS = int(os.environ.get("WRITE_BUFFER_MAX_ROWS", "10000"))
+WRITE_BUFFER_MAX_BYTES = int(os.environ.get("WRITE_BUFFER_MAX_BYTES", str(64 * 1024 * 1024)))
+WRITE_BUFFER_MAX_AGE_SECONDS = float(os.environ.get("WRITE_BUFFER_MAX_AGE_SECONDS", "60"))
+#rows kept for retry while appends fail in buffer durability; more are logged to error_logs instead
+WRITE_BUFFER_MAX_PENDING_ROWS = int(os.environ.get("WRITE_BUFFER_MAX_PENDING_ROWS", "100000"))
+WRITE_BUFFER_MAX_PENDING_BYTES = int(os.environ.get("WRITE_BUFFER_MAX_PENDING_BYTES", str(256 * 1024 * 1024)))
+#failed appends after which a table's buffered rows are logged to error_logs instead
+WRITE_BUFFER_MAX_FLUSH_ATTEMPTS = int(os.environ.get("WRITE_BUFFER_MAX_FLUSH_ATTEMPTS", "3"))
+#flush everything when less than this much invocation time is left
+FLUSH_MARGIN_MS = int(os.environ.get("FLUSH_MARGIN_MS", "5000"))
+
+#per-stage latency histograms and counters, emitted as CloudWatch EMF once per invocation
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "DataPipeline")
+METRICS_SERVICE = os.environ.get("METRICS_SERVICE", "data-processor")
+#"stdout" for the Lambda log stream, otherwise a local file the EMF lines are appended to
+METRICS_OUTPUT = os.environ.get("METRICS_OUTPUT", "stdout")
+
+#raw event archive: an s3://bucket URI or a local directory, disabled when empty
+ARCHIVE_URI = os.environ.get("ARCHIVE_URI", "")
+ARCHIVE_PREFIX = os.environ.get("ARCHIVE_PREFIX", "events")
+ARCHIVE_FORMAT = os.environ.get("ARCHIVE_FORMAT", "ndjson.zst")
+ARCHIVE_MAX_EVENTS = int(os.environ.get("ARCHIVE_MAX_EVENTS", "100000"))
+ARCHIVE_MAX_BYTES = int(os.environ.get("ARCHIVE_MAX_BYTES", str(64 * 1024 * 1024)))
+ARCHIVE_MAX_AGE_SECONDS = float(os.environ.get("ARCHIVE_MAX_AGE_SECONDS", "300"))
+#events kept while objects cannot be written; new events are dropped beyond these
+ARCHIVE_MAX_PENDING_EVENTS = int(os.environ.get("ARCHIVE_MAX_PENDING_EVENTS", "200000"))
+ARCHIVE_MAX_PENDING_BYTES = int(os.environ.get("ARCHIVE_MAX_PENDING_BYTES", str(128 * 1024 * 1024)))
+#failed writes after which an object's events are sent to the error sink instead
+ARCHIVE_MAX_WRITE_ATTEMPTS = int(os.environ.get("ARCHIVE_MAX_WRITE_ATTEMPTS", "3"))
+
+#default codec and level of compress_data, see compression.py for the registered codecs
+COMPRESSION_CODEC = os.environ.get("COMPRESSION_CODEC", "gzip")
+COMPRESSION_LEVEL = int(os.environ["COMPRESSION_LEVEL"]) if os.environ.get("COMPRESSION_LEVEL") else None
+
+#load the catalog and table handles while the container initializes instead of on the first request
+WARM_UP_ON_INIT = os.environ.get("WARM_UP_ON_INIT", "false").lower() == "true"
+#comma-separated table names to preload, e.g. "events_purchase,error_logs"; all tables of the
+#namespace when empty
+WARM_UP_TABLES = os.environ.get("WARM_UP_TABLES", "")
 
 def get_catalog():
     """Get or initialize the catalog."""
     global _catalog
     if _catalog is None:
-        _catalog = load_catalog("glue", warehouse="s3://iceberg-data/warehouse")
+        properties = {"warehouse": ICEBERG_WAREHOUSE}
+        if ICEBERG_CATALOG_TYPE:
+            properties["type"] = ICEBERG_CATALOG_TYPE
+        if ICEBERG_CATALOG_URI:
+            properties["uri"] = ICEBERG_CATALOG_URI
+        #imported on first use, the catalog implementation (boto3 for Glue) is only needed to write
+        from pyiceberg.catalog import load_catalog
+        _catalog = load_catalog(ICEBERG_CATALOG_NAME, **properties)
     return _catalog
 
+def set_catalog(catalog: Any, namespace: Optional[str] = None) -> None:
+    """Use an already loaded catalog, e.g. a local SQL catalog for backfills and tests.
+
+    Args:
+        catalog (Any): The pyiceberg catalog.
+        namespace (Optional[str]): Namespace to qualify table names with; unchanged when None.
+    """
+    global _catalog, _table_cache, ICEBERG_NAMESPACE
+    _catalog = catalog
+    _table_cache = None
+    if namespace is not None:
+        ICEBERG_NAMESPACE = namespace
+
+def table_identifier(table_name: str) -> str:
+    """Qualify a table name with the configured namespace.
+
+    Args:
+        table_name (str): The table name, e.g. "events_purchase".
+
+    Returns:
+        str: The catalog identifier of the table.
+    """
+    return f"{ICEBERG_NAMESPACE}.{table_name}" if ICEBERG_NAMESPACE else table_name
+
+def get_table_cache() -> TableCache:
+    """Get or initialize the table handle cache.
+
+    Returns:
+        TableCache: The module-level cache, whose hit/miss counters show the catalog calls saved.
+    """
+    global _table_cache
+    if _table_cache is None:
+        _table_cache = TableCache(
+            _load_table,
+            ttl_seconds=TABLE_CACHE_TTL_SECONDS
+        )
+    return _table_cache
+
+def _load_table(table_name: str) -> "Table":
+    """Load a table from the catalog, timing the catalog round trip.
+
+    Args:
+        table_name (str): The table name.
+
+    Returns:
+        Table: The freshly loaded table handle.
+    """
+    with get_metrics().timer("catalog_load"):
+        return get_catalog().load_table(table_identifier(table_name))
+
+def get_table(table_name: str) -> "Table":
+    """Get a cached Iceberg table handle.
+
+    Args:
+        table_name (str): The table name.
+
+    Returns:
+        Table: The table handle, loaded from the catalog only on a cache miss.
+    """
+    return get_table_cache().get(table_name)
+
+def get_commit_coordinator() -> CommitCoordinator:
+    """Get or initialize the commit coordinator.
+
+    Returns:
+        CommitCoordinator: The module-level coordinator that retries conflicting appends and
+        coalesces concurrent appends to the same table; its stats report the conflict rate.
+    """
+    global _commit_coordinator
+    if _commit_coordinator is None:
+        _commit_coordinator = CommitCoordinator(
+            get_table,
+            lambda table_name: get_table_cache().refresh(table_name),
+            max_attempts=COMMIT_MAX_ATTEMPTS,
+            base_backoff_seconds=COMMIT_BASE_BACKOFF_SECONDS,
+            max_backoff_seconds=COMMIT_MAX_BACKOFF_SECONDS,
+            prepare=cluster_for_table if WRITE_SORTED else None
+        )
+    return _commit_coordinator
+
+def get_router() -> EventRouter:
+    """Get or initialize the event type router.
+
+    Returns:
+        EventRouter: The module-level router built from EVENT_TYPES and QUARANTINE_TABLE; its
+        stats report the rows and throughput of every route.
+    """
+    global _router
+    if _router is None:
+        _router = EventRouter(parse_routes(EVENT_TYPES), QUARANTINE_TABLE)
+    return _router
+
+def _committed_event_ids(table_name: str, candidates: pa.Table) -> Set[str]:
+    """Find which candidate event IDs a table already holds.
+
+    The table is refreshed first so commits from other containers are seen, and the scan is
+    limited to the partitions of the candidates' timestamps, since a redelivered event keeps
+    the timestamp of the original.
+
+    Args:
+        table_name (str): The table name.
+        candidates (pa.Table): Rows the dedup filter reported as possibly committed.
+
+    Returns:
+        Set[str]: The candidate event IDs present in the table.
+    """
+    from apps.lambda_processor.upsert import match_filter
+    row_filter = match_filter(candidates)
+    table = get_table_cache().refresh(table_name)
+    found = table.scan(row_filter=row_filter, selected_fields=("event_id",)).to_arrow()
+    return set(found.column("event_id").to_pylist())
+
+def _recent_event_ids(table_name: str, limit: int) -> Optional[pa.ChunkedArray]:
+    """Read the event IDs a table's most recent snapshots added.
+
+    Walks back from the current snapshot through at most DEDUP_SEED_SNAPSHOTS snapshots,
+    reading only the manifests each one wrote, and collects the data files it added that no
+    newer snapshot removed until they hold `limit` rows. The table is never planned as a
+    whole; rows removed by delete files are included, the exact lookup confirms every hit.
+
+    Args:
+        table_name (str): The table name.
+        limit (int): Most event IDs to return.
+
+    Returns:
+        Optional[pa.ChunkedArray]: The event IDs, newest files first, or None for a table
+        without snapshots.
+    """
+    from pyiceberg.expressions import AlwaysTrue
+    from pyiceberg.io.pyarrow import ArrowScan
+    from pyiceberg.manifest import ManifestContent, ManifestEntryStatus
+    from pyiceberg.table import FileScanTask
+    from pyiceberg.table.snapshots import ancestors_of
+    table = get_table_cache().refresh(table_name)
+    snapshot = table.current_snapshot()
+    if snapshot is None:
+        return None
+    tasks = []
+    removed: Set[str] = set()
+    rows = 0
+    for depth, ancestor in enumerate(ancestors_of(snapshot, table.metadata)):
+        if depth >= DEDUP_SEED_SNAPSHOTS or rows >= limit:
+            break
+        for manifest in ancestor.manifests(table.io):
+            if manifest.added_snapshot_id != ancestor.snapshot_id or manifest.content != ManifestContent.DATA:
+                continue
+            for entry in manifest.fetch_manifest_entry(table.io, discard_deleted=False):
+                file_path = entry.data_file.file_path
+                if entry.status == ManifestEntryStatus.DELETED:
+                    removed.add(file_path)
+                elif entry.status == ManifestEntryStatus.ADDED and file_path not in removed:
+                    tasks.append(FileScanTask(entry.data_file))
+                    rows += entry.data_file.record_count
+    if not tasks:
+        return None
+    projection = table.schema().select("event_id")
+    found = ArrowScan(table.metadata, table.io, projection, AlwaysTrue()).to_table(tasks)
+    return found.column("event_id").slice(0, limit)
+
+def _log_seed_error(table_name: str, error: Exception) -> None:
+    """Log a table whose recent event IDs could not be read into the deduplicator.
+
+    Args:
+        table_name (str): The table name.
+        error (Exception): The seed error.
+    """
+    log_error(
+        "DedupSeedError",
+        f"Could not seed the deduplicator from {table_name}, only ids committed from now on are remembered: {str(error)}",
+        processing_stage="dedup"
+    )
+
+def get_deduplicator() -> Optional["Deduplicator"]:
+    """Get or initialize the event_id deduplicator.
+
+    Returns:
+        Optional[Deduplicator]: The module-level deduplicator whose filters remember the ids
+        this container committed or found in a table's recent snapshots, or None when
+        DEDUP_ENABLED is off.
+    """
+    global _deduplicator
+    if _deduplicator is None and DEDUP_ENABLED:
+        from apps.lambda_processor.dedup import Deduplicator
+        _deduplicator = Deduplicator(
+            _committed_event_ids,
+            capacity=DEDUP_CAPACITY,
+            error_rate=DEDUP_ERROR_RATE,
+            seed=_recent_event_ids,
+            on_seed_error=_log_seed_error
+        )
+    return _deduplicator
+
+def get_upsert_writer() -> Optional["UpsertWriter"]:
+    """Get or initialize the upsert writer.
+
+    Returns:
+        Optional[UpsertWriter]: The module-level writer holding corrections that wait for a
+        cheaper rewrite, or None when WRITE_MODE is "append".
+
+    Raises:
+        ValueError: If WRITE_MODE is unknown.
+    """
+    global _upsert_writer
+    from apps.lambda_processor.upsert import WRITE_MODE_UPSERT, WRITE_MODES, UpsertWriter
+    if WRITE_MODE not in WRITE_MODES:
+        raise ValueError(f"Unknown write mode: {WRITE_MODE}")
+    if _upsert_writer is None and WRITE_MODE == WRITE_MODE_UPSERT:
+        _upsert_writer = UpsertWriter(
+            lambda table_name: get_table_cache().refresh(table_name),
+            get_commit_coordinator(),
+            max_amplification=UPSERT_MAX_AMPLIFICATION,
+            max_pending_rows=UPSERT_MAX_PENDING_ROWS,
+            max_age_seconds=UPSERT_MAX_AGE_SECONDS,
+            match_window_seconds=UPSERT_MATCH_WINDOW_SECONDS
+        )
+    return _upsert_writer
+
+def flush_upserts(context: Any = None, force: bool = False) -> Dict[str, Exception]:
+    """Rewrite pending corrections that are due, or all of them when forced or out of time.
+
+    Corrections are only held back when WRITE_DURABILITY is "buffer", so like buffered rows
+    they are already acked; failed rewrites are logged and keep their corrections.
+
+    Args:
+        context (Any): The Lambda context object.
+        force (bool): Rewrite every table with pending corrections.
+
+    Returns:
+        Dict[str, Exception]: The commit error for each table that failed.
+    """
+    upserts = get_upsert_writer()
+    if upserts is None:
+        return {}
+    remaining_ms = _remaining_time_ms(context)
+    with get_metrics().timer("upsert"):
+        if force or (remaining_ms is not None and remaining_ms < FLUSH_MARGIN_MS):
+            failed = upserts.flush()
+        else:
+            failed = upserts.flush_due()
+    for table_name, e in failed.items():
+        log_error("WriteError", f"Failed to rewrite corrections of {table_name}: {str(e)}", processing_stage="upsert")
+    return failed
+
+def get_schema_aligner() -> SchemaAligner:
+    """Get or initialize the schema aligner.
+
+    Returns:
+        SchemaAligner: The module-level aligner, caching the Arrow schema of every table's
+        current schema id.
+    """
+    global _schema_aligner
+    if _schema_aligner is None:
+        _schema_aligner = SchemaAligner(evolve=WRITE_EVOLVE_SCHEMA)
+    return _schema_aligner
+
+def get_write_buffer() -> WriteBuffer:
+    """Get or initialize the write buffer kept across warm invocations.
+
+    Returns:
+        WriteBuffer: The module-level buffer, keyed by route (the event type, or the quarantine
+        for unknown types) and flushed through `write_to_iceberg`.
+    """
+    global _write_buffer
+    if _write_buffer is None:
+        _write_buffer = WriteBuffer(
+            lambda arrow_table, event_type: write_to_iceberg(arrow_table, event_type),
+            max_rows=WRITE_BUFFER_MAX_ROWS,
+            max_bytes=WRITE_BUFFER_MAX_BYTES,
+            max_age_seconds=WRITE_BUFFER_MAX_AGE_SECONDS,
+            retain_on_failure=WRITE_DURABILITY == DURABILITY_BUFFER,
+            max_pending_rows=WRITE_BUFFER_MAX_PENDING_ROWS,
+            max_pending_bytes=WRITE_BUFFER_MAX_PENDING_BYTES,
+            max_attempts=WRITE_BUFFER_MAX_FLUSH_ATTEMPTS,
+            on_abandon=_log_abandoned_rows
+        )
+    return _write_buffer
+
+def _log_abandoned_rows(key: str, arrow_table: pa.Table, error: Exception) -> None:
+    """Keep the buffered rows of a table that could not be appended.
+
+    The rows are written to ABANDONED_ROWS_URI as a single Parquet file so they can be
+    replayed, and one error record points at it.
+
+    Args:
+        key (str): The route the rows were buffered for.
+        arrow_table (pa.Table): The processed rows.
+        error (Exception): The last append error.
+    """
+    message = f"Gave up appending {arrow_table.num_rows} buffered rows for {key}: {str(error)}"
+    try:
+        location = spool_table(ABANDONED_ROWS_URI, f"abandoned-{key}", arrow_table)
+        message += f"; rows written to {location}"
+    except Exception as e:
+        location = None
+        message += f"; rows could not be written: {str(e)}"
+    log_error(
+        "WriteAbandoned",
+        message,
+        event_type=key,
+        event_data={"location": location, "row_count": arrow_table.num_rows},
+        processing_stage="write_buffer"
+    )
+
+def _remaining_time_ms(context: Any) -> Optional[int]:
+    """Get the remaining invocation time from a Lambda context.
+
+    Args:
+        context (Any): The Lambda context object.
+
+    Returns:
+        Optional[int]: Milliseconds left, or None if the context does not expose it.
+    """
+    get_remaining = getattr(context, "get_remaining_time_in_millis", None)
+    return get_remaining() if callable(get_remaining) else None
+
+def flush_write_buffer(context: Any = None, force: bool = False) -> Dict[str, Exception]:
+    """Flush the write buffer before the invocation ends.
+
+    Everything is flushed when acking only after flush, when forced, or when the invocation is
+    about to run out of time; otherwise only event types that hit a threshold are flushed.
+
+    Args:
+        context (Any): The Lambda context object.
+        force (bool): Flush every buffered event type.
+
+    Returns:
+        Dict[str, Exception]: The write error for each event type that failed to flush.
+    """
+    buffer = get_write_buffer()
+    remaining_ms = _remaining_time_ms(context)
+    if (
+        force
+        or WRITE_DURABILITY == DURABILITY_FLUSH
+        or (remaining_ms is not None and remaining_ms < FLUSH_MARGIN_MS)
+    ):
+        return buffer.flush()
+    return buffer.flush_due()
+
+def get_archive() -> Optional["RawArchive"]:
+    """Get or initialize the raw event archive kept across warm invocations.
+
+    Returns:
+        Optional[RawArchive]: The module-level archive, or None when ARCHIVE_URI is not set.
+    """
+    global _archive
+    if _archive is None and ARCHIVE_URI:
+        from apps.lambda_processor.archive import RawArchive, sink_factory
+        _archive = RawArchive(
+            sink_factory(ARCHIVE_URI),
+            prefix=ARCHIVE_PREFIX,
+            fmt=ARCHIVE_FORMAT,
+            max_rows=ARCHIVE_MAX_EVENTS,
+            max_bytes=ARCHIVE_MAX_BYTES,
+            max_age_seconds=ARCHIVE_MAX_AGE_SECONDS,
+            max_pending_events=ARCHIVE_MAX_PENDING_EVENTS,
+            max_pending_bytes=ARCHIVE_MAX_PENDING_BYTES,
+            max_attempts=ARCHIVE_MAX_WRITE_ATTEMPTS,
+            on_abandon=_log_abandoned_archive
+        )
+    return _archive
+
+def _log_abandoned_archive(key: str, events: List[Dict[str, Any]], error: Exception) -> None:
+    """Keep the events of an archive object that could not be written in error_logs.
+
+    Args:
+        key (str): The object key the events were assigned to.
+        events (List[Dict[str, Any]]): The events of the object.
+        error (Exception): The last write error.
+    """
+    for event in events:
+        log_error(
+            "ArchiveAbandoned",
+            f"Gave up writing archive object {key}: {str(error)}",
+            event_id=event.get("event_id"),
+            event_type=event.get("event_type"),
+            event_data=event,
+            processing_stage="archive"
+        )
+
+def flush_archive(context: Any = None, force: bool = False) -> Dict[str, Exception]:
+    """Write archive objects that are due, or all of them when forced or out of time.
+
+    Failed objects keep their events for the next flush and are logged, but never fail the
+    records: the events are already in Iceberg. Objects that keep failing are given up on after
+    ARCHIVE_MAX_WRITE_ATTEMPTS and their events logged to the error sink.
+
+    Args:
+        context (Any): The Lambda context object.
+        force (bool): Write every buffered archive object.
+
+    Returns:
+        Dict[str, Exception]: The write error for each object key that failed.
+    """
+    archive = get_archive()
+    if archive is None:
+        return {}
+    remaining_ms = _remaining_time_ms(context)
+    with get_metrics().timer("archive"):
+        if force or (remaining_ms is not None and remaining_ms < FLUSH_MARGIN_MS):
+            failed = archive.flush()
+        else:
+            failed = archive.flush_due()
+    for key, e in failed.items():
+        log_error("ArchiveError", f"Failed to write archive object {key}: {str(e)}", processing_stage="archive")
+    return failed
+
+def get_error_sink() -> ErrorSink:
+    """Get or initialize the error sink.
+
+    Returns:
+        ErrorSink: The module-level sink writing to error_logs or to an NDJSON spool.
+    """
+    global _error_sink
+    if _error_sink is None:
+        if ERROR_SINK == "ndjson":
+            writer = NdjsonSpoolWriter(ERROR_SPOOL_URI)
+        else:
+            from pyiceberg.io.pyarrow import schema_to_pyarrow
+            writer = IcebergErrorWriter(
+                lambda: get_table("error_logs"),
+                schema_to_pyarrow(create_error_log_schema())
+            )
+        _error_sink = ErrorSink(
+            writer,
+            max_batch=ERROR_SINK_MAX_BATCH,
+            flush_interval_seconds=ERROR_SINK_FLUSH_INTERVAL_SECONDS,
+            background=ERROR_SINK_BACKGROUND
+        )
+    return _error_sink
+
+def flush_error_sink(context: Any = None) -> int:
+    """Write queued error records before the invocation ends.
+
+    Without a background thread the records are written synchronously, waiting at most
+    ERROR_SINK_FLUSH_TIMEOUT_SECONDS (capped by the invocation time left) for a write already in
+    flight. With a thread it is only woken, as the process outlives the invocation.
+
+    Args:
+        context (Any): The Lambda context object.
+
+    Returns:
+        int: The number of records written.
+    """
+    sink = get_error_sink()
+    if sink.background:
+        sink.request_flush()
+        return 0
+    timeout_seconds = ERROR_SINK_FLUSH_TIMEOUT_SECONDS
+    remaining_ms = _remaining_time_ms(context)
+    if remaining_ms is not None:
+        timeout_seconds = max(0.0, min(timeout_seconds, (remaining_ms - FLUSH_MARGIN_MS) / 1000))
+    with get_metrics().timer("error_flush"):
+        return sink.flush(timeout_seconds=timeout_seconds)
+
+def set_error_sink(sink: ErrorSink) -> None:
+    """Use a specific error sink, e.g. a synchronous NDJSON spool for offline runs.
+
+    Args:
+        sink (ErrorSink): The sink `log_error` queues records on.
+    """
+    global _error_sink
+    _error_sink = sink
+
+def get_metrics() -> MetricsRegistry:
+    """Get or initialize the metrics registry.
+
+    Returns:
+        MetricsRegistry: The module-level registry, flushed at the end of every invocation.
+    """
+    global _metrics
+    if _metrics is None:
+        _metrics = MetricsRegistry(
+            namespace=METRICS_NAMESPACE,
+            dimensions={"Service": METRICS_SERVICE},
+            writer=None if METRICS_OUTPUT == "stdout" else FileLineWriter(METRICS_OUTPUT),
+            enabled=METRICS_ENABLED
+        )
+    return _metrics
+
+def set_metrics(metrics: MetricsRegistry) -> None:
+    """Use a specific metrics registry, e.g. one writing to a local file in tests.
+
+    Args:
+        metrics (MetricsRegistry): The registry every stage records into.
+    """
+    global _metrics
+    _metrics = metrics
+
+def flush_metrics() -> bool:
+    """Emit the metrics recorded during this invocation as one EMF line.
+
+    Cumulative container gauges (commit conflicts, table cache hit rate, peak memory) are
+    sampled just before the flush.
+
+    Returns:
+        bool: True if a line was written.
+    """
+    metrics = get_metrics()
+    if not metrics.enabled:
+        return False
+    try:
+        if _commit_coordinator is not None:
+            stats = _commit_coordinator.stats()
+            metrics.gauge("commits_total", stats["commits"])
+            metrics.gauge("commit_conflicts_total", stats["conflicts"])
+            metrics.gauge("failed_commits_total", stats["failed_commits"])
+        if _table_cache is not None:
+            cache_stats = _table_cache.stats()
+            metrics.gauge("table_cache_hits_total", cache_stats["hits"])
+            metrics.gauge("table_cache_misses_total", cache_stats["misses"])
+        if _schema_aligner is not None:
+            metrics.gauge("schema_evolutions_total", _schema_aligner.stats()["evolutions"])
+        if _deduplicator is not None:
+            dedup_stats = _deduplicator.stats()
+            metrics.gauge("dedup_memory_bytes", dedup_stats["memory_bytes"])
+            metrics.gauge("dedup_keys", dedup_stats["keys"])
+            metrics.gauge("dedup_false_positive_rate", dedup_stats["false_positive_rate"])
+            metrics.gauge("dedup_estimated_false_positive_rate", dedup_stats["estimated_false_positive_rate"])
+        if _upsert_writer is not None:
+            upsert_stats = _upsert_writer.stats()
+            metrics.gauge("upsert_corrections_pending", upsert_stats["corrections_pending"])
+            metrics.gauge("upsert_rewrites_total", upsert_stats["rewrites"])
+            metrics.gauge("upsert_write_amplification", upsert_stats["write_amplification"])
+        if _write_buffer is not None:
+            metrics.gauge("write_buffer_pending_rows", _write_buffer.pending_rows())
+            metrics.gauge("write_buffer_rows_abandoned_total", _write_buffer.rows_abandoned)
+        if _archive is not None:
+            archive_stats = _archive.stats()
+            metrics.gauge("archive_pending_events", archive_stats["pending_events"])
+            metrics.gauge("archive_pending_bytes", archive_stats["pending_bytes"])
+            metrics.gauge("archive_events_dropped_total", archive_stats["events_dropped"])
+            metrics.gauge("archive_events_abandoned_total", archive_stats["events_abandoned"])
+        #ru_maxrss is in kilobytes on Linux
+        metrics.gauge("max_rss_bytes", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+        return metrics.flush()
+    except Exception as e:
+        #metrics must never fail an invocation
+        print(f"Failed to flush metrics: {str(e)}")
+        return False
+
 def log_error(
     error_type: str,
     error_message: str,
@@ -26,11 +708,22 @@ def log_error(
     event_data: Optional[Dict[str, Any]] = None,
     processing_stage: str = "unknown"
 ) -> None:
-    """Log error to Iceberg error_logs table."""
+    """Queue an error record for the batched error sink.
+
+    The same exception logged again while it propagates is merged into its first record
+    instead of producing another row.
+
+    Args:
+        error_type (str): The error category, e.g. "ProcessingError".
+        error_message (str): The error message.
+        event_id (Optional[str]): ID of the affected event.
+        event_type (Optional[str]): Type of the affected event.
+        event_data (Optional[Dict[str, Any]]): The raw event, stored as JSON.
+        processing_stage (str): The stage that failed.
+    """
     try:
-        error_id = str(uuid.uuid4())
         error_data = {
-            "error_id": error_id,
+            "error_id": str(uuid.uuid4()),
             "timestamp": datetime.utcnow(),
             "event_id": event_id,
             "event_type": event_type,
@@ -38,16 +731,10 @@ def log_error(
             "error_message": error_message,
             "stack_trace": traceback.format_exc(),
             "processing_stage": processing_stage,
-            "event_data": json.dumps(event_data) if event_data else None
+            "event_data": json_codec.dumps(event_data) if event_data else None
         }
-        
-        # Create DataFrame
-        df = pl.DataFrame([error_data])
-        
-        # Write to error_logs table
-        table = get_catalog().load_table("error_logs")
-        table.append(df.to_arrow())
-        
+        get_error_sink().submit(error_data, sys.exc_info()[1])
+        get_metrics().count("errors_logged")
     except Exception as e:
         # If error logging fails, print to console as last resort
         print(f"Failed to log error: {str(e)}")
@@ -72,14 +759,24 @@ def flatten_nested_dict(d: Dict[str, Any], prefix: str = '') -> Dict[str, Any]:
         )
         raise
 
+def validate_event(event: Dict[str, Any]) -> None:
+    """Validate that an event carries every required field.
+
+    Args:
+        event (Dict[str, Any]): The event to validate.
+
+    Raises:
+        ValueError: If a required field is missing.
+    """
+    for field in REQUIRED_FIELDS:
+        if field not in event:
+            raise ValueError(f"Missing required field: {field}")
+
 def process_event(event: Dict[str, Any]) -> pl.DataFrame:
     """Process a single event and return a DataFrame."""
     try:
         # Validate required fields
-        required_fields = ["event_id", "event_type", "user_id", "timestamp"]
-        for field in required_fields:
-            if field not in event:
-                raise ValueError(f"Missing required field: {field}")
+        validate_event(event)
         
         # Flatten the nested structure
         flattened = flatten_nested_dict(event)
@@ -87,15 +784,18 @@ def process_event(event: Dict[str, Any]) -> pl.DataFrame:
         # Create DataFrame
         df = pl.DataFrame([flattened])
         
-        # Ensure timestamp is in correct format
-        df = df.with_columns(
-            pl.col("timestamp").str.strptime(pl.Datetime, "%Y-%m-%dT%H:%M:%S%.fZ")
-        )
+        # Normalize the timestamp to UTC microseconds
+        timestamps = parse_timestamps([flattened["timestamp"]])
+        if timestamps.null_count:
+            raise ValueError(f"Unparseable timestamp: {flattened['timestamp']!r}")
+        df = df.with_columns(pl.Series("timestamp", timestamps))
         
-        # Rename columns to remove leading underscore from _doc
+        # Rename columns to remove leading underscore from _doc and the metadata_ prefix
         for col in df.columns:
             if col.startswith("_doc_"):
                 df = df.rename({col: col[1:]})
+            elif col.startswith("metadata_") and col[len("metadata_"):] in METADATA_FIELDS:
+                df = df.rename({col: col[len("metadata_"):]})
         
         return df
     except Exception as e:
@@ -109,37 +809,174 @@ def process_event(event: Dict[str, Any]) -> pl.DataFrame:
         )
         raise
 
-def write_to_iceberg(df: pl.DataFrame, event_type: str) -> None:
-    """Write DataFrame to appropriate Iceberg table based on event type."""
+def process_events(events: List[Dict[str, Any]], rejected: Optional[List[int]] = None) -> pa.Table:
+    """Process a batch of events into a single Arrow table.
+
+    The batch is flattened straight into typed column buffers by the flattener compiled from
+    the Iceberg base schema, and timestamps are normalized in one vectorized pass, so no
+    per-event DataFrames are allocated.
+
+    Args:
+        events (List[Dict[str, Any]]): The events to process.
+        rejected (Optional[List[int]]): When given, events whose timestamp cannot be parsed
+            are logged, left out of the table and their positions appended to this list
+            instead of failing the batch.
+
+    Returns:
+        pa.Table: One row per event with exactly the columns and types of the base schema.
+
+    Raises:
+        ValueError: If an event is missing a required field, or has an unparseable timestamp
+            and `rejected` is None.
+    """
+    metrics = get_metrics()
+    try:
+        with metrics.timer("validate"):
+            for event in events:
+                validate_event(event)
+        
+        with metrics.timer("flatten"):
+            columns = _flattener.flatten(events)
+        with metrics.timer("parse_timestamps"):
+            timestamps = parse_timestamps(columns[_flattener.column_names.index("timestamp")])
+        with metrics.timer("to_arrow"):
+            arrow_table = _flattener.to_arrow(columns, {"timestamp": timestamps})
+        metrics.count("events_processed", len(events))
+        if timestamps.null_count == 0:
+            return arrow_table
+        
+        invalid = [i for i, valid in enumerate(timestamps.is_valid().to_pylist()) if not valid]
+        if rejected is None:
+            raise ValueError(
+                f"Unparseable timestamp in {len(invalid)} events, e.g. {events[invalid[0]]['timestamp']!r}"
+            )
+        for i in invalid:
+            log_error(
+                "TimestampError",
+                f"Unparseable timestamp: {events[i]['timestamp']!r}",
+                event_id=events[i].get("event_id"),
+                event_type=events[i].get("event_type"),
+                event_data=events[i],
+                processing_stage="parse_timestamps"
+            )
+        rejected.extend(invalid)
+        return arrow_table.filter(timestamps.is_valid())
+    except Exception as e:
+        #a single event is logged with its payload, a batch failure is isolated by the caller
+        event = events[0] if len(events) == 1 and isinstance(events[0], dict) else {}
+        log_error(
+            "ProcessingError",
+            str(e),
+            event_id=event.get("event_id"),
+            event_type=event.get("event_type"),
+            event_data=event or None,
+            processing_stage="process_events"
+        )
+        raise
+
+def _first_event_id(df: Union[pl.DataFrame, pa.Table]) -> Optional[str]:
+    """Get the first event ID of a batch for error reporting.
+
+    Args:
+        df (Union[pl.DataFrame, pa.Table]): The batch being written.
+
+    Returns:
+        Optional[str]: The first event ID, or None if the batch has no event_id column or rows.
+    """
+    names = df.columns if isinstance(df, pl.DataFrame) else df.column_names
+    if "event_id" not in names or len(df) == 0:
+        return None
+    value = df["event_id"][0]
+    return value.as_py() if isinstance(value, pa.Scalar) else value
+
+def write_to_iceberg(df: Union[pl.DataFrame, pa.Table], event_type: str) -> None:
+    """Write DataFrame to appropriate Iceberg table based on event type.
+
+    Unknown event types are written to the quarantine table. Rows whose event_id was
+    already committed are dropped when DEDUP_ENABLED is on, or replace the committed row when
+    WRITE_MODE is "upsert".
+    """
+    router = get_router()
+    route = router.route(event_type)
+    started = time.perf_counter()
     try:
-        # Get the appropriate table
-        table_name = f"events_{event_type}"
-        table = get_catalog().load_table(table_name)
+        table_name = route.table_name
         
         # Convert to PyArrow table
-        arrow_table = df.to_arrow()
+        arrow_table = df.to_arrow() if isinstance(df, pl.DataFrame) else df
+        
+        # Cast and project onto the table's current schema
+        metrics = get_metrics()
+        with metrics.timer("align"):
+            arrow_table = get_schema_aligner().align(get_table(table_name), arrow_table)
+        
+        # Drop redelivered events, repeated in the batch or already committed
+        upserts = get_upsert_writer()
+        deduplicator = get_deduplicator() if upserts is None else None
+        if deduplicator is not None:
+            received = arrow_table.num_rows
+            with metrics.timer("dedup"):
+                arrow_table = deduplicator.filter(table_name, arrow_table)
+            metrics.count("duplicates_dropped", received - arrow_table.num_rows)
+            if arrow_table.num_rows == 0:
+                return
         
-        # Write to Iceberg
-        table.append(arrow_table)
+        # Write to Iceberg, retrying conflicts with other writers
+        rows = arrow_table.num_rows
+        if upserts is not None:
+            #corrections may wait for a cheaper rewrite only if the rows are acked before commit
+            with metrics.timer("upsert"):
+                result = upserts.write(table_name, arrow_table, defer=WRITE_DURABILITY == DURABILITY_BUFFER)
+            rows = result["inserted"] + result["corrected"]
+            metrics.count("rows_corrected", result["corrected"])
+            metrics.count("duplicates_dropped", result["unchanged"])
+        else:
+            with metrics.timer("commit"):
+                get_commit_coordinator().append(table_name, arrow_table)
+        if deduplicator is not None:
+            deduplicator.mark_committed(table_name, arrow_table)
+        router.record_write(route, rows, arrow_table.nbytes, time.perf_counter() - started)
+        metrics.count("appends")
+        metrics.count("rows_written", rows)
+        metrics.count(f"rows_written_{route.key}", rows)
+        metrics.count("written_bytes", arrow_table.nbytes)
     except Exception as e:
+        router.record_write(route, len(df), 0, time.perf_counter() - started, failed=True)
         log_error(
             "WriteError",
             str(e),
-            event_id=df["event_id"][0] if "event_id" in df.columns else None,
+            event_id=_first_event_id(df),
             event_type=event_type,
             processing_stage="write_to_iceberg"
         )
         raise
 
-def compress_data(data: bytes) -> bytes:
-    """Compress data using gzip."""
+def compress_data(data: bytes, codec: Optional[str] = None, level: Optional[int] = None) -> bytes:
+    """Compress a payload with a registered codec.
+
+    Args:
+        data (bytes): The payload; bytearray and memoryview are accepted too.
+        codec (Optional[str]): The codec name, COMPRESSION_CODEC when None.
+        level (Optional[int]): The compression level, COMPRESSION_LEVEL or the codec default
+            when None.
+
+    Returns:
+        bytes: The compressed payload.
+
+    Raises:
+        TypeError: If the payload is not bytes-like.
+        ValueError: If the codec is unknown or the level is invalid.
+    """
+    from apps.lambda_processor import compression
     try:
-        if isinstance(data, bytes):
-            buffer = io.BytesIO()
-            with gzip.GzipFile(fileobj=buffer, mode='wb') as f:
-                f.write(data)
-            return buffer.getvalue()
-        return data
+        if codec is None:
+            codec = COMPRESSION_CODEC
+            level = COMPRESSION_LEVEL if level is None else level
+        compressed = compression.compress(data, codec, level)
+        metrics = get_metrics()
+        metrics.count("compress_input_bytes", len(data))
+        metrics.count("compress_output_bytes", len(compressed))
+        return compressed
     except Exception as e:
         log_error(
             "CompressionError",
@@ -148,25 +985,258 @@ def compress_data(data: bytes) -> bytes:
         )
         raise
 
-def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    """Lambda function handler."""
+def is_batch_event(event: Any) -> bool:
+    """Check whether an invocation payload carries a batch of records.
+
+    Args:
+        event (Any): The raw invocation payload.
+
+    Returns:
+        bool: True for SQS/Kinesis `Records` envelopes and plain JSON arrays, False otherwise.
+    """
+    if isinstance(event, list):
+        return True
+    return isinstance(event, dict) and isinstance(event.get("Records"), list)
+
+def get_record_identifier(record: Any, index: int) -> str:
+    """Get the identifier Lambda expects back in `batchItemFailures` for a record.
+
+    Args:
+        record (Any): A single record from the batch.
+        index (int): Position of the record within the batch.
+
+    Returns:
+        str: The SQS message ID, the Kinesis sequence number, or the record position for
+        plain JSON arrays, whose event IDs are not guaranteed to be unique.
+    """
+    if isinstance(record, dict):
+        if "kinesis" in record:
+            return str(record["kinesis"].get("sequenceNumber", index))
+        if "messageId" in record:
+            return str(record["messageId"])
+    return str(index)
+
+def decode_record(record: Any) -> Dict[str, Any]:
+    """Decode a single batch record into an event dictionary.
+
+    Args:
+        record (Any): An SQS record (JSON `body`), a Kinesis record (base64 `kinesis.data`)
+            or an already decoded event.
+
+    Returns:
+        Dict[str, Any]: The decoded event.
+
+    Raises:
+        ValueError: If the record does not decode to a JSON object.
+    """
+    if isinstance(record, dict) and "kinesis" in record:
+        payload = json_codec.loads(base64.b64decode(record["kinesis"]["data"]))
+    elif isinstance(record, dict) and "body" in record and "messageId" in record:
+        payload = json_codec.loads(record["body"])
+    else:
+        payload = record
+    
+    if not isinstance(payload, dict):
+        raise ValueError(f"Record does not decode to an event object: {type(payload).__name__}")
+    return payload
+
+def process_records_individually(items: List[Any]) -> Tuple[Optional[pa.Table], List[str]]:
+    """Process batch records one by one after the vectorized path failed.
+
+    Args:
+        items (List[Any]): Pairs of record identifier and decoded event.
+
+    Returns:
+        Tuple[Optional[pa.Table], List[str]]: The combined table of the records that processed
+        successfully (None if none did) and the identifiers of the records that failed.
+    """
+    tables = []
+    failed = []
+    for item_id, payload in items:
+        try:
+            tables.append(process_events([payload]))
+        except Exception:
+            failed.append(item_id)
+    
+    if not tables:
+        return None, failed
+    return pa.concat_tables(tables, promote_options="default"), failed
+
+def batch_lambda_handler(event: Any, context: Any) -> Dict[str, Any]:
+    """Process a batch of records with a single Iceberg append per event type table.
+
+    Args:
+        event (Any): An SQS/Kinesis `Records` envelope or a plain JSON array of events.
+        context (Any): The Lambda context object.
+
+    Returns:
+        Dict[str, Any]: A partial batch response listing the identifiers of failed records
+        under `batchItemFailures`, so only those records are retried.
+    """
+    records = event if isinstance(event, list) else event["Records"]
+    failures: List[str] = []
+    groups: Dict[str, List[Any]] = {}
+    buffered: Dict[str, List[Any]] = {}
+    router = get_router()
+    metrics = get_metrics()
+    metrics.count("records_received", len(records))
+    #decode and validate are timed per record but recorded once per batch
+    decode_ns = 0
+    validate_ns = 0
+    
+    for index, record in enumerate(records):
+        item_id = get_record_identifier(record, index)
+        started = time.perf_counter_ns()
+        try:
+            payload = decode_record(record)
+        except Exception as e:
+            log_error(
+                "DecodeError",
+                str(e),
+                processing_stage="decode_record"
+            )
+            failures.append(item_id)
+            continue
+        finally:
+            decoded = time.perf_counter_ns()
+            decode_ns += decoded - started
+        
+        try:
+            validate_event(payload)
+        except Exception as e:
+            log_error(
+                "ValidationError",
+                str(e),
+                event_id=payload.get("event_id"),
+                event_type=payload.get("event_type"),
+                event_data=payload,
+                processing_stage="validate_event"
+            )
+            failures.append(item_id)
+            continue
+        finally:
+            validate_ns += time.perf_counter_ns() - decoded
+        #unknown event types share the quarantine route and its single append
+        groups.setdefault(router.route(payload["event_type"]).key, []).append((item_id, payload))
+    metrics.observe_ns("decode", decode_ns)
+    metrics.observe_ns("validate", validate_ns)
+    
+    for key, items in groups.items():
+        rejected: List[int] = []
+        try:
+            arrow_table = process_events([payload for _, payload in items], rejected)
+            vectorized = True
+        except Exception:
+            vectorized = False
+        if vectorized:
+            if rejected:
+                #bad timestamps were already logged one by one, fail just those records
+                failures.extend(items[i][0] for i in rejected)
+                rejected_set = set(rejected)
+                items = [item for i, item in enumerate(items) if i not in rejected_set]
+        else:
+            #fall back to one record at a time to isolate the records that fail, outside the
+            #except block so their errors are not chained to the batch error
+            arrow_table, failed = process_records_individually(items)
+            failures.extend(failed)
+            items = [item for item in items if item[0] not in failed]
+            if arrow_table is None:
+                continue
+        
+        get_write_buffer().add(key, arrow_table)
+        router.record_events(router.route(key), len(items))
+        buffered[key] = items
+    
+    failed_writes = flush_write_buffer(context)
+    flush_upserts(context)
+    if WRITE_DURABILITY == DURABILITY_FLUSH:
+        for key in failed_writes:
+            #write_to_iceberg already logged the failure, retry every record of the table
+            failures.extend(item_id for item_id, _ in buffered.get(key, []))
+    
+    archive = get_archive()
+    if archive is not None:
+        for key, items in buffered.items():
+            if WRITE_DURABILITY == DURABILITY_FLUSH and key in failed_writes:
+                #retried records are archived when they succeed
+                continue
+            for _, payload in items:
+                archive.add(payload)
+        flush_archive(context)
+    
+    flush_error_sink(context)
+    metrics.count("records_failed", len(failures))
+    flush_metrics()
+    return {
+        "batchItemFailures": [{"itemIdentifier": item_id} for item_id in failures]
+    }
+
+def lambda_handler(event: Any, context: Any) -> Dict[str, Any]:
+    """Lambda function handler.
+
+    Args:
+        event (Any): A single event, a batch envelope, or a raw bytes/memoryview payload of
+            either (NDJSON is decoded as a plain batch).
+        context (Any): The Lambda context object.
+
+    Returns:
+        Dict[str, Any]: The single event response, the partial batch response for batches, or
+        a 400 response for a payload that is not an event object or batch.
+    """
+    try:
+        if isinstance(event, json_codec.RAW_TYPES):
+            with get_metrics().timer("decode"):
+                event = json_codec.decode_payload(event)
+        if not isinstance(event, (dict, list)):
+            raise ValueError(f"Payload does not decode to an event object or batch: {type(event).__name__}")
+    except Exception as e:
+        log_error(
+            "DecodeError",
+            str(e),
+            processing_stage="lambda_handler"
+        )
+        flush_error_sink(context)
+        flush_metrics()
+        return {
+            "statusCode": 400,
+            "body": json_codec.dumps({
+                "error": str(e),
+                "timestamp": datetime.utcnow().isoformat()
+            })
+        }
+    
+    if is_batch_event(event):
+        return batch_lambda_handler(event, context)
+    
     try:
-        # Process the event
-        df = process_event(event)
+        # Process the event into the table schema
+        arrow_table = process_events([event])
         
-        # Write to appropriate table based on event type
-        event_type = event["event_type"]
-        write_to_iceberg(df, event_type)
+        # Buffer for the appropriate table based on event type
+        router = get_router()
+        route = router.route(event["event_type"])
+        router.record_events(route, 1)
+        buffer = get_write_buffer()
+        buffer.add(route.key, arrow_table)
+        failed_writes = flush_write_buffer(context)
+        flush_upserts(context)
+        if WRITE_DURABILITY == DURABILITY_FLUSH and route.key in failed_writes:
+            raise failed_writes[route.key]
         
-        # Generate S3 key for the event
-        s3_key = f"events/{event_type}/{datetime.utcnow().strftime('%Y/%m/%d')}/{event['event_id']}.parquet"
+        # Archive the original event, its object is written once the hour's batch is due
+        archive = get_archive()
+        location = {"key": None, "row": None}
+        if archive is not None:
+            location = archive.add(event)
+            flush_archive(context)
         
         return {
             "statusCode": 200,
-            "body": json.dumps({
+            "body": json_codec.dumps({
                 "event_id": event["event_id"],
-                "status": "success",
-                "s3_key": s3_key,
+                "status": "buffered" if buffer.pending_rows(route.key) else "success",
+                "s3_key": location["key"],
+                "archive_row": location["row"],
                 "timestamp": datetime.utcnow().isoformat()
             })
         }
@@ -181,9 +1251,82 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         )
         return {
             "statusCode": 500,
-            "body": json.dumps({
+            "body": json_codec.dumps({
                 "error": str(e),
                 "event_id": event.get("event_id", "unknown"),
                 "timestamp": datetime.utcnow().isoformat()
             })
-        } 
\ No newline at end of file
+        }
+    finally:
+        flush_error_sink(context)
+        flush_metrics()
+
+def _warm_up_table_names() -> List[str]:
+    """Get the tables to preload when none are given.
+
+    Returns:
+        List[str]: The WARM_UP_TABLES names, or every table of ICEBERG_NAMESPACE.
+    """
+    if WARM_UP_TABLES:
+        return [name.strip() for name in WARM_UP_TABLES.split(",") if name.strip()]
+    if not ICEBERG_NAMESPACE:
+        return []
+    return [identifier[-1] for identifier in get_catalog().list_tables(ICEBERG_NAMESPACE)]
+
+def warm_up(table_names: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Do the first-request work ahead of time, e.g. during the Lambda init phase.
+
+    Loads the catalog and the table handles into the table cache along with their Arrow
+    schemas, creates the router, deduplicator, upsert writer, commit coordinator, write buffer,
+    error sink and archive, seeds the deduplicator from the routed tables it loaded, and runs
+    the flattener and timestamp parser once so the first invocation only processes and
+    commits its own events. Failures are reported instead of raised, the first request then
+    loads whatever is missing.
+
+    Args:
+        table_names (Optional[List[str]]): Tables to preload, defaults to WARM_UP_TABLES or
+            every table of the namespace.
+
+    Returns:
+        Dict[str, Any]: The tables loaded, the failures by table (or "catalog") and the
+        seconds spent.
+    """
+    started = time.perf_counter()
+    loaded: List[str] = []
+    failed: Dict[str, str] = {}
+    try:
+        names = _warm_up_table_names() if table_names is None else table_names
+    except Exception as e:
+        names = []
+        failed["catalog"] = str(e)
+    for table_name in names:
+        try:
+            get_schema_aligner().target_schema(get_table(table_name))
+            loaded.append(table_name)
+        except Exception as e:
+            failed[table_name] = str(e)
+    
+    router = get_router()
+    deduplicator = get_deduplicator()
+    if deduplicator is not None and get_upsert_writer() is None:
+        #read recent event ids now instead of in front of each table's first append
+        routed = set(router.table_names())
+        deduplicator.seed_tables(name for name in loaded if name in routed)
+    get_upsert_writer()
+    get_commit_coordinator()
+    get_write_buffer()
+    get_error_sink()
+    get_archive()
+    #compile the flattener and timestamp parsing paths without recording metrics
+    sample = {"event_id": "warm-up", "event_type": "warm_up", "user_id": "warm-up", "timestamp": "2024-01-01T00:00:00Z"}
+    columns = _flattener.flatten([sample])
+    timestamps = parse_timestamps(columns[_flattener.column_names.index("timestamp")])
+    _flattener.to_arrow(columns, {"timestamp": timestamps})
+    
+    report = {"tables": loaded, "failed": failed, "seconds": time.perf_counter() - started}
+    if failed:
+        print(f"Warm-up could not load: {failed}")
+    return report
+
+if WARM_UP_ON_INIT:
+    warm_up()
@@ -0,0 +1,338 @@
+import math
+import zlib
+import threading
+import numpy as np
+import polars as pl
+import pyarrow as pa
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+#bits per filter block; every key sets all of its bits in one block
+BLOCK_BITS = 64
+#bits of the second hash consumed per bit set in a block
+_BIT_INDEX_BITS = 6
+#most bits a key can set, bounded by the bits available in the second hash
+MAX_HASHES = 64 // _BIT_INDEX_BITS
+
+def blocked_error_rate(keys_per_block: float, num_hashes: int) -> float:
+    """Get the false positive rate of a blocked Bloom filter.
+
+    Args:
+        keys_per_block (float): Average number of keys added per block.
+        num_hashes (int): Bits set per key.
+
+    Returns:
+        float: The rate averaged over the Poisson distribution of keys per block, which is
+        higher than a classic filter with the same bits because blocks fill unevenly.
+    """
+    if keys_per_block <= 0:
+        return 0.0
+    miss = 1 - 1 / BLOCK_BITS
+    rate = 0.0
+    probability = math.exp(-keys_per_block)
+    for keys in range(int(keys_per_block + 10 * math.sqrt(keys_per_block) + 20)):
+        if keys:
+            probability *= keys_per_block / keys
+        rate += probability * (1 - miss ** (num_hashes * keys)) ** num_hashes
+    return rate
+
+class BloomFilter:
+    """Blocked Bloom filter over 64-bit hashes.
+
+    Each key sets its bits inside a single 64-bit word, so adding or checking a whole batch is
+    one vectorized scatter or gather instead of one per hash function.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        """Size the filter for a number of keys.
+
+        Args:
+            capacity (int): Keys the filter holds at the target error rate.
+            error_rate (float): Target false positive rate at capacity.
+
+        Raises:
+            ValueError: If the capacity or error rate is out of range.
+        """
+        if capacity < 1:
+            raise ValueError("Bloom filter capacity must be positive")
+        if not 0 < error_rate < 1:
+            raise ValueError("Bloom filter error rate must be between 0 and 1")
+        #start from the classic filter size and grow until the blocked layout meets the rate
+        bits_per_key = -math.log(error_rate) / math.log(2) ** 2
+        while True:
+            num_words = max(1, math.ceil(capacity * bits_per_key / BLOCK_BITS))
+            num_hashes = max(1, min(MAX_HASHES, round(bits_per_key * math.log(2))))
+            if blocked_error_rate(capacity / num_words, num_hashes) <= error_rate:
+                break
+            bits_per_key *= 1.05
+        self.capacity = capacity
+        self.num_words = num_words
+        self.num_hashes = num_hashes
+        self.words = np.zeros(self.num_words, dtype=np.uint64)
+        self.count = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Get the memory held by the filter bits."""
+        return self.words.nbytes
+
+    def add(self, h1: np.ndarray, h2: np.ndarray) -> None:
+        """Add keys by their hashes.
+
+        Args:
+            h1 (np.ndarray): First uint64 hash of each key, selecting its block.
+            h2 (np.ndarray): Second uint64 hash of each key, selecting the bits in the block.
+        """
+        index, mask = self._locate(h1, h2)
+        np.bitwise_or.at(self.words, index, mask)
+        self.count += len(h1)
+
+    def contains(self, h1: np.ndarray, h2: np.ndarray) -> np.ndarray:
+        """Check keys by their hashes.
+
+        Args:
+            h1 (np.ndarray): First uint64 hash of each key.
+            h2 (np.ndarray): Second uint64 hash of each key.
+
+        Returns:
+            np.ndarray: True where the key may have been added, False where it certainly was not.
+        """
+        index, mask = self._locate(h1, h2)
+        return (self.words[index] & mask) == mask
+
+    def estimated_error_rate(self) -> float:
+        """Estimate the current false positive rate from the number of keys added.
+
+        Returns:
+            float: The expected rate of a key that was never added.
+        """
+        return blocked_error_rate(self.count / self.num_words, self.num_hashes)
+
+    def _locate(self, h1: np.ndarray, h2: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Map hashes to block indexes and bit masks.
+
+        Args:
+            h1 (np.ndarray): First uint64 hash of each key.
+            h2 (np.ndarray): Second uint64 hash of each key.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The block of each key and the bits it sets there.
+        """
+        index = (h1 % np.uint64(self.num_words)).astype(np.int64)
+        mask = np.zeros(len(h2), dtype=np.uint64)
+        for i in range(self.num_hashes):
+            bit = (h2 >> np.uint64(i * _BIT_INDEX_BITS)) & np.uint64(BLOCK_BITS - 1)
+            mask |= np.uint64(1) << bit
+        return index, mask
+
+class Deduplicator:
+    """Drops rows whose key was already committed, in front of the Iceberg append.
+
+    Committed keys are remembered in two generations of Bloom filters covering the hot
+    window: when the current filter reaches capacity it becomes the previous one, so memory
+    stays at two filters. The first time a table is used, the filters are seeded with the
+    keys its recent snapshots added, so a fresh container also knows what other writers
+    committed before it started. Keys the filters report as seen are confirmed against the
+    table with an exact lookup, so a false positive never drops a row; keys they report as
+    new skip the lookup. Keys older than the window, and keys other writers commit after a
+    table was seeded, are not detected; neither are keys of a table whose seeding failed,
+    which is not retried so every batch is not held up by the same failure.
+    """
+
+    def __init__(
+        self,
+        lookup: Callable[[str, pa.Table], Set[str]],
+        capacity: int = 1_000_000,
+        error_rate: float = 0.001,
+        key_column: str = "event_id",
+        seed: Optional[Callable[[str, int], Any]] = None,
+        on_seed_error: Optional[Callable[[str, Exception], None]] = None
+    ):
+        """Initialize the deduplicator.
+
+        Args:
+            lookup (Callable[[str, pa.Table], Set[str]]): Given a table name and the candidate
+                rows the filter reported as seen, returns the keys the table already holds.
+            capacity (int): Keys per filter generation; the window spans one to two of them.
+            error_rate (float): Target false positive rate of each filter.
+            key_column (str): The column holding the idempotency key.
+            seed (Optional[Callable[[str, int], Any]]): Given a table name and a maximum
+                number of keys, returns the Arrow array of keys the table committed most
+                recently; the filters start empty for every table when None.
+            on_seed_error (Optional[Callable[[str, Exception], None]]): Called with the table
+                name and the error when seeding a table fails.
+        """
+        self.lookup = lookup
+        self.seed = seed
+        self.on_seed_error = on_seed_error
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.key_column = key_column
+        self.rows_checked = 0
+        self.batch_duplicates = 0
+        self.committed_duplicates = 0
+        self.filter_positives = 0
+        self.false_positives = 0
+        self.lookups = 0
+        self.seeded_keys = 0
+        self.seed_failures = 0
+        self._seeded: Set[str] = set()
+        self._seed_lock = threading.Lock()
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous: Optional[BloomFilter] = None
+        self._lock = threading.Lock()
+
+    def hashes(self, table_name: str, keys: Any) -> Tuple[np.ndarray, np.ndarray]:
+        """Hash keys for one table.
+
+        The seeds depend on the table, so equal keys in different tables do not collide. Hashes
+        are only stable within one process, which is all an in-memory filter needs.
+
+        Args:
+            table_name (str): The table the keys are written to.
+            keys (Any): An Arrow array or chunked array of string keys.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Two independent uint64 hashes per key.
+        """
+        series = pl.Series(pl.from_arrow(keys))
+        seed = zlib.crc32(table_name.encode("utf-8"))
+        h1 = series.hash(seed=seed).to_numpy()
+        h2 = series.hash(seed=seed + 1).to_numpy()
+        return h1, h2
+
+    def filter(self, table_name: str, data: pa.Table) -> pa.Table:
+        """Drop the rows of a batch that repeat a key in the batch or one already committed.
+
+        Args:
+            table_name (str): The table the batch is appended to.
+            data (pa.Table): The batch; rows without a key are kept.
+
+        Returns:
+            pa.Table: The rows to append, first occurrences in batch order.
+        """
+        if data.num_rows == 0:
+            return data
+        keys = pl.Series(pl.from_arrow(data.column(self.key_column)))
+        #first occurrence within the batch, exactly
+        keep = (keys.is_first_distinct() | keys.is_null()).to_numpy()
+        batch_duplicates = int(len(keep) - keep.sum())
+
+        self._ensure_seeded(table_name)
+        h1, h2 = self.hashes(table_name, data.column(self.key_column))
+        with self._lock:
+            seen = self._current.contains(h1, h2)
+            if self._previous is not None:
+                seen |= self._previous.contains(h1, h2)
+        seen &= keep & ~keys.is_null().to_numpy()
+
+        positives = int(seen.sum())
+        committed = 0
+        if positives:
+            candidates = data.filter(pa.array(seen))
+            existing = self.lookup(table_name, candidates)
+            duplicate = seen & keys.is_in(list(existing)).to_numpy() if existing else np.zeros(len(keep), bool)
+            committed = int(duplicate.sum())
+            keep &= ~duplicate
+
+        with self._lock:
+            self.rows_checked += data.num_rows
+            self.batch_duplicates += batch_duplicates
+            self.committed_duplicates += committed
+            self.filter_positives += positives
+            self.false_positives += positives - committed
+            self.lookups += 1 if positives else 0
+        if keep.all():
+            return data
+        return data.filter(pa.array(keep))
+
+    def mark_committed(self, table_name: str, data: pa.Table) -> None:
+        """Remember the keys of a committed batch.
+
+        Args:
+            table_name (str): The table the batch was appended to.
+            data (pa.Table): The committed rows.
+        """
+        if data.num_rows == 0:
+            return
+        self._add(table_name, data.column(self.key_column))
+
+    def seed_tables(self, table_names: Iterable[str]) -> None:
+        """Seed the filters for tables ahead of their first batch, e.g. during warm-up.
+
+        Args:
+            table_names (Iterable[str]): The table names; tables already seeded are skipped.
+        """
+        for table_name in table_names:
+            self._ensure_seeded(table_name)
+
+    def _ensure_seeded(self, table_name: str) -> None:
+        """Seed the filters with a table's recently committed keys the first time it is used.
+
+        A failed seed is counted, reported through `on_seed_error` and not retried; the
+        table's filters then only hold the keys committed from here on.
+
+        Args:
+            table_name (str): The table name.
+        """
+        if self.seed is None or table_name in self._seeded:
+            return
+        with self._seed_lock:
+            if table_name in self._seeded:
+                return
+            try:
+                keys = self.seed(table_name, self.capacity)
+                if keys is not None and len(keys):
+                    self._add(table_name, keys)
+                    with self._lock:
+                        self.seeded_keys += len(keys) - keys.null_count
+            except Exception as e:
+                with self._lock:
+                    self.seed_failures += 1
+                if self.on_seed_error is not None:
+                    self.on_seed_error(table_name, e)
+            self._seeded.add(table_name)
+
+    def _add(self, table_name: str, keys: Any) -> None:
+        """Add keys to the current filter, rotating generations at capacity.
+
+        Args:
+            table_name (str): The table the keys were committed to.
+            keys (Any): An Arrow array or chunked array of keys.
+        """
+        if keys.null_count:
+            keys = keys.drop_null()
+        h1, h2 = self.hashes(table_name, keys)
+        with self._lock:
+            self._current.add(h1, h2)
+            if self._current.count >= self.capacity:
+                #rotate generations so memory stays bounded
+                self._previous = self._current
+                self._current = BloomFilter(self.capacity, self.error_rate)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get duplicate counts, the false positive rate and the memory held.
+
+        Returns:
+            Dict[str, Any]: Rows checked, duplicates dropped within batches and against
+            committed rows, filter positives and false positives, exact lookups, the observed
+            false positive rate per new key, the estimated rate of the filters, keys held,
+            keys seeded from tables, tables whose seeding failed and the filter bytes.
+        """
+        with self._lock:
+            filters = [f for f in (self._current, self._previous) if f is not None]
+            new_keys = self.rows_checked - self.batch_duplicates - self.committed_duplicates
+            estimated = 1 - math.prod(1 - f.estimated_error_rate() for f in filters)
+            return {
+                "rows_checked": self.rows_checked,
+                "batch_duplicates": self.batch_duplicates,
+                "committed_duplicates": self.committed_duplicates,
+                "filter_positives": self.filter_positives,
+                "false_positives": self.false_positives,
+                "lookups": self.lookups,
+                "false_positive_rate": self.false_positives / new_keys if new_keys > 0 else 0.0,
+                "estimated_false_positive_rate": estimated,
+                "keys": sum(f.count for f in filters),
+                "seeded_keys": self.seeded_keys,
+                "seed_failures": self.seed_failures,
+                "memory_bytes": sum(f.nbytes for f in filters)
+            }
@@ -0,0 +1,253 @@
+import uuid
+import threading
+import pyarrow as pa
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from pyarrow import fs
+from apps.lambda_processor import json_codec
+
+#attribute set on exceptions once they are recorded, so re-raised copies up the stack are skipped
+_LOGGED_ATTRIBUTE = "_error_sink_logged"
+
+def iter_error_chain(exc: Optional[BaseException]) -> Iterator[BaseException]:
+    """Walk an exception and the exceptions it was explicitly raised from.
+
+    Only `raise ... from` causes are followed. An exception that merely happened while another
+    was being handled (its implicit `__context__`) is a distinct error.
+
+    Args:
+        exc (Optional[BaseException]): The most recent exception.
+
+    Returns:
+        Iterator[BaseException]: The exceptions of the chain, newest first.
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__
+
+class ErrorSink:
+    """Batched, deduplicating sink for error records.
+
+    Records are buffered in memory and written in batches, either by a daemon thread or by
+    explicit flushes, so logging an error never waits on a commit. The thread is only meant for
+    long-running processes; Lambda freezes it between invocations, so handlers flush instead.
+    An error that is logged again while it propagates up the stack, or an error raised from it,
+    is merged into the first record of its chain.
+    """
+
+    def __init__(
+        self,
+        writer: Callable[[List[Dict[str, Any]]], None],
+        max_batch: int = 500,
+        max_pending: int = 10000,
+        flush_interval_seconds: float = 5.0,
+        background: bool = True
+    ):
+        """Initialize the sink.
+
+        Args:
+            writer (Callable[[List[Dict[str, Any]]], None]): Writes a batch of error records.
+            max_batch (int): Pending record count that triggers a flush.
+            max_pending (int): Records kept in memory before new ones are dropped.
+            flush_interval_seconds (float): How often the background thread flushes.
+            background (bool): Flush from a daemon thread; when False only explicit flushes write.
+        """
+        self.writer = writer
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.flush_interval_seconds = flush_interval_seconds
+        self.background = background
+        self.submitted = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.written = 0
+        self.write_failures = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_by_error: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, record: Dict[str, Any], exc: Optional[BaseException] = None) -> bool:
+        """Queue an error record without blocking.
+
+        Args:
+            record (Dict[str, Any]): The error record.
+            exc (Optional[BaseException]): The exception being logged, used for deduplication.
+
+        Returns:
+            bool: True if the record was queued, False if it was merged or dropped.
+        """
+        with self._lock:
+            for error in iter_error_chain(exc):
+                if getattr(error, _LOGGED_ATTRIBUTE, False):
+                    self.deduplicated += 1
+                    self._merge(error, record)
+                    return False
+
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+
+            if exc is not None:
+                setattr(exc, _LOGGED_ATTRIBUTE, True)
+                self._pending_by_error[id(exc)] = record
+            self._pending.append(record)
+            self.submitted += 1
+            batch_full = len(self._pending) >= self.max_batch
+
+        if self.background:
+            self._ensure_thread()
+            if batch_full:
+                self._wake.set()
+        return True
+
+    def flush(self, timeout_seconds: Optional[float] = None) -> int:
+        """Write every pending record.
+
+        Args:
+            timeout_seconds (Optional[float]): How long to wait for a write already in flight,
+                forever when None. The records stay pending if it does not finish in time.
+
+        Returns:
+            int: The number of records written.
+        """
+        if not self._write_lock.acquire(timeout=-1 if timeout_seconds is None else timeout_seconds):
+            return 0
+        try:
+            with self._lock:
+                batch = self._pending
+                self._pending = []
+                self._pending_by_error = {}
+            if not batch:
+                return 0
+
+            try:
+                self.writer(batch)
+            except Exception as e:
+                #never let error logging take down event processing
+                self.write_failures += 1
+                print(f"Failed to write {len(batch)} error records: {str(e)}")
+                return 0
+            self.written += len(batch)
+            return len(batch)
+        finally:
+            self._write_lock.release()
+
+    def request_flush(self) -> None:
+        """Ask the background thread to flush soon, or flush now without a thread."""
+        if self.background:
+            self._ensure_thread()
+            self._wake.set()
+        else:
+            self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        """Get the sink counters.
+
+        Returns:
+            Dict[str, int]: Submitted, deduplicated, dropped, written, failed-write and pending counts.
+        """
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "dropped": self.dropped,
+            "written": self.written,
+            "write_failures": self.write_failures,
+            "pending": pending
+        }
+
+    def _merge(self, error: BaseException, record: Dict[str, Any]) -> None:
+        """Fill gaps in a still pending record with context from a later log of the same error.
+
+        Args:
+            error (BaseException): The already logged exception of the chain.
+            record (Dict[str, Any]): The duplicate record.
+        """
+        first = self._pending_by_error.get(id(error))
+        if first is None:
+            return
+        for key in ("event_id", "event_type", "event_data"):
+            if first.get(key) is None and record.get(key) is not None:
+                first[key] = record[key]
+
+    def _ensure_thread(self) -> None:
+        """Start the background flush thread on first use."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="error-sink", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        """Flush periodically, or sooner when woken."""
+        while True:
+            self._wake.wait(self.flush_interval_seconds)
+            self._wake.clear()
+            self.flush()
+
+class IcebergErrorWriter:
+    """Appends error record batches to an Iceberg table."""
+
+    def __init__(self, get_table: Callable[[], Any], arrow_schema: pa.Schema):
+        """Initialize the writer.
+
+        Args:
+            get_table (Callable[[], Any]): Returns the error_logs table handle.
+            arrow_schema (pa.Schema): Arrow schema of the error_logs table.
+        """
+        self.get_table = get_table
+        self.arrow_schema = arrow_schema
+
+    def __call__(self, records: List[Dict[str, Any]]) -> None:
+        """Append one batch of error records in a single commit.
+
+        Args:
+            records (List[Dict[str, Any]]): The error records.
+        """
+        self.get_table().append(pa.Table.from_pylist(records, schema=self.arrow_schema))
+
+class NdjsonSpoolWriter:
+    """Writes error record batches as NDJSON files to a local directory or S3 prefix."""
+
+    def __init__(self, uri: str):
+        """Initialize the writer.
+
+        Args:
+            uri (str): A local path or an s3:// prefix to spool files under.
+        """
+        self.filesystem, self.path = fs.FileSystem.from_uri(uri)
+        self.filesystem.create_dir(self.path, recursive=True)
+
+    def __call__(self, records: List[Dict[str, Any]]) -> None:
+        """Write one batch of error records to a new spool file.
+
+        Args:
+            records (List[Dict[str, Any]]): The error records.
+        """
+        name = f"errors-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex}.ndjson"
+        lines = "".join(json_codec.dumps(record) + "\n" for record in records)
+        with self.filesystem.open_output_stream(f"{self.path}/{name}") as stream:
+            stream.write(lines.encode("utf-8"))
+
+def spool_table(uri: str, name: str, arrow_table: pa.Table) -> str:
+    """Write a table as a single Parquet file under a local directory or S3 prefix.
+
+    Args:
+        uri (str): A local path or an s3:// prefix to spool the file under.
+        name (str): A name to prefix the file with.
+        arrow_table (pa.Table): The rows to write.
+
+    Returns:
+        str: The location of the written file.
+    """
+    import pyarrow.parquet as pq
+    filesystem, path = fs.FileSystem.from_uri(uri)
+    filesystem.create_dir(path, recursive=True)
+    location = f"{path}/{name}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex}.parquet"
+    pq.write_table(arrow_table, location, filesystem=filesystem)
+    return location if "://" not in uri else f"{uri.split('://', 1)[0]}://{location}"
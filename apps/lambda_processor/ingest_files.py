@@ -0,0 +1,502 @@
+import os
+import io
+import sys
+import glob
+import json
+import time
+import uuid
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+from pyiceberg.catalog import load_catalog
+from apps.lambda_processor import compression, data_processor, json_codec
+from apps.lambda_processor.error_sink import ErrorSink, NdjsonSpoolWriter
+
+NDJSON_SUFFIXES = (".ndjson", ".jsonl", ".json")
+PARQUET_SUFFIXES = (".parquet",)
+
+def is_supported_file(path: str) -> bool:
+    """Check whether a file looks like an event dump the ingester can read.
+
+    Args:
+        path (str): The file path.
+
+    Returns:
+        bool: True for NDJSON (optionally compressed with a registered codec) and Parquet files.
+    """
+    name = path.lower()
+    if name.endswith(PARQUET_SUFFIXES):
+        return True
+    if compression.codec_for_path(name) is not None:
+        name = os.path.splitext(name)[0]
+    return name.endswith(NDJSON_SUFFIXES)
+
+def discover_files(inputs: List[str]) -> List[str]:
+    """Expand directories and glob patterns into a sorted list of input files.
+
+    Args:
+        inputs (List[str]): Files, directories (searched recursively) or glob patterns.
+
+    Returns:
+        List[str]: Absolute paths of the supported files, without duplicates.
+    """
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                found.update(os.path.join(root, name) for name in names)
+        elif glob.has_magic(item):
+            found.update(glob.glob(item, recursive=True))
+        else:
+            found.add(item)
+    return sorted(
+        os.path.abspath(path) for path in found
+        if os.path.isfile(path) and is_supported_file(path)
+    )
+
+def _open_text(path: str) -> IO[str]:
+    """Open an NDJSON file for reading, decompressing it on the fly by its extension.
+
+    Args:
+        path (str): The file path.
+
+    Returns:
+        IO[str]: A text stream over the decompressed lines.
+    """
+    codec = compression.codec_for_path(path)
+    if codec is None:
+        return open(path, "r", encoding="utf-8")
+    return io.TextIOWrapper(compression.open_reader(open(path, "rb"), codec.name), encoding="utf-8")
+
+def iter_event_chunks(path: str, chunk_size: int) -> Iterator[Tuple[List[Dict[str, Any]], int]]:
+    """Stream events from a file in chunks without loading the whole file.
+
+    Args:
+        path (str): An NDJSON or Parquet file.
+        chunk_size (int): Maximum number of events per chunk.
+
+    Returns:
+        Iterator[Tuple[List[Dict[str, Any]], int]]: Each chunk of events and the number of
+        lines in it that could not be decoded.
+    """
+    if path.lower().endswith(PARQUET_SUFFIXES):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pylist(), 0
+        return
+
+    with _open_text(path) as stream:
+        chunk = []
+        rejected = 0
+        for line_number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                chunk.append(json_codec.loads(line))
+            except ValueError as e:
+                data_processor.log_error(
+                    "DecodeError",
+                    f"{path}:{line_number}: {str(e)}",
+                    processing_stage="ingest_files"
+                )
+                rejected += 1
+                continue
+            if len(chunk) >= chunk_size:
+                yield chunk, rejected
+                chunk = []
+                rejected = 0
+        if chunk or rejected:
+            yield chunk, rejected
+
+def process_chunk(events: List[Dict[str, Any]]) -> Tuple[Dict[str, pa.Table], int]:
+    """Validate and flatten a chunk of events into one Arrow table per route.
+
+    Args:
+        events (List[Dict[str, Any]]): The decoded events.
+
+    Returns:
+        Tuple[Dict[str, pa.Table], int]: The table of each route (the event type, or the
+        quarantine for unknown types) and the number of events rejected by validation or
+        processing.
+    """
+    rejected = 0
+    router = data_processor.get_router()
+    groups: Dict[str, List[Any]] = {}
+    for index, event in enumerate(events):
+        try:
+            data_processor.validate_event(event)
+        except Exception as e:
+            data_processor.log_error(
+                "ValidationError",
+                str(e),
+                event_id=event.get("event_id") if isinstance(event, dict) else None,
+                event_type=event.get("event_type") if isinstance(event, dict) else None,
+                event_data=event,
+                processing_stage="validate_event"
+            )
+            rejected += 1
+            continue
+        #unknown event types are grouped into the quarantine route
+        groups.setdefault(router.route(event["event_type"]).key, []).append((str(index), event))
+
+    tables = {}
+    for event_type, items in groups.items():
+        invalid: List[int] = []
+        try:
+            arrow_table = data_processor.process_events([event for _, event in items], invalid)
+            vectorized = True
+        except Exception:
+            vectorized = False
+        if vectorized:
+            rejected += len(invalid)
+        else:
+            #fall back to one event at a time to isolate the events that fail, outside the
+            #except block so their errors are not chained to the batch error
+            arrow_table, failed = data_processor.process_records_individually(items)
+            rejected += len(failed)
+            if arrow_table is None:
+                continue
+        tables[event_type] = arrow_table
+    return tables, rejected
+
+def _spool_part(spool_dir: str, arrow_table: pa.Table) -> str:
+    """Write a processed table to an Arrow IPC file the parent can memory-map.
+
+    Args:
+        spool_dir (str): Directory shared by the workers and the parent.
+        arrow_table (pa.Table): The rows of one chunk and event type.
+
+    Returns:
+        str: The path of the file.
+    """
+    path = os.path.join(spool_dir, f"{uuid.uuid4().hex}.arrow")
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, arrow_table.schema) as writer:
+        writer.write_table(arrow_table)
+    return path
+
+def _read_part(path: str) -> pa.Table:
+    """Read a spooled part without copying it onto the heap.
+
+    Args:
+        path (str): A file written by `_spool_part`.
+
+    Returns:
+        pa.Table: The rows, backed by a memory map of the file.
+    """
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+def process_file(path: str, spool_dir: str, chunk_size: int = 50000) -> Dict[str, Any]:
+    """Process one input file into spooled Arrow parts, ready to be committed by the parent.
+
+    Each chunk's tables are written to `spool_dir` as soon as the chunk is processed, so a
+    worker holds one chunk in memory however large the file is.
+
+    Args:
+        path (str): The input file.
+        spool_dir (str): Directory the parts are written to.
+        chunk_size (int): Number of events parsed and flattened at a time.
+
+    Returns:
+        Dict[str, Any]: The file path, the spooled part files of each event type in file order,
+        and the counts of rows processed and rejected.
+    """
+    parts: Dict[str, List[str]] = {}
+    rows = 0
+    rejected = 0
+    try:
+        for events, undecodable in iter_event_chunks(path, chunk_size):
+            tables, invalid = process_chunk(events)
+            rejected += undecodable + invalid
+            for event_type, arrow_table in tables.items():
+                parts.setdefault(event_type, []).append(_spool_part(spool_dir, arrow_table))
+                rows += arrow_table.num_rows
+    finally:
+        #worker processes exit without running the background flush thread
+        data_processor.get_error_sink().flush()
+
+    return {
+        "path": path,
+        "parts": parts,
+        "rows": rows,
+        "rejected": rejected
+    }
+
+class Checkpoint:
+    """Manifest of input files already committed to Iceberg, used to resume interrupted runs.
+
+    A file is recorded only after every row it produced has been committed, and is skipped on
+    the next run as long as its size and modification time are unchanged.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """Initialize the checkpoint, loading it from disk if it exists.
+
+        Args:
+            path (Optional[str]): The manifest file; nothing is persisted when None.
+        """
+        self.path = path
+        self.files: Dict[str, Dict[str, Any]] = {}
+        if path is not None and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+
+    def is_complete(self, path: str) -> bool:
+        """Check whether a file was already committed in its current version.
+
+        Args:
+            path (str): The input file.
+
+        Returns:
+            bool: True if the file is recorded with the same size and modification time.
+        """
+        entry = self.files.get(path)
+        if entry is None:
+            return False
+        stat = os.stat(path)
+        return entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+
+    def mark_complete(self, results: List[Dict[str, Any]]) -> None:
+        """Record committed files and persist the manifest atomically.
+
+        Args:
+            results (List[Dict[str, Any]]): The `process_file` results of the committed files.
+        """
+        for result in results:
+            stat = os.stat(result["path"])
+            self.files[result["path"]] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "rows": result["rows"],
+                "rejected": result["rejected"],
+                "completed_at": time.time()
+            }
+        if self.path is None:
+            return
+
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "files": self.files}, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+def configure(
+    catalog_name: Optional[str] = None,
+    catalog_properties: Optional[Dict[str, str]] = None,
+    namespace: Optional[str] = None,
+    error_spool: Optional[str] = None
+) -> None:
+    """Point the processor at the target catalog and error destination.
+
+    Runs in the parent and as the initializer of every worker process.
+
+    Args:
+        catalog_name (Optional[str]): Name of the catalog to load.
+        catalog_properties (Optional[Dict[str, str]]): Catalog properties such as type, uri and
+            warehouse; the processor's own catalog settings are used when empty.
+        namespace (Optional[str]): Namespace of the event tables.
+        error_spool (Optional[str]): Local path or s3:// prefix to spool error records to as
+            NDJSON instead of the error_logs table.
+    """
+    if catalog_properties:
+        data_processor.set_catalog(
+            load_catalog(catalog_name or data_processor.ICEBERG_CATALOG_NAME, **catalog_properties),
+            namespace
+        )
+    elif namespace is not None:
+        data_processor.set_catalog(data_processor.get_catalog(), namespace)
+
+    if error_spool:
+        data_processor.set_error_sink(ErrorSink(NdjsonSpoolWriter(error_spool), background=False))
+
+def _iter_results(
+    paths: List[str],
+    spool_dir: str,
+    chunk_size: int,
+    workers: int,
+    initargs: Tuple[Any, ...]
+) -> Iterator[Dict[str, Any]]:
+    """Process files in this process or a process pool, yielding results as they finish.
+
+    Args:
+        paths (List[str]): The files to process.
+        spool_dir (str): Directory the processed parts are written to.
+        chunk_size (int): Number of events parsed and flattened at a time.
+        workers (int): Number of worker processes, 0 to process in this process.
+        initargs (Tuple[Any, ...]): Arguments of `configure` for each worker.
+
+    Returns:
+        Iterator[Dict[str, Any]]: The `process_file` result of each file.
+    """
+    if workers <= 0:
+        for path in paths:
+            yield process_file(path, spool_dir, chunk_size)
+        return
+
+    #spawn so workers never inherit catalog connections or sink threads from the parent
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=configure,
+        initargs=initargs
+    ) as executor:
+        futures = [executor.submit(process_file, path, spool_dir, chunk_size) for path in paths]
+        for future in as_completed(futures):
+            yield future.result()
+
+def ingest(
+    inputs: List[str],
+    checkpoint_path: Optional[str] = None,
+    workers: int = 0,
+    chunk_size: int = 50000,
+    commit_rows: int = 500000,
+    catalog_name: Optional[str] = None,
+    catalog_properties: Optional[Dict[str, str]] = None,
+    namespace: Optional[str] = None,
+    error_spool: Optional[str] = None
+) -> Dict[str, Any]:
+    """Ingest event dump files into the `events_<type>` tables.
+
+    Files are parsed and flattened in parallel by worker processes, which spool each chunk to
+    a local directory, while this process commits their rows in large appends, one per event
+    type table once `commit_rows` rows are pending, even part way through a large file. Files
+    are checkpointed only after all of their rows are committed, so an interrupted run resumes
+    where it stopped; a run that fails between the appends of one commit may re-append some
+    rows when resumed (at-least-once).
+
+    Args:
+        inputs (List[str]): Files, directories or glob patterns to ingest.
+        checkpoint_path (Optional[str]): Manifest of completed files to resume from and update.
+        workers (int): Number of worker processes, 0 to process in this process.
+        chunk_size (int): Number of events parsed and flattened at a time.
+        commit_rows (int): Pending row count that triggers a commit.
+        catalog_name (Optional[str]): Name of the catalog to load.
+        catalog_properties (Optional[Dict[str, str]]): Catalog properties such as type, uri and
+            warehouse; the processor's own catalog settings are used when empty.
+        namespace (Optional[str]): Namespace of the event tables.
+        error_spool (Optional[str]): Local path or s3:// prefix to spool error records to.
+
+    Returns:
+        Dict[str, Any]: Counts of files found, skipped and ingested, rows committed and
+        rejected, commits made and the elapsed seconds.
+    """
+    started = time.monotonic()
+    initargs = (catalog_name, catalog_properties, namespace, error_spool)
+    configure(*initargs)
+
+    checkpoint = Checkpoint(checkpoint_path)
+    paths = discover_files(inputs)
+    todo = [path for path in paths if not checkpoint.is_complete(path)]
+    report = {
+        "files_found": len(paths),
+        "files_skipped": len(paths) - len(todo),
+        "files_ingested": 0,
+        "rows_committed": 0,
+        "rows_rejected": 0,
+        "commits": 0
+    }
+
+    pending_tables: Dict[str, List[pa.Table]] = {}
+    pending_parts: List[str] = []
+    pending_files: List[Dict[str, Any]] = []
+    pending_rows = 0
+
+    def commit() -> None:
+        nonlocal pending_rows
+        for event_type, tables in pending_tables.items():
+            data_processor.write_to_iceberg(
+                pa.concat_tables(tables, promote_options="default"), event_type
+            )
+            report["rows_committed"] += sum(t.num_rows for t in tables)
+            report["commits"] += 1
+        checkpoint.mark_complete(pending_files)
+        report["files_ingested"] += len(pending_files)
+        report["rows_rejected"] += sum(result["rejected"] for result in pending_files)
+        pending_tables.clear()
+        pending_files.clear()
+        for part in pending_parts:
+            os.remove(part)
+        pending_parts.clear()
+        pending_rows = 0
+
+    spool_dir = tempfile.mkdtemp(prefix="ingest-spool-")
+    try:
+        for result in _iter_results(todo, spool_dir, chunk_size, workers, initargs):
+            for event_type, parts in result.pop("parts").items():
+                for part in parts:
+                    arrow_table = _read_part(part)
+                    pending_tables.setdefault(event_type, []).append(arrow_table)
+                    pending_parts.append(part)
+                    pending_rows += arrow_table.num_rows
+                    #the file is only checkpointed by the commit after its last part
+                    if pending_rows >= commit_rows:
+                        commit()
+            pending_files.append(result)
+        if pending_files or pending_tables:
+            commit()
+    finally:
+        data_processor.get_error_sink().flush()
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+    report["elapsed_seconds"] = round(time.monotonic() - started, 3)
+    return report
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse the ingestion command line.
+
+    Args:
+        argv (Optional[List[str]]): Arguments to parse; sys.argv is used when None.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Ingest NDJSON/Parquet event dumps into Iceberg.")
+    parser.add_argument("inputs", nargs="+", help="files, directories or glob patterns to ingest")
+    parser.add_argument("--checkpoint", default=None, help="manifest of completed files to resume from")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes, 0 for none")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="events parsed at a time")
+    parser.add_argument("--commit-rows", type=int, default=500000, help="pending rows that trigger a commit")
+    parser.add_argument("--catalog-name", default=None, help="name of the catalog to load")
+    parser.add_argument("--catalog-type", default=None, help="catalog type, e.g. glue, sql or rest")
+    parser.add_argument("--catalog-uri", default=None, help="catalog uri, e.g. sqlite:///catalog.db")
+    parser.add_argument("--warehouse", default=None, help="warehouse location, e.g. file:///tmp/warehouse")
+    parser.add_argument("--namespace", default=None, help="namespace of the event tables")
+    parser.add_argument("--error-spool", default=None, help="path or s3:// prefix to spool error records to")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the ingestion CLI.
+
+    Args:
+        argv (Optional[List[str]]): Arguments to parse; sys.argv is used when None.
+
+    Returns:
+        int: The process exit code.
+    """
+    args = parse_args(argv)
+    catalog_properties = {
+        key: value for key, value in (
+            ("type", args.catalog_type),
+            ("uri", args.catalog_uri),
+            ("warehouse", args.warehouse)
+        ) if value
+    }
+    report = ingest(
+        args.inputs,
+        checkpoint_path=args.checkpoint,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        commit_rows=args.commit_rows,
+        catalog_name=args.catalog_name,
+        catalog_properties=catalog_properties,
+        namespace=args.namespace,
+        error_spool=args.error_spool
+    )
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import json
+from typing import Any, List, Union
+
+try:
+    import orjson
+except ImportError:  #pragma: no cover - orjson ships in requirements.txt
+    orjson = None
+
+#raw payload types decoded without copying them into a str first
+RAW_TYPES = (bytes, bytearray, memoryview)
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """Decode one JSON document.
+
+    Args:
+        data (Union[str, bytes, bytearray, memoryview]): The document; bytes-like input is read
+            in place by orjson.
+
+    Returns:
+        Any: The decoded value.
+
+    Raises:
+        ValueError: If the input is not valid JSON.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+def dumps(value: Any) -> str:
+    """Encode a value as compact JSON.
+
+    Datetimes are encoded in ISO 8601 and any other unsupported value with `str`.
+
+    Args:
+        value (Any): The value to encode.
+
+    Returns:
+        str: The JSON text.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(value, default=lambda v: v.isoformat() if hasattr(v, "isoformat") else str(v),
+                      separators=(",", ":"))
+
+def loads_lines(data: Union[str, bytes, bytearray, memoryview]) -> List[Any]:
+    """Decode newline-delimited JSON, skipping blank lines.
+
+    Args:
+        data (Union[str, bytes, bytearray, memoryview]): The NDJSON payload.
+
+    Returns:
+        List[Any]: The decoded value of every line.
+
+    Raises:
+        ValueError: If a line is not valid JSON.
+    """
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return [loads(line) for line in data.splitlines() if line.strip()]
+
+def decode_payload(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """Decode a raw invocation payload holding one JSON document or NDJSON.
+
+    Args:
+        data (Union[str, bytes, bytearray, memoryview]): The raw payload.
+
+    Returns:
+        Any: The decoded document, or the list of decoded lines for NDJSON.
+
+    Raises:
+        ValueError: If the payload is neither valid JSON nor valid NDJSON.
+    """
+    try:
+        return loads(data)
+    except ValueError:
+        #a single document failed to parse, try one document per line
+        events = loads_lines(data)
+        if len(events) < 2:
+            raise
+        return events
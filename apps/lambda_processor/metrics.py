@@ -0,0 +1,289 @@
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from apps.lambda_processor import json_codec
+
+#linear sub-buckets per power of two, bounding the relative error of a recorded value to 1/16
+SUB_BUCKETS = 16
+#CloudWatch accepts at most this many distinct values per metric in one EMF document
+EMF_MAX_VALUES = 100
+
+class LatencyHistogram:
+    """Log-linear latency histogram in the style of HdrHistogram.
+
+    Values are counted in buckets that double in width every power of two, each split into
+    SUB_BUCKETS linear sub-buckets, so memory stays bounded and percentiles keep a fixed
+    relative precision whatever the range.
+    """
+
+    def __init__(self):
+        """Initialize an empty histogram."""
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+
+    @staticmethod
+    def bucket_index(value: int) -> int:
+        """Get the bucket of a value.
+
+        Args:
+            value (int): The value, e.g. a latency in microseconds.
+
+        Returns:
+            int: The bucket index; values below SUB_BUCKETS get exact buckets.
+        """
+        if value < SUB_BUCKETS:
+            return max(value, 0)
+        shift = value.bit_length() - SUB_BUCKETS.bit_length()
+        return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+    @staticmethod
+    def bucket_value(index: int) -> int:
+        """Get the representative (lowest) value of a bucket.
+
+        Args:
+            index (int): The bucket index.
+
+        Returns:
+            int: The smallest value counted in the bucket.
+        """
+        if index < SUB_BUCKETS:
+            return index
+        shift = index // SUB_BUCKETS - 1
+        return (index % SUB_BUCKETS + SUB_BUCKETS) << shift
+
+    def record(self, value: int) -> None:
+        """Count one value.
+
+        Args:
+            value (int): The value, e.g. a latency in microseconds.
+        """
+        index = self.bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, fraction: float) -> Optional[int]:
+        """Get a percentile, accurate to the bucket width.
+
+        Args:
+            fraction (float): The percentile as a fraction, e.g. 0.99.
+
+        Returns:
+            Optional[int]: The lowest value of the bucket holding the percentile, or None when
+            the histogram is empty.
+        """
+        if not self.count:
+            return None
+        rank = max(1, int(round(fraction * self.count)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return self.bucket_value(index)
+        return self.max
+
+    def values_and_counts(self, max_values: int = EMF_MAX_VALUES) -> Tuple[List[int], List[int]]:
+        """Get the populated buckets as parallel value and count lists.
+
+        Args:
+            max_values (int): Maximum number of entries; adjacent buckets are merged to fit.
+
+        Returns:
+            Tuple[List[int], List[int]]: Bucket values and their counts, ascending.
+        """
+        items = sorted(self.counts.items())
+        while len(items) > max_values:
+            merged = []
+            for i in range(0, len(items), 2):
+                pair = items[i:i + 2]
+                merged.append((pair[0][0], sum(count for _, count in pair)))
+            items = merged
+        return [self.bucket_value(index) for index, _ in items], [count for _, count in items]
+
+class MetricsRegistry:
+    """Per-stage latency histograms, counters and gauges flushed as CloudWatch EMF lines.
+
+    Recording is a dictionary update under a lock, cheap enough to wrap every stage of every
+    batch. Stage latencies are recorded in microseconds.
+    """
+
+    def __init__(
+        self,
+        namespace: str = "DataPipeline",
+        dimensions: Optional[Dict[str, str]] = None,
+        writer: Optional[Callable[[str], None]] = None,
+        enabled: bool = True,
+        clock: Callable[[], float] = time.time
+    ):
+        """Initialize the registry.
+
+        Args:
+            namespace (str): The CloudWatch metric namespace.
+            dimensions (Optional[Dict[str, str]]): Dimensions attached to every metric.
+            writer (Optional[Callable[[str], None]]): Writes one EMF JSON line; stdout when None.
+            enabled (bool): Record anything at all; when False every call is a no-op.
+            clock (Callable[[], float]): Wall clock in seconds, for EMF timestamps.
+        """
+        self.namespace = namespace
+        self.dimensions = dimensions or {}
+        self.writer = writer or (lambda line: sys.stdout.write(line + "\n"))
+        self.enabled = enabled
+        self.clock = clock
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Time a stage and record its latency, also when it raises.
+
+        Args:
+            stage (str): The stage name, e.g. "flatten".
+        """
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.observe_ns(stage, time.perf_counter_ns() - started)
+
+    def observe_ns(self, stage: str, elapsed_ns: int) -> None:
+        """Record a stage latency measured by the caller.
+
+        Args:
+            stage (str): The stage name.
+            elapsed_ns (int): The elapsed time in nanoseconds.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = LatencyHistogram()
+            histogram.record(elapsed_ns // 1000)
+
+    def count(self, name: str, value: float = 1) -> None:
+        """Add to a counter.
+
+        Args:
+            name (str): The counter name, e.g. "rows_written".
+            value (float): The amount to add.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def gauge(self, name: str, value: float) -> None:
+        """Set a gauge to its latest value.
+
+        Args:
+            name (str): The gauge name, e.g. "max_rss_bytes".
+            value (float): The value.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[name] = value
+
+    def histogram(self, stage: str) -> Optional[LatencyHistogram]:
+        """Get the pending histogram of a stage.
+
+        Args:
+            stage (str): The stage name.
+
+        Returns:
+            Optional[LatencyHistogram]: The histogram, or None if nothing was recorded.
+        """
+        with self._lock:
+            return self._histograms.get(stage)
+
+    def to_emf(self) -> Optional[Dict]:
+        """Build an EMF document of everything recorded since the last flush.
+
+        Returns:
+            Optional[Dict]: The EMF document, or None when nothing was recorded.
+        """
+        with self._lock:
+            if not (self._histograms or self._counters or self._gauges):
+                return None
+            document = dict(self.dimensions)
+            definitions = []
+            for stage, histogram in sorted(self._histograms.items()):
+                name = f"{stage}_latency"
+                values, counts = histogram.values_and_counts()
+                document[name] = {
+                    "Values": values,
+                    "Counts": counts,
+                    "Min": histogram.min,
+                    "Max": histogram.max,
+                    "Sum": histogram.total,
+                    "Count": histogram.count
+                }
+                definitions.append({"Name": name, "Unit": "Microseconds"})
+            for name, value in sorted(self._counters.items()):
+                document[name] = value
+                definitions.append({"Name": name, "Unit": "Bytes" if name.endswith("_bytes") else "Count"})
+            for name, value in sorted(self._gauges.items()):
+                document[name] = value
+                definitions.append({"Name": name, "Unit": "Bytes" if name.endswith("_bytes") else "None"})
+
+        document["_aws"] = {
+            "Timestamp": int(self.clock() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": self.namespace,
+                "Dimensions": [sorted(self.dimensions)],
+                "Metrics": definitions
+            }]
+        }
+        return document
+
+    def flush(self) -> bool:
+        """Write everything recorded so far as one EMF line and start over.
+
+        Returns:
+            bool: True if a line was written.
+        """
+        document = self.to_emf()
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+            self._gauges = {}
+        if document is None:
+            return False
+        self.writer(json_codec.dumps(document))
+        return True
+
+class FileLineWriter:
+    """Appends EMF lines to a local file, e.g. for tests or offline jobs."""
+
+    def __init__(self, path: str):
+        """Initialize the writer.
+
+        Args:
+            path (str): The file to append to.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, line: str) -> None:
+        """Append one line.
+
+        Args:
+            line (str): The EMF JSON line.
+        """
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
@@ -0,0 +1,58 @@
+import pyarrow as pa
+from typing import Any, List, Tuple
+from pyiceberg.partitioning import PartitionSpec
+from pyiceberg.schema import Schema
+from pyiceberg.table.sorting import SortOrder
+from apps.lambda_processor.sort_order import arrow_sort_keys, sort_by_keys, sort_for_table
+
+#prefix of the temporary partition value columns used while clustering
+_PARTITION_COLUMN_PREFIX = "__partition_"
+
+def partition_columns(spec: PartitionSpec, schema: Schema, data: pa.Table) -> List[Tuple[str, pa.Array]]:
+    """Compute the partition values of every row in one vectorized pass per partition field.
+
+    Args:
+        spec (PartitionSpec): The table's partition spec.
+        schema (Schema): The table schema the partition fields refer to.
+        data (pa.Table): The rows to partition.
+
+    Returns:
+        List[Tuple[str, pa.Array]]: The name and values of each partition field.
+    """
+    columns = []
+    for field in spec.fields:
+        source = schema.find_field(field.source_id)
+        transform = field.transform.pyarrow_transform(source.field_type)
+        columns.append((field.name, transform(data.column(source.name))))
+    return columns
+
+def cluster_for_table(table: Any, data: pa.Table) -> pa.Table:
+    """Order rows by partition, then by the table's sort order, before they are appended.
+
+    Every partition's rows end up contiguous and sorted, so the append writes one file per
+    partition with tight column statistics.
+
+    Args:
+        table (Any): The Iceberg table handle.
+        data (pa.Table): The rows to append.
+
+    Returns:
+        pa.Table: The clustered rows.
+    """
+    spec = table.spec()
+    if not isinstance(spec, PartitionSpec) or spec.is_unpartitioned() or data.num_rows < 2:
+        return sort_for_table(table, data)
+
+    schema = table.schema()
+    keyed = data
+    keys = []
+    for index, (_, values) in enumerate(partition_columns(spec, schema, data)):
+        name = f"{_PARTITION_COLUMN_PREFIX}{index}"
+        keyed = keyed.append_column(name, values)
+        keys.append((name, "ascending", "at_start"))
+    sort_order = table.sort_order()
+    if isinstance(sort_order, SortOrder) and not sort_order.is_unsorted:
+        keys.extend(arrow_sort_keys(sort_order, schema))
+
+    clustered = sort_by_keys(keyed, keys)
+    return clustered.drop_columns([name for name, _, _ in keys if name.startswith(_PARTITION_COLUMN_PREFIX)])
@@ -0,0 +1,708 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
+from collections import deque
+from itertools import islice
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+from pyiceberg.catalog import load_catalog
+from pyiceberg.expressions.visitors import BooleanExpressionVisitor, bind, visit
+from apps.lambda_processor import data_processor
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "iceberg_query_cache")
+DEFAULT_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+#data files read at the same time
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+class QueryCache:
+    """Query results on local disk, keyed by table, snapshot and query.
+
+    A committed snapshot never changes, so an entry stays valid until it is evicted, and the
+    next commit to the table simply makes queries miss. Entries are Arrow IPC files read back
+    through a memory map, so a hit does no parsing or copying. The least recently used
+    entries are evicted once the directory exceeds max_bytes.
+    """
+
+    SUFFIX = ".arrow"
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        """Initialize the cache.
+
+        Args:
+            directory (str): The local directory holding the entries, created when missing.
+            max_bytes (int): Total size of the entries kept; larger results are not cached.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(table_name: str, snapshot_id: int, **query: Any) -> str:
+        """Build the cache key of a query.
+
+        Args:
+            table_name (str): The table identifier.
+            snapshot_id (int): The snapshot the query reads.
+            **query (Any): Everything else that changes the result, e.g. the filter and fields.
+
+        Returns:
+            str: A hex digest naming the entry.
+        """
+        document = json.dumps([table_name, snapshot_id, query], sort_keys=True, default=str)
+        return hashlib.sha256(document.encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        """Get the file of an entry.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            str: The entry's path, whether or not it exists.
+        """
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def get(self, key: str) -> Optional[pa.Table]:
+        """Read an entry.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            Optional[pa.Table]: The cached result backed by a memory map, or None on a miss.
+        """
+        path = self.path(key)
+        try:
+            data = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+            self._touch(path)
+        except FileNotFoundError:
+            data = None
+        except (OSError, pa.ArrowInvalid):
+            #a torn or foreign file is dropped and recomputed
+            self._remove(path)
+            data = None
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def put(self, key: str, data: pa.Table) -> bool:
+        """Write an entry, evicting the least recently used ones beyond the size limit.
+
+        Args:
+            key (str): The cache key.
+            data (pa.Table): The query result.
+
+        Returns:
+            bool: False if the result is larger than the whole cache and was not written.
+        """
+        if data.nbytes > self.max_bytes:
+            return False
+        path = self.path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with pa.OSFile(temp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, data.schema) as writer:
+                writer.write_table(data)
+        #readers see either no entry or a complete one
+        os.replace(temp_path, path)
+        self._touch(path)
+        self._evict()
+        return True
+
+    def clear(self) -> int:
+        """Remove every entry.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        entries = self._entries()
+        for path, _, _ in entries:
+            self._remove(path)
+        return len(entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the hit rate and size of the cache.
+
+        Returns:
+            Dict[str, Any]: Hits, misses, evictions, the hit rate, entries and bytes on disk.
+        """
+        entries = self._entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries)
+            }
+
+    def _entries(self) -> List[Tuple[str, int, int]]:
+        """List the entries with their size and last use.
+
+        Returns:
+            List[Tuple[str, int, int]]: Path, bytes and modification time in nanoseconds of
+            each entry.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                status = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, status.st_size, status.st_mtime_ns))
+        return entries
+
+    def _touch(self, path: str) -> None:
+        """Mark an entry as just used.
+
+        The time is set explicitly because file times taken from the kernel's coarse clock
+        tie for entries used in quick succession.
+
+        Args:
+            path (str): The entry's path.
+        """
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def _evict(self) -> None:
+        """Remove the least recently used entries until the cache fits in max_bytes."""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def _remove(self, path: str) -> None:
+        """Delete an entry file that may already be gone.
+
+        Args:
+            path (str): The entry's path.
+        """
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+class _FilterDocument(BooleanExpressionVisitor[Any]):
+    """Serialise a bound filter into JSON-ready lists that do not depend on how it was written.
+
+    Columns are named by field id and the literals of set predicates are sorted, so filters
+    that read the same rows, e.g. an `in` list written in another order, get the same key in
+    every process.
+    """
+
+    def visit_true(self) -> Any:
+        """Serialise an always true filter."""
+        return True
+
+    def visit_false(self) -> Any:
+        """Serialise an always false filter."""
+        return False
+
+    def visit_not(self, child_result: Any) -> Any:
+        """Serialise a negation."""
+        return ["not", child_result]
+
+    def visit_and(self, left_result: Any, right_result: Any) -> Any:
+        """Serialise a conjunction."""
+        return ["and", left_result, right_result]
+
+    def visit_or(self, left_result: Any, right_result: Any) -> Any:
+        """Serialise a disjunction."""
+        return ["or", left_result, right_result]
+
+    def visit_unbound_predicate(self, predicate: Any) -> Any:
+        """Reject a predicate that was not bound to the schema."""
+        raise TypeError(f"Filter is not bound: {predicate}")
+
+    def visit_bound_predicate(self, predicate: Any) -> Any:
+        """Serialise a predicate as its type, field id and sorted literals."""
+        document = [type(predicate).__name__, predicate.term.ref().field.field_id]
+        if hasattr(predicate, "literals"):
+            document.append(sorted(repr(literal.value) for literal in predicate.literals))
+        elif hasattr(predicate, "literal"):
+            document.append(repr(predicate.literal.value))
+        return document
+
+class TableQuery:
+    """A filtered, projected read of one table snapshot.
+
+    The filter and projection are pushed into pyiceberg's planning, so partitions, manifests
+    and data files whose partition values or column statistics cannot match are never
+    opened, and only the selected columns of the remaining files are read. Those files are
+    read by a pool of threads and merged in planning order. With an order and a limit, files
+    are read best bound first and the read stops once no remaining file can improve the
+    result, e.g. for the last N errors of an event.
+    """
+
+    def __init__(
+        self,
+        table: Any,
+        row_filter: Any = None,
+        selected_fields: Sequence[str] = ("*",),
+        snapshot_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        case_sensitive: bool = True,
+        workers: int = DEFAULT_WORKERS,
+        cache: Optional[QueryCache] = None
+    ):
+        """Initialize the query.
+
+        Args:
+            table (Any): The Iceberg table; refresh it first to read the latest snapshot.
+            row_filter (Any): A pyiceberg expression or filter string, e.g.
+                "event_id = 'abc' and timestamp >= '2024-01-01T00:00:00'"; None reads every row.
+            selected_fields (Sequence[str]): The columns to return, "*" for all.
+            snapshot_id (Optional[int]): The snapshot to read, the current one when None.
+            limit (Optional[int]): Most rows to return.
+            order_by (Optional[str]): Column to sort the result by, nulls last.
+            descending (bool): Sort from the largest value.
+            case_sensitive (bool): Match column names in the filter case-sensitively.
+            workers (int): Data files read at the same time.
+            cache (Optional[QueryCache]): Where results are cached, or None to always read.
+        """
+        self.table = table
+        self.row_filter = row_filter
+        self.selected_fields = tuple(selected_fields)
+        self.snapshot_id = snapshot_id
+        self.limit = limit
+        self.order_by = order_by
+        self.descending = descending
+        self.case_sensitive = case_sensitive
+        self.workers = max(1, workers)
+        self.cache = cache
+        self.stats: Dict[str, Any] = {}
+
+    def scan(self) -> Any:
+        """Build the pyiceberg scan, adding the order column to the projection if needed.
+
+        Returns:
+            Any: The DataScan of the query's snapshot.
+        """
+        from pyiceberg.expressions import AlwaysTrue
+        fields = self.selected_fields
+        if self.order_by is not None and "*" not in fields and self.order_by not in fields:
+            fields = fields + (self.order_by,)
+        return self.table.scan(
+            row_filter=AlwaysTrue() if self.row_filter is None else self.row_filter,
+            selected_fields=fields,
+            case_sensitive=self.case_sensitive,
+            snapshot_id=self.snapshot_id,
+            #a per-file limit is only safe when any rows will do
+            limit=self.limit if self.order_by is None else None
+        )
+
+    def cache_key(self) -> Optional[str]:
+        """Get the cache key of the query.
+
+        Returns:
+            Optional[str]: The key, or None when the table has no snapshot to read.
+        """
+        snapshot = self._snapshot()
+        if snapshot is None:
+            return None
+        return QueryCache.key(
+            ".".join(self.table.name()),
+            snapshot.snapshot_id,
+            schema_id=self.table.metadata.current_schema_id,
+            row_filter=self._filter_document(),
+            selected_fields=self.selected_fields,
+            limit=self.limit,
+            order_by=self.order_by,
+            descending=self.descending,
+            case_sensitive=self.case_sensitive
+        )
+
+    def to_arrow(self) -> pa.Table:
+        """Run the query, answering from the cache when the snapshot was already queried.
+
+        Returns:
+            pa.Table: The matching rows with the selected columns.
+        """
+        started = time.perf_counter()
+        key = self.cache_key() if self.cache is not None else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.stats = {"cache": "hit", "seconds": time.perf_counter() - started}
+                return cached
+
+        scan = self.scan()
+        tasks = self._ordered_tasks(scan) if self.order_by is not None else [(task, None) for task in scan.plan_files()]
+        parts: List[pa.Table] = []
+        rows = 0
+        files_read = 0
+        for index, part in enumerate(self._read(scan, [task for task, _ in tasks])):
+            files_read += 1
+            parts.append(part)
+            rows += part.num_rows
+            if self.limit is None or rows < self.limit:
+                continue
+            if self.order_by is None:
+                break
+            #keep only the best rows so far and stop once the next file cannot beat the last
+            parts = [self._sort(pa.concat_tables(parts, promote_options="permissive")).slice(0, self.limit)]
+            rows = parts[0].num_rows
+            if index + 1 < len(tasks) and not self._may_improve(tasks[index + 1][1], parts[0]):
+                break
+
+        data = self._finish(scan, parts)
+        if key is not None:
+            self.cache.put(key, data)
+        self.stats = {
+            "cache": "miss" if key is not None else "off",
+            "files_planned": len(tasks),
+            "files_read": files_read,
+            "rows": data.num_rows,
+            "seconds": time.perf_counter() - started
+        }
+        return data
+
+    def to_polars(self) -> pl.LazyFrame:
+        """Expose the query as a polars LazyFrame that reads nothing until it is collected.
+
+        The columns polars needs narrow the scan's projection, and its filters are applied to
+        every file read. A query without order, limit or cache streams file by file and stops
+        once polars has all the rows it asked for; otherwise the rows come from `to_arrow`,
+        cache included, when the frame is collected.
+
+        Returns:
+            pl.LazyFrame: The query as a lazy polars source.
+        """
+        from polars.io.plugins import register_io_source
+
+        def read(with_columns: Optional[List[str]], predicate: Any, n_rows: Optional[int], batch_size: Optional[int]) -> Iterator[pl.DataFrame]:
+            table_query = self if with_columns is None else self._with_fields(with_columns)
+            if table_query.order_by is None and table_query.limit is None and table_query.cache is None:
+                parts = table_query.to_batches()
+            else:
+                parts = iter([table_query.to_arrow()])
+            rows = 0
+            try:
+                for part in parts:
+                    frame = pl.from_arrow(part)
+                    if predicate is not None:
+                        frame = frame.filter(predicate)
+                    if n_rows is not None:
+                        frame = frame.head(n_rows - rows)
+                    rows += frame.height
+                    yield frame
+                    if n_rows is not None and rows >= n_rows:
+                        break
+            finally:
+                #files not started yet are skipped when polars stops early
+                if hasattr(parts, "close"):
+                    parts.close()
+
+        return register_io_source(read, schema=pl.from_arrow(self._result_schema().empty_table()).schema)
+
+    def to_batches(self) -> Iterator[pa.Table]:
+        """Stream the matching rows file by file, without ordering, limit or cache.
+
+        Returns:
+            Iterator[pa.Table]: The matching rows of each data file in planning order; files
+            ahead are read while the caller consumes the current one.
+        """
+        scan = self.scan()
+        return self._read(scan, list(scan.plan_files()))
+
+    def _filter_document(self) -> Any:
+        """Get the row filter in a form that identifies the rows it selects.
+
+        Returns:
+            Any: The filter bound to the table schema and serialised by `_FilterDocument`.
+        """
+        from pyiceberg.expressions import AlwaysTrue
+        from pyiceberg.expressions.parser import parse
+        row_filter = self.row_filter
+        if row_filter is None:
+            row_filter = AlwaysTrue()
+        elif isinstance(row_filter, str):
+            row_filter = parse(row_filter)
+        return visit(bind(self.table.schema(), row_filter, self.case_sensitive), _FilterDocument())
+
+    def _with_fields(self, selected_fields: Sequence[str]) -> "TableQuery":
+        """Copy the query with other columns selected.
+
+        Args:
+            selected_fields (Sequence[str]): The columns to return.
+
+        Returns:
+            TableQuery: The same query over just those columns.
+        """
+        return TableQuery(
+            self.table,
+            self.row_filter,
+            selected_fields=selected_fields,
+            snapshot_id=self.snapshot_id,
+            limit=self.limit,
+            order_by=self.order_by,
+            descending=self.descending,
+            case_sensitive=self.case_sensitive,
+            workers=self.workers,
+            cache=self.cache
+        )
+
+    def _result_schema(self) -> pa.Schema:
+        """Get the Arrow schema of the query's result without reading any data.
+
+        Returns:
+            pa.Schema: The selected columns in projection order.
+        """
+        from pyiceberg.io.pyarrow import schema_to_pyarrow
+        schema = schema_to_pyarrow(self.scan().projection(), include_field_ids=False)
+        if self.order_by is not None and "*" not in self.selected_fields and self.order_by not in self.selected_fields:
+            schema = schema.remove(schema.get_field_index(self.order_by))
+        return schema
+
+    def _snapshot(self) -> Any:
+        """Get the snapshot the query reads.
+
+        Returns:
+            Any: The snapshot, or None for a table without one.
+        """
+        if self.snapshot_id is not None:
+            return self.table.snapshot_by_id(self.snapshot_id)
+        return self.table.current_snapshot()
+
+    def _read(self, scan: Any, tasks: List[Any]) -> Iterator[pa.Table]:
+        """Read data files with a bounded window of threads, yielding them in task order.
+
+        Args:
+            scan (Any): The scan the tasks were planned from.
+            tasks (List[Any]): The file scan tasks.
+
+        Returns:
+            Iterator[pa.Table]: The matching rows of each file.
+        """
+        from pyiceberg.io.pyarrow import ArrowScan
+        reader = ArrowScan(
+            self.table.metadata,
+            self.table.io,
+            scan.projection(),
+            scan.row_filter,
+            self.case_sensitive,
+            scan.limit
+        )
+        remaining = iter(tasks)
+        window: Deque[Future] = deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            try:
+                for task in islice(remaining, self.workers):
+                    window.append(pool.submit(reader.to_table, [task]))
+                while window:
+                    part = window.popleft().result()
+                    for task in islice(remaining, 1):
+                        window.append(pool.submit(reader.to_table, [task]))
+                    yield part
+            finally:
+                #files not started yet are skipped when the caller stops early
+                for future in window:
+                    future.cancel()
+
+    def _ordered_tasks(self, scan: Any) -> List[Tuple[Any, Any]]:
+        """Plan files best bound first for an ordered query.
+
+        Args:
+            scan (Any): The query's scan.
+
+        Returns:
+            List[Tuple[Any, Any]]: Each task with the Arrow scalar of its upper bound of the
+            order column (lower bound when ascending), or None when unknown. Tasks without a
+            bound come first, since any of their rows may belong in the result.
+        """
+        from pyiceberg.conversions import from_bytes
+        from pyiceberg.io.pyarrow import schema_to_pyarrow
+        field = scan.projection().find_field(self.order_by, self.case_sensitive)
+        arrow_type = schema_to_pyarrow(scan.projection(), include_field_ids=False).field(field.name).type
+        planned = []
+        for task in scan.plan_files():
+            bounds = task.file.upper_bounds if self.descending else task.file.lower_bounds
+            bound = None
+            if bounds and field.field_id in bounds:
+                try:
+                    value = from_bytes(field.field_type, bounds[field.field_id])
+                    bound = pa.array([value]).cast(arrow_type)[0]
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError, TypeError, ValueError):
+                    bound = None
+            planned.append((task, bound))
+        known = [item for item in planned if item[1] is not None]
+        known.sort(key=lambda item: item[1].as_py(), reverse=self.descending)
+        return [item for item in planned if item[1] is None] + known
+
+    def _may_improve(self, bound: Any, best: pa.Table) -> bool:
+        """Check whether a file with a bound may hold rows that belong in the result.
+
+        Args:
+            bound (Any): The file's bound of the order column, None when unknown.
+            best (pa.Table): The best `limit` rows found so far, sorted.
+
+        Returns:
+            bool: False only if every row of the file sorts after the current last row.
+        """
+        last = best.column(self.order_by)[best.num_rows - 1]
+        if bound is None or not last.is_valid:
+            return True
+        compare = pc.less if self.descending else pc.greater
+        return not compare(bound, last).as_py()
+
+    def _sort(self, data: pa.Table) -> pa.Table:
+        """Sort rows by the order column, nulls last.
+
+        Args:
+            data (pa.Table): The rows.
+
+        Returns:
+            pa.Table: The sorted rows.
+        """
+        return data.sort_by([(self.order_by, "descending" if self.descending else "ascending")])
+
+    def _finish(self, scan: Any, parts: List[pa.Table]) -> pa.Table:
+        """Combine the parts read into the result.
+
+        Args:
+            scan (Any): The query's scan.
+            parts (List[pa.Table]): The rows read from each file.
+
+        Returns:
+            pa.Table: The ordered, limited rows with just the selected columns.
+        """
+        from pyiceberg.io.pyarrow import schema_to_pyarrow
+        if parts:
+            data = pa.concat_tables(parts, promote_options="permissive")
+        else:
+            data = schema_to_pyarrow(scan.projection(), include_field_ids=False).empty_table()
+        if self.order_by is not None:
+            data = self._sort(data)
+            if "*" not in self.selected_fields and self.order_by not in self.selected_fields:
+                data = data.drop_columns([self.order_by])
+        if self.limit is not None:
+            data = data.slice(0, self.limit)
+        return data
+
+def query(table: Any, row_filter: Any = None, cache: Optional[QueryCache] = None, **options: Any) -> pa.Table:
+    """Run a table query, see `TableQuery` for the options.
+
+    Args:
+        table (Any): The Iceberg table.
+        row_filter (Any): A pyiceberg expression or filter string; None reads every row.
+        cache (Optional[QueryCache]): Where results are cached, or None to always read.
+        **options (Any): selected_fields, snapshot_id, limit, order_by, descending,
+            case_sensitive and workers.
+
+    Returns:
+        pa.Table: The matching rows.
+    """
+    return TableQuery(table, row_filter, cache=cache, **options).to_arrow()
+
+def _write_rows(data: pa.Table, fmt: str, stream: Any) -> None:
+    """Print a query result.
+
+    Args:
+        data (pa.Table): The result.
+        fmt (str): "table", "ndjson" or "csv".
+        stream (Any): The text stream written to.
+    """
+    frame = pl.from_arrow(data)
+    if fmt == "ndjson":
+        stream.write(frame.write_ndjson())
+    elif fmt == "csv":
+        stream.write(frame.write_csv())
+    else:
+        with pl.Config(tbl_rows=-1, tbl_cols=-1, fmt_str_lengths=80):
+            stream.write(f"{frame}\n")
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse the query command line.
+
+    Args:
+        argv (Optional[List[str]]): Arguments to parse; sys.argv is used when None.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Query an Iceberg table with local result caching.")
+    parser.add_argument("table", help="table name, qualified with --namespace unless it contains a dot")
+    parser.add_argument("--filter", default=None, help="row filter, e.g. \"event_id = 'abc'\"")
+    parser.add_argument("--select", nargs="*", default=["*"], help="columns to return, all when omitted")
+    parser.add_argument("--snapshot-id", type=int, default=None, help="snapshot to read, the current one when omitted")
+    parser.add_argument("--limit", type=int, default=None, help="most rows to return")
+    parser.add_argument("--order-by", default=None, help="column to sort by")
+    parser.add_argument("--descending", action="store_true", help="sort from the largest value")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="data files read at the same time")
+    parser.add_argument("--format", choices=["table", "ndjson", "csv"], default="table", help="output format")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="local directory of cached results")
+    parser.add_argument("--cache-max-bytes", type=int, default=DEFAULT_CACHE_MAX_BYTES, help="size of the result cache")
+    parser.add_argument("--no-cache", action="store_true", help="always read the table")
+    parser.add_argument("--catalog-name", default=None, help="name of the catalog to load")
+    parser.add_argument("--catalog-type", default=None, help="catalog type, e.g. glue, sql or rest")
+    parser.add_argument("--catalog-uri", default=None, help="catalog uri, e.g. sqlite:///catalog.db")
+    parser.add_argument("--warehouse", default=None, help="warehouse location, e.g. file:///tmp/warehouse")
+    parser.add_argument("--namespace", default="events_db", help="namespace of unqualified table names")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the query CLI, printing the rows to stdout and the query stats to stderr.
+
+    Args:
+        argv (Optional[List[str]]): Arguments to parse; sys.argv is used when None.
+
+    Returns:
+        int: The process exit code.
+    """
+    args = parse_args(argv)
+    properties = {
+        key: value for key, value in (
+            ("type", args.catalog_type),
+            ("uri", args.catalog_uri),
+            ("warehouse", args.warehouse)
+        ) if value
+    }
+    if properties:
+        catalog = load_catalog(args.catalog_name or data_processor.ICEBERG_CATALOG_NAME, **properties)
+    else:
+        catalog = data_processor.get_catalog()
+    identifier = args.table if "." in args.table else f"{args.namespace}.{args.table}"
+
+    table_query = TableQuery(
+        catalog.load_table(identifier),
+        args.filter,
+        selected_fields=args.select or ["*"],
+        snapshot_id=args.snapshot_id,
+        limit=args.limit,
+        order_by=args.order_by,
+        descending=args.descending,
+        workers=args.workers,
+        cache=None if args.no_cache else QueryCache(args.cache_dir, args.cache_max_bytes)
+    )
+    _write_rows(table_query.to_arrow(), args.format, sys.stdout)
+    print(json.dumps(table_query.stats), file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+import threading
+from typing import Any, Dict, List, Optional
+
+#event types with a table of their own unless EVENT_TYPES says otherwise
+DEFAULT_EVENT_TYPES = (
+    "user_login",
+    "product_view",
+    "cart_update",
+    "purchase",
+    "page_view",
+    "search",
+    "click",
+    "form_submission"
+)
+#route of every event type without a table of its own
+QUARANTINE_ROUTE = "quarantine"
+DEFAULT_QUARANTINE_TABLE = "events_quarantine"
+
+def parse_routes(spec: str) -> Dict[str, str]:
+    """Parse an event type routing spec.
+
+    Args:
+        spec (str): Comma-separated event types, each optionally followed by "=<table>", e.g.
+            "user_login,page_view=events_pages". Empty means DEFAULT_EVENT_TYPES.
+
+    Returns:
+        Dict[str, str]: The table name of each event type, events_<type> unless given.
+
+    Raises:
+        ValueError: If an entry has an empty event type or table name.
+    """
+    entries = [entry.strip() for entry in spec.split(",") if entry.strip()]
+    if not entries:
+        entries = list(DEFAULT_EVENT_TYPES)
+    routes = {}
+    for entry in entries:
+        event_type, _, table_name = (part.strip() for part in entry.partition("="))
+        if not event_type or ("=" in entry and not table_name):
+            raise ValueError(f"Invalid event route: {entry!r}")
+        routes[event_type] = table_name or f"events_{event_type}"
+    return routes
+
+class Route:
+    """Destination of one event type, or of the quarantine, with its write counters."""
+
+    def __init__(self, key: str, table_name: str):
+        """Initialize a route.
+
+        Args:
+            key (str): The write buffer key, the event type or QUARANTINE_ROUTE.
+            table_name (str): The Iceberg table rows are appended to.
+        """
+        self.key = key
+        self.table_name = table_name
+        self.events = 0
+        self.rows_written = 0
+        self.bytes_written = 0
+        self.appends = 0
+        self.failed_appends = 0
+        self.write_seconds = 0.0
+
+class EventRouter:
+    """Registry mapping event types to their tables, built once per container.
+
+    Every configured type is written to its own table; any other type, typos included, is
+    routed to the quarantine table in bulk instead of failing its events one by one. Table
+    handles and write buffers are created the first time a route is written to.
+    """
+
+    def __init__(self, routes: Dict[str, str], quarantine_table: str = DEFAULT_QUARANTINE_TABLE):
+        """Initialize the router.
+
+        Args:
+            routes (Dict[str, str]): The table name of each event type, see `parse_routes`.
+            quarantine_table (str): The table that receives events of unknown types.
+
+        Raises:
+            ValueError: If an event type is named like the quarantine route.
+        """
+        if QUARANTINE_ROUTE in routes:
+            raise ValueError(f"Event type {QUARANTINE_ROUTE!r} is reserved for the quarantine route")
+        self._routes = {event_type: Route(event_type, table_name) for event_type, table_name in routes.items()}
+        self.quarantine = Route(QUARANTINE_ROUTE, quarantine_table)
+        self._lock = threading.Lock()
+
+    def route(self, event_type: Any) -> Route:
+        """Get the route of an event type.
+
+        Args:
+            event_type (Any): The event type, or a route key; anything unknown, including
+                non-string values, is quarantined.
+
+        Returns:
+            Route: The type's own route, or the quarantine route.
+        """
+        if isinstance(event_type, str):
+            route = self._routes.get(event_type)
+            if route is not None:
+                return route
+        return self.quarantine
+
+    def routes(self) -> List[Route]:
+        """Get every route, the quarantine last.
+
+        Returns:
+            List[Route]: The configured routes and the quarantine route.
+        """
+        return list(self._routes.values()) + [self.quarantine]
+
+    def table_names(self) -> List[str]:
+        """Get the tables the router writes to, e.g. to create or preload them.
+
+        Returns:
+            List[str]: The distinct table names, the quarantine table last.
+        """
+        names: List[str] = []
+        for route in self.routes():
+            if route.table_name not in names:
+                names.append(route.table_name)
+        return names
+
+    def record_events(self, route: Route, count: int) -> None:
+        """Count events routed to a route.
+
+        Args:
+            route (Route): The route.
+            count (int): The number of events.
+        """
+        with self._lock:
+            route.events += count
+
+    def record_write(self, route: Route, rows: int, nbytes: int, seconds: float, failed: bool = False) -> None:
+        """Record one append to a route's table.
+
+        Args:
+            route (Route): The route.
+            rows (int): Rows in the append.
+            nbytes (int): Arrow bytes of the append.
+            seconds (float): Time spent aligning and committing.
+            failed (bool): Whether the append failed; its rows are then not counted as written.
+        """
+        with self._lock:
+            route.write_seconds += seconds
+            if failed:
+                route.failed_appends += 1
+                return
+            route.appends += 1
+            route.rows_written += rows
+            route.bytes_written += nbytes
+
+    def stats(self, key: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Get the cumulative counters and write throughput of each route.
+
+        Args:
+            key (Optional[str]): Report a single route, or every route when None.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Per route key its table, events routed, rows and bytes
+            written, appends, failed appends and rows written per second of write time.
+        """
+        with self._lock:
+            report = {}
+            for route in self.routes():
+                if key is not None and route.key != key:
+                    continue
+                report[route.key] = {
+                    "table": route.table_name,
+                    "events": route.events,
+                    "rows_written": route.rows_written,
+                    "bytes_written": route.bytes_written,
+                    "appends": route.appends,
+                    "failed_appends": route.failed_appends,
+                    "rows_per_second": route.rows_written / route.write_seconds if route.write_seconds else 0.0
+                }
+            return report
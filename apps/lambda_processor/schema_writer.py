@@ -0,0 +1,147 @@
+import threading
+import pyarrow as pa
+from typing import Any, Dict, List, Tuple
+from pyiceberg.exceptions import CommitFailedException
+
+class SchemaAligner:
+    """Casts and projects Arrow batches onto the current schema of an Iceberg table.
+
+    The Arrow form of a table schema is derived once per table UUID and schema id, so aligning
+    a batch is one projection and one vectorized cast; batches that already match are passed
+    through untouched. Polars' Int64/Float64 inference and columns the table lacks would
+    otherwise fail the append or send pyiceberg through its own per-batch reconciliation.
+    """
+
+    def __init__(self, evolve: bool = False, max_evolve_attempts: int = 3):
+        """Initialize the aligner.
+
+        Args:
+            evolve (bool): Add columns the table lacks through schema evolution instead of
+                raising.
+            max_evolve_attempts (int): Schema update attempts before a conflict is raised.
+        """
+        self.evolve = evolve
+        self.max_evolve_attempts = max_evolve_attempts
+        self.hits = 0
+        self.misses = 0
+        self.casts = 0
+        self.evolutions = 0
+        self._schemas: Dict[Tuple[str, int], pa.Schema] = {}
+        self._lock = threading.Lock()
+
+    def target_schema(self, table: Any) -> pa.Schema:
+        """Get the Arrow schema that appends to a table must have.
+
+        Args:
+            table (Any): The Iceberg table handle.
+
+        Returns:
+            pa.Schema: The Arrow form of the table's current schema, with field IDs.
+        """
+        key = (str(table.metadata.table_uuid), table.metadata.current_schema_id)
+        with self._lock:
+            schema = self._schemas.get(key)
+            if schema is not None:
+                self.hits += 1
+                return schema
+            self.misses += 1
+        from pyiceberg.io.pyarrow import schema_to_pyarrow
+        schema = schema_to_pyarrow(table.schema())
+        with self._lock:
+            self._schemas[key] = schema
+        return schema
+
+    def align(self, table: Any, data: pa.Table) -> pa.Table:
+        """Cast and project a batch onto the table schema.
+
+        Columns the table lacks that hold only nulls are dropped since they carry no data.
+        Other unknown columns are added to the table when evolution is enabled. Optional
+        columns missing from the batch are filled with nulls.
+
+        Args:
+            table (Any): The Iceberg table handle; its metadata is updated when the schema
+                evolves.
+            data (pa.Table): The batch, e.g. from polars' `to_arrow`.
+
+        Returns:
+            pa.Table: The batch with exactly the table's columns, order and types.
+
+        Raises:
+            ValueError: If the batch has unknown columns and evolution is disabled, lacks a
+                required column, has nulls in one, or holds values the column type cannot take.
+        """
+        target = self.target_schema(table)
+        if data.schema.equals(target):
+            return data
+
+        unknown = [
+            field for field in data.schema
+            if target.get_field_index(field.name) == -1 and data.column(field.name).null_count < len(data)
+        ]
+        if unknown:
+            if not self.evolve:
+                names = ", ".join(field.name for field in unknown)
+                raise ValueError(f"Columns not in the schema of table {table.name()}: {names}")
+            self._evolve(table, unknown)
+            target = self.target_schema(table)
+
+        columns = []
+        for field in target:
+            index = data.schema.get_field_index(field.name)
+            if index == -1:
+                if not field.nullable:
+                    raise ValueError(f"Missing required column: {field.name}")
+                columns.append(pa.nulls(len(data), field.type))
+                continue
+            column = data.column(index)
+            if not field.nullable and column.null_count:
+                raise ValueError(f"Required column {field.name} has {column.null_count} nulls")
+            columns.append(column)
+
+        try:
+            aligned = pa.Table.from_arrays(columns, names=target.names).cast(target)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise ValueError(f"Cannot cast batch to the schema of table {table.name()}: {e}") from e
+        with self._lock:
+            self.casts += 1
+        return aligned
+
+    def stats(self) -> Dict[str, int]:
+        """Get cache and evolution counters.
+
+        Returns:
+            Dict[str, int]: Schema cache hits and misses, batches cast, and schema evolutions.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "casts": self.casts,
+                "evolutions": self.evolutions
+            }
+
+    def _evolve(self, table: Any, fields: List[pa.Field]) -> None:
+        """Add columns to a table, retrying on conflicts with other writers.
+
+        Args:
+            table (Any): The Iceberg table handle.
+            fields (List[pa.Field]): The new columns, added as optional columns.
+
+        Raises:
+            CommitFailedException: If every attempt conflicted.
+        """
+        new_columns = pa.schema([field.with_nullable(True) for field in fields])
+        attempt = 1
+        while True:
+            try:
+                #a no-op when a concurrent writer already added the same columns
+                with table.update_schema() as update:
+                    update.union_by_name(new_columns)
+                break
+            except CommitFailedException:
+                if attempt >= self.max_evolve_attempts:
+                    raise
+                table.refresh()
+                attempt += 1
+        with self._lock:
+            self.evolutions += 1
@@ -0,0 +1,296 @@
+import pyarrow as pa
+from typing import Dict, Any, List, Optional, Tuple
+from pyiceberg.schema import Schema
+from pyiceberg.partitioning import PartitionField, PartitionSpec
+from pyiceberg.table.sorting import SortField, SortOrder
+from pyiceberg.transforms import BucketTransform, DayTransform, HourTransform, IdentityTransform
+from pyiceberg.types import (
+    StringType,
+    IntegerType,
+    BooleanType,
+    DoubleType,
+    TimestampType,
+    NestedField
+)
+from apps.lambda_processor import json_codec
+
+#nested sections of the raw event that are flattened into doc_<section>_<field> columns
+DOC_SECTIONS = ("session_info", "user_agent", "location", "engagement", "performance")
+#raw event metadata keys that are stored as top-level columns
+METADATA_FIELDS = ("browser", "os", "device")
+#time partition granularities of the event and error tables
+PARTITION_GRANULARITIES = {"day": DayTransform, "hour": HourTransform}
+#first field id of partition fields, as assigned by Iceberg
+PARTITION_FIELD_ID_START = 1000
+
+def create_base_schema() -> Schema:
+    """Create base schema for event tables.
+
+    Returns:
+        Schema: The Iceberg schema shared by every events_<type> table.
+    """
+    return Schema(
+        NestedField(1, "event_id", StringType(), required=True),
+        NestedField(2, "event_type", StringType(), required=True),
+        NestedField(3, "user_id", StringType(), required=True),
+        NestedField(4, "timestamp", TimestampType(), required=True),
+        NestedField(5, "browser", StringType()),
+        NestedField(6, "os", StringType()),
+        NestedField(7, "device", StringType()),
+        NestedField(8, "doc_session_info_session_id", StringType()),
+        NestedField(9, "doc_session_info_duration", IntegerType()),
+        NestedField(10, "doc_session_info_pages_visited", IntegerType()),
+        NestedField(11, "doc_session_info_entry_page", StringType()),
+        NestedField(12, "doc_session_info_exit_page", StringType()),
+        NestedField(13, "doc_session_info_referrer", StringType()),
+        NestedField(14, "doc_session_info_is_new_session", BooleanType()),
+        NestedField(15, "doc_user_agent_browser_version", StringType()),
+        NestedField(16, "doc_user_agent_platform_version", StringType()),
+        NestedField(17, "doc_user_agent_device_type", StringType()),
+        NestedField(18, "doc_user_agent_screen_resolution", StringType()),
+        NestedField(19, "doc_user_agent_language", StringType()),
+        NestedField(20, "doc_user_agent_timezone", StringType()),
+        NestedField(21, "doc_location_country", StringType()),
+        NestedField(22, "doc_location_region", StringType()),
+        NestedField(23, "doc_location_city", StringType()),
+        NestedField(24, "doc_location_ip_address", StringType()),
+        NestedField(25, "doc_location_isp", StringType()),
+        NestedField(26, "doc_location_connection_type", StringType()),
+        NestedField(27, "doc_engagement_scroll_depth", IntegerType()),
+        NestedField(28, "doc_engagement_time_on_page", IntegerType()),
+        NestedField(29, "doc_engagement_interactions", IntegerType()),
+        NestedField(30, "doc_engagement_form_submissions", IntegerType()),
+        NestedField(31, "doc_engagement_video_views", IntegerType()),
+        NestedField(32, "doc_engagement_downloads", IntegerType()),
+        NestedField(33, "doc_performance_page_load_time", DoubleType()),
+        NestedField(34, "doc_performance_dom_load_time", DoubleType()),
+        NestedField(35, "doc_performance_network_latency", DoubleType()),
+        NestedField(36, "doc_performance_server_response_time", DoubleType()),
+        #fields the generator emits that the original schema did not declare
+        NestedField(37, "doc_performance_first_contentful_paint", DoubleType()),
+        NestedField(38, "doc_performance_dom_interactive", DoubleType())
+    )
+
+def create_error_log_schema() -> Schema:
+    """Create schema for error logging table.
+
+    Returns:
+        Schema: The Iceberg schema of the error_logs table.
+    """
+    return Schema(
+        NestedField(1, "error_id", StringType(), required=True),
+        NestedField(2, "timestamp", TimestampType(), required=True),
+        NestedField(3, "event_id", StringType()),
+        NestedField(4, "event_type", StringType()),
+        NestedField(5, "error_type", StringType(), required=True),
+        NestedField(6, "error_message", StringType(), required=True),
+        NestedField(7, "stack_trace", StringType()),
+        NestedField(8, "processing_stage", StringType(), required=True),
+        NestedField(9, "event_data", StringType())
+    )
+
+def create_event_sort_order(schema: Optional[Schema] = None) -> SortOrder:
+    """Create the write order of event tables: by user, then by time.
+
+    Clustering rows this way keeps each Parquet row group to a narrow user and time range,
+    so engines can skip row groups using their min/max statistics.
+
+    Args:
+        schema (Optional[Schema]): The event table schema, the base schema when None.
+
+    Returns:
+        SortOrder: The Iceberg sort order on user_id and timestamp, both ascending.
+    """
+    schema = schema or create_base_schema()
+    return SortOrder(
+        SortField(source_id=schema.find_field("user_id").field_id, transform=IdentityTransform()),
+        SortField(source_id=schema.find_field("timestamp").field_id, transform=IdentityTransform())
+    )
+
+def create_partition_spec(schema: Schema, granularity: str = "day", user_buckets: int = 0) -> PartitionSpec:
+    """Create the partition spec of an event or error table.
+
+    Args:
+        schema (Schema): The table schema; it must have a timestamp column, and a user_id column
+            when user_buckets is set.
+        granularity (str): "day" or "hour" partitions of the timestamp.
+        user_buckets (int): Number of user_id hash buckets within each time partition, 0 for none.
+
+    Returns:
+        PartitionSpec: The spec, e.g. day(timestamp), bucket(16, user_id).
+
+    Raises:
+        ValueError: If the granularity is not supported.
+    """
+    if granularity not in PARTITION_GRANULARITIES:
+        raise ValueError(f"Unsupported partition granularity: {granularity}")
+    fields = [
+        PartitionField(
+            source_id=schema.find_field("timestamp").field_id,
+            field_id=PARTITION_FIELD_ID_START,
+            transform=PARTITION_GRANULARITIES[granularity](),
+            name=f"timestamp_{granularity}"
+        )
+    ]
+    if user_buckets:
+        fields.append(PartitionField(
+            source_id=schema.find_field("user_id").field_id,
+            field_id=PARTITION_FIELD_ID_START + 1,
+            transform=BucketTransform(user_buckets),
+            name="user_id_bucket"
+        ))
+    return PartitionSpec(*fields)
+
+def source_path(field_name: str) -> Tuple[str, ...]:
+    """Map a flat table column to the key path it is read from in a raw event.
+
+    Args:
+        field_name (str): The Iceberg column name.
+
+    Returns:
+        Tuple[str, ...]: The nested keys leading to the value, e.g.
+        ("_doc", "session_info", "session_id") for doc_session_info_session_id.
+    """
+    if field_name in METADATA_FIELDS:
+        return ("metadata", field_name)
+    if field_name.startswith("doc_"):
+        rest = field_name[len("doc_"):]
+        for section in DOC_SECTIONS:
+            if rest.startswith(f"{section}_"):
+                return ("_doc", section, rest[len(section) + 1:])
+    return (field_name,)
+
+class CompiledFlattener:
+    """Flattener compiled once from an Iceberg schema.
+
+    Every column is resolved to a key path up front and leaves are grouped by their parent
+    dictionary, so flattening an event is a fixed sequence of dictionary lookups with no key
+    construction and no type inference.
+    """
+
+    def __init__(self, schema: Schema, overflow_column: Optional[str] = None):
+        """Compile the flattening plan for a schema.
+
+        Args:
+            schema (Schema): The Iceberg schema the flattened rows must match.
+            overflow_column (Optional[str]): Name of a string column that collects unknown keys
+                as a JSON object. Unknown keys are dropped when None.
+        """
+        self.schema = schema
+        self.overflow_column = overflow_column
+        self._arrow_schema: Optional[pa.Schema] = None
+        self.field_ids = [field.field_id for field in schema.fields]
+
+        plan: Dict[Tuple[str, ...], List[Tuple[int, str]]] = {}
+        known_keys: Dict[Tuple[str, ...], set] = {(): set()}
+        for index, field in enumerate(schema.fields):
+            path = source_path(field.name)
+            plan.setdefault(path[:-1], []).append((index, path[-1]))
+            for depth in range(len(path)):
+                known_keys.setdefault(path[:depth], set()).add(path[depth])
+
+        self._plan = tuple((parent, tuple(leaves)) for parent, leaves in plan.items())
+        self._known_keys = {path: frozenset(keys) for path, keys in known_keys.items()}
+        self._column_names = [field.name for field in schema.fields]
+        if overflow_column is not None:
+            self._column_names.append(overflow_column)
+
+    @property
+    def arrow_schema(self) -> pa.Schema:
+        """Get the Arrow schema of the flattened rows, built on first use.
+
+        pyiceberg.io.pyarrow is only imported here since it is slow to import at init.
+
+        Returns:
+            pa.Schema: The table schema, with the overflow column when enabled.
+        """
+        if self._arrow_schema is None:
+            from pyiceberg.io.pyarrow import schema_to_pyarrow
+            arrow_schema = schema_to_pyarrow(self.schema)
+            if self.overflow_column is not None:
+                arrow_schema = arrow_schema.append(pa.field(self.overflow_column, pa.string()))
+            self._arrow_schema = arrow_schema
+        return self._arrow_schema
+
+    @property
+    def column_names(self) -> List[str]:
+        """Get the output column names in schema order.
+
+        Returns:
+            List[str]: The column names, including the overflow column when enabled.
+        """
+        return self._column_names
+
+    def flatten(self, events: List[Dict[str, Any]]) -> List[List[Any]]:
+        """Flatten a batch of events into column buffers.
+
+        Args:
+            events (List[Dict[str, Any]]): The raw events.
+
+        Returns:
+            List[List[Any]]: One value list per output column, in schema order.
+        """
+        columns: List[List[Any]] = [[] for _ in self._column_names]
+        for event in events:
+            for parent, leaves in self._plan:
+                node = event
+                for key in parent:
+                    node = node.get(key) if isinstance(node, dict) else None
+                if isinstance(node, dict):
+                    for index, key in leaves:
+                        columns[index].append(node.get(key))
+                else:
+                    for index, _ in leaves:
+                        columns[index].append(None)
+
+            if self.overflow_column is not None:
+                extras = self._unknown_keys(event)
+                columns[-1].append(json_codec.dumps(extras) if extras else None)
+        return columns
+
+    def to_arrow(
+        self,
+        columns: List[List[Any]],
+        arrays: Optional[Dict[str, pa.Array]] = None
+    ) -> pa.Table:
+        """Build a typed Arrow table from column buffers.
+
+        Args:
+            columns (List[List[Any]]): Column buffers returned by `flatten`.
+            arrays (Optional[Dict[str, pa.Array]]): Pre-built arrays that replace the buffers of
+                the named columns, e.g. timestamps parsed in a vectorized pass.
+
+        Returns:
+            pa.Table: A table with exactly the compiled Arrow schema.
+        """
+        arrays = arrays or {}
+        built = []
+        for field, values in zip(self.arrow_schema, columns):
+            array = arrays.get(field.name)
+            if array is None:
+                array = pa.array(values, type=field.type)
+            elif not array.type.equals(field.type):
+                array = array.cast(field.type)
+            built.append(array)
+        return pa.Table.from_arrays(built, schema=self.arrow_schema)
+
+    def _unknown_keys(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Collect the keys of an event that no column is compiled for.
+
+        Args:
+            event (Dict[str, Any]): The raw event.
+
+        Returns:
+            Dict[str, Any]: Unknown values keyed by their underscore-joined key path.
+        """
+        extras = {}
+        for path, keys in self._known_keys.items():
+            node = event
+            for key in path:
+                node = node.get(key) if isinstance(node, dict) else None
+            if not isinstance(node, dict):
+                continue
+            for key, value in node.items():
+                if key not in keys:
+                    extras["_".join(path + (key,))] = value
+        return extras
@@ -0,0 +1,62 @@
+import pyarrow as pa
+from typing import Any, List, Tuple
+from pyiceberg.schema import Schema
+from pyiceberg.table.sorting import NullOrder, SortDirection, SortOrder
+
+def arrow_sort_keys(sort_order: SortOrder, schema: Schema) -> List[Tuple[str, str, str]]:
+    """Translate an Iceberg sort order into Arrow sort keys.
+
+    Order-preserving transforms such as day() or truncate() sort the same way as their source
+    column, so the source column is used. Keys stop at the first transform that does not
+    preserve order, e.g. bucket().
+
+    Args:
+        sort_order (SortOrder): The table's sort order.
+        schema (Schema): The table schema the sort fields refer to.
+
+    Returns:
+        List[Tuple[str, str, str]]: Column name, "ascending"/"descending" and
+        "at_start"/"at_end" null placement of each key.
+    """
+    keys = []
+    for field in sort_order.fields:
+        if not field.transform.preserves_order:
+            break
+        keys.append((
+            schema.find_column_name(field.source_id),
+            "ascending" if field.direction == SortDirection.ASC else "descending",
+            "at_end" if field.null_order == NullOrder.NULLS_LAST else "at_start"
+        ))
+    return keys
+
+def sort_for_table(table: Any, data: pa.Table) -> pa.Table:
+    """Sort rows by a table's declared sort order before they are appended.
+
+    Args:
+        table (Any): The Iceberg table handle.
+        data (pa.Table): The rows to append.
+
+    Returns:
+        pa.Table: The sorted rows, or the rows unchanged if the table is unsorted.
+    """
+    sort_order = table.sort_order()
+    if not isinstance(sort_order, SortOrder) or sort_order.is_unsorted or data.num_rows < 2:
+        return data
+
+    return sort_by_keys(data, arrow_sort_keys(sort_order, table.schema()))
+
+def sort_by_keys(data: pa.Table, keys: List[Tuple[str, str, str]]) -> pa.Table:
+    """Sort rows by Arrow sort keys, ignoring keys for columns the rows do not have.
+
+    Args:
+        data (pa.Table): The rows to sort.
+        keys (List[Tuple[str, str, str]]): Column name, direction and null placement of each key.
+
+    Returns:
+        pa.Table: The sorted rows, or the rows unchanged if no key applies.
+    """
+    keys = [key for key in keys if key[0] in data.column_names]
+    if not keys:
+        return data
+    #each key keeps its own null placement, see the pyarrow floor in requirements.txt
+    return data.sort_by(keys)
@@ -0,0 +1,93 @@
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+class TableCache:
+    """Cache of loaded Iceberg table handles keyed by table name.
+
+    Handles are reused until their TTL expires or they are invalidated, saving a catalog
+    round-trip and a metadata read per write. A handle keeps its own metadata current after
+    each commit it makes, so only conflicts with other writers need an explicit refresh.
+    """
+
+    def __init__(
+        self,
+        load_table: Callable[[str], Any],
+        ttl_seconds: float = 300.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """Initialize the cache.
+
+        Args:
+            load_table (Callable[[str], Any]): Loads a table handle from the catalog by name.
+            ttl_seconds (float): How long a handle is reused before it is loaded again.
+            clock (Callable[[], float]): Monotonic clock, in seconds.
+        """
+        self.load_table = load_table
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._tables: Dict[str, Tuple[Any, float]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def get(self, name: str) -> Any:
+        """Get a table handle, loading it from the catalog on a miss or after the TTL.
+
+        Args:
+            name (str): The table name.
+
+        Returns:
+            Any: The table handle.
+        """
+        cached = self._tables.get(name)
+        if cached is not None and self.clock() - cached[1] < self.ttl_seconds:
+            self.hits += 1
+            return cached[0]
+
+        self.misses += 1
+        table = self.load_table(name)
+        self._tables[name] = (table, self.clock())
+        return table
+
+    def refresh(self, name: str) -> Any:
+        """Refresh the metadata of a single table, e.g. after a commit conflict.
+
+        Args:
+            name (str): The table name.
+
+        Returns:
+            Any: The refreshed table handle.
+        """
+        cached = self._tables.get(name)
+        if cached is None:
+            return self.get(name)
+
+        self.refreshes += 1
+        table = cached[0]
+        table.refresh()
+        self._tables[name] = (table, self.clock())
+        return table
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Drop cached handles so the next access loads them from the catalog.
+
+        Args:
+            name (Optional[str]): The table to drop, or every table when None.
+        """
+        if name is None:
+            self._tables.clear()
+        else:
+            self._tables.pop(name, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Get the cache counters.
+
+        Returns:
+            Dict[str, int]: Hits, misses (catalog loads), refreshes and cached table count.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "cached_tables": len(self._tables)
+        }
@@ -0,0 +1,116 @@
+import polars as pl
+import pyarrow as pa
+from typing import Any, List, Optional
+
+#ISO 8601 variants tried in order, "%.f" also matches values without a fraction
+ISO_UTC = "%Y-%m-%dT%H:%M:%S%.fZ"
+ISO_OFFSET = "%Y-%m-%dT%H:%M:%S%.f%z"
+ISO_NAIVE = "%Y-%m-%dT%H:%M:%S%.f"
+SPACE_NAIVE = "%Y-%m-%d %H:%M:%S%.f"
+#integer or decimal seconds, milliseconds or microseconds since the epoch
+EPOCH = "epoch"
+FORMATS = (ISO_UTC, ISO_OFFSET, ISO_NAIVE, SPACE_NAIVE, EPOCH)
+
+#magnitudes above which an epoch value is read as milliseconds, microseconds or nanoseconds
+_EPOCH_MILLIS_FROM = 1e11
+_EPOCH_MICROS_FROM = 1e14
+_EPOCH_NANOS_FROM = 1e17
+#microseconds since the epoch of the first and last representable datetimes, years 1 and 9999
+_EPOCH_MIN_MICROS = -62_135_596_800_000_000
+_EPOCH_MAX_MICROS = 253_402_300_799_999_999
+#unparsed values sampled when detecting the format of the rest of a batch
+DETECTION_SAMPLE_SIZE = 8
+
+def _to_series(values: List[Any]) -> pl.Series:
+    """Build a string series from raw timestamp values.
+
+    Args:
+        values (List[Any]): Strings, numbers or None.
+
+    Returns:
+        pl.Series: The values as strings, None where missing.
+    """
+    try:
+        return pl.Series("timestamp", values, dtype=pl.String)
+    except (TypeError, pl.exceptions.PolarsError):
+        #mixed strings and epoch numbers
+        return pl.Series(
+            "timestamp", [v if v is None or isinstance(v, str) else str(v) for v in values], dtype=pl.String
+        )
+
+def parse_with_format(values: pl.Series, fmt: str) -> pl.Series:
+    """Parse a string series in one vectorized pass.
+
+    Args:
+        values (pl.Series): The timestamp strings.
+        fmt (str): One of FORMATS.
+
+    Returns:
+        pl.Series: Naive UTC datetimes in microseconds, null where a value does not match.
+    """
+    if fmt == EPOCH:
+        numbers = values.cast(pl.Float64, strict=False)
+        micros = (
+            pl.select(
+                pl.when(numbers >= _EPOCH_NANOS_FROM).then(numbers / 1000)
+                .when(numbers >= _EPOCH_MICROS_FROM).then(numbers)
+                .when(numbers >= _EPOCH_MILLIS_FROM).then(numbers * 1000)
+                .otherwise(numbers * 1_000_000)
+            ).to_series()
+        ).round(0)
+        #NaN, infinities and values beyond the datetime range become null instead of failing the batch
+        micros = pl.select(
+            pl.when(micros.is_between(_EPOCH_MIN_MICROS, _EPOCH_MAX_MICROS)).then(micros)
+        ).to_series()
+        return micros.cast(pl.Int64, strict=False).cast(pl.Datetime("us")).alias("timestamp")
+
+    if fmt == ISO_OFFSET:
+        parsed = values.str.strptime(pl.Datetime("us", "UTC"), fmt, strict=False)
+        return parsed.dt.replace_time_zone(None)
+    return values.str.strptime(pl.Datetime("us"), fmt, strict=False)
+
+def detect_format(values: pl.Series) -> Optional[str]:
+    """Detect the format of timestamp strings from a small sample.
+
+    Args:
+        values (pl.Series): Timestamp strings, without nulls.
+
+    Returns:
+        Optional[str]: The format in FORMATS that parses most of the sample, or None if
+        none parses any value.
+    """
+    sample = values.head(DETECTION_SAMPLE_SIZE)
+    best, best_count = None, 0
+    for fmt in FORMATS:
+        count = sample.len() - parse_with_format(sample, fmt).null_count()
+        if count > best_count:
+            best, best_count = fmt, count
+            if count == sample.len():
+                break
+    return best
+
+def parse_timestamps(values: List[Any]) -> pa.Array:
+    """Normalize raw event timestamps to naive UTC microseconds.
+
+    The format is detected once from a sample and the whole column is parsed in a vectorized
+    pass. Rows left unparsed are detected and parsed again, so a batch mixing a few formats
+    costs one pass per format; values matching no format stay null.
+
+    Args:
+        values (List[Any]): ISO 8601 strings with or without "Z" or an offset, or epoch
+            seconds, milliseconds or microseconds as numbers or strings.
+
+    Returns:
+        pa.Array: A timestamp[us] array with nulls for missing or unparseable values.
+    """
+    raw = _to_series(values)
+    parsed = pl.Series("timestamp", [None] * len(raw), dtype=pl.Datetime("us"))
+    for _ in FORMATS:
+        unparsed = raw.filter(parsed.is_null() & raw.is_not_null())
+        if unparsed.is_empty():
+            break
+        fmt = detect_format(unparsed)
+        if fmt is None:
+            break
+        parsed = pl.select(pl.coalesce(parsed, parse_with_format(raw, fmt))).to_series()
+    return parsed.alias("timestamp").to_arrow()
@@ -0,0 +1,372 @@
+import time
+import datetime
+import threading
+import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+#append every row, redelivered events are dropped by the deduplicator
+WRITE_MODE_APPEND = "append"
+#replace the committed row of every event_id that arrives again with different values
+WRITE_MODE_UPSERT = "upsert"
+WRITE_MODES = (WRITE_MODE_APPEND, WRITE_MODE_UPSERT)
+
+def match_filter(data: pa.Table, key_column: str = "event_id", window_seconds: float = 0.0) -> Any:
+    """Build a pyiceberg row filter matching the keys of a batch.
+
+    The filter is bounded by the batch's timestamps, so planning prunes the time partitions
+    that cannot hold the keys.
+
+    Args:
+        data (pa.Table): The batch, with at least one non-null key.
+        key_column (str): The column holding the key.
+        window_seconds (float): How far before and after the batch's timestamps committed rows
+            are looked for, for corrections that also move the event in time.
+
+    Returns:
+        Any: The pyiceberg expression.
+    """
+    from pyiceberg.expressions import And, GreaterThanOrEqual, In, LessThanOrEqual
+    row_filter = In(key_column, set(data.column(key_column).drop_null().to_pylist()))
+    if "timestamp" in data.column_names:
+        bounds = pc.min_max(data.column("timestamp")).as_py()
+        if bounds["min"] is not None:
+            window = datetime.timedelta(seconds=window_seconds)
+            row_filter = And(
+                row_filter,
+                And(
+                    GreaterThanOrEqual("timestamp", (bounds["min"] - window).isoformat()),
+                    LessThanOrEqual("timestamp", (bounds["max"] + window).isoformat())
+                )
+            )
+    return row_filter
+
+class _PendingCorrections:
+    """Corrections of one table waiting for a rewrite, with the data files it would replace."""
+
+    __slots__ = ("data", "files", "first_added")
+
+    def __init__(self, data: pa.Table, files: Dict[str, int], first_added: float):
+        self.data = data
+        self.files = files
+        self.first_added = first_added
+
+class UpsertWriter:
+    """Copy-on-write upserts keyed on event_id, in front of the commit coordinator.
+
+    Incoming rows are matched against the committed rows of their time partitions: rows with
+    a new key are appended, identical redeliveries are dropped, and rows that change a
+    committed row are corrections. A correction is written by rewriting the data files that
+    hold the old version, which also copies every other row of those files, so corrections
+    are held back while the rows rewritten per corrected row exceed the amplification limit
+    and later corrections to the same files share the rewrite.
+    """
+
+    def __init__(
+        self,
+        load_table: Callable[[str], Any],
+        coordinator: Any,
+        key_column: str = "event_id",
+        max_amplification: float = 50.0,
+        max_pending_rows: int = 10000,
+        max_age_seconds: float = 60.0,
+        match_window_seconds: float = 86400.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """Initialize the writer.
+
+        Args:
+            load_table (Callable[[str], Any]): Returns an up-to-date table handle, so rows other
+                writers committed are matched too.
+            coordinator (Any): The commit coordinator used for appends and rewrites.
+            key_column (str): The column holding the upsert key.
+            max_amplification (float): Rows rewritten per corrected row up to which pending
+                corrections are applied right away.
+            max_pending_rows (int): Pending corrections of a table that force a rewrite.
+            max_age_seconds (float): Age of the oldest pending correction that forces a rewrite.
+            match_window_seconds (float): How far around a batch's timestamps committed rows
+                are matched.
+            clock (Callable[[], float]): Monotonic clock, in seconds.
+        """
+        self.load_table = load_table
+        self.coordinator = coordinator
+        self.key_column = key_column
+        self.max_amplification = max_amplification
+        self.max_pending_rows = max_pending_rows
+        self.max_age_seconds = max_age_seconds
+        self.match_window_seconds = match_window_seconds
+        self.clock = clock
+        self.rows_inserted = 0
+        self.rows_unchanged = 0
+        self.corrections_applied = 0
+        self.rewrites = 0
+        self.rows_rewritten = 0
+        self._pending: Dict[str, _PendingCorrections] = {}
+        self._lock = threading.Lock()
+
+    def write(self, table_name: str, data: pa.Table, defer: bool = True) -> Dict[str, int]:
+        """Upsert a batch.
+
+        Args:
+            table_name (str): The table the batch is written to.
+            data (pa.Table): The batch, already cast to the table's schema. When a key repeats,
+                its last row wins.
+            defer (bool): Allow corrections to wait for a cheaper rewrite; when False they are
+                applied before returning.
+
+        Returns:
+            Dict[str, int]: Rows inserted, unchanged rows dropped, corrections applied, and
+            corrections left pending for the table.
+
+        Raises:
+            CommitFailedException: If the append or rewrite still conflicts after every attempt;
+                the corrections then stay pending.
+        """
+        if data.num_rows == 0:
+            return {"inserted": 0, "unchanged": 0, "corrected": 0, "pending": self.pending_rows(table_name)}
+        keys = pl.Series(pl.from_arrow(data.column(self.key_column)))
+        last = keys.is_last_distinct()
+        if not last.all():
+            data = data.filter(pa.array(last.to_numpy()))
+            keys = keys.filter(last)
+
+        with self._lock:
+            pending = self._pending.get(table_name)
+            pending_keys = pending.data.column(self.key_column) if pending is not None else None
+        #a key with a pending correction is corrected again without another lookup
+        repeat = keys.is_in(pl.Series(pl.from_arrow(pending_keys))).to_numpy() if pending_keys is not None else None
+        lookup = data if repeat is None else data.filter(pa.array(~repeat))
+
+        inserts, corrections, unchanged, files = self._classify(table_name, lookup)
+        if repeat is not None and repeat.any():
+            corrections = pa.concat_tables([corrections, data.filter(pa.array(repeat))])
+        if inserts.num_rows:
+            self.coordinator.append(table_name, inserts)
+
+        corrected = 0
+        with self._lock:
+            self.rows_inserted += inserts.num_rows
+            self.rows_unchanged += unchanged
+            if corrections.num_rows:
+                self._add_pending(table_name, corrections, files)
+            due = table_name in self._pending and (not defer or self._is_due(self._pending[table_name]))
+        if due:
+            corrected = self._apply(table_name)
+        return {
+            "inserted": inserts.num_rows,
+            "unchanged": unchanged,
+            "corrected": corrected,
+            "pending": self.pending_rows(table_name)
+        }
+
+    def amplification(self, table_name: str) -> float:
+        """Get the rows a rewrite would write per pending correction of a table.
+
+        Args:
+            table_name (str): The table name.
+
+        Returns:
+            float: Rows of the data files to rewrite over pending corrections, 0 when none pend.
+        """
+        with self._lock:
+            pending = self._pending.get(table_name)
+            return self._amplification(pending) if pending is not None else 0.0
+
+    def pending_rows(self, table_name: Optional[str] = None) -> int:
+        """Count the corrections waiting for a rewrite.
+
+        Args:
+            table_name (Optional[str]): Count a single table, or every table when None.
+
+        Returns:
+            int: The number of pending corrections.
+        """
+        with self._lock:
+            if table_name is not None:
+                pending = self._pending.get(table_name)
+                return pending.data.num_rows if pending is not None else 0
+            return sum(pending.data.num_rows for pending in self._pending.values())
+
+    def flush(self, table_name: Optional[str] = None) -> Dict[str, Exception]:
+        """Apply pending corrections whatever the cost.
+
+        Args:
+            table_name (Optional[str]): Flush a single table, or every table when None.
+
+        Returns:
+            Dict[str, Exception]: The error of each table whose rewrite failed; its corrections
+            stay pending.
+        """
+        with self._lock:
+            names = [table_name] if table_name is not None else list(self._pending)
+        return self._apply_all(names)
+
+    def flush_due(self) -> Dict[str, Exception]:
+        """Apply the pending corrections that are cheap enough, too many or too old.
+
+        Returns:
+            Dict[str, Exception]: The error of each table whose rewrite failed.
+        """
+        with self._lock:
+            names = [name for name, pending in self._pending.items() if self._is_due(pending)]
+        return self._apply_all(names)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get upsert counts and the write amplification of the rewrites.
+
+        Returns:
+            Dict[str, Any]: Rows inserted, unchanged rows dropped, corrections applied and
+            pending, rewrites, rows written by rewrites, and the write amplification: rows
+            physically written per row inserted or corrected.
+        """
+        with self._lock:
+            changed = self.rows_inserted + self.corrections_applied
+            return {
+                "rows_inserted": self.rows_inserted,
+                "rows_unchanged": self.rows_unchanged,
+                "corrections_applied": self.corrections_applied,
+                "corrections_pending": sum(pending.data.num_rows for pending in self._pending.values()),
+                "rewrites": self.rewrites,
+                "rows_rewritten": self.rows_rewritten,
+                "write_amplification": (self.rows_inserted + self.rows_rewritten) / changed if changed else 0.0
+            }
+
+    def _classify(self, table_name: str, data: pa.Table) -> Tuple[pa.Table, pa.Table, int, Dict[str, int]]:
+        """Split rows into inserts and corrections by matching them with committed rows.
+
+        Args:
+            table_name (str): The table name.
+            data (pa.Table): Rows with distinct keys.
+
+        Returns:
+            Tuple[pa.Table, pa.Table, int, Dict[str, int]]: The rows with new keys, the rows
+            changing a committed row, the number of unchanged rows dropped, and the row count of
+            each data file holding a corrected row.
+        """
+        if data.num_rows == 0:
+            return data, data, 0, {}
+        from pyiceberg.io.pyarrow import ArrowScan
+        table = self.load_table(table_name)
+        row_filter = match_filter(data, self.key_column, self.match_window_seconds)
+        scan = table.scan(row_filter=row_filter)
+        projection = scan.projection()
+        found: List[pa.Table] = []
+        file_keys: List[Tuple[str, int, Set[str]]] = []
+        for task in scan.plan_files():
+            rows = ArrowScan(table.metadata, table.io, projection, row_filter).to_table([task])
+            if rows.num_rows:
+                found.append(rows.select(data.column_names))
+                file_keys.append((task.file.file_path, task.file.record_count, set(rows.column(self.key_column).to_pylist())))
+        if not found:
+            return data, data.slice(0, 0), 0, {}
+
+        incoming = pl.from_arrow(data)
+        committed = pl.from_arrow(pa.concat_tables(found, promote_options="default")).cast(incoming.schema)
+        matched = incoming[self.key_column].is_in(committed[self.key_column])
+        same = incoming.hash_rows().is_in(committed.hash_rows())
+        insert = (~matched).to_numpy()
+        correct = (matched & ~same).to_numpy()
+        corrections = data.filter(pa.array(correct))
+        corrected_keys = set(corrections.column(self.key_column).to_pylist())
+        files = {path: count for path, count, keys in file_keys if keys & corrected_keys}
+        return data.filter(pa.array(insert)), corrections, int((matched & same).sum()), files
+
+    def _add_pending(self, table_name: str, corrections: pa.Table, files: Dict[str, int]) -> None:
+        """Merge corrections into a table's pending ones, the newest version of a key winning.
+
+        Called with the lock held.
+
+        Args:
+            table_name (str): The table name.
+            corrections (pa.Table): Corrections with distinct keys.
+            files (Dict[str, int]): Row counts of the data files holding the old versions.
+        """
+        pending = self._pending.get(table_name)
+        if pending is None:
+            self._pending[table_name] = _PendingCorrections(corrections, dict(files), self.clock())
+            return
+        stale = pc.is_in(pending.data.column(self.key_column), value_set=corrections.column(self.key_column))
+        pending.data = pa.concat_tables([pending.data.filter(pc.invert(stale)), corrections])
+        pending.files.update(files)
+
+    def _amplification(self, pending: _PendingCorrections) -> float:
+        """Get the rows a rewrite would write per pending correction.
+
+        Args:
+            pending (_PendingCorrections): The pending corrections.
+
+        Returns:
+            float: Rows of the data files to rewrite over the number of corrections.
+        """
+        return sum(pending.files.values()) / max(1, pending.data.num_rows)
+
+    def _is_due(self, pending: _PendingCorrections) -> bool:
+        """Check whether pending corrections should be rewritten now.
+
+        Called with the lock held.
+
+        Args:
+            pending (_PendingCorrections): The pending corrections.
+
+        Returns:
+            bool: True if the rewrite is cheap enough, or the corrections are too many or too old.
+        """
+        return (
+            self._amplification(pending) <= self.max_amplification
+            or pending.data.num_rows >= self.max_pending_rows
+            or self.clock() - pending.first_added >= self.max_age_seconds
+        )
+
+    def _apply(self, table_name: str) -> int:
+        """Rewrite a table's pending corrections in one overwrite commit.
+
+        Args:
+            table_name (str): The table name.
+
+        Returns:
+            int: The number of corrections applied.
+
+        Raises:
+            CommitFailedException: If the rewrite still conflicts after every attempt; the
+                corrections are then put back, behind any that arrived since.
+        """
+        with self._lock:
+            pending = self._pending.pop(table_name, None)
+        if pending is None:
+            return 0
+        try:
+            self.coordinator.overwrite(
+                table_name,
+                pending.data,
+                match_filter(pending.data, self.key_column, self.match_window_seconds)
+            )
+        except Exception:
+            with self._lock:
+                newer = self._pending.pop(table_name, None)
+                self._pending[table_name] = pending
+                if newer is not None:
+                    self._add_pending(table_name, newer.data, newer.files)
+            raise
+        with self._lock:
+            self.corrections_applied += pending.data.num_rows
+            self.rewrites += 1
+            self.rows_rewritten += sum(pending.files.values())
+        return pending.data.num_rows
+
+    def _apply_all(self, table_names: List[str]) -> Dict[str, Exception]:
+        """Apply the pending corrections of several tables.
+
+        Args:
+            table_names (List[str]): The tables to rewrite.
+
+        Returns:
+            Dict[str, Exception]: The error of each table whose rewrite failed.
+        """
+        failures = {}
+        for table_name in table_names:
+            try:
+                self._apply(table_name)
+            except Exception as e:
+                failures[table_name] = e
+        return failures
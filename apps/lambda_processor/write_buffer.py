@@ -0,0 +1,194 @@
+import time
+import pyarrow as pa
+from typing import Callable, Dict, List, Optional
+
+#ack only after the buffered rows are committed to Iceberg
+DURABILITY_FLUSH = "flush"
+#ack as soon as the rows are buffered, trading bounded loss on container death for fewer commits
+DURABILITY_BUFFER = "buffer"
+
+class WriteBuffer:
+    """In-process micro-batching buffer of Arrow batches keyed by destination.
+
+    Batches accumulate per key until a row count, byte size or age threshold is hit, so a
+    warm container turns many small appends into a few large ones. When failed flushes are
+    retained, a key that has failed `max_attempts` times in a row, or whose rows would push the
+    buffer past its pending limits, is given up on and its rows handed to `on_abandon`.
+    """
+
+    def __init__(
+        self,
+        writer: Callable[[pa.Table, str], None],
+        max_rows: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_age_seconds: float = 60.0,
+        retain_on_failure: bool = False,
+        max_pending_rows: int = 100_000,
+        max_pending_bytes: int = 256 * 1024 * 1024,
+        max_attempts: int = 3,
+        on_abandon: Optional[Callable[[str, pa.Table, Exception], None]] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """Initialize the buffer.
+
+        Args:
+            writer (Callable[[pa.Table, str], None]): Called with the combined table and the key
+                on flush; raising marks the key's flush as failed.
+            max_rows (int): Row count that makes a key due for flushing.
+            max_bytes (int): Arrow buffer size in bytes that makes a key due for flushing.
+            max_age_seconds (float): Age of the oldest buffered batch that makes a key due.
+            retain_on_failure (bool): Keep the batches of a failed flush for the next attempt
+                instead of dropping them.
+            max_pending_rows (int): Buffered rows over every key beyond which the rows of a
+                failed flush are given up on instead of retained.
+            max_pending_bytes (int): Buffered Arrow bytes beyond which the rows of a failed
+                flush are given up on instead of retained.
+            max_attempts (int): Consecutive failed flushes after which a key's retained rows
+                are given up on.
+            on_abandon (Optional[Callable[[str, pa.Table, Exception], None]]): Called with the
+                key, rows and last error of a key that is given up on.
+            clock (Callable[[], float]): Monotonic clock, in seconds.
+        """
+        self.writer = writer
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.retain_on_failure = retain_on_failure
+        self.max_pending_rows = max_pending_rows
+        self.max_pending_bytes = max_pending_bytes
+        self.max_attempts = max_attempts
+        self.on_abandon = on_abandon
+        self.clock = clock
+        self.keys_abandoned = 0
+        self.rows_abandoned = 0
+        self._batches: Dict[str, List[pa.Table]] = {}
+        self._rows: Dict[str, int] = {}
+        self._bytes: Dict[str, int] = {}
+        self._first_added: Dict[str, float] = {}
+        self._failures: Dict[str, int] = {}
+
+    def add(self, key: str, batch: pa.Table) -> bool:
+        """Buffer a batch for a destination.
+
+        Args:
+            key (str): The destination the batch is written to.
+            batch (pa.Table): The rows to buffer.
+
+        Returns:
+            bool: True if the key is now due for flushing.
+        """
+        if batch.num_rows == 0:
+            return self.is_due(key)
+        self._batches.setdefault(key, []).append(batch)
+        self._rows[key] = self._rows.get(key, 0) + batch.num_rows
+        self._bytes[key] = self._bytes.get(key, 0) + batch.nbytes
+        self._first_added.setdefault(key, self.clock())
+        return self.is_due(key)
+
+    def is_due(self, key: str) -> bool:
+        """Check whether a key has hit any flush threshold.
+
+        Args:
+            key (str): The destination to check.
+
+        Returns:
+            bool: True if the key's rows, bytes or age exceed their thresholds.
+        """
+        if key not in self._batches:
+            return False
+        return (
+            self._rows[key] >= self.max_rows
+            or self._bytes[key] >= self.max_bytes
+            or self.clock() - self._first_added[key] >= self.max_age_seconds
+        )
+
+    def pending_rows(self, key: Optional[str] = None) -> int:
+        """Count the buffered rows.
+
+        Args:
+            key (Optional[str]): Count a single destination, or every destination when None.
+
+        Returns:
+            int: The number of buffered rows.
+        """
+        if key is not None:
+            return self._rows.get(key, 0)
+        return sum(self._rows.values())
+
+    def flush(self, key: Optional[str] = None) -> Dict[str, Exception]:
+        """Write buffered batches, one combined write per destination.
+
+        Args:
+            key (Optional[str]): Flush a single destination, or every destination when None.
+
+        Returns:
+            Dict[str, Exception]: The error raised by the writer for each key that failed.
+        """
+        keys = [key] if key is not None else list(self._batches)
+        failures = {}
+        abandoned = []
+        for k in keys:
+            batches = self._batches.pop(k, None)
+            if not batches:
+                continue
+            first_added = self._first_added.pop(k)
+            self._rows.pop(k)
+            self._bytes.pop(k)
+            try:
+                self.writer(pa.concat_tables(batches, promote_options="default"), k)
+            except Exception as e:
+                failures[k] = e
+                if not self.retain_on_failure:
+                    continue
+                attempts = self._failures.pop(k, 0) + 1
+                if attempts < self.max_attempts and self._fits(batches):
+                    self._failures[k] = attempts
+                    self._restore(k, batches, first_added)
+                else:
+                    abandoned.append((k, batches))
+                continue
+            self._failures.pop(k, None)
+        #handed off outside the except block, so the error is not the exception being handled
+        for k, batches in abandoned:
+            self.keys_abandoned += 1
+            self.rows_abandoned += sum(batch.num_rows for batch in batches)
+            if self.on_abandon is not None:
+                self.on_abandon(k, pa.concat_tables(batches, promote_options="default"), failures[k])
+        return failures
+
+    def flush_due(self) -> Dict[str, Exception]:
+        """Flush only the destinations that hit a threshold.
+
+        Returns:
+            Dict[str, Exception]: The error raised by the writer for each key that failed.
+        """
+        failures = {}
+        for key in [k for k in self._batches if self.is_due(k)]:
+            failures.update(self.flush(key))
+        return failures
+
+    def _fits(self, batches: List[pa.Table]) -> bool:
+        """Check whether retaining batches keeps the buffer within its pending limits.
+
+        Args:
+            batches (List[pa.Table]): The batches of a failed flush, not currently buffered.
+
+        Returns:
+            bool: True if the buffered rows and bytes stay within the limits with them.
+        """
+        rows = sum(batch.num_rows for batch in batches) + sum(self._rows.values())
+        nbytes = sum(batch.nbytes for batch in batches) + sum(self._bytes.values())
+        return rows <= self.max_pending_rows and nbytes <= self.max_pending_bytes
+
+    def _restore(self, key: str, batches: List[pa.Table], first_added: float) -> None:
+        """Put the batches of a failed flush back in front of anything buffered since.
+
+        Args:
+            key (str): The destination of the batches.
+            batches (List[pa.Table]): The batches that failed to flush.
+            first_added (float): When the oldest of those batches was buffered.
+        """
+        self._batches[key] = batches + self._batches.get(key, [])
+        self._rows[key] = sum(batch.num_rows for batch in self._batches[key])
+        self._bytes[key] = sum(batch.nbytes for batch in self._batches[key])
+        self._first_added[key] = first_added
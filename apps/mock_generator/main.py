@@ -1,8 +1,23 @@
 import json
+import time
+import uuid
 import random
+import binascii
+import argparse
 import datetime
+import threading
 import boto3
-from typing import Dict, Any, List
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Iterator, List, Optional, Union
+from apps.lambda_processor.commit import percentile
+
+EVENT_TYPES = ["user_login", "product_view", "cart_update", "purchase"]
+USER_IDS = [f"user_{i}" for i in range(1, 1001)]
+#positions of the hex digits in a canonical 36 character UUID, the rest are dashes
+_UUID_DIGIT_POSITIONS = [i for i in range(36) if i not in (8, 13, 18, 23)]
 
 def generate_session_info() -> Dict[str, Any]:
     """Generate session-related information.
@@ -76,9 +91,6 @@ def generate_mock_event() -> Dict[str, Any]:
         Dict[str, Any]: Dictionary containing event ID, type, user ID, timestamp,
         metadata, and nested _doc information.
     """
-    event_types = ["user_login", "product_view", "cart_update", "purchase"]
-    user_ids = [f"user_{i}" for i in range(1, 1001)]
-    
     #generate nested _doc data
     _doc = {
         "session_info": generate_session_info(),
@@ -94,9 +106,9 @@ def generate_mock_event() -> Dict[str, Any]:
     }
     
     return {
-        "event_id": str(random.randint(100000, 999999)),
-        "event_type": random.choice(event_types),
-        "user_id": random.choice(user_ids),
+        "event_id": str(uuid.uuid4()),
+        "event_type": random.choice(EVENT_TYPES),
+        "user_id": random.choice(USER_IDS),
         "timestamp": datetime.datetime.now().isoformat(),
         "metadata": {
             "browser": random.choice(["chrome", "firefox", "safari", "edge"]),
@@ -106,19 +118,217 @@ def generate_mock_event() -> Dict[str, Any]:
         "_doc": _doc
     }
 
-def send_to_lambda(event: Dict[str, Any]) -> None:
-    """Send the mock event to a Lambda function.
+def _join_ints(separator: str, *parts: np.ndarray) -> pa.Array:
+    """Join integer arrays element-wise into strings, e.g. version numbers or IP addresses.
     
     Args:
-        event (Dict[str, Any]): The event data to send to the Lambda function.
+        separator (str): String placed between the parts.
+        *parts (np.ndarray): Integer arrays of equal length.
+    
+    Returns:
+        pa.Array: The joined strings.
+    """
+    return pc.binary_join_element_wise(*[pa.array(part).cast(pa.string()) for part in parts], separator)
+
+def _uuid4_strings(rng: np.random.Generator, n: int) -> pa.Array:
+    """Draw random version 4 UUIDs as canonical strings without a per-event loop.
+    
+    Args:
+        rng (np.random.Generator): Random generator the UUID bits are drawn from.
+        n (int): Number of UUIDs.
+    
+    Returns:
+        pa.Array: The UUID strings, e.g. "3f2b8c1e-9a4d-4e6f-8b7a-1c2d3e4f5a6b".
+    """
+    raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  #version 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  #RFC 4122 variant
+    digits = np.frombuffer(binascii.hexlify(raw.tobytes()), dtype=np.uint8).reshape(n, 32)
+    text = np.full((n, 36), ord("-"), dtype=np.uint8)
+    text[:, _UUID_DIGIT_POSITIONS] = digits
+    return pa.array(text.view("S36").ravel()).cast(pa.string())
+
+def _generate_event_columns(
+    num_events: int,
+    rng: np.random.Generator,
+    start: np.datetime64
+) -> Dict[str, Any]:
+    """Draw every field of a chunk of events as NumPy arrays.
+    
+    Args:
+        num_events (int): Number of events in the chunk.
+        rng (np.random.Generator): Random generator all fields are drawn from.
+        start (np.datetime64): Timestamp of the first event; events are one millisecond apart.
+    
+    Returns:
+        Dict[str, Any]: NumPy or Arrow arrays nested in the same shape as `generate_mock_event`
+        output, with the same value ranges and choices.
+    """
+    n = num_events
+    
+    def ints(low: int, high: int) -> np.ndarray:
+        return rng.integers(low, high + 1, size=n)  #inclusive like random.randint
+    
+    def choice(options: List[Any]) -> pa.Array:
+        return pa.array(options).take(rng.integers(0, len(options), size=n))
+    
+    timestamps = pa.array(start + np.arange(n, dtype="int64").astype("timedelta64[ms]"), pa.timestamp("us"))
+    return {
+        "event_id": _uuid4_strings(rng, n),
+        "event_type": choice(EVENT_TYPES),
+        "user_id": choice(USER_IDS),
+        "timestamp": pc.replace_substring(timestamps.cast(pa.string()), " ", "T", max_replacements=1),
+        "metadata": {
+            "browser": choice(["chrome", "firefox", "safari", "edge"]),
+            "os": choice(["windows", "macos", "linux", "android", "ios"]),
+            "device": choice(["desktop", "mobile", "tablet"])
+        },
+        "_doc": {
+            "session_info": {
+                "session_id": pc.binary_join_element_wise(
+                    pa.scalar("session"), pa.array(ints(1000, 9999)).cast(pa.string()), "_"
+                ),
+                "duration": ints(1, 3600),
+                "pages_visited": ints(1, 20),
+                "entry_page": choice(["/home", "/products", "/blog", "/about"]),
+                "exit_page": choice(["/checkout", "/product", "/contact", "/home"]),
+                "referrer": choice(["google", "direct", "social", "email", "other"]),
+                "is_new_session": rng.integers(0, 2, size=n).astype(bool)
+            },
+            "user_agent": {
+                "browser_version": _join_ints(".", ints(1, 100), ints(0, 9), ints(0, 9)),
+                "platform_version": _join_ints(".", ints(10, 20), ints(0, 9), ints(0, 9)),
+                "device_type": choice(["desktop", "mobile", "tablet"]),
+                "screen_resolution": choice(["1920x1080", "1366x768", "1440x900", "375x812"]),
+                "language": choice(["en-US", "en-GB", "es-ES", "fr-FR", "de-DE"]),
+                "timezone": choice(["UTC", "EST", "PST", "CET", "GMT"])
+            },
+            "location": {
+                "country": choice(["US", "UK", "CA", "AU", "DE"]),
+                "region": choice(["NA", "EU", "AP", "SA"]),
+                "city": choice(["New York", "London", "Toronto", "Sydney", "Berlin"]),
+                "ip_address": _join_ints(".", ints(1, 255), ints(1, 255), ints(1, 255), ints(1, 255)),
+                "isp": choice(["Comcast", "Verizon", "AT&T", "BT", "Deutsche Telekom"]),
+                "connection_type": choice(["broadband", "mobile", "dial-up"])
+            },
+            "engagement": {
+                "scroll_depth": ints(0, 100),
+                "time_on_page": ints(1, 600),
+                "interactions": ints(0, 50),
+                "form_submissions": ints(0, 3),
+                "video_views": ints(0, 5),
+                "downloads": ints(0, 2)
+            },
+            "performance": {
+                "page_load_time": rng.uniform(0.5, 5.0, size=n),
+                "first_contentful_paint": rng.uniform(0.3, 3.0, size=n),
+                "dom_interactive": rng.uniform(0.4, 4.0, size=n),
+                "network_latency": rng.uniform(10, 500, size=n)
+            }
+        }
+    }
+
+def _columns_to_arrow(columns: Dict[str, Any]) -> pa.StructArray:
+    """Convert nested column arrays to an Arrow struct array.
+    
+    Args:
+        columns (Dict[str, Any]): Arrays keyed by field name, nested dictionaries become structs.
+    
+    Returns:
+        pa.StructArray: The struct array.
+    """
+    arrays = []
+    for value in columns.values():
+        if isinstance(value, dict):
+            arrays.append(_columns_to_arrow(value))
+        elif isinstance(value, np.ndarray):
+            arrays.append(pa.array(value))
+        else:
+            arrays.append(value)
+    return pa.StructArray.from_arrays(arrays, names=list(columns))
+
+def _columns_to_dicts(columns: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Convert nested column arrays to one dictionary per event.
+    
+    Args:
+        columns (Dict[str, Any]): Arrays keyed by field name, nested dictionaries become dictionaries.
+    
+    Returns:
+        List[Dict[str, Any]]: The events, with plain Python values.
     """
-    lambda_client = boto3.client(
+    keys = list(columns)
+    values = []
+    for value in columns.values():
+        if isinstance(value, dict):
+            values.append(_columns_to_dicts(value))
+        elif isinstance(value, np.ndarray):
+            values.append(value.tolist())
+        else:
+            values.append(value.to_pylist())
+    return [dict(zip(keys, row)) for row in zip(*values)]
+
+def generate_mock_events(
+    num_events: int,
+    seed: Optional[int] = None,
+    start: Optional[datetime.datetime] = None,
+    as_arrow: bool = True,
+    chunk_size: int = 100_000
+) -> Union[pa.Table, Iterator[Dict[str, Any]]]:
+    """Generate many mock events at once with every field drawn as a NumPy array.
+    
+    Args:
+        num_events (int): Number of events to generate.
+        seed (Optional[int]): Seed for reproducible output; the same seed, start and chunk size
+            always produce the same events.
+        start (Optional[datetime.datetime]): Timestamp of the first event, defaults to now;
+            events are one millisecond apart.
+        as_arrow (bool): Return a columnar Arrow table instead of an iterator of dictionaries.
+        chunk_size (int): Number of events drawn per NumPy pass, bounding peak memory.
+    
+    Returns:
+        Union[pa.Table, Iterator[Dict[str, Any]]]: An Arrow table with one struct column per nested
+        section, or an iterator of events shaped like `generate_mock_event` output.
+    """
+    rng = np.random.default_rng(seed)
+    first = np.datetime64(start or datetime.datetime.now(), "ms")
+    
+    def chunks() -> Iterator[Dict[str, Any]]:
+        for offset in range(0, num_events, chunk_size):
+            size = min(chunk_size, num_events - offset)
+            yield _generate_event_columns(size, rng, first + np.timedelta64(offset, "ms"))
+    
+    if not as_arrow:
+        return (event for columns in chunks() for event in _columns_to_dicts(columns))
+    
+    batches = [pa.RecordBatch.from_struct_array(_columns_to_arrow(columns)) for columns in chunks()]
+    if not batches:
+        empty = _columns_to_arrow(_generate_event_columns(0, rng, first))
+        return pa.Table.from_batches([], schema=pa.schema(list(empty.type)))
+    return pa.Table.from_batches(batches)
+
+def create_lambda_client() -> Any:
+    """Create a Lambda client for the local Localstack endpoint.
+
+    Returns:
+        Any: A boto3 Lambda client.
+    """
+    return boto3.client(
         'lambda',
         endpoint_url='http://localhost:4566',
         region_name='us-east-1',
         aws_access_key_id='test',
         aws_secret_access_key='test'
     )
+
+def send_to_lambda(event: Dict[str, Any], lambda_client: Optional[Any] = None) -> None:
+    """Send the mock event to a Lambda function.
+    
+    Args:
+        event (Dict[str, Any]): The event data to send to the Lambda function.
+        lambda_client (Optional[Any]): A client to reuse; a new one is created when omitted.
+    """
+    if lambda_client is None:
+        lambda_client = create_lambda_client()
     
     try:
         response = lambda_client.invoke(
@@ -130,8 +340,112 @@ def send_to_lambda(event: Dict[str, Any]) -> None:
     except Exception as e:
         print(f"error sending event: {str(e)}")
 
+def run_load_test(
+    num_events: int,
+    concurrency: int = 10,
+    rate: Optional[float] = None,
+    function_name: str = 'data-processor',
+    event_factory: Callable[[], Dict[str, Any]] = generate_mock_event,
+    client_factory: Callable[[], Any] = create_lambda_client
+) -> Dict[str, Any]:
+    """Send events concurrently with one pooled Lambda client per worker.
+    
+    Args:
+        num_events (int): Total number of events to send.
+        concurrency (int): Number of worker threads, each with its own client.
+        rate (Optional[float]): Target events per second across all workers; unlimited when None.
+        function_name (str): Name of the Lambda function to invoke.
+        event_factory (Callable[[], Dict[str, Any]]): Generates one event per invoke.
+        client_factory (Callable[[], Any]): Creates the Lambda client of a worker.
+    
+    Returns:
+        Dict[str, Any]: Events sent, errors, duration in seconds, achieved events per second,
+        and p50/p95/p99 invoke latency in milliseconds.
+    """
+    lock = threading.Lock()
+    next_index = [0]
+    latencies: List[float] = []
+    errors = [0]
+    
+    def worker() -> None:
+        lambda_client = client_factory()
+        while True:
+            with lock:
+                index = next_index[0]
+                next_index[0] += 1
+            if index >= num_events:
+                return
+            
+            #open-loop pacing, every event has a fixed send slot
+            if rate:
+                delay = started + index / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            
+            payload = json.dumps(event_factory())
+            invoke_started = time.perf_counter()
+            try:
+                response = lambda_client.invoke(
+                    FunctionName=function_name,
+                    InvocationType='Event',
+                    Payload=payload
+                )
+                failed = 'FunctionError' in response or not 200 <= response.get('StatusCode', 202) < 300
+            except Exception:
+                failed = True
+            latency_ms = (time.perf_counter() - invoke_started) * 1000
+            
+            with lock:
+                latencies.append(latency_ms)
+                if failed:
+                    errors[0] += 1
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    duration = time.perf_counter() - started
+    
+    latencies.sort()
+    return {
+        "events_sent": len(latencies),
+        "errors": errors[0],
+        "duration_seconds": duration,
+        "events_per_second": len(latencies) / duration if duration else 0.0,
+        "latency_p50_ms": percentile(latencies, 0.50),
+        "latency_p95_ms": percentile(latencies, 0.95),
+        "latency_p99_ms": percentile(latencies, 0.99)
+    }
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse the generator command line.
+    
+    Args:
+        argv (Optional[List[str]]): Arguments to parse; sys.argv is used when None.
+    
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Send mock events to the data processor Lambda.")
+    parser.add_argument("--events", type=int, default=10, help="number of events to send")
+    parser.add_argument("--concurrency", type=int, default=1, help="number of concurrent senders")
+    parser.add_argument("--rate", type=float, default=None, help="target events per second")
+    parser.add_argument("--function-name", default="data-processor", help="Lambda function to invoke")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    #generate and send 10 mock events
-    for _ in range(10):
-        event = generate_mock_event()
-        send_to_lambda(event) 
\ No newline at end of file
+    args = parse_args()
+    if args.concurrency == 1 and args.rate is None:
+        #generate and send mock events one at a time, reusing a single client
+        lambda_client = create_lambda_client()
+        for _ in range(args.events):
+            event = generate_mock_event()
+            send_to_lambda(event, lambda_client)
+    else:
+        report = run_load_test(
+            args.events,
+            concurrency=args.concurrency,
+            rate=args.rate,
+            function_name=args.function_name
+        )
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,418 @@
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from pyarrow import fs
+from pyiceberg.catalog import load_catalog
+from pyiceberg.exceptions import CommitFailedException
+from pyiceberg.expressions import AlwaysTrue
+from pyiceberg.io.pyarrow import ArrowScan
+#pyiceberg has no public API to write data files without committing them, which a rewrite of
+#specific files needs; requirements.txt pins pyiceberg exactly and a unit test guards this
+from pyiceberg.io.pyarrow import _dataframe_to_data_files
+from pyiceberg.table import TableProperties
+from apps.lambda_processor import data_processor
+from apps.lambda_processor.partitioning import cluster_for_table
+
+#bin-packing target when the table does not set write.parquet.row-group-size-bytes
+DEFAULT_TARGET_FILE_SIZE_BYTES = 128 * 1024 * 1024
+#data files smaller than this fraction of the target are compacted
+DEFAULT_SMALL_FILE_RATIO = 0.75
+#small files a partition needs before it is worth rewriting
+DEFAULT_MIN_INPUT_FILES = 5
+DEFAULT_EXPIRE_OLDER_THAN_HOURS = 24.0
+DEFAULT_RETAIN_LAST_SNAPSHOTS = 10
+#unreferenced files younger than this may belong to a commit still in flight
+DEFAULT_ORPHAN_OLDER_THAN_HOURS = 72.0
+DEFAULT_MAX_COMMIT_ATTEMPTS = 3
+
+def target_file_size(table: Any, override: Optional[int] = None) -> int:
+    """Get the size compacted files are bin-packed up to.
+
+    Args:
+        table (Any): The Iceberg table.
+        override (Optional[int]): Size in bytes to use instead of the table property.
+
+    Returns:
+        int: The target size in bytes, from write.parquet.row-group-size-bytes by default.
+    """
+    if override:
+        return override
+    return int(table.properties.get("write.parquet.row-group-size-bytes", DEFAULT_TARGET_FILE_SIZE_BYTES))
+
+def table_stats(table: Any) -> Dict[str, int]:
+    """Count the live data files, bytes, manifests and snapshots of a table.
+
+    Args:
+        table (Any): The Iceberg table.
+
+    Returns:
+        Dict[str, int]: Data file count and bytes of the current snapshot, its manifest count,
+        and the number of snapshots kept in the metadata.
+    """
+    snapshot = table.current_snapshot()
+    if snapshot is None:
+        return {"data_files": 0, "data_bytes": 0, "manifests": 0, "snapshots": 0}
+    files = table.inspect.files()
+    return {
+        "data_files": files.num_rows,
+        "data_bytes": sum(files.column("file_size_in_bytes").to_pylist()),
+        "manifests": len(snapshot.manifests(table.io)),
+        "snapshots": len(table.snapshots())
+    }
+
+def plan_bins(
+    tasks: List[Any],
+    target_bytes: int,
+    small_file_ratio: float = DEFAULT_SMALL_FILE_RATIO,
+    min_input_files: int = DEFAULT_MIN_INPUT_FILES
+) -> List[List[Any]]:
+    """Bin-pack the small files of each partition into groups to rewrite as one file each.
+
+    Args:
+        tasks (List[Any]): File scan tasks of the current snapshot.
+        target_bytes (int): Maximum combined size of a group.
+        small_file_ratio (float): Files below this fraction of the target are candidates.
+        min_input_files (int): Candidates a partition needs before it is compacted.
+
+    Returns:
+        List[List[Any]]: Groups of at least two tasks, never mixing partitions.
+    """
+    partitions: Dict[Tuple[int, str], List[Any]] = {}
+    for task in tasks:
+        data_file = task.file
+        #files with row-level deletes are left to a rewrite that can also drop the deletes
+        if task.delete_files or data_file.file_size_in_bytes >= target_bytes * small_file_ratio:
+            continue
+        key = (data_file.spec_id, repr(data_file.partition))
+        partitions.setdefault(key, []).append(task)
+
+    groups = []
+    for candidates in partitions.values():
+        if len(candidates) < min_input_files:
+            continue
+        bins: List[List[Any]] = []
+        sizes: List[int] = []
+        #first-fit decreasing
+        for task in sorted(candidates, key=lambda t: t.file.file_size_in_bytes, reverse=True):
+            size = task.file.file_size_in_bytes
+            for index, used in enumerate(sizes):
+                if used + size <= target_bytes:
+                    bins[index].append(task)
+                    sizes[index] += size
+                    break
+            else:
+                bins.append([task])
+                sizes.append(size)
+        groups.extend(group for group in bins if len(group) > 1)
+    return groups
+
+def compact_table(
+    table: Any,
+    target_bytes: int,
+    small_file_ratio: float = DEFAULT_SMALL_FILE_RATIO,
+    min_input_files: int = DEFAULT_MIN_INPUT_FILES,
+    max_attempts: int = DEFAULT_MAX_COMMIT_ATTEMPTS,
+    dry_run: bool = False
+) -> Dict[str, int]:
+    """Rewrite groups of small files into target-sized files in one overwrite commit.
+
+    Rows are clustered by partition and the table's sort order while they are rewritten. A
+    commit that conflicts with a concurrent append is planned again on the new snapshot.
+
+    Args:
+        table (Any): The Iceberg table.
+        target_bytes (int): Size files are bin-packed up to.
+        small_file_ratio (float): Files below this fraction of the target are candidates.
+        min_input_files (int): Candidates a partition needs before it is compacted.
+        max_attempts (int): Commit attempts before a conflict is raised.
+        dry_run (bool): Only plan, without writing or committing anything.
+
+    Returns:
+        Dict[str, int]: The number of groups, files and bytes rewritten and files written.
+    """
+    for attempt in range(1, max_attempts + 1):
+        groups = plan_bins(list(table.scan().plan_files()), target_bytes, small_file_ratio, min_input_files)
+        report = {
+            "groups": len(groups),
+            "files_rewritten": sum(len(group) for group in groups),
+            "bytes_rewritten": sum(task.file.file_size_in_bytes for group in groups for task in group),
+            "files_written": 0
+        }
+        if dry_run or not groups:
+            return report
+
+        try:
+            with table.transaction() as transaction:
+                with transaction.update_snapshot().overwrite() as overwrite:
+                    for group in groups:
+                        rows = ArrowScan(table.metadata, table.io, table.schema(), AlwaysTrue()).to_table(group)
+                        for task in group:
+                            overwrite.delete_data_file(task.file)
+                        for data_file in _dataframe_to_data_files(
+                            table_metadata=transaction.table_metadata,
+                            df=cluster_for_table(table, rows),
+                            io=table.io
+                        ):
+                            overwrite.append_data_file(data_file)
+                            report["files_written"] += 1
+            return report
+        except CommitFailedException:
+            if attempt == max_attempts:
+                raise
+            table.refresh()
+    return report
+
+def rewrite_manifests(table: Any, dry_run: bool = False) -> int:
+    """Merge the current snapshot's manifests into as few target-sized manifests as possible.
+
+    Args:
+        table (Any): The Iceberg table.
+        dry_run (bool): Only count, without committing anything.
+
+    Returns:
+        int: The manifest count of the current snapshot afterwards.
+    """
+    snapshot = table.current_snapshot()
+    if snapshot is None:
+        return 0
+    manifests = len(snapshot.manifests(table.io))
+    if dry_run or manifests < 2:
+        return manifests
+
+    original = table.properties.get(TableProperties.MANIFEST_MIN_MERGE_COUNT)
+    with table.transaction() as transaction:
+        #an append of no files with merging forced for this commit only
+        transaction.set_properties({TableProperties.MANIFEST_MIN_MERGE_COUNT: "2"})
+        with transaction.update_snapshot().merge_append():
+            pass
+        if original is None:
+            transaction.remove_properties(TableProperties.MANIFEST_MIN_MERGE_COUNT)
+        else:
+            transaction.set_properties({TableProperties.MANIFEST_MIN_MERGE_COUNT: original})
+    return len(table.current_snapshot().manifests(table.io))
+
+def expire_snapshots(table: Any, older_than: datetime, retain_last: int, dry_run: bool = False) -> int:
+    """Expire old snapshots, always keeping the newest ones and every referenced snapshot.
+
+    Args:
+        table (Any): The Iceberg table.
+        older_than (datetime): Snapshots committed before this time are expired.
+        retain_last (int): Number of most recent snapshots that are always kept.
+        dry_run (bool): Only count, without committing anything.
+
+    Returns:
+        int: The number of snapshots expired.
+    """
+    protected = {ref.snapshot_id for ref in table.metadata.refs.values()}
+    snapshots = sorted(table.snapshots(), key=lambda snapshot: snapshot.timestamp_ms)
+    if retain_last:
+        protected.update(snapshot.snapshot_id for snapshot in snapshots[-retain_last:])
+    cutoff_ms = int(older_than.timestamp() * 1000)
+    expired = [
+        snapshot.snapshot_id for snapshot in snapshots
+        if snapshot.timestamp_ms < cutoff_ms and snapshot.snapshot_id not in protected
+    ]
+    if expired and not dry_run:
+        table.maintenance.expire_snapshots().by_ids(expired).commit()
+    return len(expired)
+
+def _strip_scheme(uri: str) -> str:
+    """Drop the scheme of a URI, matching the paths pyarrow filesystems list."""
+    return uri.split("://", 1)[-1]
+
+def referenced_files(table: Any) -> set:
+    """Collect every file the table metadata still references.
+
+    Args:
+        table (Any): The Iceberg table.
+
+    Returns:
+        set: Scheme-less paths of data, delete, manifest, manifest list and statistics files.
+    """
+    paths = {snapshot.manifest_list for snapshot in table.snapshots()}
+    paths.update(statistics.statistics_path for statistics in table.metadata.statistics)
+    if table.snapshots():
+        paths.update(table.inspect.all_files().column("file_path").to_pylist())
+        paths.update(table.inspect.all_manifests().column("path").to_pylist())
+    return {_strip_scheme(path) for path in paths}
+
+def remove_orphan_files(table: Any, older_than: datetime, dry_run: bool = False) -> Tuple[int, int]:
+    """Delete files under the table location that no snapshot references.
+
+    Metadata JSON files are never touched; they are pruned by the catalog's own settings.
+
+    Args:
+        table (Any): The Iceberg table.
+        older_than (datetime): Only files last modified before this time are removed.
+        dry_run (bool): Only count, without deleting anything.
+
+    Returns:
+        Tuple[int, int]: The number of orphan files and their total bytes.
+    """
+    filesystem, root = fs.FileSystem.from_uri(table.location())
+    referenced = referenced_files(table)
+    cutoff_ns = int(older_than.timestamp() * 1e9)
+    count, size = 0, 0
+    for info in filesystem.get_file_info(fs.FileSelector(root, recursive=True, allow_not_found=True)):
+        if info.type != fs.FileType.File or info.path in referenced:
+            continue
+        if info.path.endswith((".metadata.json", "version-hint.text")) or info.mtime_ns >= cutoff_ns:
+            continue
+        count += 1
+        size += info.size
+        if not dry_run:
+            filesystem.delete_file(info.path)
+    return count, size
+
+def _hours_ago(hours: float) -> datetime:
+    """Get the UTC time a number of hours before now."""
+    return datetime.now(timezone.utc) - timedelta(hours=hours)
+
+def maintain_table(
+    table: Any,
+    target_bytes: Optional[int] = None,
+    small_file_ratio: float = DEFAULT_SMALL_FILE_RATIO,
+    min_input_files: int = DEFAULT_MIN_INPUT_FILES,
+    expire_older_than_hours: float = DEFAULT_EXPIRE_OLDER_THAN_HOURS,
+    retain_last: int = DEFAULT_RETAIN_LAST_SNAPSHOTS,
+    orphan_older_than_hours: float = DEFAULT_ORPHAN_OLDER_THAN_HOURS,
+    dry_run: bool = False
+) -> Dict[str, Any]:
+    """Compact, rewrite manifests, expire snapshots and remove orphan files of one table.
+
+    Args:
+        table (Any): The Iceberg table.
+        target_bytes (Optional[int]): Compaction target size, the table property when None.
+        small_file_ratio (float): Files below this fraction of the target are compacted.
+        min_input_files (int): Small files a partition needs before it is compacted.
+        expire_older_than_hours (float): Age after which snapshots are expired.
+        retain_last (int): Number of most recent snapshots that are always kept.
+        orphan_older_than_hours (float): Age after which unreferenced files are removed.
+        dry_run (bool): Report what would be done without changing anything.
+
+    Returns:
+        Dict[str, Any]: Table stats before and after, and the result of every step.
+    """
+    started = time.monotonic()
+    before = table_stats(table)
+
+    compaction = compact_table(
+        table, target_file_size(table, target_bytes), small_file_ratio, min_input_files, dry_run=dry_run
+    )
+    manifests = rewrite_manifests(table, dry_run)
+    expired = expire_snapshots(table, _hours_ago(expire_older_than_hours), retain_last, dry_run)
+    orphans, orphan_bytes = remove_orphan_files(table, _hours_ago(orphan_older_than_hours), dry_run)
+
+    return {
+        "table": ".".join(table.name()),
+        "dry_run": dry_run,
+        "before": before,
+        "after": table_stats(table),
+        "compaction": compaction,
+        "manifests_after_rewrite": manifests,
+        "snapshots_expired": expired,
+        "orphan_files_removed": orphans,
+        "orphan_bytes_removed": orphan_bytes,
+        "elapsed_seconds": round(time.monotonic() - started, 3)
+    }
+
+def list_maintained_tables(catalog: Any, namespace: str) -> List[str]:
+    """List the event and error tables of a namespace.
+
+    Args:
+        catalog (Any): The catalog.
+        namespace (str): The namespace to list.
+
+    Returns:
+        List[str]: Identifiers of the events_* and error_logs tables.
+    """
+    names = [identifier[-1] for identifier in catalog.list_tables(namespace)]
+    return [f"{namespace}.{name}" for name in sorted(names) if name.startswith("events_") or name == "error_logs"]
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse the maintenance command line.
+
+    Args:
+        argv (Optional[List[str]]): Arguments to parse; sys.argv is used when None.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Compact and clean up the Iceberg event and error tables.")
+    parser.add_argument("--tables", nargs="*", default=None, help="table identifiers, every events_*/error_logs table when omitted")
+    parser.add_argument("--namespace", default="events_db", help="namespace to list tables from")
+    parser.add_argument("--interval-seconds", type=float, default=0, help="run repeatedly at this interval, 0 to run once")
+    parser.add_argument("--target-file-size-bytes", type=int, default=None, help="override the compaction target size")
+    parser.add_argument("--small-file-ratio", type=float, default=DEFAULT_SMALL_FILE_RATIO, help="fraction of the target below which files are compacted")
+    parser.add_argument("--min-input-files", type=int, default=DEFAULT_MIN_INPUT_FILES, help="small files a partition needs before it is compacted")
+    parser.add_argument("--expire-older-than-hours", type=float, default=DEFAULT_EXPIRE_OLDER_THAN_HOURS, help="age after which snapshots are expired")
+    parser.add_argument("--retain-last", type=int, default=DEFAULT_RETAIN_LAST_SNAPSHOTS, help="most recent snapshots always kept")
+    parser.add_argument("--orphan-older-than-hours", type=float, default=DEFAULT_ORPHAN_OLDER_THAN_HOURS, help="age after which unreferenced files are removed")
+    parser.add_argument("--dry-run", action="store_true", help="report without changing anything")
+    parser.add_argument("--catalog-name", default=None, help="name of the catalog to load")
+    parser.add_argument("--catalog-type", default=None, help="catalog type, e.g. glue, sql or rest")
+    parser.add_argument("--catalog-uri", default=None, help="catalog uri, e.g. sqlite:///catalog.db")
+    parser.add_argument("--warehouse", default=None, help="warehouse location, e.g. file:///tmp/warehouse")
+    return parser.parse_args(argv)
+
+def run(catalog: Any, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Maintain every selected table once, continuing past tables that fail.
+
+    Args:
+        catalog (Any): The catalog.
+        args (argparse.Namespace): The parsed command line.
+
+    Returns:
+        List[Dict[str, Any]]: The report of each table, or its error.
+    """
+    reports = []
+    for identifier in args.tables or list_maintained_tables(catalog, args.namespace):
+        try:
+            reports.append(maintain_table(
+                catalog.load_table(identifier),
+                target_bytes=args.target_file_size_bytes,
+                small_file_ratio=args.small_file_ratio,
+                min_input_files=args.min_input_files,
+                expire_older_than_hours=args.expire_older_than_hours,
+                retain_last=args.retain_last,
+                orphan_older_than_hours=args.orphan_older_than_hours,
+                dry_run=args.dry_run
+            ))
+        except Exception as e:
+            reports.append({"table": identifier, "error": str(e)})
+    return reports
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the maintenance CLI once or on a fixed interval.
+
+    Args:
+        argv (Optional[List[str]]): Arguments to parse; sys.argv is used when None.
+
+    Returns:
+        int: The process exit code, 1 if any table failed in the last run.
+    """
+    args = parse_args(argv)
+    properties = {
+        key: value for key, value in (
+            ("type", args.catalog_type),
+            ("uri", args.catalog_uri),
+            ("warehouse", args.warehouse)
+        ) if value
+    }
+    if properties:
+        catalog = load_catalog(args.catalog_name or data_processor.ICEBERG_CATALOG_NAME, **properties)
+    else:
+        catalog = data_processor.get_catalog()
+
+    while True:
+        reports = run(catalog, args)
+        print(json.dumps(reports, indent=2))
+        if args.interval_seconds <= 0:
+            return 1 if any("error" in report for report in reports) else 0
+        time.sleep(args.interval_seconds)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,75 +1,19 @@
+import os
 import boto3
+import argparse
 import pyiceberg
-from pyiceberg.catalog import GlueCatalog
-from pyiceberg.schema import Schema
-from pyiceberg.types import (
-    StringType,
-    LongType,
-    IntegerType,
-    BooleanType,
-    DoubleType,
-    TimestampType,
-    StructType,
-    NestedField
+from pyiceberg.catalog.glue import GlueCatalog
+from pyiceberg.table.sorting import UNSORTED_SORT_ORDER
+from apps.lambda_processor.routing import DEFAULT_QUARANTINE_TABLE, EventRouter, parse_routes
+from apps.lambda_processor.schemas import (
+    create_base_schema,
+    create_error_log_schema,
+    create_event_sort_order,
+    create_partition_spec
 )
 
-def create_base_schema():
-    """Create base schema for event tables."""
-    return Schema(
-        NestedField(1, "event_id", StringType(), required=True),
-        NestedField(2, "event_type", StringType(), required=True),
-        NestedField(3, "user_id", StringType(), required=True),
-        NestedField(4, "timestamp", TimestampType(), required=True),
-        NestedField(5, "browser", StringType()),
-        NestedField(6, "os", StringType()),
-        NestedField(7, "device", StringType()),
-        NestedField(8, "doc_session_info_session_id", StringType()),
-        NestedField(9, "doc_session_info_duration", IntegerType()),
-        NestedField(10, "doc_session_info_pages_visited", IntegerType()),
-        NestedField(11, "doc_session_info_entry_page", StringType()),
-        NestedField(12, "doc_session_info_exit_page", StringType()),
-        NestedField(13, "doc_session_info_referrer", StringType()),
-        NestedField(14, "doc_session_info_is_new_session", BooleanType()),
-        NestedField(15, "doc_user_agent_browser_version", StringType()),
-        NestedField(16, "doc_user_agent_platform_version", StringType()),
-        NestedField(17, "doc_user_agent_device_type", StringType()),
-        NestedField(18, "doc_user_agent_screen_resolution", StringType()),
-        NestedField(19, "doc_user_agent_language", StringType()),
-        NestedField(20, "doc_user_agent_timezone", StringType()),
-        NestedField(21, "doc_location_country", StringType()),
-        NestedField(22, "doc_location_region", StringType()),
-        NestedField(23, "doc_location_city", StringType()),
-        NestedField(24, "doc_location_ip_address", StringType()),
-        NestedField(25, "doc_location_isp", StringType()),
-        NestedField(26, "doc_location_connection_type", StringType()),
-        NestedField(27, "doc_engagement_scroll_depth", IntegerType()),
-        NestedField(28, "doc_engagement_time_on_page", IntegerType()),
-        NestedField(29, "doc_engagement_interactions", IntegerType()),
-        NestedField(30, "doc_engagement_form_submissions", IntegerType()),
-        NestedField(31, "doc_engagement_video_views", IntegerType()),
-        NestedField(32, "doc_engagement_downloads", IntegerType()),
-        NestedField(33, "doc_performance_page_load_time", DoubleType()),
-        NestedField(34, "doc_performance_dom_load_time", DoubleType()),
-        NestedField(35, "doc_performance_network_latency", DoubleType()),
-        NestedField(36, "doc_performance_server_response_time", DoubleType())
-    )
-
-def create_error_log_schema():
-    """Create schema for error logging table."""
-    return Schema(
-        NestedField(1, "error_id", StringType(), required=True),
-        NestedField(2, "timestamp", TimestampType(), required=True),
-        NestedField(3, "event_id", StringType()),
-        NestedField(4, "event_type", StringType()),
-        NestedField(5, "error_type", StringType(), required=True),
-        NestedField(6, "error_message", StringType(), required=True),
-        NestedField(7, "stack_trace", StringType()),
-        NestedField(8, "processing_stage", StringType(), required=True),
-        NestedField(9, "event_data", StringType())
-    )
-
-def create_table(catalog, table_name, schema, partition_spec=None):
-    """Create an Iceberg table with standard properties."""
+def create_table(catalog, table_name, schema, partition_spec=None, sort_order=None):
+    """Create an Iceberg table with standard properties, day partitioned unless a spec is given."""
     properties = {
         "write.format.default": "parquet",
         "write.parquet.compression-codec": "zstd",
@@ -80,17 +24,25 @@ def create_table(catalog, table_name, schema, partition_spec=None):
     }
     
     if partition_spec is None:
-        partition_spec = ["timestamp"]
+        partition_spec = create_partition_spec(schema)
     
     catalog.create_table(
         table_name,
         schema,
         partition_spec=partition_spec,
+        sort_order=sort_order or UNSORTED_SORT_ORDER,
         properties=properties
     )
 
-def create_tables():
-    """Create all required Iceberg tables."""
+def create_tables(granularity="day", user_buckets=0, event_types=None):
+    """Create all required Iceberg tables.
+
+    Args:
+        granularity (str): "day" or "hour" partitions of the event timestamp.
+        user_buckets (int): Number of user_id hash buckets per time partition of the event tables.
+        event_types (str): Routing spec of the event tables, see `parse_routes`; defaults to
+            the processor's EVENT_TYPES setting.
+    """
     # Create catalog
     catalog = GlueCatalog("events_db")
     
@@ -99,23 +51,30 @@ def create_tables():
     
     # Create error logging table
     error_schema = create_error_log_schema()
-    create_table(catalog, "error_logs", error_schema, ["timestamp"])
+    create_table(catalog, "error_logs", error_schema, create_partition_spec(error_schema))
     
-    # Create event type-specific tables
-    event_types = [
-        "user_login",
-        "product_view",
-        "cart_update",
-        "purchase",
-        "page_view",
-        "search",
-        "click",
-        "form_submission"
-    ]
+    # Create event type-specific tables and the quarantine table for unknown types
+    if event_types is None:
+        event_types = os.environ.get("EVENT_TYPES", "")
+    router = EventRouter(
+        parse_routes(event_types),
+        os.environ.get("QUARANTINE_TABLE", DEFAULT_QUARANTINE_TABLE)
+    )
     
-    for event_type in event_types:
-        table_name = f"events_{event_type}"
-        create_table(catalog, table_name, base_schema)
+    for table_name in router.table_names():
+        create_table(
+            catalog,
+            table_name,
+            base_schema,
+            create_partition_spec(base_schema, granularity, user_buckets),
+            sort_order=create_event_sort_order(base_schema)
+        )
 
 if __name__ == "__main__":
-    create_tables() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create the Iceberg event and error tables.")
+    parser.add_argument("--granularity", choices=["day", "hour"], default="day", help="time partition granularity")
+    parser.add_argument("--user-buckets", type=int, default=0, help="user_id buckets per time partition, 0 for none")
+    parser.add_argument("--event-types", help="event tables as type or type=table entries, defaults to EVENT_TYPES")
+    args = parser.parse_args()
+    create_tables(args.granularity, args.user_buckets, args.event_types)
+ 
\ No newline at end of file
@@ -6,6 +6,15 @@ from typing import Dict, Any
 import boto3
 from moto import mock_aws
 import os
+from pyiceberg.catalog.sql import SqlCatalog
+from apps.lambda_processor.routing import DEFAULT_QUARANTINE_TABLE
+from apps.lambda_processor.schemas import (
+    create_base_schema,
+    create_error_log_schema,
+    create_event_sort_order,
+    create_partition_spec
+)
+from apps.mock_generator.main import EVENT_TYPES
 
 @pytest.fixture
 def sample_event() -> Dict[str, Any]:
@@ -101,4 +110,45 @@ def mock_context():
             self.invoked_function_arn = "arn:aws:lambda:us-east-1:123456789012:function:test-function"
             self.aws_request_id = "test-request-id"
     
-    return MockContext() 
\ No newline at end of file
+    return MockContext()
+
+@pytest.fixture
+def local_catalog(tmp_path):
+    """Local SQLite/filesystem Iceberg catalog with the event, quarantine and error_logs tables.
+
+    Tables live in the `events_db` namespace and are partitioned and sorted like the tables
+    created by scripts/init_iceberg_tables.py.
+    """
+    warehouse = tmp_path / "warehouse"
+    warehouse.mkdir()
+    catalog = SqlCatalog(
+        "local",
+        uri=f"sqlite:///{tmp_path / 'catalog.db'}",
+        warehouse=f"file://{warehouse}"
+    )
+    catalog.create_namespace("events_db")
+    for table_name in [f"events_{event_type}" for event_type in EVENT_TYPES] + [DEFAULT_QUARANTINE_TABLE]:
+        catalog.create_table(
+            f"events_db.{table_name}",
+            create_base_schema(),
+            partition_spec=create_partition_spec(create_base_schema()),
+            sort_order=create_event_sort_order()
+        )
+    catalog.create_table(
+        "events_db.error_logs",
+        create_error_log_schema(),
+        partition_spec=create_partition_spec(create_error_log_schema())
+    )
+    return catalog
+
+@pytest.fixture
+def report_mean(benchmark):
+    """Record a figure derived from the mean round time of a benchmark.
+
+    The returned function takes an `extra_info` name and a function of the mean seconds. It
+    records nothing under `--benchmark-disable`, where the benchmark keeps no stats.
+    """
+    def report(name, value_of):
+        if benchmark.stats:
+            benchmark.extra_info[name] = value_of(benchmark.stats.stats.mean)
+    return report
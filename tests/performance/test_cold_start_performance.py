@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+import subprocess
+import pytest
+from apps.mock_generator.main import generate_mock_events
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BATCH_SIZE = 100
+MODULES = ["pyiceberg.catalog.sql", "pyiceberg.io.pyarrow", "sqlalchemy"]
+
+#runs in a fresh interpreter so imports and first calls are really cold
+COLD_START_SCRIPT = """
+import sys, json, time
+started = time.perf_counter()
+from apps.lambda_processor import data_processor
+init_seconds = time.perf_counter() - started
+imported = {name: name in sys.modules for name in MODULES}
+cache = data_processor.get_table_cache()
+misses = cache.stats()["misses"]
+invocations = []
+for batch in json.loads(sys.stdin.read()):
+    started = time.perf_counter()
+    response = data_processor.batch_lambda_handler(batch, None)
+    invocations.append(time.perf_counter() - started)
+    assert response == {"batchItemFailures": []}, response
+print(json.dumps({
+    "init_seconds": init_seconds,
+    "imported_at_init": imported,
+    "first_invocation_seconds": invocations[0],
+    "warm_invocation_seconds": invocations[1],
+    "first_invocation_catalog_loads": cache.stats()["misses"] - misses
+}))
+"""
+
+def _cold_start(local_catalog, tmp_path, warm_up):
+    """Import the processor and run two invocations in a new process."""
+    properties = local_catalog.properties
+    env = dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        ICEBERG_CATALOG_NAME="local",
+        ICEBERG_CATALOG_TYPE="sql",
+        ICEBERG_CATALOG_URI=properties["uri"],
+        ICEBERG_WAREHOUSE=properties["warehouse"],
+        ICEBERG_NAMESPACE="events_db",
+        ERROR_SINK="ndjson",
+        ERROR_SPOOL_URI=str(tmp_path / "errors"),
+        ERROR_SINK_BACKGROUND="false",
+        METRICS_OUTPUT=str(tmp_path / "metrics.jsonl"),
+        WARM_UP_ON_INIT=str(warm_up).lower()
+    )
+    events = list(generate_mock_events(2 * BATCH_SIZE, seed=1, as_arrow=False))
+    batches = [events[:BATCH_SIZE], events[BATCH_SIZE:]]
+    completed = subprocess.run(
+        [sys.executable, "-c", f"MODULES = {MODULES!r}\n" + COLD_START_SCRIPT],
+        input=json.dumps(batches),
+        env=env,
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("warm_up", [False, True], ids=["lazy", "warm_up"])
+def test_cold_start(benchmark, local_catalog, tmp_path, warm_up):
+    """Measure init (import) time and first-invocation latency of a fresh container."""
+    benchmark.group = "cold start"
+    
+    result = benchmark.pedantic(_cold_start, args=(local_catalog, tmp_path, warm_up), rounds=1, iterations=1)
+    
+    benchmark.extra_info.update(result)
+    if warm_up:
+        #the first request finds every table handle already cached
+        assert result["first_invocation_catalog_loads"] == 0
+        assert result["imported_at_init"]["pyiceberg.catalog.sql"]
+    else:
+        #catalog and table loads are left to the first request
+        assert result["first_invocation_catalog_loads"] > 0
+        assert not result["imported_at_init"]["pyiceberg.catalog.sql"]
+        assert not result["imported_at_init"]["sqlalchemy"]
+        assert not result["imported_at_init"]["pyiceberg.io.pyarrow"]
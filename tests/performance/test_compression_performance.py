@@ -0,0 +1,52 @@
+import os
+import io
+import time
+import datetime
+import pytest
+import pyarrow.parquet as pq
+from apps.lambda_processor import json_codec
+from apps.lambda_processor.compression import compress, decompress
+from apps.lambda_processor.data_processor import process_events
+from apps.mock_generator.main import generate_mock_events
+
+NUM_EVENTS = int(os.environ.get("BENCHMARK_COMPRESSION_EVENTS", "2000"))
+#codec and level pairs; None is the codec default
+LEVELS = [
+    ("gzip", 1), ("gzip", 6), ("gzip", 9),
+    ("zstd", 1), ("zstd", 3), ("zstd", 9), ("zstd", 19),
+    ("lz4", 0), ("lz4", 9),
+    ("snappy", None)
+]
+
+@pytest.fixture(scope="module")
+def payloads():
+    """Realistic batches: raw NDJSON as spooled or archived, and an uncompressed Parquet file."""
+    events = list(generate_mock_events(NUM_EVENTS, seed=42, start=datetime.datetime(2024, 1, 1), as_arrow=False))
+    ndjson = "".join(json_codec.dumps(event) + "\n" for event in events).encode("utf-8")
+    buffer = io.BytesIO()
+    pq.write_table(process_events(events), buffer, compression="none")
+    return {"ndjson": ndjson, "parquet": buffer.getvalue()}
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("payload", ["ndjson", "parquet"])
+@pytest.mark.parametrize("codec,level", LEVELS, ids=[f"{codec}-{level}" for codec, level in LEVELS])
+def test_compression_ratio_and_throughput(benchmark, report_mean, payloads, payload, codec, level):
+    """Report compression ratio against compress and decompress throughput per codec and level."""
+    data = payloads[payload]
+    benchmark.group = f"compress {NUM_EVENTS} events as {payload}"
+    
+    compressed = benchmark.pedantic(compress, args=(data, codec, level), rounds=3, iterations=1)
+    
+    started = time.perf_counter()
+    restored = decompress(compressed, codec)
+    decompress_seconds = time.perf_counter() - started
+    megabytes = len(data) / 1e6
+    benchmark.extra_info.update({
+        "input_bytes": len(data),
+        "compressed_bytes": len(compressed),
+        "ratio": len(data) / len(compressed),
+        "decompress_mb_per_second": megabytes / decompress_seconds
+    })
+    report_mean("compress_mb_per_second", lambda seconds: megabytes / seconds)
+    assert restored == data
+    assert len(compressed) < len(data)
@@ -0,0 +1,54 @@
+import os
+import pytest
+import polars as pl
+from apps.lambda_processor.dedup import Deduplicator
+
+ID_COUNTS = [1_000_000, 10_000_000]
+MAX_IDS = int(os.environ.get("BENCHMARK_DEDUP_IDS", "10000000"))  #lower to skip the 10M window
+BATCH_ROWS = 100_000
+ERROR_RATE = 0.001
+
+def _id_batches(start, stop):
+    """Yield batches of distinct event IDs as the dedup filter sees them."""
+    for offset in range(start, stop, BATCH_ROWS):
+        ids = pl.select(event_id=pl.format("evt-{}", pl.int_range(offset, min(offset + BATCH_ROWS, stop))))
+        yield ids.to_arrow()
+
+def _check(dedup, batches):
+    """Filter every batch of new IDs, confirming filter positives with an empty lookup."""
+    for batch in batches:
+        dedup.filter("events_click", batch)
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("num_ids", ID_COUNTS)
+def test_dedup_filter_throughput(benchmark, report_mean, num_ids):
+    """Check a window's worth of new IDs against a filter holding as many committed ones."""
+    if num_ids > MAX_IDS:
+        pytest.skip(f"set BENCHMARK_DEDUP_IDS>={num_ids} to run this size")
+
+    lookups = []
+
+    def lookup(table_name, candidates):
+        lookups.append(candidates.num_rows)
+        return set()
+
+    #one generation holds the whole window
+    dedup = Deduplicator(lookup, capacity=num_ids + 1, error_rate=ERROR_RATE)
+    for batch in _id_batches(0, num_ids):
+        dedup.mark_committed("events_click", batch)
+    batches = list(_id_batches(num_ids, 2 * num_ids))
+    benchmark.group = f"dedup {num_ids} ids"
+
+    benchmark.pedantic(_check, args=(dedup, batches), rounds=1, iterations=1)
+
+    stats = dedup.stats()
+    report_mean("ids_per_second", lambda seconds: num_ids / seconds)
+    benchmark.extra_info["false_positive_rate"] = stats["false_positive_rate"]
+    benchmark.extra_info["estimated_false_positive_rate"] = stats["estimated_false_positive_rate"]
+    benchmark.extra_info["memory_bytes"] = stats["memory_bytes"]
+    benchmark.extra_info["bytes_per_id"] = stats["memory_bytes"] / num_ids
+    assert stats["keys"] == num_ids
+    assert stats["committed_duplicates"] == 0
+    assert sum(lookups) == stats["false_positives"]
+    #the observed rate stays within sampling noise of the target
+    assert stats["false_positive_rate"] < 1.5 * ERROR_RATE
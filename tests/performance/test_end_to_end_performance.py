@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import platform
+import datetime
+import threading
+import psutil
+import pytest
+import pyarrow as pa
+import pyiceberg
+from apps.lambda_processor import data_processor
+from apps.lambda_processor.error_sink import ErrorSink, NdjsonSpoolWriter
+from apps.lambda_processor.metrics import MetricsRegistry
+from apps.mock_generator.main import EVENT_TYPES, generate_mock_events
+
+BATCH_SIZES = [1, 100, 1_000, 10_000, 100_000]
+MAX_EVENTS = int(os.environ.get("BENCHMARK_MAX_EVENTS", "10000"))  #raise to run the 100k batches
+#results of this run, and an earlier run's results to compare against
+RESULTS_PATH = os.environ.get("BENCHMARK_RESULTS", ".benchmarks/end_to_end.json")
+BASELINE_PATH = os.environ.get("BENCHMARK_BASELINE")
+#allowed relative regression of throughput and p99 latency against the baseline
+BASELINE_TOLERANCE = float(os.environ.get("BENCHMARK_TOLERANCE", "0.25"))
+START = datetime.datetime(2024, 1, 1)
+RESULTS_VERSION = 1
+
+def _invocations(batch_size):
+    """Measured invocations per batch size: enough for percentiles without hour-long runs."""
+    return max(5, min(50, 1_000 // batch_size))
+
+class _PeakRss:
+    """Samples the process RSS in the background and keeps the peak."""
+
+    def __init__(self, interval_seconds=0.01):
+        self.interval_seconds = interval_seconds
+        self.process = psutil.Process()
+        self.peak = self.process.memory_info().rss
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+def _percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, int(round(fraction * len(ordered))) - 1)]
+
+def _sqs_batches(batch_size, invocations):
+    """Reproducible SQS batches of mock events, one per invocation plus a warm-up batch."""
+    events = generate_mock_events(batch_size * (invocations + 1), seed=batch_size, start=START, as_arrow=False)
+    batches = []
+    for _ in range(invocations + 1):
+        batches.append({"Records": [
+            {"messageId": f"msg-{i}", "body": json.dumps(next(events)), "eventSource": "aws:sqs"}
+            for i in range(batch_size)
+        ]})
+    return batches
+
+def _stage_seconds(lines):
+    """Total seconds spent per stage across the EMF lines of a run."""
+    totals = {}
+    for line in lines:
+        document = json.loads(line)
+        for name, value in document.items():
+            if name.endswith("_latency"):
+                stage = name[:-len("_latency")]
+                totals[stage] = totals.get(stage, 0) + value["Sum"] / 1e6
+    return totals
+
+def _table_footprint(catalog):
+    """Count the snapshots and live data files of every event table."""
+    snapshots = 0
+    files = 0
+    for event_type in EVENT_TYPES:
+        table = catalog.load_table(f"events_db.events_{event_type}")
+        snapshots += len(table.metadata.snapshots)
+        files += len(list(table.scan().plan_files()))
+    return snapshots, files
+
+def compare_to_baseline(results, baseline, tolerance):
+    """List the scenarios that regressed against a baseline run.
+
+    Args:
+        results (dict): This run's results document.
+        baseline (dict): A results document from an earlier run.
+        tolerance (float): Allowed relative drop in throughput or rise in p99 latency.
+
+    Returns:
+        list: One message per regression; scenarios missing from either run are ignored.
+    """
+    regressions = []
+    for name, result in sorted(results["scenarios"].items()):
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        if result["events_per_second"] < before["events_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {result['events_per_second']:.0f} events/s vs {before['events_per_second']:.0f} baseline"
+            )
+        if result["latency_p99_seconds"] > before["latency_p99_seconds"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p99 {result['latency_p99_seconds']:.4f}s vs {before['latency_p99_seconds']:.4f}s baseline"
+            )
+    return regressions
+
+@pytest.fixture(scope="module")
+def results():
+    """Collect scenario results and write them as one JSON document after the module."""
+    document = {
+        "version": RESULTS_VERSION,
+        "created_at": datetime.datetime.utcnow().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pyarrow": pa.__version__,
+            "pyiceberg": pyiceberg.__version__
+        },
+        "scenarios": {}
+    }
+    yield document
+    if document["scenarios"]:
+        directory = os.path.dirname(RESULTS_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(RESULTS_PATH, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+
+@pytest.fixture
+def pipeline(monkeypatch, local_catalog, tmp_path):
+    """Point the processor at the local catalog with fresh module state and collected metrics."""
+    lines = []
+    for name in [
+        "_table_cache", "_commit_coordinator", "_write_buffer", "_error_sink", "_metrics", "_archive",
+        "_schema_aligner", "_router", "_deduplicator", "_upsert_writer"
+    ]:
+        monkeypatch.setattr(data_processor, name, None)
+    monkeypatch.setattr(data_processor, "WRITE_DURABILITY", data_processor.DURABILITY_FLUSH)
+    #registered so set_catalog's namespace and catalog are undone after the test
+    monkeypatch.setattr(data_processor, "_catalog", None)
+    monkeypatch.setattr(data_processor, "ICEBERG_NAMESPACE", "")
+    data_processor.set_catalog(local_catalog, "events_db")
+    data_processor.set_error_sink(ErrorSink(NdjsonSpoolWriter(str(tmp_path / "errors")), background=False))
+    data_processor.set_metrics(MetricsRegistry(writer=lines.append))
+    return lines
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("batch_size", BATCH_SIZES)
+def test_end_to_end_throughput(benchmark, pipeline, local_catalog, results, mock_context, batch_size):
+    """Measure decode-to-commit throughput, latency, memory and table footprint per batch size."""
+    if batch_size > MAX_EVENTS:
+        pytest.skip(f"set BENCHMARK_MAX_EVENTS>={batch_size} to run this size")
+
+    invocations = _invocations(batch_size)
+    batches = _sqs_batches(batch_size, invocations)
+    #warm up imports, the table cache and the first commit outside the measurement
+    assert data_processor.batch_lambda_handler(batches.pop(), mock_context) == {"batchItemFailures": []}
+    pipeline.clear()
+    snapshots_before, _ = _table_footprint(local_catalog)
+    latencies = []
+
+    def run():
+        for batch in batches:
+            started = time.perf_counter()
+            response = data_processor.batch_lambda_handler(batch, mock_context)
+            latencies.append(time.perf_counter() - started)
+            assert response == {"batchItemFailures": []}
+
+    with _PeakRss() as rss:
+        benchmark.pedantic(run, rounds=1, iterations=1)
+
+    elapsed = sum(latencies)
+    snapshots, files = _table_footprint(local_catalog)
+    scenario = {
+        "batch_size": batch_size,
+        "invocations": invocations,
+        "events": batch_size * invocations,
+        "events_per_second": batch_size * invocations / elapsed,
+        "latency_p50_seconds": _percentile(latencies, 0.50),
+        "latency_p99_seconds": _percentile(latencies, 0.99),
+        "peak_rss_bytes": rss.peak,
+        "commits": snapshots - snapshots_before,
+        "data_files": files,
+        "stage_seconds": _stage_seconds(pipeline)
+    }
+    results["scenarios"][f"batch_{batch_size}"] = scenario
+    benchmark.group = "end to end"
+    benchmark.extra_info.update(scenario)
+
+    committed = sum(
+        local_catalog.load_table(f"events_db.events_{event_type}").scan().to_arrow().num_rows
+        for event_type in EVENT_TYPES
+    )
+    assert committed == batch_size * (invocations + 1)
+    #at most one commit per event type table per invocation
+    assert scenario["commits"] <= invocations * min(batch_size, len(EVENT_TYPES))
+
+def test_compare_to_baseline_flags_regressions():
+    """Test that only drops in throughput or rises in p99 beyond the tolerance are reported."""
+    baseline = {"scenarios": {
+        "batch_100": {"events_per_second": 1000.0, "latency_p99_seconds": 0.10},
+        "batch_1000": {"events_per_second": 5000.0, "latency_p99_seconds": 0.50}
+    }}
+    current = {"scenarios": {
+        "batch_1": {"events_per_second": 1.0, "latency_p99_seconds": 9.0},
+        "batch_100": {"events_per_second": 900.0, "latency_p99_seconds": 0.11},
+        "batch_1000": {"events_per_second": 3000.0, "latency_p99_seconds": 0.70}
+    }}
+
+    regressions = compare_to_baseline(current, baseline, 0.25)
+
+    assert len(regressions) == 2
+    assert all(message.startswith("batch_1000:") for message in regressions)
+
+def test_end_to_end_against_baseline(results):
+    """Fail when this run regressed against the BENCHMARK_BASELINE results file."""
+    if not BASELINE_PATH:
+        pytest.skip("set BENCHMARK_BASELINE to a results file to compare against")
+    if not results["scenarios"]:
+        pytest.skip("no end to end scenarios ran")
+    with open(BASELINE_PATH, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = compare_to_baseline(results, baseline, BASELINE_TOLERANCE)
+
+    assert not regressions, "\n".join(regressions)
@@ -0,0 +1,63 @@
+import json
+import pytest
+from apps.lambda_processor import json_codec
+from apps.lambda_processor.data_processor import decode_record
+from apps.mock_generator.main import generate_mock_event
+
+NUM_EVENTS = 10_000
+
+@pytest.fixture(scope="module")
+def sqs_records():
+    """SQS records carrying mock events as JSON bodies."""
+    return [
+        {"messageId": f"msg-{i}", "body": json.dumps(generate_mock_event())}
+        for i in range(NUM_EVENTS)
+    ]
+
+@pytest.fixture(scope="module")
+def ndjson_payload(sqs_records):
+    """The same events as one raw NDJSON payload."""
+    return "\n".join(record["body"] for record in sqs_records).encode("utf-8")
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("codec", ["stdlib", "orjson"])
+def test_decode_sqs_bodies(benchmark, report_mean, sqs_records, codec):
+    """Compare decoding SQS bodies with the stdlib decoder and the orjson fast path."""
+    benchmark.group = f"decode {NUM_EVENTS} sqs bodies"
+    if codec == "stdlib":
+        decode = lambda records: [json.loads(record["body"]) for record in records]
+    else:
+        decode = lambda records: [decode_record(record) for record in records]
+    
+    events = benchmark(decode, sqs_records)
+    
+    report_mean("microseconds_per_event", lambda seconds: seconds / NUM_EVENTS * 1e6)
+    assert len(events) == NUM_EVENTS
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("codec", ["stdlib", "orjson"])
+def test_decode_ndjson_payload(benchmark, report_mean, ndjson_payload, codec):
+    """Compare decoding a raw NDJSON payload, the orjson path reading the bytes in place."""
+    benchmark.group = f"decode {NUM_EVENTS} event ndjson payload"
+    if codec == "stdlib":
+        decode = lambda data: [json.loads(line) for line in data.decode("utf-8").splitlines()]
+    else:
+        decode = lambda data: json_codec.decode_payload(memoryview(data))
+    
+    events = benchmark(decode, ndjson_payload)
+    
+    report_mean("microseconds_per_event", lambda seconds: seconds / NUM_EVENTS * 1e6)
+    assert len(events) == NUM_EVENTS
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("codec", ["stdlib", "orjson"])
+def test_encode_event_data(benchmark, report_mean, sqs_records, codec):
+    """Compare encoding error `event_data` payloads."""
+    benchmark.group = f"encode {NUM_EVENTS} events"
+    events = [json.loads(record["body"]) for record in sqs_records]
+    encode = json.dumps if codec == "stdlib" else json_codec.dumps
+    
+    encoded = benchmark(lambda values: [encode(value) for value in values], events)
+    
+    report_mean("microseconds_per_event", lambda seconds: seconds / NUM_EVENTS * 1e6)
+    assert len(encoded) == NUM_EVENTS
@@ -0,0 +1,41 @@
+import os
+import pytest
+import polars as pl
+import pyarrow as pa
+from apps.lambda_processor.data_processor import process_event, process_events
+from apps.mock_generator.main import generate_mock_event
+
+BATCH_SIZES = [1_000, 10_000, 100_000]
+MAX_EVENTS = int(os.environ.get("BENCHMARK_MAX_EVENTS", "100000"))  #lower for a quicker run
+
+@pytest.fixture(autouse=True)
+def mock_catalog(mocker):
+    """Keep error logging away from a real catalog."""
+    return mocker.patch("apps.lambda_processor.data_processor.get_catalog")
+
+def _generate_events(num_events):
+    """Generate mock events exactly as the generator emits them."""
+    return [generate_mock_event() for _ in range(num_events)]
+
+def _per_event_path(events):
+    """Build the batch table the way the single-event handler path does."""
+    return pl.concat([process_event(event) for event in events], how="diagonal_relaxed").to_arrow()
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("num_events", BATCH_SIZES)
+@pytest.mark.parametrize("path", ["per_event", "vectorized"])
+def test_process_events_throughput(benchmark, report_mean, path, num_events):
+    """Compare the per-event and vectorized processing paths at increasing batch sizes."""
+    if num_events > MAX_EVENTS:
+        pytest.skip(f"set BENCHMARK_MAX_EVENTS>={num_events} to run this size")
+    
+    events = _generate_events(num_events)
+    func = process_events if path == "vectorized" else _per_event_path
+    benchmark.group = f"process {num_events} events"
+    func(events[:10])  #warm up lazy imports outside the measured round
+    
+    result = benchmark.pedantic(func, args=(events,), rounds=1, iterations=1)
+    
+    report_mean("events_per_second", lambda seconds: num_events / seconds)
+    assert isinstance(result, pa.Table)
+    assert result.num_rows == num_events
@@ -0,0 +1,58 @@
+import os
+import datetime
+import pytest
+from apps.lambda_processor.commit import CommitCoordinator
+from apps.lambda_processor.data_processor import process_events
+from apps.lambda_processor.query import QueryCache, TableQuery
+from apps.lambda_processor.schema_writer import SchemaAligner
+from apps.mock_generator.main import generate_mock_events
+
+NUM_EVENTS = int(os.environ.get("BENCHMARK_QUERY_EVENTS", "50000"))
+LOAD_BATCHES = 10
+TABLE = "events_db.events_product_view"
+START = datetime.datetime(2024, 1, 1)
+
+@pytest.fixture
+def loaded(local_catalog):
+    """A product view table holding NUM_EVENTS events committed over LOAD_BATCHES appends."""
+    def load(table_name):
+        return local_catalog.load_table(table_name)
+
+    events = list(generate_mock_events(NUM_EVENTS, seed=3, start=START, as_arrow=False))
+    for event in events:
+        event["event_type"] = "product_view"
+    data = SchemaAligner().align(load(TABLE), process_events(events))
+    coordinator = CommitCoordinator(load, load)
+    step = -(-NUM_EVENTS // LOAD_BATCHES)
+    for offset in range(0, NUM_EVENTS, step):
+        coordinator.append(TABLE, data.slice(offset, step))
+    return load(TABLE), data.column("user_id")[0].as_py()
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("cache", ["cold", "cached"])
+def test_lookup_latency(benchmark, loaded, tmp_path, cache):
+    """Compare reading a user's latest events from the table and from the result cache."""
+    table, user_id = loaded
+    query_cache = QueryCache(str(tmp_path / "cache"))
+
+    def lookup():
+        if cache == "cold":
+            query_cache.clear()
+        table_query = TableQuery(
+            table,
+            f"user_id = '{user_id}'",
+            selected_fields=("event_id", "timestamp", "doc_location_country"),
+            order_by="timestamp",
+            descending=True,
+            limit=100,
+            cache=query_cache
+        )
+        return table_query.to_arrow(), table_query.stats
+
+    lookup()
+    benchmark.group = f"latest events of a user in {NUM_EVENTS} events"
+    result, stats = benchmark.pedantic(lookup, rounds=5, iterations=1)
+
+    benchmark.extra_info.update(stats)
+    assert result.num_rows > 0
+    assert stats["cache"] == ("hit" if cache == "cached" else "miss")
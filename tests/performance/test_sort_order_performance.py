@@ -0,0 +1,85 @@
+import datetime
+import pytest
+import pyarrow.parquet as pq
+from pyiceberg.catalog.sql import SqlCatalog
+from pyiceberg.expressions import And, EqualTo, GreaterThanOrEqual, LessThan
+from apps.lambda_processor.data_processor import process_events
+from apps.lambda_processor.schemas import create_base_schema, create_event_sort_order
+from apps.lambda_processor.sort_order import sort_for_table
+from apps.mock_generator.main import generate_mock_events
+
+NUM_APPENDS = 8
+EVENTS_PER_APPEND = 10_000
+#small row groups so pruning within a file is visible at benchmark sizes
+ROW_GROUP_ROWS = 1_000
+START = datetime.datetime(2024, 1, 1)
+
+QUERIES = {
+    "user": (EqualTo("user_id", "user_42"), {"user_id": ("user_42", "user_42")}),
+    "time_range": (
+        And(GreaterThanOrEqual("timestamp", "2024-01-01T00:00:42"), LessThan("timestamp", "2024-01-01T00:00:44")),
+        {"timestamp": (START + datetime.timedelta(seconds=42), START + datetime.timedelta(seconds=44))}
+    ),
+    "user_and_time": (
+        And(EqualTo("user_id", "user_42"), GreaterThanOrEqual("timestamp", "2024-01-01T00:00:40")),
+        {"user_id": ("user_42", "user_42"), "timestamp": (START + datetime.timedelta(seconds=40), None)}
+    )
+}
+
+@pytest.fixture(scope="module")
+def tables(tmp_path_factory):
+    """An unsorted and a sorted table holding the same appends."""
+    root = tmp_path_factory.mktemp("sort_order")
+    catalog = SqlCatalog("bench", uri=f"sqlite:///{root / 'catalog.db'}", warehouse=f"file://{root}")
+    catalog.create_namespace("bench")
+    properties = {"write.parquet.row-group-limit": str(ROW_GROUP_ROWS)}
+    unsorted = catalog.create_table("bench.unsorted", create_base_schema(), properties=properties)
+    sorted_table = catalog.create_table(
+        "bench.sorted", create_base_schema(), sort_order=create_event_sort_order(), properties=properties
+    )
+    
+    for append in range(NUM_APPENDS):
+        start = START + datetime.timedelta(milliseconds=append * EVENTS_PER_APPEND)
+        data = process_events(list(generate_mock_events(EVENTS_PER_APPEND, seed=append, start=start, as_arrow=False)))
+        unsorted.append(data)
+        sorted_table.append(sort_for_table(sorted_table, data))
+    return {"unsorted": unsorted, "sorted": sorted_table}
+
+def _overlaps(statistics, bounds):
+    """Check whether a row group's min/max can contain values within the bounds."""
+    if statistics is None or not statistics.has_min_max:
+        return True
+    low, high = bounds
+    return (high is None or statistics.min <= high) and (low is None or statistics.max >= low)
+
+def _count_scanned(table, row_filter, bounds):
+    """Count the files left after manifest pruning and their row groups left after stats pruning."""
+    files = [task.file.file_path for task in table.scan(row_filter=row_filter).plan_files()]
+    row_groups = 0
+    for path in files:
+        metadata = pq.ParquetFile(path.replace("file://", "")).metadata
+        for i in range(metadata.num_row_groups):
+            group = metadata.row_group(i)
+            columns = {group.column(j).path_in_schema: group.column(j) for j in range(group.num_columns)}
+            if all(_overlaps(columns[name].statistics, column_bounds) for name, column_bounds in bounds.items()):
+                row_groups += 1
+    return len(files), row_groups
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("query", list(QUERIES))
+@pytest.mark.parametrize("layout", ["unsorted", "sorted"])
+def test_scan_pruning(benchmark, tables, layout, query):
+    """Compare files and row groups scanned, and scan time, with and without write-time sorting."""
+    row_filter, bounds = QUERIES[query]
+    table = tables[layout]
+    benchmark.group = f"scan {query}"
+    
+    result = benchmark.pedantic(lambda: table.scan(row_filter=row_filter).to_arrow(), rounds=3, iterations=1)
+    
+    files, row_groups = _count_scanned(table, row_filter, bounds)
+    total_row_groups = NUM_APPENDS * EVENTS_PER_APPEND // ROW_GROUP_ROWS
+    benchmark.extra_info.update({"files_scanned": files, "row_groups_scanned": row_groups,
+                                 "row_groups_total": total_row_groups, "rows": result.num_rows})
+    if layout == "sorted" and query == "user":
+        _, unsorted_row_groups = _count_scanned(tables["unsorted"], row_filter, bounds)
+        assert row_groups < unsorted_row_groups
@@ -0,0 +1,89 @@
+import os
+import time
+import datetime
+import pytest
+import polars as pl
+from apps.lambda_processor.commit import CommitCoordinator
+from apps.lambda_processor.data_processor import process_events
+from apps.lambda_processor.schema_writer import SchemaAligner
+from apps.lambda_processor.upsert import UpsertWriter
+from apps.mock_generator.main import generate_mock_events
+
+NUM_EVENTS = int(os.environ.get("BENCHMARK_UPSERT_EVENTS", "20000"))
+#appends the table is loaded with, one data file per hour partition each
+LOAD_BATCHES = 10
+CORRECTION_FRACTIONS = [0.01, 0.1]
+TABLE = "events_purchase"
+START = datetime.datetime(2024, 1, 1)
+
+@pytest.fixture
+def loaded(local_catalog):
+    """A purchase table holding NUM_EVENTS events committed over LOAD_BATCHES appends."""
+    def load(table_name):
+        return local_catalog.load_table(f"events_db.{table_name}")
+
+    events = list(generate_mock_events(NUM_EVENTS, seed=7, start=START, as_arrow=False))
+    for event in events:
+        event["event_type"] = "purchase"
+    data = SchemaAligner().align(load(TABLE), process_events(events))
+    coordinator = CommitCoordinator(load, load)
+    step = -(-NUM_EVENTS // LOAD_BATCHES)
+    for offset in range(0, NUM_EVENTS, step):
+        coordinator.append(TABLE, data.slice(offset, step))
+    return load, coordinator, data
+
+def _corrections(data, fraction):
+    """Corrected versions of a sample of the committed events."""
+    sample = pl.from_arrow(data).sample(fraction=fraction, seed=11)
+    return sample.with_columns(pl.lit("corrected").alias("browser")).to_arrow().cast(data.schema)
+
+def _added_records(table, since_snapshot_id):
+    """Count the rows written by the snapshots committed after a snapshot."""
+    added = 0
+    for snapshot in reversed(table.metadata.snapshots):
+        if snapshot.snapshot_id == since_snapshot_id:
+            break
+        added += int(snapshot.summary.get("added-records", "0"))
+    return added
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("fraction", CORRECTION_FRACTIONS)
+@pytest.mark.parametrize("path", ["append", "upsert"])
+def test_correction_write_amplification_and_read_overhead(benchmark, loaded, path, fraction):
+    """Compare writing corrections as plain appends or as copy-on-write upserts.
+
+    Appends write only the corrections but leave two versions of every corrected event, so
+    readers must drop the stale copies. Upserts rewrite the data files holding the old versions
+    so a plain scan is correct. Both write time and the rows physically written per
+    correction are reported, along with the scan time of the resulting table.
+    """
+    load, coordinator, data = loaded
+    corrections = _corrections(data, fraction)
+    writer = UpsertWriter(load, coordinator)
+    before = load(TABLE).metadata.current_snapshot_id
+    benchmark.group = f"correct {fraction:.0%} of {NUM_EVENTS} events"
+
+    if path == "append":
+        benchmark.pedantic(coordinator.append, args=(TABLE, corrections), rounds=1, iterations=1)
+    else:
+        benchmark.pedantic(writer.write, args=(TABLE, corrections), kwargs={"defer": False}, rounds=1, iterations=1)
+
+    table = load(TABLE)
+    started = time.perf_counter()
+    rows = table.scan().to_arrow()
+    if path == "append":
+        #the cheapest read-side merge, which still cannot tell which copy is the newest
+        rows = pl.from_arrow(rows).unique(subset="event_id", keep="any").to_arrow()
+    read_seconds = time.perf_counter() - started
+
+    written = _added_records(table, before)
+    benchmark.extra_info["corrections"] = corrections.num_rows
+    benchmark.extra_info["rows_written"] = written
+    benchmark.extra_info["write_amplification"] = written / corrections.num_rows
+    benchmark.extra_info["data_files"] = len(list(table.scan().plan_files()))
+    benchmark.extra_info["read_seconds"] = read_seconds
+    benchmark.extra_info["rows_scanned"] = table.scan().to_arrow().num_rows
+    assert rows.num_rows == NUM_EVENTS
+    if path == "upsert":
+        assert writer.stats()["corrections_applied"] == corrections.num_rows
+        assert benchmark.extra_info["rows_scanned"] == NUM_EVENTS
@@ -0,0 +1,194 @@
+import os
+import json
+import datetime
+import pytest
+import pyarrow.parquet as pq
+from apps.lambda_processor.archive import (
+    FORMAT_PARQUET,
+    MIN_PART_SIZE,
+    LocalFileSink,
+    RawArchive,
+    S3MultipartSink,
+    sink_factory
+)
+from apps.lambda_processor.compression import decompress
+
+BUCKET = "data-pipeline-bucket"
+
+class _Clock:
+    """Controllable monotonic and wall clocks."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.utc = datetime.datetime(2024, 1, 2, 3, 15)
+
+    def monotonic(self):
+        return self.now
+
+    def utcnow(self):
+        return self.utc
+
+def _events(event_type, count, start=0):
+    """Build events of one type."""
+    return [
+        {"event_id": str(start + i), "event_type": event_type, "user_id": f"user_{i}", "payload": {"n": i}}
+        for i in range(count)
+    ]
+
+def _read_ndjson(data):
+    """Decode an NDJSON.zst object."""
+    return [json.loads(line) for line in decompress(data, "zstd").decode("utf-8").splitlines()]
+
+def test_local_archive_groups_by_type_and_hour(tmp_path):
+    """Test events land in one object per type and hour, at the key and row returned on add."""
+    clock = _Clock()
+    archive = RawArchive(sink_factory(str(tmp_path)), clock=clock.monotonic, utcnow=clock.utcnow)
+    added = [(event, archive.add(event)) for event in _events("purchase", 3) + _events("user_login", 2, 10)]
+    clock.utc = datetime.datetime(2024, 1, 2, 4, 1)
+    late = _events("purchase", 1, 20)[0]
+    added.append((late, archive.add(late)))
+    
+    assert archive.flush_due() == {}
+    assert archive.flush() == {}
+    
+    keys = {location["key"] for _, location in added}
+    assert len(keys) == 3
+    assert added[0][1]["key"].startswith("events/purchase/2024/01/02/03/20240102T031500-")
+    assert added[0][1]["key"].endswith(".ndjson.zst")
+    assert added[-1][1] == {"key": added[-1][1]["key"], "row": 0}
+    assert added[-1][1]["key"].startswith("events/purchase/2024/01/02/04/")
+    for event, location in added:
+        rows = _read_ndjson((tmp_path / location["key"]).read_bytes())
+        assert rows[location["row"]] == event
+    assert archive.stats()["objects_written"] == 3
+    assert archive.stats()["pending_events"] == 0
+    assert not [path for path in tmp_path.rglob("*.tmp")]
+
+def test_parquet_archive_and_thresholds(tmp_path):
+    """Test the Parquet format and that only groups over a threshold are flushed when due."""
+    clock = _Clock()
+    archive = RawArchive(
+        sink_factory(str(tmp_path)), fmt=FORMAT_PARQUET, max_rows=3, max_age_seconds=60,
+        clock=clock.monotonic, utcnow=clock.utcnow
+    )
+    purchases = [archive.add(event) for event in _events("purchase", 3)]
+    login = archive.add(_events("user_login", 1)[0])
+    
+    archive.flush_due()
+    
+    table = pq.read_table(str(tmp_path / purchases[0]["key"]))
+    assert table.column("event_id").to_pylist() == ["0", "1", "2"]
+    assert not os.path.exists(tmp_path / login["key"])
+    clock.now = 61
+    archive.flush_due()
+    assert os.path.exists(tmp_path / login["key"])
+
+def test_failed_write_keeps_events_and_key(tmp_path):
+    """Test a failed object write is retried under the key already handed out."""
+    calls = []
+    open_local = sink_factory(str(tmp_path))
+    
+    def flaky_sink(key):
+        calls.append(key)
+        if len(calls) == 1:
+            raise OSError("S3 unavailable")
+        return open_local(key)
+    
+    archive = RawArchive(flaky_sink)
+    location = archive.add(_events("purchase", 1)[0])
+    
+    failed = archive.flush()
+    assert list(failed) == [location["key"]]
+    assert archive.stats()["pending_events"] == 1
+    assert archive.flush() == {}
+    assert calls == [location["key"], location["key"]]
+    assert _read_ndjson((tmp_path / location["key"]).read_bytes())[0]["event_id"] == "0"
+
+def test_parquet_archive_keeps_mixed_shapes_as_json(tmp_path):
+    """Test events whose fields disagree on a type are still written, as JSON rows."""
+    archive = RawArchive(sink_factory(str(tmp_path)), fmt=FORMAT_PARQUET)
+    events = [
+        {"event_id": "1", "event_type": "purchase", "data": {"v": 1}},
+        {"event_id": "2", "event_type": "purchase", "data": {"v": "x"}}
+    ]
+    location = [archive.add(event) for event in events][0]
+    
+    assert archive.flush() == {}
+    
+    table = pq.read_table(str(tmp_path / location["key"]))
+    assert table.column("event_id").to_pylist() == ["1", "2"]
+    assert [json.loads(value) for value in table.column("event_json").to_pylist()] == events
+    stats = archive.stats()
+    assert (stats["parquet_fallbacks"], stats["pending_events"], stats["write_failures"]) == (1, 0, 0)
+
+def test_failing_group_is_abandoned_and_buffer_is_capped(tmp_path):
+    """Test an unwritable group is handed off after its attempts and new events drop when full."""
+    abandoned = []
+    
+    def unavailable(key):
+        raise OSError("S3 unavailable")
+    
+    archive = RawArchive(
+        unavailable, max_pending_events=3, max_attempts=2,
+        on_abandon=lambda key, events, error: abandoned.append((key, len(events), str(error)))
+    )
+    locations = [archive.add(event) for event in _events("purchase", 4)]
+    
+    assert locations[-1] == {"key": None, "row": None}
+    assert list(archive.flush()) == [locations[0]["key"]]
+    assert archive.stats()["pending_events"] == 3
+    assert list(archive.flush()) == [locations[0]["key"]]
+    
+    assert abandoned == [(locations[0]["key"], 3, "S3 unavailable")]
+    stats = archive.stats()
+    assert stats["events_dropped"] == 1
+    assert (stats["groups_abandoned"], stats["events_abandoned"]) == (1, 3)
+    assert (stats["pending_events"], stats["pending_bytes"]) == (0, 0)
+    assert archive.add(_events("purchase", 1)[0])["row"] == 0
+
+def test_local_sink_removes_temporary_file_when_rename_fails(tmp_path, monkeypatch):
+    """Test a failed move into place leaves no temporary file behind."""
+    sink = LocalFileSink(str(tmp_path / "out" / "object.bin"))
+    sink.write(b"data")
+    
+    def fail(source, target):
+        raise OSError("read-only file system")
+    
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError):
+        sink.close()
+    
+    assert list((tmp_path / "out").iterdir()) == []
+    assert sink.closed
+
+def test_s3_multipart_upload(s3):
+    """Test objects are uploaded in parts and a failed write leaves no object or open upload."""
+    data = os.urandom(2 * MIN_PART_SIZE + 12345)
+    sink = S3MultipartSink(s3, BUCKET, "raw/big.bin", part_size=MIN_PART_SIZE)
+    for start in range(0, len(data), 1024 * 1024):
+        sink.write(data[start:start + 1024 * 1024])
+    sink.close()
+    
+    head = s3.head_object(Bucket=BUCKET, Key="raw/big.bin", PartNumber=1)
+    assert s3.get_object(Bucket=BUCKET, Key="raw/big.bin")["Body"].read() == data
+    assert head["PartsCount"] == 3
+    
+    aborted = S3MultipartSink(s3, BUCKET, "raw/aborted.bin", part_size=MIN_PART_SIZE)
+    aborted.write(data[:MIN_PART_SIZE + 1])
+    aborted.abort()
+    assert "Contents" not in s3.list_objects_v2(Bucket=BUCKET, Prefix="raw/aborted")
+    assert "Uploads" not in s3.list_multipart_uploads(Bucket=BUCKET)
+
+def test_s3_archive_returns_real_keys(s3):
+    """Test the keys returned for events are the keys of the uploaded objects."""
+    archive = RawArchive(sink_factory(f"s3://{BUCKET}", client=s3), prefix="raw")
+    events = _events("purchase", 5)
+    locations = [archive.add(event) for event in events]
+    
+    archive.flush()
+    
+    body = s3.get_object(Bucket=BUCKET, Key=locations[0]["key"])["Body"].read()
+    assert locations[0]["key"].startswith("raw/purchase/")
+    assert [_read_ndjson(body)[location["row"]] for location in locations] == events
+    with pytest.raises(ValueError):
+        sink_factory(f"s3://{BUCKET}/raw")
@@ -0,0 +1,147 @@
+import time
+import threading
+from unittest.mock import MagicMock
+import pytest
+import pyarrow as pa
+from pyiceberg.exceptions import CommitFailedException
+from apps.lambda_processor.commit import CommitCoordinator, percentile
+
+def _batch(num_rows):
+    """Build a small Arrow batch."""
+    return pa.table({"event_id": [str(i) for i in range(num_rows)]})
+
+def _coordinator(table, **kwargs):
+    """Build a coordinator around a single mock table that never sleeps."""
+    refresh = MagicMock()
+    coordinator = CommitCoordinator(lambda name: table, refresh, sleep=lambda seconds: None, **kwargs)
+    return coordinator, refresh
+
+def test_percentile():
+    """Test nearest-rank percentiles."""
+    values = [float(v) for v in range(1, 101)]
+    
+    assert percentile(values, 0.5) == 50.0
+    assert percentile(values, 0.99) == 99.0
+    assert percentile([], 0.5) is None
+
+def test_append_commits_once_without_conflict():
+    """Test a conflict-free append is a single attempt."""
+    table = MagicMock()
+    coordinator, refresh = _coordinator(table)
+    
+    coordinator.append("events_purchase", _batch(3))
+    
+    table.append.assert_called_once()
+    refresh.assert_not_called()
+    stats = coordinator.stats()
+    assert stats["commits"] == 1
+    assert stats["conflict_rate"] == 0.0
+    assert stats["retry_latency_p50"] is None
+
+def test_append_retries_conflicts_with_refresh():
+    """Test conflicts refresh the table and retry until the commit lands."""
+    table = MagicMock()
+    table.append.side_effect = [CommitFailedException("conflict"), CommitFailedException("conflict"), None]
+    coordinator, refresh = _coordinator(table)
+    
+    coordinator.append("events_purchase", _batch(1))
+    
+    assert table.append.call_count == 3
+    assert refresh.call_count == 2
+    stats = coordinator.stats()
+    assert stats["conflicts"] == 2
+    assert stats["conflict_rate"] == pytest.approx(2 / 3)
+    assert stats["retry_latency_p99"] is not None
+
+def test_append_gives_up_after_max_attempts():
+    """Test a persistent conflict is raised after the last attempt."""
+    table = MagicMock()
+    table.append.side_effect = CommitFailedException("conflict")
+    coordinator, _ = _coordinator(table, max_attempts=3)
+    
+    with pytest.raises(CommitFailedException):
+        coordinator.append("events_purchase", _batch(1))
+    
+    assert table.append.call_count == 3
+    assert coordinator.stats()["failed_commits"] == 1
+
+def test_overwrite_retries_conflicts_with_refresh():
+    """Test an overwrite commits the rows and filter together, retrying conflicts."""
+    table = MagicMock()
+    table.overwrite.side_effect = [CommitFailedException("conflict"), None]
+    coordinator, refresh = _coordinator(table)
+    data = _batch(2)
+
+    coordinator.overwrite("events_purchase", data, "event_id in ('0', '1')")
+
+    table.overwrite.assert_called_with(data, overwrite_filter="event_id in ('0', '1')")
+    assert table.overwrite.call_count == 2
+    table.append.assert_not_called()
+    assert refresh.call_count == 1
+    assert coordinator.stats()["commits"] == 1
+
+def test_backoff_is_jittered_and_capped():
+    """Test the backoff grows exponentially up to the cap, scaled by jitter."""
+    coordinator = CommitCoordinator(
+        MagicMock(), MagicMock(), base_backoff_seconds=0.1, max_backoff_seconds=1.0, rng=lambda: 0.5
+    )
+    
+    assert coordinator.backoff_seconds(1) == pytest.approx(0.05)
+    assert coordinator.backoff_seconds(3) == pytest.approx(0.2)
+    assert coordinator.backoff_seconds(10) == pytest.approx(0.5)
+
+def test_concurrent_appends_are_coalesced():
+    """Test appends queued while another commit is in flight land in one commit."""
+    first_commit_started = threading.Event()
+    release_first_commit = threading.Event()
+    committed = []
+    
+    def append(data):
+        committed.append(data.num_rows)
+        if len(committed) == 1:
+            first_commit_started.set()
+            release_first_commit.wait(5)
+    
+    table = MagicMock()
+    table.append.side_effect = append
+    coordinator, _ = _coordinator(table)
+    
+    leader = threading.Thread(target=coordinator.append, args=("events_purchase", _batch(1)))
+    leader.start()
+    first_commit_started.wait(5)
+    followers = [
+        threading.Thread(target=coordinator.append, args=("events_purchase", _batch(2)))
+        for _ in range(3)
+    ]
+    for thread in followers:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while len(coordinator._state("events_purchase").pending) < 3 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release_first_commit.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    
+    assert committed == [1, 6]
+    assert coordinator.stats()["coalesced_appends"] == 2
+
+def test_coalesced_failure_is_raised_to_every_caller():
+    """Test every appender of a failed coalesced commit sees the error."""
+    table = MagicMock()
+    table.append.side_effect = RuntimeError("io error")
+    coordinator, _ = _coordinator(table)
+    
+    with pytest.raises(RuntimeError):
+        coordinator.append("events_purchase", _batch(1))
+
+def test_prepare_runs_once_on_coalesced_rows():
+    """Test the prepare hook sees the combined rows of a commit and its result is appended."""
+    table = MagicMock()
+    prepare = MagicMock(side_effect=lambda handle, data: data.slice(0, 1))
+    coordinator, _ = _coordinator(table, prepare=prepare)
+    
+    coordinator.append("events_purchase", _batch(3))
+    
+    prepare.assert_called_once()
+    assert prepare.call_args.args[0] is table
+    assert table.append.call_args.args[0].num_rows == 1
@@ -0,0 +1,122 @@
+import io
+import gzip
+import pytest
+import zstandard
+from apps.lambda_processor import compression
+from apps.lambda_processor.compression import (
+    CompressingWriter,
+    available_codecs,
+    codec_for_path,
+    compress,
+    copy_compress,
+    decompress,
+    iter_compress,
+    iter_decompress,
+    open_reader
+)
+
+CODECS = ["none", "gzip", "zstd", "lz4", "snappy"]
+PAYLOAD = b"".join(b'{"event_id": "%d", "event_type": "purchase", "user_id": "user_%d"}\n' % (i, i % 97) for i in range(20000))
+
+def _pieces(data, size):
+    """Split bytes into pieces of a fixed size."""
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_round_trip_one_shot_and_streaming(codec):
+    """Test whole-payload and chunked compression agree and decompress on any chunk boundary."""
+    compressed = compress(PAYLOAD, codec)
+    streamed = b"".join(iter_compress(_pieces(PAYLOAD, 7777), codec))
+    
+    assert decompress(compressed, codec) == PAYLOAD
+    assert b"".join(iter_decompress(_pieces(streamed, 333), codec)) == PAYLOAD
+    if codec != "none":
+        assert len(compressed) < len(PAYLOAD) / 3
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_file_reader_and_writer(codec, tmp_path):
+    """Test compressing a file in bounded chunks and reading its lines back through a reader."""
+    source = tmp_path / "events.ndjson"
+    source.write_bytes(PAYLOAD)
+    target = tmp_path / "events.ndjson.out"
+    
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        bytes_in, bytes_out = copy_compress(src, dst, codec, chunk_size=4096)
+    with io.TextIOWrapper(open_reader(open(target, "rb"), codec, chunk_size=1000), encoding="utf-8") as reader:
+        lines = reader.readlines()
+    
+    assert bytes_in == len(PAYLOAD)
+    assert bytes_out == target.stat().st_size
+    assert len(lines) == 20000
+    assert lines[-1] == '{"event_id": "19999", "event_type": "purchase", "user_id": "user_17"}\n'
+
+def test_concatenated_frames_and_standard_tools():
+    """Test appended frames decompress as one stream and match the standard gzip/zstd tools."""
+    first, second = PAYLOAD[:1000], PAYLOAD[1000:3000]
+    for codec in ["gzip", "zstd", "lz4", "snappy"]:
+        assert decompress(compress(first, codec) + compress(second, codec), codec) == first + second
+    
+    assert gzip.decompress(compress(PAYLOAD, "gzip", 9)) == PAYLOAD
+    assert zstandard.ZstdDecompressor().decompress(compress(PAYLOAD, "zstd", 19)) == PAYLOAD
+    assert decompress(gzip.compress(first), "gzip") == first
+
+@pytest.mark.parametrize("codec", ["gzip", "zstd", "lz4", "snappy"])
+def test_truncated_input_raises(codec, tmp_path):
+    """Test a payload cut short fails to decompress instead of decoding to partial output."""
+    truncated = compress(PAYLOAD, codec)[:-1000]
+    path = tmp_path / "events.ndjson.cut"
+    path.write_bytes(truncated)
+    
+    with pytest.raises(EOFError):
+        decompress(truncated, codec)
+    with pytest.raises(EOFError):
+        list(iter_decompress(_pieces(truncated, 333), codec))
+    with pytest.raises(EOFError):
+        with open_reader(open(path, "rb"), codec, chunk_size=1000) as reader:
+            reader.read()
+
+def test_writer_counts_and_leaves_target_open():
+    """Test the writer reports its bytes and only closes the target when asked to."""
+    target = io.BytesIO()
+    with CompressingWriter(target, "zstd", level=1) as writer:
+        writer.write(PAYLOAD[:5000])
+        writer.write(memoryview(PAYLOAD)[5000:10000])
+    
+    assert not target.closed
+    assert writer.bytes_in == 10000
+    assert writer.bytes_out == len(target.getvalue())
+    assert decompress(target.getvalue(), "zstd") == PAYLOAD[:10000]
+
+def test_invalid_input_codec_and_level():
+    """Test non-bytes payloads, unknown codecs and out-of-range levels are rejected."""
+    with pytest.raises(TypeError):
+        compress("not bytes", "gzip")
+    with pytest.raises(TypeError):
+        list(iter_compress([b"ok", 42], "zstd"))
+    with pytest.raises(ValueError, match="Unknown compression codec"):
+        compress(PAYLOAD, "brotli")
+    with pytest.raises(ValueError, match="between 1 and 9"):
+        compress(PAYLOAD, "gzip", 12)
+    with pytest.raises(ValueError, match="no compression levels"):
+        compress(PAYLOAD, "snappy", 3)
+
+def test_registry_and_extensions():
+    """Test codecs are looked up by name and by file extension."""
+    assert set(CODECS) <= set(available_codecs())
+    assert codec_for_path("dump/events.ndjson.ZST").name == "zstd"
+    assert codec_for_path("events.jsonl.gz").name == "gzip"
+    assert codec_for_path("events.ndjson.lz4").name == "lz4"
+    assert codec_for_path("events.ndjson") is None
+    assert compression.get_codec("snappy").extensions == (".sz", ".snappy")
+
+def test_incomplete_codec_cannot_be_registered():
+    """Test a codec without a streaming decompressor fails before it reaches the registry."""
+    class HalfCodec(compression.Codec):
+        name = "half"
+
+        def compressor(self, level=None):
+            return compression.get_codec("none").compressor(level)
+
+    with pytest.raises(TypeError, match="decompressor"):
+        compression.register_codec(HalfCodec())
+    assert "half" not in available_codecs()
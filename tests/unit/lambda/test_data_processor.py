@@ -5,26 +5,75 @@ import io
 import concurrent.futures
 import psutil
 import os
+import sys
+import json
+import subprocess
+import copy
+import datetime
+import base64
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyiceberg.exceptions import CommitFailedException
+from pyiceberg.io.pyarrow import schema_to_pyarrow
+from apps.lambda_processor.schemas import create_base_schema
 from unittest.mock import patch, MagicMock
+from apps.lambda_processor import compression, data_processor
 from apps.lambda_processor.data_processor import (
     flatten_nested_dict,
     process_event,
     write_to_iceberg,
     lambda_handler,
+    batch_lambda_handler,
+    process_events,
+    process_records_individually,
     compress_data,
     get_catalog
 )
 
+#modules that are slow to import and only needed once a request uses them
+DEFERRED_MODULES = [
+    "pyiceberg.io.pyarrow",
+    "pyiceberg.catalog",
+    "apps.lambda_processor.archive",
+    "apps.lambda_processor.dedup",
+    "apps.lambda_processor.upsert",
+    "apps.lambda_processor.compression"
+]
+
+def _mock_table():
+    """Mock an event table whose schema is the base schema."""
+    table = MagicMock()
+    table.schema.return_value = create_base_schema()
+    return table
+
 @pytest.fixture(autouse=True)
 def mock_catalog():
     """Mock Iceberg catalog for all tests."""
     with patch('apps.lambda_processor.data_processor.get_catalog') as mock_get_catalog:
         mock_catalog = MagicMock()
-        mock_table = MagicMock()
+        mock_table = _mock_table()
         mock_catalog.load_table.return_value = mock_table
         mock_get_catalog.return_value = mock_catalog
         yield mock_catalog
 
+@pytest.fixture(autouse=True)
+def reset_module_state(monkeypatch):
+    """Start every test with an empty table cache, write buffer and synchronous error sink."""
+    monkeypatch.setattr(data_processor, "_table_cache", None)
+    monkeypatch.setattr(data_processor, "_commit_coordinator", None)
+    monkeypatch.setattr(data_processor, "COMMIT_BASE_BACKOFF_SECONDS", 0.0)
+    monkeypatch.setattr(data_processor, "_write_buffer", None)
+    monkeypatch.setattr(data_processor, "_error_sink", None)
+    monkeypatch.setattr(data_processor, "_metrics", None)
+    monkeypatch.setattr(data_processor, "_archive", None)
+    monkeypatch.setattr(data_processor, "_schema_aligner", None)
+    monkeypatch.setattr(data_processor, "_router", None)
+    monkeypatch.setattr(data_processor, "_deduplicator", None)
+    monkeypatch.setattr(data_processor, "_upsert_writer", None)
+    #the mock tables cannot answer dedup lookups, tests that need dedup turn it back on
+    monkeypatch.setattr(data_processor, "DEDUP_ENABLED", False)
+    monkeypatch.setattr(data_processor, "ERROR_SINK_BACKGROUND", False)
+
 def test_flatten_nested_dict():
     """Test flattening of nested dictionaries."""
     nested_dict = {
@@ -127,6 +176,14 @@ def test_write_to_iceberg(mock_catalog, sample_event):
     mock_table = mock_catalog.load_table.return_value
     mock_table.append.assert_called_once()
 
+def test_write_to_iceberg_aligns_dataframe_to_table_schema(mock_catalog, sample_event):
+    """Test a polars batch is appended with the table's column names and types."""
+    write_to_iceberg(process_event(sample_event), sample_event["event_type"])
+    
+    appended = mock_catalog.load_table.return_value.append.call_args.args[0]
+    assert appended.schema.equals(schema_to_pyarrow(create_base_schema()))
+    assert appended.column("browser").to_pylist() == [sample_event["metadata"]["browser"]]
+
 def test_data_integrity(sample_event):
     """Test data integrity through processing pipeline."""
     # Process event
@@ -222,4 +279,554 @@ def test_compression_performance(benchmark, sample_event):
     
     # Benchmark compression
     result = benchmark(compress_batch)
-    assert isinstance(result, bytes) 
\ No newline at end of file
+    assert isinstance(result, bytes)
+
+def _tables_by_name(mock_catalog):
+    """Give every table loaded from the mock catalog its own mock."""
+    tables = {}
+    mock_catalog.load_table.side_effect = lambda name: tables.setdefault(name, _mock_table())
+    return tables
+
+def _make_events(sample_event, event_types):
+    """Build one copy of the sample event per requested event type."""
+    events = []
+    for i, event_type in enumerate(event_types):
+        event = copy.deepcopy(sample_event)
+        event["event_id"] = str(100000 + i)
+        event["event_type"] = event_type
+        events.append(event)
+    return events
+
+def test_batch_handler_sqs_records(mock_catalog, sample_event, mock_context):
+    """Test SQS batches are appended once per event type table."""
+    events = _make_events(sample_event, ["user_login", "purchase", "user_login"])
+    batch = {
+        "Records": [
+            {"messageId": f"msg-{i}", "body": json.dumps(event), "eventSource": "aws:sqs"}
+            for i, event in enumerate(events)
+        ]
+    }
+    
+    response = lambda_handler(batch, mock_context)
+    
+    assert response == {"batchItemFailures": []}
+    loaded = sorted(call.args[0] for call in mock_catalog.load_table.call_args_list)
+    assert loaded == ["events_purchase", "events_user_login"]
+    appended = [call.args[0] for call in mock_catalog.load_table.return_value.append.call_args_list]
+    assert sorted(t.num_rows for t in appended) == [1, 2]
+
+def test_batch_handler_kinesis_records(mock_catalog, sample_event, mock_context):
+    """Test Kinesis base64 payloads are decoded and written."""
+    events = _make_events(sample_event, ["cart_update", "cart_update"])
+    batch = {
+        "Records": [
+            {
+                "eventSource": "aws:kinesis",
+                "kinesis": {
+                    "sequenceNumber": str(i),
+                    "data": base64.b64encode(json.dumps(event).encode()).decode()
+                }
+            }
+            for i, event in enumerate(events)
+        ]
+    }
+    
+    response = batch_lambda_handler(batch, mock_context)
+    
+    assert response == {"batchItemFailures": []}
+    mock_catalog.load_table.assert_called_once_with("events_cart_update")
+    mock_catalog.load_table.return_value.append.assert_called_once()
+
+def test_batch_handler_reports_failed_records(mock_catalog, sample_event, mock_context):
+    """Test a bad record is reported without failing the rest of the batch."""
+    tables = _tables_by_name(mock_catalog)
+    events = _make_events(sample_event, ["user_login", "user_login"])
+    del events[1]["user_id"]
+    batch = {
+        "Records": [
+            {"messageId": "good", "body": json.dumps(events[0])},
+            {"messageId": "missing-field", "body": json.dumps(events[1])},
+            {"messageId": "not-json", "body": "{"}
+        ]
+    }
+    
+    response = batch_lambda_handler(batch, mock_context)
+    
+    assert response["batchItemFailures"] == [
+        {"itemIdentifier": "missing-field"},
+        {"itemIdentifier": "not-json"}
+    ]
+    tables["events_user_login"].append.assert_called_once()
+    assert tables["events_user_login"].append.call_args.args[0].num_rows == 1
+
+def test_process_records_individually_isolates_failures(sample_event):
+    """Test the one-by-one fallback keeps the good records and names the bad ones."""
+    events = _make_events(sample_event, ["user_login"] * 3)
+    events[1]["timestamp"] = "not a timestamp"
+    
+    arrow_table, failed = process_records_individually(list(zip(["a", "b", "c"], events)))
+    
+    assert failed == ["b"]
+    assert arrow_table.column("event_id").to_pylist() == [events[0]["event_id"], events[2]["event_id"]]
+    assert process_records_individually([("b", events[1])]) == (None, ["b"])
+
+def test_batch_handler_identifies_array_records_by_position(mock_catalog, sample_event, mock_context):
+    """Test redelivered copies in a plain array are told apart by their position."""
+    tables = _tables_by_name(mock_catalog)
+    events = _make_events(sample_event, ["user_login"] * 3)
+    events[1]["event_id"] = events[2]["event_id"] = events[0]["event_id"]
+    events[1]["timestamp"] = "not a timestamp"
+    
+    process_events = data_processor.process_events
+    
+    def fail_batches(payloads, rejected=None):
+        #force the one-by-one fallback, which filters records by identifier
+        if len(payloads) > 1:
+            raise RuntimeError("batch failed")
+        return process_events(payloads, rejected)
+    
+    with patch.object(data_processor, "process_events", side_effect=fail_batches):
+        response = batch_lambda_handler(events, mock_context)
+    
+    assert response["batchItemFailures"] == [{"itemIdentifier": "1"}]
+    assert tables["events_user_login"].append.call_args.args[0].num_rows == 2
+
+def test_batch_handler_quarantines_unknown_event_types(mock_catalog, sample_event, mock_context):
+    """Test events of unknown types are appended to the quarantine table together."""
+    tables = _tables_by_name(mock_catalog)
+    events = _make_events(sample_event, ["user_login", "signup", "user_lgoin", "signup"])
+
+    response = batch_lambda_handler(events, mock_context)
+
+    assert response == {"batchItemFailures": []}
+    assert sorted(tables) == ["events_quarantine", "events_user_login"]
+    quarantined = tables["events_quarantine"].append.call_args.args[0]
+    assert quarantined.column("event_type").to_pylist() == ["signup", "user_lgoin", "signup"]
+    stats = data_processor.get_router().stats()
+    assert stats["quarantine"]["events"] == 3
+    assert stats["quarantine"]["rows_written"] == 3
+    assert stats["user_login"]["appends"] == 1
+
+def test_batch_handler_write_failure_fails_table_records(mock_catalog, sample_event, mock_context):
+    """Test a failed append marks every record of that table as failed."""
+    events = _make_events(sample_event, ["user_login", "purchase"])
+    mock_table = mock_catalog.load_table.return_value
+    
+    def load_table(name):
+        if name == "events_purchase":
+            raise RuntimeError("commit failed")
+        return mock_table
+    
+    mock_catalog.load_table.side_effect = load_table
+    
+    response = batch_lambda_handler(events, mock_context)
+    
+    assert response["batchItemFailures"] == [{"itemIdentifier": "1"}]
+
+def test_process_events_matches_base_schema(sample_event):
+    """Test the vectorized path returns exactly the columns and types of the base schema."""
+    events = _make_events(sample_event, ["user_login"] * 3)
+    
+    table = process_events(events)
+    
+    assert isinstance(table, pa.Table)
+    assert table.num_rows == 3
+    assert table.schema.equals(schema_to_pyarrow(create_base_schema()))
+    row = table.to_pylist()[0]
+    assert row["event_id"] == events[0]["event_id"]
+    assert row["browser"] == sample_event["metadata"]["browser"]
+    assert row["doc_session_info_session_id"] == sample_event["_doc"]["session_info"]["session_id"]
+    assert row["doc_engagement_scroll_depth"] == sample_event["_doc"]["engagement"]["scroll_depth"]
+    assert row["doc_performance_first_contentful_paint"] == \
+        sample_event["_doc"]["performance"]["first_contentful_paint"]
+    assert row["doc_performance_dom_load_time"] is None
+
+def test_process_events_pads_missing_keys(sample_event):
+    """Test missing keys become nulls and unknown keys are dropped."""
+    events = _make_events(sample_event, ["user_login", "user_login"])
+    del events[0]["metadata"]["browser"]
+    del events[1]["_doc"]["location"]
+    events[1]["metadata"]["extra"] = "value"
+    
+    table = process_events(events)
+    
+    assert table.column("browser").to_pylist() == [None, "chrome"]
+    assert table.column("doc_location_country").to_pylist() == ["US", None]
+    assert "metadata_extra" not in table.column_names
+
+def test_process_events_missing_field(sample_event):
+    """Test the vectorized path rejects events without required fields."""
+    events = _make_events(sample_event, ["user_login", "user_login"])
+    del events[1]["timestamp"]
+    
+    with pytest.raises(ValueError, match="timestamp"):
+        process_events(events)
+
+def test_batch_handler_isolates_bad_timestamp(mock_catalog, sample_event, mock_context):
+    """Test a record the vectorized path cannot parse fails alone."""
+    tables = _tables_by_name(mock_catalog)
+    events = _make_events(sample_event, ["user_login", "user_login"])
+    events[1]["timestamp"] = "not a timestamp"
+    
+    response = batch_lambda_handler(events, mock_context)
+    
+    assert response["batchItemFailures"] == [{"itemIdentifier": "1"}]
+    appended = tables["events_user_login"].append.call_args.args[0]
+    assert appended.column("event_id").to_pylist() == [events[0]["event_id"]]
+
+def test_buffer_durability_batches_across_invocations(monkeypatch, mock_catalog, sample_event, mock_context):
+    """Test ack-on-buffer mode appends once per threshold instead of once per invocation."""
+    monkeypatch.setattr(data_processor, "WRITE_DURABILITY", "buffer")
+    monkeypatch.setattr(data_processor, "WRITE_BUFFER_MAX_ROWS", 3)
+    mock_table = mock_catalog.load_table.return_value
+    
+    responses = [lambda_handler(event, mock_context) for event in _make_events(sample_event, ["user_login"] * 2)]
+    
+    assert [json.loads(r["body"])["status"] for r in responses] == ["buffered", "buffered"]
+    mock_table.append.assert_not_called()
+    
+    lambda_handler(_make_events(sample_event, ["user_login"])[0], mock_context)
+    
+    mock_table.append.assert_called_once()
+    assert mock_table.append.call_args.args[0].num_rows == 3
+
+def test_buffer_durability_gives_up_on_failing_table(monkeypatch, tmp_path, mock_catalog, sample_event, mock_context):
+    """Test rows a table keeps rejecting are spooled to one file with one error record instead of retried forever."""
+    monkeypatch.setattr(data_processor, "WRITE_DURABILITY", "buffer")
+    monkeypatch.setattr(data_processor, "WRITE_BUFFER_MAX_ROWS", 1)
+    monkeypatch.setattr(data_processor, "WRITE_BUFFER_MAX_FLUSH_ATTEMPTS", 2)
+    monkeypatch.setattr(data_processor, "ABANDONED_ROWS_URI", str(tmp_path))
+    tables = _tables_by_name(mock_catalog)
+    tables["events_user_login"] = _mock_table()
+    tables["events_user_login"].append.side_effect = ValueError("schema mismatch")
+    events = _make_events(sample_event, ["user_login", "user_login"])
+    
+    for event in events:
+        lambda_handler(event, mock_context)
+    data_processor.flush_error_sink()
+    
+    assert data_processor.get_write_buffer().pending_rows() == 0
+    rows = [row for batch in tables["error_logs"].append.call_args_list for row in batch.args[0].to_pylist()]
+    abandoned = [row for row in rows if row["error_type"] == "WriteAbandoned"]
+    assert len(abandoned) == 1
+    location = json.loads(abandoned[0]["event_data"])["location"]
+    assert location in abandoned[0]["error_message"]
+    assert pq.read_table(location).column("event_id").to_pylist() == [event["event_id"] for event in events]
+
+def test_abandoned_rows_do_not_overflow_error_sink(monkeypatch, tmp_path, mock_catalog, sample_event):
+    """Test abandoning more rows than the error sink holds keeps every row and drops no records."""
+    monkeypatch.setattr(data_processor, "WRITE_DURABILITY", "buffer")
+    monkeypatch.setattr(data_processor, "WRITE_BUFFER_MAX_FLUSH_ATTEMPTS", 1)
+    monkeypatch.setattr(data_processor, "ABANDONED_ROWS_URI", str(tmp_path))
+    tables = _tables_by_name(mock_catalog)
+    tables["events_user_login"] = _mock_table()
+    tables["events_user_login"].append.side_effect = ValueError("schema mismatch")
+    row_count = data_processor.get_error_sink().max_pending + 5000
+    arrow_table = pa.concat_tables([process_events([sample_event])] * row_count)
+    
+    data_processor.get_write_buffer().add("user_login", arrow_table)
+    data_processor.get_write_buffer().flush()
+    data_processor.flush_error_sink()
+    
+    assert data_processor.get_error_sink().stats()["dropped"] == 0
+    rows = [row for batch in tables["error_logs"].append.call_args_list for row in batch.args[0].to_pylist()]
+    abandoned = [row for row in rows if row["error_type"] == "WriteAbandoned"]
+    assert len(abandoned) == 1
+    assert pq.read_table(json.loads(abandoned[0]["event_data"])["location"]).num_rows == row_count
+
+def test_buffer_flushes_when_invocation_time_runs_out(monkeypatch, mock_catalog, sample_event, mock_context):
+    """Test buffered rows are flushed when the invocation is about to time out."""
+    monkeypatch.setattr(data_processor, "WRITE_DURABILITY", "buffer")
+    mock_context.get_remaining_time_in_millis = lambda: 1000
+    
+    response = batch_lambda_handler(_make_events(sample_event, ["purchase", "purchase"]), mock_context)
+    
+    assert response == {"batchItemFailures": []}
+    mock_catalog.load_table.return_value.append.assert_called_once()
+    assert data_processor.get_write_buffer().pending_rows() == 0
+
+def test_write_to_iceberg_reuses_table_handles(mock_catalog, sample_event):
+    """Test warm writes reuse the cached table handle instead of reloading it."""
+    arrow_table = process_events([sample_event])
+    
+    for _ in range(3):
+        write_to_iceberg(arrow_table, "user_login")
+    
+    mock_catalog.load_table.assert_called_once_with("events_user_login")
+    assert mock_catalog.load_table.return_value.append.call_count == 3
+    #one lookup to align the batch and one to commit it per write
+    assert data_processor.get_table_cache().stats()["hits"] == 5
+    assert data_processor.get_table_cache().stats()["misses"] == 1
+
+def test_write_to_iceberg_retries_conflict_after_refresh(mock_catalog, sample_event):
+    """Test a commit conflict refreshes only the affected table handle and retries."""
+    tables = _tables_by_name(mock_catalog)
+    arrow_table = process_events([sample_event])
+    write_to_iceberg(arrow_table, "purchase")
+    tables["events_user_login"] = _mock_table()
+    tables["events_user_login"].append.side_effect = [CommitFailedException("conflict"), None]
+    
+    write_to_iceberg(arrow_table, "user_login")
+    
+    assert tables["events_user_login"].append.call_count == 2
+    tables["events_user_login"].refresh.assert_called_once()
+    tables["events_purchase"].refresh.assert_not_called()
+    assert data_processor.get_commit_coordinator().stats()["conflicts"] == 1
+
+def test_write_to_iceberg_raises_persistent_conflict(monkeypatch, mock_catalog, sample_event):
+    """Test a conflict that outlasts every attempt is raised."""
+    monkeypatch.setattr(data_processor, "COMMIT_MAX_ATTEMPTS", 2)
+    mock_catalog.load_table.return_value.append.side_effect = CommitFailedException("conflict")
+    
+    with pytest.raises(CommitFailedException):
+        write_to_iceberg(process_events([sample_event]), "user_login")
+    
+    assert mock_catalog.load_table.return_value.append.call_count == 2
+
+def test_lambda_handler_error_logs_one_record(mock_catalog, sample_event, mock_context):
+    """Test an error logged at several stages produces a single error record."""
+    tables = _tables_by_name(mock_catalog)
+    sample_event["timestamp"] = "not a timestamp"
+    
+    response = lambda_handler(sample_event, mock_context)
+    
+    assert response["statusCode"] == 500
+    tables["error_logs"].append.assert_called_once()
+    rows = tables["error_logs"].append.call_args.args[0].to_pylist()
+    assert len(rows) == 1
+    assert rows[0]["processing_stage"] == "process_events"
+    assert rows[0]["event_id"] == sample_event["event_id"]
+    assert json.loads(rows[0]["event_data"])["event_id"] == sample_event["event_id"]
+
+def test_batch_handler_logs_each_record_of_a_failed_batch(mock_catalog, sample_event, mock_context):
+    """Test records isolated by the one-by-one fallback are logged with their own payload."""
+    tables = _tables_by_name(mock_catalog)
+    events = _make_events(sample_event, ["user_login"] * 4)
+    events[1]["_doc"]["session_info"]["duration"] = "an hour"
+    events[3]["_doc"]["session_info"]["duration"] = "two hours"
+    
+    response = batch_lambda_handler(events, mock_context)
+    
+    assert response["batchItemFailures"] == [{"itemIdentifier": "1"}, {"itemIdentifier": "3"}]
+    assert tables["events_user_login"].append.call_args.args[0].num_rows == 2
+    rows = tables["error_logs"].append.call_args.args[0].to_pylist()
+    record_rows = [row for row in rows if row["event_id"] is not None]
+    assert [row["event_id"] for row in record_rows] == [events[1]["event_id"], events[3]["event_id"]]
+    assert [row["event_type"] for row in record_rows] == ["user_login", "user_login"]
+    assert json.loads(record_rows[1]["event_data"])["_doc"]["session_info"]["duration"] == "two hours"
+    assert len(rows) == 3
+
+def test_batch_handler_writes_errors_in_one_commit(mock_catalog, sample_event, mock_context):
+    """Test errors from several records are written to error_logs in one append."""
+    tables = _tables_by_name(mock_catalog)
+    events = _make_events(sample_event, ["user_login"] * 3)
+    for event in events:
+        del event["user_id"]
+    
+    response = batch_lambda_handler(events, mock_context)
+    
+    assert len(response["batchItemFailures"]) == 3
+    tables["error_logs"].append.assert_called_once()
+    assert tables["error_logs"].append.call_args.args[0].num_rows == 3
+
+
+def test_lambda_handler_decodes_raw_payloads(mock_catalog, sample_event, mock_context):
+    """Test bytes and memoryview payloads are decoded, with NDJSON handled as a batch."""
+    tables = _tables_by_name(mock_catalog)
+    events = _make_events(sample_event, ["user_login", "purchase"])
+    ndjson = b"".join(json.dumps(event).encode() + b"\n" for event in events)
+    
+    single = lambda_handler(memoryview(json.dumps(events[0]).encode()), mock_context)
+    batch = lambda_handler(ndjson, mock_context)
+    
+    assert single["statusCode"] == 200
+    assert json.loads(single["body"])["event_id"] == events[0]["event_id"]
+    assert batch == {"batchItemFailures": []}
+    assert tables["events_user_login"].append.call_count == 2
+    tables["events_purchase"].append.assert_called_once()
+
+def test_lambda_handler_rejects_undecodable_payload(mock_catalog, mock_context):
+    """Test a raw payload that is not JSON returns a client error and is logged."""
+    tables = _tables_by_name(mock_catalog)
+    
+    response = lambda_handler(b"{not json", mock_context)
+    
+    assert response["statusCode"] == 400
+    rows = tables["error_logs"].append.call_args.args[0].to_pylist()
+    assert rows[0]["error_type"] == "DecodeError"
+
+@pytest.mark.parametrize("payload", [b'"just a string"', b"42", bytearray(b"null"), "plain text"])
+def test_lambda_handler_rejects_non_event_payload(mock_catalog, mock_context, payload):
+    """Test a payload decoding to a JSON scalar or string returns a client error."""
+    tables = _tables_by_name(mock_catalog)
+    
+    response = lambda_handler(payload, mock_context)
+    
+    assert response["statusCode"] == 400
+    assert "does not decode to an event object" in json.loads(response["body"])["error"]
+    rows = tables["error_logs"].append.call_args.args[0].to_pylist()
+    assert rows[0]["error_type"] == "DecodeError"
+
+def test_process_events_normalizes_timestamp_formats(sample_event):
+    """Test ISO timestamps with and without "Z" or an offset and epoch values parse to UTC."""
+    events = _make_events(sample_event, ["user_login"] * 5)
+    for event, timestamp in zip(events, [
+        "2024-01-02T03:04:05.250000Z",
+        "2024-01-02T03:04:05.25",
+        "2024-01-02T04:04:05.25+01:00",
+        1704164645250,
+        "1704164645250000"
+    ]):
+        event["timestamp"] = timestamp
+    
+    result = process_events(events)
+    
+    expected = datetime.datetime(2024, 1, 2, 3, 4, 5, 250000)
+    assert result.column("timestamp").to_pylist() == [expected] * 5
+
+def test_batch_handler_logs_only_bad_timestamp_rows(mock_catalog, sample_event, mock_context):
+    """Test unparseable timestamps reject their own rows without a fallback pass."""
+    tables = _tables_by_name(mock_catalog)
+    events = _make_events(sample_event, ["user_login"] * 4)
+    events[0]["timestamp"] = datetime.datetime.now().isoformat()
+    events[2]["timestamp"] = "yesterday"
+    
+    response = batch_lambda_handler(events, mock_context)
+    
+    assert response["batchItemFailures"] == [{"itemIdentifier": "2"}]
+    assert tables["events_user_login"].append.call_args.args[0].num_rows == 3
+    rows = tables["error_logs"].append.call_args.args[0].to_pylist()
+    assert [(row["error_type"], row["event_id"]) for row in rows] == [("TimestampError", events[2]["event_id"])]
+
+def test_batch_handler_emits_stage_metrics(monkeypatch, mock_catalog, sample_event, mock_context, tmp_path):
+    """Test a batch invocation flushes one EMF line covering every pipeline stage."""
+    output = tmp_path / "metrics.jsonl"
+    monkeypatch.setattr(data_processor, "METRICS_OUTPUT", str(output))
+    events = _make_events(sample_event, ["user_login", "purchase", "user_login"])
+    batch = {
+        "Records": [
+            {"messageId": f"msg-{i}", "body": json.dumps(event), "eventSource": "aws:sqs"}
+            for i, event in enumerate(events)
+        ] + [{"messageId": "msg-bad", "body": "{not json", "eventSource": "aws:sqs"}]
+    }
+    
+    batch_lambda_handler(batch, mock_context)
+    
+    lines = output.read_text().splitlines()
+    assert len(lines) == 1
+    document = json.loads(lines[0])
+    names = {metric["Name"] for metric in document["_aws"]["CloudWatchMetrics"][0]["Metrics"]}
+    for stage in ["decode", "validate", "flatten", "parse_timestamps", "to_arrow", "catalog_load", "commit"]:
+        assert f"{stage}_latency" in names
+    assert document["commit_latency"]["Count"] == 2
+    assert document["records_received"] == 4
+    assert document["records_failed"] == 1
+    assert document["rows_written"] == 3
+    assert document["appends"] == 2
+    assert document["commits_total"] == 2
+    assert document["Service"] == "data-processor"
+
+def test_warm_up_preloads_tables_for_first_invocation(mock_catalog, sample_event, mock_context):
+    """Test warm-up loads the table handles so the first request makes no catalog calls."""
+    report = data_processor.warm_up(["events_user_login", "error_logs"])
+    loads = mock_catalog.load_table.call_count
+    
+    response = batch_lambda_handler(_make_events(sample_event, ["user_login"]), mock_context)
+    
+    assert report["tables"] == ["events_user_login", "error_logs"]
+    assert report["failed"] == {}
+    assert loads == 2
+    assert mock_catalog.load_table.call_count == loads
+    assert response == {"batchItemFailures": []}
+
+def test_warm_up_seeds_deduplicator_from_routed_tables(monkeypatch, mock_catalog, sample_event, mock_context):
+    """Test warm-up seeds the routed tables it loaded so the first append reads no snapshots."""
+    monkeypatch.setattr(data_processor, "DEDUP_ENABLED", True)
+    seeds = []
+    monkeypatch.setattr(data_processor, "_recent_event_ids", lambda table_name, limit: seeds.append(table_name))
+    
+    data_processor.warm_up(["events_user_login", "error_logs"])
+    batch_lambda_handler(_make_events(sample_event, ["user_login"]), mock_context)
+    
+    assert seeds == ["events_user_login"]
+
+def test_warm_up_reports_missing_tables(mock_catalog):
+    """Test a table that cannot be loaded is reported instead of failing the warm-up."""
+    mock_catalog.load_table.side_effect = [_mock_table(), Exception("no such table")]
+    
+    report = data_processor.warm_up(["events_user_login", "events_missing"])
+    
+    assert report["tables"] == ["events_user_login"]
+    assert report["failed"] == {"events_missing": "no such table"}
+
+def test_compress_data_codecs_and_type_check():
+    """Test compress_data honours the codec and rejects non-bytes instead of passing them through."""
+    data = b"test data" * 100
+    
+    for codec in ["gzip", "zstd", "lz4", "snappy"]:
+        assert compression.decompress(compress_data(data, codec), codec) == data
+    with pytest.raises(TypeError):
+        compress_data("test data")
+
+def test_lambda_handler_returns_archive_location(monkeypatch, mock_catalog, sample_event, mock_context, tmp_path):
+    """Test the handler returns the real archive key and row of the event once archiving is on."""
+    monkeypatch.setattr(data_processor, "ARCHIVE_URI", str(tmp_path))
+    monkeypatch.setattr(data_processor, "ARCHIVE_MAX_EVENTS", 2)
+    second = dict(sample_event, event_id="654321")
+    
+    first_body = json.loads(lambda_handler(sample_event, mock_context)["body"])
+    second_body = json.loads(lambda_handler(second, mock_context)["body"])
+    
+    assert first_body["s3_key"] == second_body["s3_key"]
+    assert first_body["s3_key"].startswith("events/user_login/")
+    assert (first_body["archive_row"], second_body["archive_row"]) == (0, 1)
+    lines = compression.decompress((tmp_path / first_body["s3_key"]).read_bytes(), "zstd").splitlines()
+    assert [json.loads(line)["event_id"] for line in lines] == ["123456", "654321"]
+
+def test_batch_handler_archives_only_committed_records(monkeypatch, mock_catalog, sample_event, mock_context, tmp_path):
+    """Test a batch archives the events that were written and skips records sent back for retry."""
+    monkeypatch.setattr(data_processor, "ARCHIVE_URI", str(tmp_path))
+    events = _make_events(sample_event, ["user_login", "purchase", "user_login"])
+    del events[1]["user_id"]
+    
+    batch_lambda_handler(events, mock_context)
+    data_processor.flush_archive(force=True)
+    
+    objects = [path for path in tmp_path.rglob("*.ndjson.zst")]
+    assert len(objects) == 1
+    lines = compression.decompress(objects[0].read_bytes(), "zstd").splitlines()
+    assert [json.loads(line)["event_id"] for line in lines] == [events[0]["event_id"], events[2]["event_id"]]
+
+def test_unwritable_archive_events_go_to_error_logs(monkeypatch, mock_catalog, sample_event, mock_context, tmp_path):
+    """Test events of an archive object that keeps failing are logged with their data."""
+    tables = _tables_by_name(mock_catalog)
+    blocked = tmp_path / "blocked"
+    blocked.write_text("not a directory")
+    monkeypatch.setattr(data_processor, "ARCHIVE_URI", str(blocked))
+    monkeypatch.setattr(data_processor, "ARCHIVE_MAX_WRITE_ATTEMPTS", 2)
+    events = _make_events(sample_event, ["user_login", "user_login"])
+    
+    batch_lambda_handler(events, mock_context)
+    data_processor.flush_archive(force=True)
+    data_processor.flush_archive(force=True)
+    data_processor.flush_error_sink()
+    
+    rows = [row for batch in tables["error_logs"].append.call_args_list for row in batch.args[0].to_pylist()]
+    abandoned = [row for row in rows if row["error_type"] == "ArchiveAbandoned"]
+    assert [json.loads(row["event_data"])["event_id"] for row in abandoned] == [event["event_id"] for event in events]
+    assert data_processor.get_archive().stats()["pending_events"] == 0
+
+def test_import_defers_cold_path_modules():
+    """Test importing the processor leaves the cold-path modules unimported."""
+    script = (
+        "import sys, json\n"
+        "from apps.lambda_processor import data_processor\n"
+        f"print(json.dumps([name for name in {DEFERRED_MODULES!r} if name in sys.modules]))"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    env = {key: value for key, value in os.environ.items() if key != "WARM_UP_ON_INIT"}
+    env["PYTHONPATH"] = root
+    
+    completed = subprocess.run([sys.executable, "-c", script], env=env, cwd=root, capture_output=True, text=True, check=True)
+    
+    assert json.loads(completed.stdout) == []
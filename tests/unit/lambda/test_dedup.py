@@ -0,0 +1,123 @@
+import pytest
+import polars as pl
+import pyarrow as pa
+from apps.lambda_processor.dedup import BloomFilter, Deduplicator, blocked_error_rate
+
+def _batch(ids):
+    """Build a batch with one row per event id."""
+    return pa.table({"event_id": pa.array(ids, pa.string()), "value": pa.array(range(len(ids)), pa.int64())})
+
+def _hashes(n, offset=0):
+    """Hash n distinct keys the way the deduplicator does."""
+    keys = pl.select(pl.format("evt-{}", pl.int_range(offset, offset + n))).to_series()
+    return keys.hash(seed=1).to_numpy(), keys.hash(seed=2).to_numpy()
+
+def test_bloom_filter_meets_target_error_rate():
+    """Test a filter at capacity keeps every key and stays near its target rate."""
+    bloom = BloomFilter(100_000, error_rate=0.01)
+    h1, h2 = _hashes(100_000)
+    bloom.add(h1, h2)
+
+    assert bloom.contains(h1, h2).all()
+    observed = bloom.contains(*_hashes(100_000, offset=100_000)).mean()
+    assert observed < 0.015
+    assert bloom.estimated_error_rate() <= 0.01
+    assert blocked_error_rate(bloom.count / bloom.num_words, bloom.num_hashes) == bloom.estimated_error_rate()
+    with pytest.raises(ValueError):
+        BloomFilter(0)
+    with pytest.raises(ValueError):
+        BloomFilter(10, error_rate=1.0)
+
+def test_filter_drops_duplicates_within_a_batch():
+    """Test repeated ids in one batch keep their first row and rows without an id are kept."""
+    dedup = Deduplicator(lambda table_name, candidates: set(), capacity=100)
+
+    result = dedup.filter("events_click", _batch(["a", "b", "a", None, None, "b"]))
+
+    assert result.column("event_id").to_pylist() == ["a", "b", None, None]
+    assert result.column("value").to_pylist() == [0, 1, 3, 4]
+    assert dedup.stats()["batch_duplicates"] == 2
+
+def test_filter_drops_committed_ids_confirmed_by_lookup():
+    """Test a redelivered batch is dropped and filter positives the table lacks are kept."""
+    committed = {"a", "b"}
+    calls = []
+
+    def lookup(table_name, candidates):
+        calls.append((table_name, candidates.column("event_id").to_pylist()))
+        return committed & set(candidates.column("event_id").to_pylist())
+
+    dedup = Deduplicator(lookup, capacity=100)
+    #c was committed to the filter but is missing from the table, like a false positive
+    dedup.mark_committed("events_click", _batch(["a", "b", "c"]))
+
+    result = dedup.filter("events_click", _batch(["a", "c", "d", "b"]))
+
+    assert result.column("event_id").to_pylist() == ["c", "d"]
+    assert calls == [("events_click", ["a", "c", "b"])]
+    stats = dedup.stats()
+    assert stats["committed_duplicates"] == 2
+    assert stats["false_positives"] == 1
+    assert stats["false_positive_rate"] == 0.5
+    #the same ids in another table are not duplicates
+    assert dedup.filter("events_search", _batch(["a", "b"])).num_rows == 2
+    assert len(calls) == 1
+
+def test_filter_generations_bound_memory():
+    """Test the filters rotate at capacity, keeping two generations and forgetting older ids."""
+    dedup = Deduplicator(lambda table_name, candidates: set(candidates.column("event_id").to_pylist()), capacity=10)
+    for generation in range(3):
+        dedup.mark_committed("events_click", _batch([f"{generation}-{i}" for i in range(10)]))
+
+    stats = dedup.stats()
+    assert stats["keys"] == 10
+    assert stats["memory_bytes"] == 2 * BloomFilter(10).nbytes
+    assert dedup.filter("events_click", _batch(["2-0"])).num_rows == 0
+    assert dedup.filter("events_click", _batch(["0-0"])).num_rows == 1
+    assert 0 < stats["estimated_false_positive_rate"] < 1
+
+def test_filter_seeds_each_table_once_from_committed_ids():
+    """Test a fresh deduplicator learns a table's recent ids before its first batch."""
+    committed = {"events_click": ["a", "b", None]}
+    seeds = []
+
+    def seed(table_name, limit):
+        seeds.append((table_name, limit))
+        return pa.array(committed.get(table_name, []), pa.string())
+
+    def lookup(table_name, candidates):
+        return set(committed.get(table_name, [])) & set(candidates.column("event_id").to_pylist())
+
+    dedup = Deduplicator(lookup, capacity=100, seed=seed)
+
+    assert dedup.filter("events_click", _batch(["a", "c"])).column("event_id").to_pylist() == ["c"]
+    assert dedup.filter("events_click", _batch(["b"])).num_rows == 0
+    assert dedup.filter("events_search", _batch(["a"])).num_rows == 1
+    assert seeds == [("events_click", 100), ("events_search", 100)]
+    stats = dedup.stats()
+    assert stats["seeded_keys"] == 2
+    assert stats["committed_duplicates"] == 2
+
+def test_failed_seed_is_reported_once_and_does_not_block_batches():
+    """Test a table whose seeding fails still gets its batches filtered and is not seeded again."""
+    seeds = []
+    errors = []
+
+    def seed(table_name, limit):
+        seeds.append(table_name)
+        raise OSError("manifest unavailable")
+
+    dedup = Deduplicator(
+        lambda table_name, candidates: set(),
+        capacity=100,
+        seed=seed,
+        on_seed_error=lambda table_name, error: errors.append((table_name, str(error)))
+    )
+    dedup.seed_tables(["events_click"])
+
+    assert dedup.filter("events_click", _batch(["a", "a"])).column("event_id").to_pylist() == ["a"]
+    assert dedup.filter("events_click", _batch(["b"])).num_rows == 1
+    assert seeds == ["events_click"]
+    assert errors == [("events_click", "manifest unavailable")]
+    assert dedup.stats()["seed_failures"] == 1
+
@@ -0,0 +1,191 @@
+import json
+import time
+import threading
+from datetime import datetime
+from unittest.mock import MagicMock
+import pytest
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyiceberg.io.pyarrow import schema_to_pyarrow
+from apps.lambda_processor.error_sink import (
+    ErrorSink,
+    IcebergErrorWriter,
+    NdjsonSpoolWriter,
+    iter_error_chain,
+    spool_table
+)
+from apps.lambda_processor.schemas import create_error_log_schema
+
+def _record(**overrides):
+    """Build an error record."""
+    record = {
+        "error_id": "error-1",
+        "timestamp": datetime(2024, 1, 1),
+        "event_id": None,
+        "event_type": None,
+        "error_type": "ProcessingError",
+        "error_message": "boom",
+        "stack_trace": None,
+        "processing_stage": "process_events",
+        "event_data": None
+    }
+    record.update(overrides)
+    return record
+
+@pytest.fixture
+def written():
+    """Collect the batches handed to the writer."""
+    return []
+
+def test_iter_error_chain():
+    """Test the chain follows explicit causes but not implicit contexts."""
+    root = ValueError("root")
+    try:
+        try:
+            raise root
+        except ValueError as e:
+            raise RuntimeError("wrapped") from e
+    except RuntimeError as wrapped:
+        chain = list(iter_error_chain(wrapped))
+    try:
+        try:
+            raise root
+        except ValueError:
+            raise KeyError("while handling")
+    except KeyError as distinct:
+        unrelated = [e is distinct for e in iter_error_chain(distinct)]
+    
+    assert [str(e) for e in chain] == ["wrapped", "root"]
+    assert unrelated == [True]
+
+def test_submit_dedupes_error_chain(written):
+    """Test re-logging an exception or one raised from it is merged into the first record."""
+    sink = ErrorSink(written.extend, background=False)
+    root = ValueError("bad timestamp")
+    wrapped = RuntimeError("handler failed")
+    wrapped.__cause__ = root
+    
+    assert sink.submit(_record(), root) is True
+    assert sink.submit(_record(event_id="123", event_type="purchase"), root) is False
+    assert sink.submit(_record(error_type="HandlerError"), wrapped) is False
+    sink.flush()
+    
+    assert len(written) == 1
+    assert written[0]["event_id"] == "123"
+    assert written[0]["event_type"] == "purchase"
+    assert sink.stats()["deduplicated"] == 2
+
+def test_submit_keeps_errors_raised_while_handling_a_logged_one(written):
+    """Test an error raised in the except block of a logged error gets its own record."""
+    sink = ErrorSink(written.extend, background=False)
+    batch_error = ValueError("batch failed")
+    sink.submit(_record(), batch_error)
+    try:
+        try:
+            raise batch_error
+        except ValueError:
+            raise ValueError("record 2 failed")
+    except ValueError as record_error:
+        assert sink.submit(_record(event_id="2"), record_error) is True
+    sink.flush()
+    
+    assert [record["event_id"] for record in written] == [None, "2"]
+    assert sink.stats()["deduplicated"] == 0
+
+def test_submit_without_exception_is_not_deduped(written):
+    """Test records logged outside an exception are all kept."""
+    sink = ErrorSink(written.extend, background=False)
+    
+    sink.submit(_record())
+    sink.submit(_record())
+    
+    assert sink.flush() == 2
+
+def test_submit_drops_when_full(written):
+    """Test the pending buffer is bounded."""
+    sink = ErrorSink(written.extend, max_pending=2, background=False)
+    
+    results = [sink.submit(_record()) for _ in range(3)]
+    
+    assert results == [True, True, False]
+    assert sink.stats()["dropped"] == 1
+
+def test_flush_survives_writer_failure(capsys):
+    """Test a failing writer is reported without raising."""
+    def failing_writer(records):
+        raise RuntimeError("commit failed")
+    
+    sink = ErrorSink(failing_writer, background=False)
+    sink.submit(_record())
+    
+    assert sink.flush() == 0
+    assert sink.stats()["write_failures"] == 1
+    assert "commit failed" in capsys.readouterr().out
+
+def test_flush_gives_up_waiting_on_a_write_in_flight(written):
+    """Test a bounded flush returns while another flush still holds the writer."""
+    started = threading.Event()
+    release = threading.Event()
+    
+    def slow_writer(records):
+        started.set()
+        release.wait(5)
+        written.append(records)
+    
+    sink = ErrorSink(slow_writer, background=False)
+    sink.submit(_record())
+    in_flight = threading.Thread(target=sink.flush)
+    in_flight.start()
+    started.wait(5)
+    sink.submit(_record(error_id="error-2"))
+    
+    assert sink.flush(timeout_seconds=0.01) == 0
+    assert sink.stats()["pending"] == 1
+    release.set()
+    in_flight.join(5)
+    assert sink.flush(timeout_seconds=0.01) == 1
+    assert [len(batch) for batch in written] == [1, 1]
+
+def test_background_flush_when_batch_full(written):
+    """Test the background thread writes once the batch size is reached."""
+    sink = ErrorSink(written.append, max_batch=2, flush_interval_seconds=60)
+    
+    sink.submit(_record())
+    sink.submit(_record())
+    deadline = time.monotonic() + 5
+    while not written and time.monotonic() < deadline:
+        time.sleep(0.01)
+    
+    assert [len(batch) for batch in written] == [2]
+
+def test_iceberg_writer_appends_one_batch():
+    """Test error batches become one typed append."""
+    table = MagicMock()
+    writer = IcebergErrorWriter(lambda: table, schema_to_pyarrow(create_error_log_schema()))
+    
+    writer([_record(), _record(error_id="error-2")])
+    
+    appended = table.append.call_args.args[0]
+    assert appended.num_rows == 2
+    assert appended.schema.field("timestamp").type == pa.timestamp("us")
+
+def test_ndjson_spool_writer(tmp_path):
+    """Test error batches are spooled as NDJSON files."""
+    writer = NdjsonSpoolWriter(str(tmp_path / "spool"))
+    
+    writer([_record(), _record(error_id="error-2")])
+    
+    files = list((tmp_path / "spool").iterdir())
+    assert len(files) == 1
+    lines = files[0].read_text().splitlines()
+    assert [json.loads(line)["error_id"] for line in lines] == ["error-1", "error-2"]
+
+def test_spool_table_writes_one_parquet_file(tmp_path):
+    """Test a table is spooled as a single Parquet file at the returned location."""
+    arrow_table = pa.table({"event_id": ["a", "b", "c"]})
+    
+    location = spool_table(str(tmp_path / "abandoned"), "abandoned-purchase", arrow_table)
+    
+    assert [path.name for path in (tmp_path / "abandoned").iterdir()] == [location.rsplit("/", 1)[1]]
+    assert location.rsplit("/", 1)[1].startswith("abandoned-purchase-")
+    assert pq.read_table(location).equals(arrow_table)
@@ -0,0 +1,208 @@
+import gzip
+import json
+import tempfile
+import pytest
+import zstandard
+import pyarrow as pa
+import pyarrow.parquet as pq
+from apps.lambda_processor import compression, data_processor
+from apps.lambda_processor.ingest_files import discover_files, ingest, main, process_file
+from apps.mock_generator.main import EVENT_TYPES, generate_mock_events
+
+@pytest.fixture(autouse=True)
+def reset_module_state(monkeypatch):
+    """Start every test without a loaded catalog, cached tables or error sink."""
+    monkeypatch.setattr(data_processor, "_catalog", None)
+    monkeypatch.setattr(data_processor, "_table_cache", None)
+    monkeypatch.setattr(data_processor, "_commit_coordinator", None)
+    monkeypatch.setattr(data_processor, "_error_sink", None)
+    monkeypatch.setattr(data_processor, "_metrics", None)
+    monkeypatch.setattr(data_processor, "_archive", None)
+    monkeypatch.setattr(data_processor, "_schema_aligner", None)
+    monkeypatch.setattr(data_processor, "_router", None)
+    monkeypatch.setattr(data_processor, "_deduplicator", None)
+    monkeypatch.setattr(data_processor, "_upsert_writer", None)
+    monkeypatch.setattr(data_processor, "ICEBERG_NAMESPACE", "")
+    monkeypatch.setattr(data_processor, "ERROR_SINK_BACKGROUND", False)
+
+def _make_events(num_events, seed):
+    """Generate mock events exactly as the generator emits them."""
+    return list(generate_mock_events(num_events, seed=seed, as_arrow=False))
+
+def _ndjson(events):
+    """Encode events as NDJSON bytes."""
+    return "".join(json.dumps(event) + "\n" for event in events).encode("utf-8")
+
+def _ingest(local_catalog, inputs, **kwargs):
+    """Ingest into the local catalog the same way the CLI does."""
+    return ingest(
+        inputs,
+        catalog_name="local",
+        catalog_properties={"type": "sql", **local_catalog.properties},
+        namespace="events_db",
+        **kwargs
+    )
+
+def _committed_rows(local_catalog):
+    """Count the rows committed to every event table."""
+    return sum(
+        local_catalog.load_table(f"events_db.events_{event_type}").scan().to_arrow().num_rows
+        for event_type in EVENT_TYPES
+    )
+
+def test_ingest_ndjson_compressed_and_parquet(local_catalog, tmp_path):
+    """Test that plain, gzip and zstd NDJSON and Parquet dumps all land in the event tables."""
+    dumps = tmp_path / "dumps"
+    (dumps / "nested").mkdir(parents=True)
+    (dumps / "plain.ndjson").write_bytes(_ndjson(_make_events(100, 1)))
+    (dumps / "nested" / "gzipped.jsonl.gz").write_bytes(gzip.compress(_ndjson(_make_events(100, 2))))
+    (dumps / "zstd.ndjson.zst").write_bytes(zstandard.ZstdCompressor().compress(_ndjson(_make_events(100, 3))))
+    pq.write_table(pa.Table.from_pylist(_make_events(100, 4)), str(dumps / "columnar.parquet"))
+    (dumps / "notes.txt").write_text("not an event dump")
+
+    report = _ingest(local_catalog, [str(dumps)], workers=0, chunk_size=30)
+
+    assert report["files_found"] == 4
+    assert report["files_ingested"] == 4
+    assert report["rows_committed"] == 400
+    assert report["rows_rejected"] == 0
+    assert _committed_rows(local_catalog) == 400
+    #one large append per event type table instead of one per file or chunk
+    assert report["commits"] == len(EVENT_TYPES)
+
+def test_ingest_rejects_bad_lines_to_error_spool(local_catalog, tmp_path):
+    """Test that undecodable and invalid events are rejected without failing the file."""
+    events = _make_events(10, 5)
+    del events[3]["user_id"]
+    dump = tmp_path / "events.ndjson"
+    dump.write_bytes(_ndjson(events) + b"{not json\n")
+    spool = tmp_path / "errors"
+
+    report = _ingest(local_catalog, [str(dump)], workers=0, error_spool=str(spool))
+
+    assert report["rows_committed"] == 9
+    assert report["rows_rejected"] == 2
+    records = [json.loads(line) for path in spool.iterdir() for line in path.read_text().splitlines()]
+    assert sorted(record["error_type"] for record in records) == ["DecodeError", "ValidationError"]
+
+def test_ingest_commits_large_file_in_spooled_parts(local_catalog, tmp_path, monkeypatch):
+    """Test a file is spooled chunk by chunk and committed part way through, then cleaned up."""
+    spool_root = tmp_path / "tmp"
+    spool_root.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(spool_root))
+    dump = tmp_path / "events.ndjson"
+    dump.write_bytes(_ndjson(_make_events(200, 11)))
+    checkpoint = tmp_path / "checkpoint.json"
+
+    result = process_file(str(dump), str(spool_root), chunk_size=40)
+    report = _ingest(local_catalog, [str(dump)], workers=0, chunk_size=40, commit_rows=100, checkpoint_path=str(checkpoint))
+
+    assert max(len(parts) for parts in result["parts"].values()) == 5
+    assert report["rows_committed"] == 200
+    assert report["commits"] > len(EVENT_TYPES)
+    assert report["files_ingested"] == 1
+    assert _committed_rows(local_catalog) == 200
+    assert list(json.loads(checkpoint.read_text())["files"]) == [str(dump)]
+    assert list(spool_root.glob("ingest-spool-*")) == []
+
+def test_ingest_resumes_from_checkpoint(local_catalog, tmp_path):
+    """Test that files recorded in the checkpoint are skipped on the next run."""
+    dumps = tmp_path / "dumps"
+    dumps.mkdir()
+    checkpoint = tmp_path / "checkpoint.json"
+    (dumps / "first.ndjson").write_bytes(_ndjson(_make_events(50, 6)))
+
+    first = _ingest(local_catalog, [str(dumps / "*.ndjson")], workers=0, checkpoint_path=str(checkpoint))
+    (dumps / "second.ndjson").write_bytes(_ndjson(_make_events(30, 7)))
+    second = _ingest(local_catalog, [str(dumps / "*.ndjson")], workers=0, checkpoint_path=str(checkpoint))
+
+    assert first["rows_committed"] == 50
+    assert second["files_skipped"] == 1
+    assert second["rows_committed"] == 30
+    assert _committed_rows(local_catalog) == 80
+    assert sorted(json.loads(checkpoint.read_text())["files"]) == discover_files([str(dumps)])
+
+@pytest.mark.parametrize("codec", ["gzip", "zstd", "lz4", "snappy"])
+def test_ingest_truncated_dump_fails_without_checkpoint(local_catalog, tmp_path, codec):
+    """Test a compressed dump cut in half fails instead of committing its first half as complete."""
+    compressed = compression.compress(_ndjson(_make_events(2000, 9)), codec)
+    dump = tmp_path / f"events.ndjson{compression.get_codec(codec).extensions[0]}"
+    dump.write_bytes(compressed[:len(compressed) // 2])
+    checkpoint = tmp_path / "checkpoint.json"
+
+    with pytest.raises(EOFError):
+        process_file(str(dump), str(tmp_path))
+    with pytest.raises(EOFError):
+        _ingest(local_catalog, [str(dump)], workers=0, checkpoint_path=str(checkpoint))
+
+    assert not checkpoint.exists()
+    assert _committed_rows(local_catalog) == 0
+
+def test_ingest_redelivered_dump_is_committed_once(local_catalog, tmp_path):
+    """Test a dump ingested again without a checkpoint adds no duplicate events."""
+    dump = tmp_path / "events.ndjson"
+    events = _make_events(60, 8)
+    dump.write_bytes(_ndjson(events + events[:10]))
+
+    _ingest(local_catalog, [str(dump)], workers=0, chunk_size=25)
+    _ingest(local_catalog, [str(dump)], workers=0)
+
+    assert _committed_rows(local_catalog) == 60
+    stats = data_processor.get_deduplicator().stats()
+    assert stats["batch_duplicates"] == 20
+    assert stats["committed_duplicates"] == 60
+    assert stats["false_positives"] == 0
+
+def test_ingest_redelivered_dump_on_a_fresh_process(local_catalog, tmp_path, monkeypatch):
+    """Test a second run with a new deduplicator still finds the ids the first run committed."""
+    dump = tmp_path / "events.ndjson"
+    dump.write_bytes(_ndjson(_make_events(60, 10)))
+
+    _ingest(local_catalog, [str(dump)], workers=0)
+    monkeypatch.setattr(data_processor, "_deduplicator", None)
+    _ingest(local_catalog, [str(dump)], workers=0)
+
+    assert _committed_rows(local_catalog) == 60
+    stats = data_processor.get_deduplicator().stats()
+    assert stats["seeded_keys"] == 60
+    assert stats["committed_duplicates"] == 60
+
+def test_recent_event_ids_skip_files_a_newer_snapshot_removed(local_catalog, tmp_path):
+    """Test the seed reads the files recent snapshots added and leaves out the ones overwritten since."""
+    dump = tmp_path / "events.ndjson"
+    dump.write_bytes(_ndjson(_make_events(60, 11)))
+    _ingest(local_catalog, [str(dump)], workers=0)
+    table_name = next(
+        f"events_{event_type}" for event_type in EVENT_TYPES
+        if local_catalog.load_table(f"events_db.events_{event_type}").scan().to_arrow().num_rows > 1
+    )
+    table = local_catalog.load_table(f"events_db.{table_name}")
+    kept = table.scan().to_arrow().slice(0, 1)
+    table.overwrite(kept)
+
+    assert data_processor._recent_event_ids(table_name, 1000).to_pylist() == kept.column("event_id").to_pylist()
+
+def test_ingest_with_worker_processes(local_catalog, tmp_path, capsys):
+    """Test the CLI with files processed by a process pool and committed by the parent."""
+    dumps = tmp_path / "dumps"
+    dumps.mkdir()
+    for seed in range(4):
+        (dumps / f"part-{seed}.ndjson").write_bytes(_ndjson(_make_events(100, seed)))
+    properties = local_catalog.properties
+
+    exit_code = main([
+        str(dumps),
+        "--workers", "2",
+        "--commit-rows", "200",
+        "--catalog-name", "local",
+        "--catalog-type", "sql",
+        "--catalog-uri", properties["uri"],
+        "--warehouse", properties["warehouse"],
+        "--namespace", "events_db"
+    ])
+    report = json.loads(capsys.readouterr().out)
+
+    assert exit_code == 0
+    assert report["files_ingested"] == 4
+    assert report["rows_committed"] == 400
+    assert _committed_rows(local_catalog) == 400
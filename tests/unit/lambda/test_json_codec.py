@@ -0,0 +1,35 @@
+import json
+import pytest
+import datetime
+from apps.lambda_processor.json_codec import decode_payload, dumps, loads, loads_lines
+
+def test_loads_accepts_raw_buffers():
+    """Test str, bytes, bytearray and memoryview input decode the same way."""
+    document = '{"event_id": "1", "nested": {"values": [1, 2.5, null]}}'
+    expected = json.loads(document)
+    
+    for data in (document, document.encode(), bytearray(document.encode()), memoryview(document.encode())):
+        assert loads(data) == expected
+
+def test_loads_rejects_invalid_json():
+    """Test invalid input raises ValueError like the stdlib decoder."""
+    with pytest.raises(ValueError):
+        loads(b"{not json")
+
+def test_dumps_is_compact_and_encodes_datetimes():
+    """Test encoding produces compact JSON the stdlib can read back."""
+    encoded = dumps({"at": datetime.datetime(2024, 1, 2, 3, 4, 5), "ids": [1, 2]})
+    
+    assert " " not in encoded
+    assert json.loads(encoded) == {"at": "2024-01-02T03:04:05", "ids": [1, 2]}
+
+def test_loads_lines_skips_blank_lines():
+    """Test NDJSON decoding ignores blank and whitespace-only lines."""
+    assert loads_lines(b'{"a": 1}\n\n  \n{"a": 2}\n') == [{"a": 1}, {"a": 2}]
+
+def test_decode_payload_detects_ndjson():
+    """Test a single document is returned as is and NDJSON as a list of documents."""
+    assert decode_payload(b'{"a": 1}') == {"a": 1}
+    assert decode_payload(memoryview(b'{"a": 1}\n{"a": 2}')) == [{"a": 1}, {"a": 2}]
+    with pytest.raises(ValueError):
+        decode_payload(b'{"a": 1}\n{broken')
@@ -0,0 +1,87 @@
+import json
+import random
+import pytest
+from apps.lambda_processor.metrics import EMF_MAX_VALUES, FileLineWriter, LatencyHistogram, MetricsRegistry
+
+def _registry(lines, **kwargs):
+    """Build a registry collecting EMF lines in a list at a fixed time."""
+    return MetricsRegistry(writer=lines.append, clock=lambda: 1700000000.0, **kwargs)
+
+def test_histogram_bucket_round_trip():
+    """Test every value falls in a bucket whose lowest value is within 1/16 below it."""
+    for value in list(range(0, 100)) + [random.Random(1).randrange(1, 10 ** 9) for _ in range(1000)]:
+        lowest = LatencyHistogram.bucket_value(LatencyHistogram.bucket_index(value))
+        assert lowest <= value
+        assert value - lowest <= value / 16
+
+def test_histogram_percentiles_within_precision():
+    """Test percentiles of a wide latency distribution are within the bucket precision."""
+    rng = random.Random(7)
+    values = sorted(int(rng.lognormvariate(8, 1.5)) for _ in range(10000))
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    
+    for fraction in (0.5, 0.95, 0.99):
+        exact = values[int(round(fraction * len(values))) - 1]
+        assert abs(histogram.percentile(fraction) - exact) <= exact / 16
+    assert histogram.count == len(values)
+    assert histogram.min == values[0]
+    assert histogram.max == values[-1]
+    assert len(histogram.values_and_counts()[0]) <= EMF_MAX_VALUES
+    assert sum(histogram.values_and_counts(max_values=10)[1]) == len(values)
+
+def test_flush_writes_emf_document():
+    """Test timers, counters and gauges are emitted as one EMF line and then reset."""
+    lines = []
+    metrics = _registry(lines, namespace="Test", dimensions={"Service": "unit"})
+    with metrics.timer("flatten"):
+        pass
+    metrics.observe_ns("flatten", 2_500_000)
+    metrics.count("rows_written", 10)
+    metrics.count("rows_written", 5)
+    metrics.gauge("max_rss_bytes", 1024)
+    
+    assert metrics.flush() is True
+    assert metrics.flush() is False
+    
+    document = json.loads(lines[0])
+    assert len(lines) == 1
+    assert document["_aws"]["Timestamp"] == 1700000000000
+    assert document["_aws"]["CloudWatchMetrics"][0]["Namespace"] == "Test"
+    assert document["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["Service"]]
+    assert document["Service"] == "unit"
+    assert document["flatten_latency"]["Count"] == 2
+    assert document["flatten_latency"]["Max"] == 2500
+    assert sum(document["flatten_latency"]["Counts"]) == 2
+    assert document["rows_written"] == 15
+    units = {m["Name"]: m["Unit"] for m in document["_aws"]["CloudWatchMetrics"][0]["Metrics"]}
+    assert units == {"flatten_latency": "Microseconds", "rows_written": "Count", "max_rss_bytes": "Bytes"}
+
+def test_timer_records_on_error_and_disabled_is_noop(tmp_path):
+    """Test a failing stage is still timed and a disabled registry writes nothing."""
+    path = tmp_path / "metrics.jsonl"
+    metrics = MetricsRegistry(writer=FileLineWriter(str(path)))
+    with pytest.raises(ValueError):
+        with metrics.timer("commit"):
+            raise ValueError("conflict")
+    metrics.flush()
+    
+    disabled = MetricsRegistry(writer=FileLineWriter(str(path)), enabled=False)
+    with disabled.timer("commit"):
+        disabled.count("rows_written", 1)
+    
+    assert disabled.flush() is False
+    lines = path.read_text().splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["commit_latency"]["Count"] == 1
+
+def test_timer_overhead(benchmark):
+    """Benchmark the cost of timing one stage."""
+    metrics = MetricsRegistry(writer=lambda line: None)
+    
+    def timed():
+        with metrics.timer("flatten"):
+            pass
+    
+    benchmark(timed)
@@ -0,0 +1,74 @@
+import datetime
+import pytest
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyiceberg.transforms import BucketTransform, DayTransform, HourTransform
+from apps.lambda_processor import data_processor
+from apps.lambda_processor.partitioning import cluster_for_table, partition_columns
+from apps.lambda_processor.schemas import create_base_schema, create_error_log_schema, create_partition_spec
+
+def test_create_partition_spec_transforms():
+    """Test time partitions with an optional user bucket, instead of raw timestamp identity."""
+    day = create_partition_spec(create_base_schema())
+    hour_bucketed = create_partition_spec(create_base_schema(), "hour", user_buckets=16)
+    
+    assert [type(field.transform) for field in day.fields] == [DayTransform]
+    assert [type(field.transform) for field in hour_bucketed.fields] == [HourTransform, BucketTransform]
+    assert hour_bucketed.fields[1].transform.num_buckets == 16
+    assert create_partition_spec(create_error_log_schema()).fields[0].name == "timestamp_day"
+    with pytest.raises(ValueError, match="granularity"):
+        create_partition_spec(create_base_schema(), "minute")
+
+def test_partition_columns_are_vectorized_transforms():
+    """Test day partition values are days since the epoch."""
+    spec = create_partition_spec(create_base_schema())
+    data = pa.table({"timestamp": pa.array([datetime.datetime(1970, 1, 2, 5), datetime.datetime(1970, 1, 4)], pa.timestamp("us"))})
+    
+    ((name, values),) = partition_columns(spec, create_base_schema(), data)
+    
+    assert name == "timestamp_day"
+    assert values.to_pylist() == [1, 3]
+
+def _events(sample_event, timestamps_and_users):
+    """Copy the sample event once per timestamp and user."""
+    return [
+        dict(sample_event, event_id=str(i), timestamp=timestamp, user_id=user_id)
+        for i, (timestamp, user_id) in enumerate(timestamps_and_users)
+    ]
+
+def test_cluster_for_table_groups_partitions_then_sorts(local_catalog, sample_event):
+    """Test rows are grouped by day and sorted by user within each day."""
+    table = local_catalog.load_table("events_db.events_user_login")
+    data = data_processor.process_events(_events(sample_event, [
+        ("2024-01-02T10:00:00Z", "user_2"),
+        ("2024-01-01T10:00:00Z", "user_3"),
+        ("2024-01-02T09:00:00Z", "user_1"),
+        ("2024-01-01T11:00:00Z", "user_1")
+    ]))
+    
+    clustered = cluster_for_table(table, data)
+    
+    assert clustered.column_names == data.column_names
+    assert clustered.column("user_id").to_pylist() == ["user_1", "user_3", "user_1", "user_2"]
+
+def test_write_to_iceberg_writes_one_file_per_partition(monkeypatch, local_catalog, sample_event):
+    """Test one append spanning several days writes one sorted file per day in one commit."""
+    monkeypatch.setattr(data_processor, "_table_cache", None)
+    monkeypatch.setattr(data_processor, "_commit_coordinator", None)
+    monkeypatch.setattr(data_processor, "_catalog", local_catalog)
+    monkeypatch.setattr(data_processor, "ICEBERG_NAMESPACE", "events_db")
+    days = ["2024-01-01", "2024-01-02", "2024-01-03"]
+    events = _events(sample_event, [
+        (f"{day}T{hour:02d}:00:00Z", f"user_{(hour * 7) % 5}") for hour in range(24) for day in days
+    ])
+    
+    data_processor.write_to_iceberg(data_processor.process_events(events), "user_login")
+    
+    table = local_catalog.load_table("events_db.events_user_login")
+    tasks = list(table.scan().plan_files())
+    assert len(table.history()) == 1
+    assert sorted(task.file.partition[0] for task in tasks) == [19723, 19724, 19725]
+    for task in tasks:
+        assert task.file.record_count == 24
+        users = pq.read_table(task.file.file_path.replace("file://", ""), columns=["user_id"]).column("user_id").to_pylist()
+        assert users == sorted(users)
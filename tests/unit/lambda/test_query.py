@@ -0,0 +1,171 @@
+import json
+import datetime
+import pytest
+import polars as pl
+import pyarrow as pa
+from pyiceberg.io.pyarrow import schema_to_pyarrow
+from pyiceberg.types import IntegerType
+from apps.lambda_processor.query import QueryCache, TableQuery, main, query
+from apps.lambda_processor.schemas import create_error_log_schema
+
+START = datetime.datetime(2024, 1, 1)
+
+def _errors(hour, count, event_id="evt-1"):
+    """Build error records of one hour, a minute apart."""
+    return pa.Table.from_pylist([
+        {
+            "error_id": f"err-{hour}-{i}",
+            "timestamp": START + datetime.timedelta(hours=hour, minutes=i),
+            "event_id": event_id if i % 2 == 0 else "evt-2",
+            "event_type": "purchase",
+            "error_type": "WriteError",
+            "error_message": f"failure {hour}-{i}",
+            "processing_stage": "write_to_iceberg"
+        }
+        for i in range(count)
+    ], schema=schema_to_pyarrow(create_error_log_schema()))
+
+@pytest.fixture
+def error_logs(local_catalog):
+    """The error_logs table with one data file per hour for five hours."""
+    table = local_catalog.load_table("events_db.error_logs")
+    for hour in range(5):
+        table.append(_errors(hour, 10))
+    return table
+
+def test_query_pushes_down_filter_and_projection(error_logs):
+    """Test files outside the filter are pruned and only the selected columns are read."""
+    table_query = TableQuery(
+        error_logs,
+        "event_id = 'evt-1' and timestamp >= '2024-01-01T03:00:00'",
+        selected_fields=("error_id", "timestamp")
+    )
+
+    result = table_query.to_arrow()
+
+    assert result.column_names == ["error_id", "timestamp"]
+    assert sorted(result.column("error_id").to_pylist()) == sorted(
+        f"err-{hour}-{i}" for hour in (3, 4) for i in range(0, 10, 2)
+    )
+    assert table_query.stats["files_planned"] == 2
+    assert table_query.stats["cache"] == "off"
+    assert sum(part.num_rows for part in TableQuery(error_logs, workers=2).to_batches()) == 50
+
+def test_ordered_limit_stops_reading_early(error_logs):
+    """Test the last N rows are read from the newest files only, nulls and ties aside."""
+    table_query = TableQuery(
+        error_logs,
+        "event_id = 'evt-1'",
+        selected_fields=("error_message",),
+        order_by="timestamp",
+        descending=True,
+        limit=3,
+        workers=1
+    )
+
+    result = table_query.to_arrow()
+
+    assert result.column_names == ["error_message"]
+    assert result.column("error_message").to_pylist() == ["failure 4-8", "failure 4-6", "failure 4-4"]
+    assert table_query.stats["files_planned"] == 5
+    assert table_query.stats["files_read"] == 1
+    oldest = query(error_logs, order_by="timestamp", limit=12, workers=1)
+    assert oldest.column("error_id").to_pylist()[-2:] == ["err-1-0", "err-1-1"]
+
+def test_cache_hits_until_the_snapshot_changes(error_logs, tmp_path):
+    """Test a repeated query is answered from disk and a new commit invalidates it."""
+    cache = QueryCache(str(tmp_path / "cache"))
+    first = TableQuery(error_logs, "event_id = 'evt-2'", cache=cache)
+    expected = first.to_arrow()
+
+    repeated = TableQuery(error_logs, "event_id = 'evt-2'", cache=cache)
+    assert repeated.to_arrow().equals(expected)
+    assert (first.stats["cache"], repeated.stats["cache"]) == ("miss", "hit")
+
+    error_logs.append(_errors(5, 4))
+    refreshed = TableQuery(error_logs, "event_id = 'evt-2'", cache=cache)
+    assert refreshed.to_arrow().num_rows == expected.num_rows + 2
+    assert refreshed.stats["cache"] == "miss"
+    #the older snapshot can still be read from its own entry
+    pinned = TableQuery(error_logs, "event_id = 'evt-2'", snapshot_id=error_logs.snapshots()[-2].snapshot_id, cache=cache)
+    assert pinned.to_arrow().num_rows == expected.num_rows
+    assert pinned.stats["cache"] == "hit"
+    assert cache.stats()["entries"] == 2
+
+def test_cache_key_names_the_rows_not_the_filter_text(error_logs):
+    """Test equivalent filters share a key and a schema change invalidates it."""
+    def key(row_filter):
+        return TableQuery(error_logs, row_filter).cache_key()
+
+    assert key("event_id in ('evt-1', 'evt-2', 'evt-3')") == key("event_id IN ('evt-3', 'evt-1', 'evt-2')")
+    assert key("event_id in ('evt-1', 'evt-2')") != key("event_id in ('evt-1', 'evt-3')")
+    before = key("event_id = 'evt-1'")
+
+    with error_logs.update_schema() as update:
+        update.add_column("retry_count", IntegerType())
+
+    assert error_logs.metadata.current_schema_id == 1
+    assert key("event_id = 'evt-1'") != before
+
+def test_to_polars_reads_only_when_collected(error_logs, monkeypatch):
+    """Test the lazy frame defers the read and pushes its columns into the scan."""
+    scans = []
+    scan = TableQuery.scan
+    monkeypatch.setattr(TableQuery, "scan", lambda self: scans.append(self.selected_fields) or scan(self))
+    frame = TableQuery(error_logs, "event_id = 'evt-1'").to_polars()
+    planned = len(scans)
+
+    result = frame.filter(pl.col("error_id").str.starts_with("err-4")).select("error_id").collect()
+
+    assert planned == 1
+    assert sorted(result["error_id"].to_list()) == [f"err-4-{i}" for i in range(0, 10, 2)]
+    assert scans[-1] == ("error_id",)
+    assert frame.head(3).collect().height == 3
+    ordered = TableQuery(error_logs, order_by="timestamp", descending=True, limit=2).to_polars()
+    assert ordered.select("error_id").collect()["error_id"].to_list() == ["err-4-9", "err-4-8"]
+
+def test_cache_evicts_least_recently_used_and_drops_torn_entries(tmp_path):
+    """Test the cache stays within its size and recovers from unreadable files."""
+    data = pa.table({"value": list(range(1000))})
+    cache = QueryCache(str(tmp_path), max_bytes=20_000)
+    cache.put("a", data)
+    cache.put("b", data)
+    assert cache.get("a") is not None
+
+    cache.put("c", data)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.put("big", pa.table({"value": list(range(10_000))})) is False
+    with open(cache.path("a"), "wb") as f:
+        f.write(b"torn")
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 1
+
+def test_query_cli_prints_rows_and_stats(error_logs, local_catalog, tmp_path, capsys):
+    """Test the CLI against the local catalog."""
+    properties = local_catalog.properties
+    args = [
+        "error_logs",
+        "--filter", "event_id = 'evt-1'",
+        "--select", "error_id",
+        "--order-by", "timestamp",
+        "--descending",
+        "--limit", "2",
+        "--format", "ndjson",
+        "--cache-dir", str(tmp_path / "cache"),
+        "--catalog-name", "local",
+        "--catalog-type", "sql",
+        "--catalog-uri", properties["uri"],
+        "--warehouse", properties["warehouse"]
+    ]
+
+    assert main(args) == 0
+    assert main(args) == 0
+
+    captured = capsys.readouterr()
+    rows = [json.loads(line) for line in captured.out.splitlines()]
+    assert rows == [{"error_id": "err-4-8"}, {"error_id": "err-4-6"}] * 2
+    stats = [json.loads(line) for line in captured.err.splitlines()]
+    assert [s["cache"] for s in stats] == ["miss", "hit"]
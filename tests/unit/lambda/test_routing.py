@@ -0,0 +1,55 @@
+import pytest
+from apps.lambda_processor.routing import (
+    DEFAULT_EVENT_TYPES,
+    QUARANTINE_ROUTE,
+    EventRouter,
+    parse_routes
+)
+
+def test_parse_routes_defaults_and_overrides():
+    """Test an empty spec gives the default tables and entries may name their own table."""
+    assert parse_routes("") == {event_type: f"events_{event_type}" for event_type in DEFAULT_EVENT_TYPES}
+    assert parse_routes(" signup , page_view=events_pages ,") == {
+        "signup": "events_signup",
+        "page_view": "events_pages"
+    }
+    with pytest.raises(ValueError):
+        parse_routes("page_view=")
+    with pytest.raises(ValueError):
+        parse_routes("=events_pages")
+
+def test_router_quarantines_unknown_types():
+    """Test unknown, misspelled and non-string types share the quarantine route."""
+    router = EventRouter(parse_routes("user_login,purchase=events_orders"), "events_unknown")
+
+    assert router.route("purchase").table_name == "events_orders"
+    assert router.route("purchse") is router.quarantine
+    assert router.route(["user_login"]) is router.quarantine
+    assert router.route(QUARANTINE_ROUTE) is router.quarantine
+    assert router.table_names() == ["events_user_login", "events_orders", "events_unknown"]
+    with pytest.raises(ValueError, match="reserved"):
+        EventRouter({QUARANTINE_ROUTE: "events_quarantine"})
+
+def test_router_stats_track_each_route():
+    """Test routed events, written rows and throughput are counted per route."""
+    router = EventRouter(parse_routes("user_login"))
+    login = router.route("user_login")
+    router.record_events(login, 3)
+    router.record_write(login, 3, 300, 0.5)
+    router.record_write(login, 2, 0, 0.5, failed=True)
+    router.record_events(router.quarantine, 2)
+
+    stats = router.stats()
+
+    assert stats["user_login"] == {
+        "table": "events_user_login",
+        "events": 3,
+        "rows_written": 3,
+        "bytes_written": 300,
+        "appends": 1,
+        "failed_appends": 1,
+        "rows_per_second": 3.0
+    }
+    assert stats[QUARANTINE_ROUTE]["events"] == 2
+    assert stats[QUARANTINE_ROUTE]["rows_per_second"] == 0.0
+    assert list(router.stats("user_login")) == ["user_login"]
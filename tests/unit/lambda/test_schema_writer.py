@@ -0,0 +1,78 @@
+import datetime
+import pytest
+import polars as pl
+import pyarrow as pa
+from pyiceberg.io.pyarrow import schema_to_pyarrow
+from apps.lambda_processor.schema_writer import SchemaAligner
+from apps.lambda_processor.schemas import create_base_schema
+
+TABLE = "events_db.events_user_login"
+
+def _frame(rows, **extra):
+    """Build a polars batch with the inferred types polars gives raw events."""
+    data = {
+        "event_id": [str(i) for i in range(rows)],
+        "event_type": ["user_login"] * rows,
+        "user_id": [f"user_{i}" for i in range(rows)],
+        "timestamp": [datetime.datetime(2024, 1, 1, 0, 0, i) for i in range(rows)],
+        "doc_session_info_duration": list(range(rows)),
+        "doc_performance_page_load_time": [float(i) for i in range(rows)]
+    }
+    data.update(extra)
+    return pl.DataFrame(data)
+
+def test_align_casts_inferred_types_and_fills_missing_columns(local_catalog):
+    """Test Int64/large types are cast and absent optional columns become nulls in one pass."""
+    table = local_catalog.load_table(TABLE)
+    aligner = SchemaAligner()
+    data = _frame(3).to_arrow()
+    assert data.schema.field("doc_session_info_duration").type == pa.int64()
+
+    aligned = aligner.align(table, data)
+    table.append(aligned)
+
+    assert aligned.schema.equals(schema_to_pyarrow(create_base_schema()))
+    assert aligned.column("doc_session_info_duration").to_pylist() == [0, 1, 2]
+    assert aligned.column("browser").null_count == 3
+    assert table.scan().to_arrow().num_rows == 3
+    assert aligner.stats() == {"hits": 0, "misses": 1, "casts": 1, "evolutions": 0}
+
+def test_align_passes_matching_batches_through(local_catalog):
+    """Test a batch already in the table schema is returned as is from the cached schema."""
+    table = local_catalog.load_table(TABLE)
+    aligner = SchemaAligner()
+    data = aligner.align(table, _frame(2).to_arrow())
+
+    assert aligner.align(table, data) is data
+    assert aligner.stats()["hits"] == 1
+    assert aligner.stats()["casts"] == 1
+
+def test_align_rejects_unknown_columns_and_bad_values(local_catalog):
+    """Test unknown non-null columns, missing required columns and overflowing values fail."""
+    table = local_catalog.load_table(TABLE)
+    aligner = SchemaAligner()
+
+    with pytest.raises(ValueError, match="doc_performance_largest_paint"):
+        aligner.align(table, _frame(2, doc_performance_largest_paint=[1.0, None]).to_arrow())
+    with pytest.raises(ValueError, match="Missing required column: user_id"):
+        aligner.align(table, _frame(2).drop("user_id").to_arrow())
+    with pytest.raises(ValueError, match="Cannot cast"):
+        aligner.align(table, _frame(1, doc_session_info_duration=[2 ** 40]).to_arrow())
+    #a column that is null in every row carries no data and is dropped
+    aligned = aligner.align(table, _frame(2, doc_performance_largest_paint=[None, None]).to_arrow())
+    assert "doc_performance_largest_paint" not in aligned.column_names
+
+def test_align_evolves_schema_when_enabled(local_catalog):
+    """Test unknown columns are added as optional columns and the new schema is cached."""
+    table = local_catalog.load_table(TABLE)
+    aligner = SchemaAligner(evolve=True)
+    aligner.align(table, _frame(1).to_arrow())
+
+    aligned = aligner.align(table, _frame(2, doc_performance_largest_paint=[1.5, 2.5]).to_arrow())
+    table.append(aligned)
+
+    reloaded = local_catalog.load_table(TABLE)
+    assert reloaded.metadata.current_schema_id == 1
+    assert reloaded.schema().find_field("doc_performance_largest_paint").required is False
+    assert reloaded.scan().to_arrow().column("doc_performance_largest_paint").to_pylist() == [1.5, 2.5]
+    assert aligner.stats() == {"hits": 1, "misses": 2, "casts": 2, "evolutions": 1}
@@ -0,0 +1,70 @@
+import json
+import pytest
+import pyarrow as pa
+from apps.lambda_processor.schemas import (
+    CompiledFlattener,
+    create_base_schema,
+    source_path
+)
+from apps.mock_generator.main import generate_mock_event
+
+def test_source_path():
+    """Test flat column names resolve to their raw event key paths."""
+    assert source_path("event_id") == ("event_id",)
+    assert source_path("browser") == ("metadata", "browser")
+    assert source_path("doc_session_info_session_id") == ("_doc", "session_info", "session_id")
+    assert source_path("doc_user_agent_browser_version") == ("_doc", "user_agent", "browser_version")
+
+def test_generator_fields_are_covered_by_schema():
+    """Test every leaf the mock generator emits has a column in the base schema."""
+    flattener = CompiledFlattener(create_base_schema(), overflow_column="overflow")
+    
+    columns = flattener.flatten([generate_mock_event()])
+    
+    assert columns[-1] == [None]
+
+def test_flatten_follows_schema_order(sample_event):
+    """Test column buffers line up with the schema fields."""
+    schema = create_base_schema()
+    flattener = CompiledFlattener(schema)
+    
+    columns = flattener.flatten([sample_event])
+    
+    assert len(columns) == len(schema.fields)
+    values = dict(zip(flattener.column_names, (column[0] for column in columns)))
+    assert values["user_id"] == sample_event["user_id"]
+    assert values["os"] == sample_event["metadata"]["os"]
+    assert values["doc_performance_dom_interactive"] == sample_event["_doc"]["performance"]["dom_interactive"]
+
+def test_flatten_routes_unknown_keys_to_overflow(sample_event):
+    """Test unknown keys are collected into the overflow column."""
+    sample_event["campaign"] = "spring"
+    sample_event["_doc"]["performance"]["ttfb"] = 0.2
+    flattener = CompiledFlattener(create_base_schema(), overflow_column="overflow")
+    
+    columns = flattener.flatten([sample_event])
+    
+    assert json.loads(columns[-1][0]) == {
+        "campaign": "spring",
+        "_doc_performance_ttfb": 0.2
+    }
+
+def test_to_arrow_uses_schema_types(sample_event):
+    """Test the Arrow table is built with the declared Iceberg types."""
+    flattener = CompiledFlattener(create_base_schema())
+    sample_event["timestamp"] = None
+    
+    table = flattener.to_arrow(flattener.flatten([sample_event]))
+    
+    assert str(table.schema.field("doc_session_info_duration").type) == "int32"
+    assert str(table.schema.field("doc_performance_network_latency").type) == "double"
+    assert table.schema.field("event_id").metadata[b"PARQUET:field_id"] == b"1"
+
+def test_to_arrow_rejects_mistyped_values(sample_event):
+    """Test values that do not fit the declared type fail instead of being guessed."""
+    flattener = CompiledFlattener(create_base_schema())
+    sample_event["timestamp"] = None
+    sample_event["_doc"]["session_info"]["duration"] = "an hour"
+    
+    with pytest.raises(pa.ArrowInvalid):
+        flattener.to_arrow(flattener.flatten([sample_event]))
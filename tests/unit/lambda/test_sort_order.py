@@ -0,0 +1,85 @@
+import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+from unittest.mock import MagicMock
+from pyiceberg.table.sorting import UNSORTED_SORT_ORDER, NullOrder, SortDirection, SortField, SortOrder
+from pyiceberg.transforms import BucketTransform, DayTransform, IdentityTransform
+from apps.lambda_processor import data_processor
+from apps.lambda_processor.schemas import create_base_schema, create_event_sort_order
+from apps.lambda_processor.sort_order import arrow_sort_keys, sort_by_keys, sort_for_table
+
+def _rows():
+    """Build rows in arrival order, interleaving users."""
+    start = datetime.datetime(2024, 1, 1)
+    return pa.table({
+        "user_id": ["user_2", "user_1", "user_2", "user_1"],
+        "timestamp": pa.array([start + datetime.timedelta(seconds=s) for s in (4, 3, 1, 2)], pa.timestamp("us"))
+    })
+
+def _table(sort_order):
+    """Mock a table handle with the base schema and the given sort order."""
+    table = MagicMock()
+    table.sort_order.return_value = sort_order
+    table.schema.return_value = create_base_schema()
+    return table
+
+def test_arrow_sort_keys_follow_order_preserving_transforms():
+    """Test source columns of order-preserving transforms are used up to the first bucket."""
+    sort_order = SortOrder(
+        SortField(source_id=4, transform=DayTransform(), direction=SortDirection.DESC, null_order=NullOrder.NULLS_LAST),
+        SortField(source_id=3, transform=IdentityTransform()),
+        SortField(source_id=1, transform=BucketTransform(16)),
+        SortField(source_id=2, transform=IdentityTransform())
+    )
+    
+    keys = arrow_sort_keys(sort_order, create_base_schema())
+    
+    assert keys == [("timestamp", "descending", "at_end"), ("user_id", "ascending", "at_start")]
+
+def test_sort_for_table_applies_event_sort_order():
+    """Test rows are clustered by user, then time."""
+    result = sort_for_table(_table(create_event_sort_order()), _rows())
+    
+    assert result.column("user_id").to_pylist() == ["user_1", "user_1", "user_2", "user_2"]
+    seconds = [ts.second for ts in result.column("timestamp").to_pylist()]
+    assert seconds == [2, 3, 1, 4]
+
+def test_sort_by_keys_places_nulls_per_key():
+    """Test each key keeps its own null placement and missing columns are ignored."""
+    rows = pa.table({
+        "user_id": ["user_1", None, "user_1", None],
+        "scroll_depth": pa.array([None, 10, 20, None], pa.int64())
+    })
+    
+    result = sort_by_keys(rows, [
+        ("user_id", "ascending", "at_start"),
+        ("scroll_depth", "ascending", "at_end"),
+        ("event_id", "ascending", "at_start")
+    ])
+    
+    assert result.column("user_id").to_pylist() == [None, None, "user_1", "user_1"]
+    assert result.column("scroll_depth").to_pylist() == [10, None, 20, None]
+
+def test_sort_for_table_leaves_unsorted_tables_alone():
+    """Test unsorted tables keep arrival order without a copy."""
+    rows = _rows()
+    
+    assert sort_for_table(_table(UNSORTED_SORT_ORDER), rows) is rows
+
+def test_write_to_iceberg_writes_sorted_files(monkeypatch, local_catalog, sample_event):
+    """Test appends through the processor produce data files in the table's sort order."""
+    monkeypatch.setattr(data_processor, "_table_cache", None)
+    monkeypatch.setattr(data_processor, "_commit_coordinator", None)
+    monkeypatch.setattr(data_processor, "_catalog", local_catalog)
+    monkeypatch.setattr(data_processor, "ICEBERG_NAMESPACE", "events_db")
+    events = [
+        dict(sample_event, event_id=str(i), user_id=user_id)
+        for i, user_id in enumerate(["user_9", "user_3", "user_5", "user_3"])
+    ]
+    
+    data_processor.write_to_iceberg(data_processor.process_events(events), "user_login")
+    
+    table = local_catalog.load_table("events_db.events_user_login")
+    (task,) = table.scan().plan_files()
+    written = pq.read_table(task.file.file_path.replace("file://", ""), columns=["user_id"])
+    assert written.column("user_id").to_pylist() == ["user_3", "user_3", "user_5", "user_9"]
@@ -0,0 +1,63 @@
+from unittest.mock import MagicMock
+from apps.lambda_processor.table_cache import TableCache
+
+class FakeClock:
+    """Manually advanced clock."""
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+def test_get_caches_handles():
+    """Test repeated lookups hit the cache."""
+    load_table = MagicMock(side_effect=lambda name: MagicMock(name=name))
+    cache = TableCache(load_table)
+    
+    first = cache.get("events_purchase")
+    second = cache.get("events_purchase")
+    
+    assert first is second
+    load_table.assert_called_once_with("events_purchase")
+    assert cache.stats() == {"hits": 1, "misses": 1, "refreshes": 0, "cached_tables": 1}
+
+def test_get_reloads_after_ttl():
+    """Test handles are loaded again once the TTL expires."""
+    clock = FakeClock()
+    load_table = MagicMock()
+    cache = TableCache(load_table, ttl_seconds=60, clock=clock)
+    cache.get("error_logs")
+    
+    clock.now = 61
+    cache.get("error_logs")
+    
+    assert load_table.call_count == 2
+    assert cache.misses == 2
+
+def test_refresh_only_touches_one_table():
+    """Test refreshing reloads metadata of the named table only."""
+    tables = {}
+    cache = TableCache(lambda name: tables.setdefault(name, MagicMock()))
+    cache.get("events_purchase")
+    cache.get("events_user_login")
+    
+    cache.refresh("events_purchase")
+    
+    tables["events_purchase"].refresh.assert_called_once()
+    tables["events_user_login"].refresh.assert_not_called()
+    assert cache.refreshes == 1
+
+def test_invalidate():
+    """Test invalidated handles are loaded from the catalog again."""
+    load_table = MagicMock()
+    cache = TableCache(load_table)
+    cache.get("events_purchase")
+    cache.get("events_user_login")
+    
+    cache.invalidate("events_purchase")
+    cache.get("events_purchase")
+    cache.get("events_user_login")
+    cache.invalidate()
+    
+    assert load_table.call_count == 3
+    assert cache.stats()["cached_tables"] == 0
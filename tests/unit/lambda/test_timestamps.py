@@ -0,0 +1,62 @@
+import datetime
+import polars as pl
+from apps.lambda_processor.timestamps import (
+    EPOCH,
+    ISO_NAIVE,
+    ISO_OFFSET,
+    ISO_UTC,
+    detect_format,
+    parse_timestamps
+)
+
+EXPECTED = datetime.datetime(2024, 1, 2, 3, 4, 5, 123456)
+
+def test_detect_format():
+    """Test the format is detected from the values themselves."""
+    assert detect_format(pl.Series(["2024-01-02T03:04:05.123456Z"])) == ISO_UTC
+    assert detect_format(pl.Series(["2024-01-02T03:04:05+02:00"])) == ISO_OFFSET
+    assert detect_format(pl.Series(["2024-01-02T03:04:05"])) == ISO_NAIVE
+    assert detect_format(pl.Series(["1704164645123"])) == EPOCH
+    assert detect_format(pl.Series(["not a timestamp"])) is None
+
+def test_parse_timestamps_generator_isoformat():
+    """Test `datetime.isoformat()` output with and without a fraction parses without "Z"."""
+    result = parse_timestamps([EXPECTED.isoformat(), EXPECTED.replace(microsecond=0).isoformat()])
+    
+    assert result.to_pylist() == [EXPECTED, EXPECTED.replace(microsecond=0)]
+
+def test_parse_timestamps_converts_offsets_to_utc():
+    """Test offsets are applied so every value is naive UTC."""
+    result = parse_timestamps(["2024-01-02T05:04:05.123456+02:00", "2024-01-01T22:34:05.123456-04:30"])
+    
+    assert result.to_pylist() == [EXPECTED, EXPECTED]
+
+def test_parse_timestamps_epoch_units():
+    """Test epoch seconds, milliseconds and microseconds are told apart by magnitude."""
+    seconds = 1704164645
+    result = parse_timestamps([seconds, seconds * 1000 + 123, str(seconds * 1_000_000 + 123456), seconds + 0.5])
+    
+    assert result.to_pylist() == [
+        EXPECTED.replace(microsecond=0),
+        EXPECTED.replace(microsecond=123000),
+        EXPECTED,
+        EXPECTED.replace(microsecond=500000)
+    ]
+
+def test_parse_timestamps_mixed_batch_keeps_failures_null():
+    """Test a batch mixing formats parses every valid row and leaves the rest null."""
+    values = ["2024-01-02T03:04:05.123456Z"] * 3 + ["2024-01-02T03:04:05.123456", None, "garbage"]
+    
+    result = parse_timestamps(values)
+    
+    assert result.type.unit == "us"
+    assert result.to_pylist() == [EXPECTED] * 4 + [None, None]
+
+def test_parse_timestamps_epoch_out_of_range_is_null():
+    """Test non-finite and out-of-range epoch values null their own row instead of raising."""
+    seconds = 1704164645
+    values = [seconds, "NaN", "inf", "-inf", 1e30, -1e30, "1e25", seconds * 1000 + 123]
+    
+    result = parse_timestamps(values)
+    
+    assert result.to_pylist() == [EXPECTED.replace(microsecond=0)] + [None] * 6 + [EXPECTED.replace(microsecond=123000)]
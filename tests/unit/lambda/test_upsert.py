@@ -0,0 +1,103 @@
+import datetime
+import pytest
+import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
+from apps.lambda_processor import data_processor
+from apps.lambda_processor.commit import CommitCoordinator
+from apps.lambda_processor.schema_writer import SchemaAligner
+from apps.lambda_processor.upsert import WRITE_MODE_UPSERT, UpsertWriter
+
+TABLE = "events_purchase"
+
+def _batch(local_catalog, ids, browser="Chrome"):
+    """Build a batch of purchase events in the table's schema."""
+    data = pl.DataFrame({
+        "event_id": [f"evt-{i}" for i in ids],
+        "event_type": ["purchase"] * len(ids),
+        "user_id": [f"user_{i}" for i in ids],
+        "timestamp": [datetime.datetime(2024, 1, 1, 0, 0, i % 60) for i in ids],
+        "browser": [browser] * len(ids)
+    }).to_arrow()
+    return SchemaAligner().align(local_catalog.load_table(f"events_db.{TABLE}"), data)
+
+def _writer(local_catalog, **kwargs):
+    """Build an upsert writer committing to the local catalog."""
+    def load(table_name):
+        return local_catalog.load_table(f"events_db.{table_name}")
+    return UpsertWriter(load, CommitCoordinator(load, load), **kwargs)
+
+def _browsers(local_catalog):
+    """Get the browser of every committed event, checking none is committed twice."""
+    rows = local_catalog.load_table(f"events_db.{TABLE}").scan(selected_fields=("event_id", "browser")).to_arrow()
+    assert pc.count_distinct(rows.column("event_id")).as_py() == rows.num_rows
+    return dict(zip(rows.column("event_id").to_pylist(), rows.column("browser").to_pylist()))
+
+def test_upsert_inserts_corrects_and_drops_unchanged_rows(local_catalog):
+    """Test new keys are appended, changed rows replace their committed version once."""
+    writer = _writer(local_catalog)
+    assert writer.write(TABLE, _batch(local_catalog, range(20)), defer=False)["inserted"] == 20
+
+    batch = pa.concat_tables([
+        _batch(local_catalog, range(5), browser="Safari"),
+        _batch(local_catalog, range(5, 8)),
+        _batch(local_catalog, [20, 21]),
+        #the last version of a repeated key wins
+        _batch(local_catalog, [0], browser="Firefox")
+    ])
+    result = writer.write(TABLE, batch, defer=False)
+
+    assert result == {"inserted": 2, "unchanged": 3, "corrected": 5, "pending": 0}
+    browsers = _browsers(local_catalog)
+    assert len(browsers) == 22
+    assert browsers["evt-0"] == "Firefox"
+    assert [browsers[f"evt-{i}"] for i in range(1, 5)] == ["Safari"] * 4
+    assert browsers["evt-5"] == "Chrome"
+    stats = writer.stats()
+    assert stats["rewrites"] == 1
+    assert stats["rows_rewritten"] == 20
+    assert stats["write_amplification"] == (22 + 20) / (22 + 5)
+
+def test_upsert_defers_costly_rewrites_until_flush(local_catalog):
+    """Test corrections wait while a rewrite is too costly and are applied together later."""
+    now = [0.0]
+    writer = _writer(local_catalog, max_amplification=5, max_pending_rows=100, max_age_seconds=30, clock=lambda: now[0])
+    writer.write(TABLE, _batch(local_catalog, range(20)))
+
+    first = writer.write(TABLE, _batch(local_catalog, [1, 2], browser="Safari"))
+    second = writer.write(TABLE, _batch(local_catalog, [2, 3], browser="Edge"))
+
+    assert first["pending"] == 2
+    assert second == {"inserted": 0, "unchanged": 0, "corrected": 0, "pending": 3}
+    assert writer.amplification(TABLE) == 20 / 3
+    assert set(_browsers(local_catalog).values()) == {"Chrome"}
+    assert writer.flush_due() == {}
+    assert writer.pending_rows() == 3
+
+    now[0] = 30.0
+    assert writer.flush_due() == {}
+
+    browsers = _browsers(local_catalog)
+    assert len(browsers) == 20
+    assert [browsers[f"evt-{i}"] for i in range(1, 4)] == ["Safari", "Edge", "Edge"]
+    assert writer.stats()["rewrites"] == 1
+    assert writer.pending_rows() == 0
+
+def test_write_to_iceberg_upserts_in_upsert_mode(local_catalog, monkeypatch):
+    """Test the writer path replaces corrected events instead of appending them again."""
+    for name in ["_table_cache", "_commit_coordinator", "_metrics", "_schema_aligner", "_router", "_deduplicator", "_upsert_writer"]:
+        monkeypatch.setattr(data_processor, name, None)
+    monkeypatch.setattr(data_processor, "WRITE_MODE", WRITE_MODE_UPSERT)
+    monkeypatch.setattr(data_processor, "_catalog", local_catalog)
+    monkeypatch.setattr(data_processor, "ICEBERG_NAMESPACE", "events_db")
+
+    data_processor.write_to_iceberg(_batch(local_catalog, range(10)), "purchase")
+    data_processor.write_to_iceberg(_batch(local_catalog, range(8, 12), browser="Safari"), "purchase")
+
+    browsers = _browsers(local_catalog)
+    assert len(browsers) == 12
+    assert [browsers[f"evt-{i}"] for i in range(7, 12)] == ["Chrome", "Safari", "Safari", "Safari", "Safari"]
+    assert data_processor.get_upsert_writer().stats()["corrections_applied"] == 2
+    monkeypatch.setattr(data_processor, "WRITE_MODE", "merge")
+    with pytest.raises(ValueError, match="Unknown write mode"):
+        data_processor.get_upsert_writer()
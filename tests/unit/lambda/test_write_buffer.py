@@ -0,0 +1,142 @@
+import pytest
+import pyarrow as pa
+from apps.lambda_processor.write_buffer import WriteBuffer
+
+class FakeClock:
+    """Manually advanced clock."""
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+def _batch(num_rows):
+    """Build a small Arrow batch."""
+    return pa.table({"event_id": [str(i) for i in range(num_rows)]})
+
+@pytest.fixture
+def written():
+    """Collect the tables handed to the writer."""
+    return []
+
+def test_add_below_thresholds_does_not_write(written):
+    """Test batches stay buffered until a threshold is hit."""
+    buffer = WriteBuffer(lambda table, key: written.append((key, table)), max_rows=10)
+    
+    assert buffer.add("user_login", _batch(4)) is False
+    assert buffer.flush_due() == {}
+    assert written == []
+    assert buffer.pending_rows("user_login") == 4
+
+def test_row_threshold(written):
+    """Test the row threshold makes a key due and flushes one combined table."""
+    buffer = WriteBuffer(lambda table, key: written.append((key, table)), max_rows=5)
+    buffer.add("user_login", _batch(3))
+    
+    assert buffer.add("user_login", _batch(3)) is True
+    buffer.flush_due()
+    
+    assert [(key, table.num_rows) for key, table in written] == [("user_login", 6)]
+    assert buffer.pending_rows() == 0
+
+def test_byte_threshold(written):
+    """Test the byte threshold makes a key due."""
+    buffer = WriteBuffer(lambda table, key: written.append((key, table)), max_bytes=1)
+    
+    assert buffer.add("purchase", _batch(1)) is True
+
+def test_age_threshold(written):
+    """Test the oldest batch's age makes a key due."""
+    clock = FakeClock()
+    buffer = WriteBuffer(lambda table, key: written.append((key, table)), max_age_seconds=30, clock=clock)
+    buffer.add("purchase", _batch(1))
+    buffer.add("user_login", _batch(1))
+    
+    clock.now = 31
+    buffer.add("cart_update", _batch(1))
+    buffer.flush_due()
+    
+    assert sorted(key for key, _ in written) == ["purchase", "user_login"]
+    assert buffer.pending_rows() == 1
+
+def test_flush_failure_drops_batches_by_default():
+    """Test failed flushes are reported and dropped when not retained."""
+    def failing_writer(table, key):
+        raise RuntimeError("commit failed")
+    
+    buffer = WriteBuffer(failing_writer)
+    buffer.add("purchase", _batch(2))
+    
+    failures = buffer.flush()
+    
+    assert list(failures) == ["purchase"]
+    assert buffer.pending_rows() == 0
+
+def test_flush_failure_retains_batches(written):
+    """Test failed flushes keep their rows, ahead of newer batches, when retained."""
+    attempts = []
+    
+    def flaky_writer(table, key):
+        attempts.append(table.num_rows)
+        if len(attempts) == 1:
+            raise RuntimeError("commit failed")
+        written.append((key, table))
+    
+    buffer = WriteBuffer(flaky_writer, retain_on_failure=True)
+    buffer.add("purchase", _batch(2))
+    assert list(buffer.flush()) == ["purchase"]
+    
+    buffer.add("purchase", _batch(1))
+    assert buffer.flush() == {}
+    
+    assert attempts == [2, 3]
+    assert written[0][1].column("event_id").to_pylist() == ["0", "1", "0"]
+
+def test_permanently_failing_key_is_abandoned_after_max_attempts(written):
+    """Test a key that never flushes is retried up to max_attempts, then handed off and dropped."""
+    abandoned = []
+    
+    def writer(table, key):
+        if key == "missing_table":
+            raise RuntimeError("table does not exist")
+        written.append((key, table))
+    
+    buffer = WriteBuffer(
+        writer,
+        retain_on_failure=True,
+        max_attempts=3,
+        on_abandon=lambda key, table, error: abandoned.append((key, table.num_rows, str(error)))
+    )
+    for _ in range(3):
+        buffer.add("missing_table", _batch(2))
+        buffer.add("purchase", _batch(1))
+        assert list(buffer.flush()) == ["missing_table"]
+    
+    assert abandoned == [("missing_table", 6, "table does not exist")]
+    assert buffer.pending_rows() == 0
+    assert (buffer.keys_abandoned, buffer.rows_abandoned) == (1, 6)
+    assert [table.num_rows for _, table in written] == [1, 1, 1]
+
+def test_failed_rows_beyond_pending_limit_are_abandoned():
+    """Test a failed flush that would overfill the buffer is handed off instead of retained."""
+    abandoned = []
+    
+    def failing_writer(table, key):
+        raise RuntimeError("schema mismatch")
+    
+    buffer = WriteBuffer(
+        failing_writer,
+        retain_on_failure=True,
+        max_pending_rows=5,
+        max_attempts=10,
+        on_abandon=lambda key, table, error: abandoned.append((key, table.num_rows))
+    )
+    buffer.add("purchase", _batch(4))
+    buffer.flush()
+    assert buffer.pending_rows() == 4
+    
+    buffer.add("purchase", _batch(2))
+    buffer.flush()
+    
+    assert abandoned == [("purchase", 6)]
+    assert buffer.pending_rows() == 0
@@ -1,11 +1,17 @@
 import pytest
+import datetime
+import pyarrow as pa
+import pyarrow.compute as pc
 from apps.mock_generator.main import (
     generate_session_info,
     generate_user_agent,
     generate_location,
     generate_engagement,
     generate_mock_event,
-    send_to_lambda
+    generate_mock_events,
+    send_to_lambda,
+    run_load_test,
+    parse_args
 )
 
 def test_generate_session_info():
@@ -124,4 +130,140 @@ def test_send_to_lambda(mocker, sample_event):
         FunctionName='data-processor',
         InvocationType='Event',
         Payload=mocker.ANY  # We don't care about the exact payload
-    ) 
\ No newline at end of file
+    )
+
+def test_send_to_lambda_reuses_client(mocker, sample_event):
+    """Test a provided client is used instead of creating a new one."""
+    mock_boto3_client = mocker.patch('boto3.client')
+    lambda_client = mocker.MagicMock()
+    
+    send_to_lambda(sample_event, lambda_client)
+    send_to_lambda(sample_event, lambda_client)
+    
+    mock_boto3_client.assert_not_called()
+    assert lambda_client.invoke.call_count == 2
+
+def test_run_load_test_uses_one_client_per_worker(mocker):
+    """Test the load test pools one client per worker and reports throughput."""
+    clients = []
+    
+    def client_factory():
+        client = mocker.MagicMock()
+        client.invoke.return_value = {"StatusCode": 202}
+        clients.append(client)
+        return client
+    
+    report = run_load_test(50, concurrency=4, client_factory=client_factory)
+    
+    assert len(clients) == 4
+    assert sum(client.invoke.call_count for client in clients) == 50
+    assert report["events_sent"] == 50
+    assert report["errors"] == 0
+    assert report["events_per_second"] > 0
+    assert report["latency_p50_ms"] <= report["latency_p99_ms"]
+
+def test_run_load_test_counts_errors(mocker):
+    """Test failed and raising invokes are counted as errors."""
+    responses = iter([{"StatusCode": 202}, {"StatusCode": 500}, RuntimeError("throttled")])
+    
+    def invoke(**kwargs):
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+    
+    client = mocker.MagicMock()
+    client.invoke.side_effect = invoke
+    
+    report = run_load_test(3, concurrency=1, client_factory=lambda: client)
+    
+    assert report["events_sent"] == 3
+    assert report["errors"] == 2
+
+def test_run_load_test_paces_to_target_rate(mocker):
+    """Test the target rate spaces out sends."""
+    client = mocker.MagicMock()
+    client.invoke.return_value = {"StatusCode": 202}
+    
+    report = run_load_test(11, concurrency=2, rate=100, client_factory=lambda: client)
+    
+    assert report["duration_seconds"] >= 0.1
+    assert report["events_per_second"] <= 110
+
+def test_parse_args_defaults():
+    """Test the command line defaults to a short serial run."""
+    args = parse_args([])
+    
+    assert args.events == 10
+    assert args.concurrency == 1
+    assert args.rate is None
+
+def _key_shape(d):
+    """Get the nested key structure of an event."""
+    return {k: _key_shape(v) if isinstance(v, dict) else None for k, v in d.items()}
+
+def test_generate_mock_events_matches_event_shape():
+    """Test bulk events have the same nested fields and value types as single events."""
+    single = generate_mock_event()
+    
+    bulk = next(generate_mock_events(1, seed=7, as_arrow=False))
+    
+    assert _key_shape(bulk) == _key_shape(single)
+    assert isinstance(bulk["event_id"], str)
+    assert isinstance(bulk["_doc"]["session_info"]["duration"], int)
+    assert isinstance(bulk["_doc"]["session_info"]["is_new_session"], bool)
+    assert isinstance(bulk["_doc"]["performance"]["page_load_time"], float)
+    assert datetime.datetime.fromisoformat(bulk["timestamp"])
+
+def test_generate_mock_events_is_reproducible():
+    """Test the same seed and start produce identical output."""
+    start = datetime.datetime(2024, 1, 1)
+    
+    first = generate_mock_events(500, seed=42, start=start, chunk_size=128)
+    second = generate_mock_events(500, seed=42, start=start, chunk_size=128)
+    other = generate_mock_events(500, seed=43, start=start, chunk_size=128)
+    
+    assert first.equals(second)
+    assert not first.equals(other)
+
+def test_generate_mock_events_arrow_and_iterator_agree():
+    """Test the Arrow table and the dictionary iterator carry the same events."""
+    start = datetime.datetime(2024, 1, 1)
+    
+    table = generate_mock_events(300, seed=1, start=start, chunk_size=100)
+    events = list(generate_mock_events(300, seed=1, start=start, chunk_size=100, as_arrow=False))
+    
+    assert isinstance(table, pa.Table)
+    assert table.num_rows == 300
+    assert table.to_pylist() == events
+
+def test_generate_mock_events_distributions():
+    """Test bulk fields keep the value ranges and choices of single events."""
+    table = generate_mock_events(20000, seed=3)
+    doc = table.column("_doc").combine_chunks()
+    session_info = doc.field("session_info")
+    engagement = doc.field("engagement")
+    performance = doc.field("performance")
+    
+    assert set(table.column("event_type").to_pylist()) == {"user_login", "product_view", "cart_update", "purchase"}
+    assert len(set(table.column("user_id").to_pylist())) == 1000
+    assert pc.min_max(session_info.field("duration")).as_py() == {"min": 1, "max": 3600}
+    assert pc.min_max(engagement.field("scroll_depth")).as_py() == {"min": 0, "max": 100}
+    assert 45 < pc.mean(engagement.field("scroll_depth")).as_py() < 55
+    load_times = pc.min_max(performance.field("page_load_time")).as_py()
+    assert 0.5 <= load_times["min"] and load_times["max"] <= 5.0
+    assert 0.45 < pc.mean(session_info.field("is_new_session").cast(pa.float64())).as_py() < 0.55
+
+def test_generate_mock_events_empty():
+    """Test zero events give an empty table with the full schema."""
+    table = generate_mock_events(0)
+    
+    assert table.num_rows == 0
+    assert table.column_names == ["event_id", "event_type", "user_id", "timestamp", "metadata", "_doc"]
+
+@pytest.mark.benchmark
+def test_generate_mock_events_performance(benchmark):
+    """Benchmark bulk generation of 100k events."""
+    result = benchmark(generate_mock_events, 100_000, 0)
+    assert result.num_rows == 100_000
+